@@ -0,0 +1,300 @@
+"""
+almacen_productos.py — Vista materializada de productos alimentada por SSE (Semana 10)
+=====================================================================================
+
+Reemplaza el dict plano `_cache_sse` de ClienteRobusto, donde
+`update(datos)` mezclaba las claves `producto`/`precio` de eventos de
+productos distintos. Aquí cada producto es una entrada propia, con el id
+del evento SSE como versión:
+
+    almacen = AlmacenProductos(umbral_stock_bajo=5)
+    sse = ClienteSSEMultiplex(..., materializador=almacen)
+    cliente = ClienteRobusto(..., almacen=almacen)
+
+    almacen.obtener(42)                # o por nombre: "Bolsa Reutilizable"
+    almacen.por_categoria("bebidas")
+    almacen.stock_bajo()
+
+DECISIONES DE DISEÑO:
+  1. Clave = id del producto; los eventos que solo traen el nombre (los
+     del mock: {"producto": nombre, "precio": ...}) se resuelven con un
+     índice nombre → id. Si el id aún no se conoce, la entrada queda bajo
+     el nombre y se fusiona cuando llega el registro completo.
+  2. Versión = id del evento SSE (timestamp en ms en el mock). Un evento
+     con versión <= la de la entrada se descarta ("obsoleto").
+     → Justificación: aplicar es idempotente (reenvíos tras Last-Event-ID,
+     varios shards, at-least-once) y un evento atrasado no pisa uno nuevo.
+     Ids no numéricos no se pueden comparar: se aplican en orden de llegada.
+  3. Los borrados dejan una lápida con su versión (acotadas a
+     MAX_LAPIDAS).
+     → Justificación: un precio-actualizado viejo que llegue después del
+     borrado no resucita el producto.
+  4. Índices secundarios (categoría, stock bajo, nombre) mantenidos en cada
+     escritura.
+     → Justificación: por_categoria()/stock_bajo() cuestan O(resultado),
+     no O(productos); los lee el UI en cada repintado.
+  5. cargar() materializa respuestas REST con versión = ms del inicio de
+     la petición.
+     → Justificación: el mock numera los eventos con su timestamp en ms,
+     así que un evento emitido después de la petición (id mayor) sigue
+     ganándole a la respuesta, y uno anterior ya está reflejado en ella.
+     Con completo=True (GET /productos sin filtros) los productos que no
+     vienen en la respuesta y son más viejos que ella se borran con lápida,
+     y `completo` pasa a True. Las escrituras REST propias (cargar,
+     eliminar) ganan el empate con una entrada de la misma versión: una
+     respuesta posterior es al menos igual de nueva.
+     → Justificación: sin esto un producto borrado en el servidor mientras
+     el SSE estaba caído seguía en el almacén para siempre; y un almacén
+     armado solo con eventos SSE no sabe si tiene todos los productos.
+  6. Lecturas sin red y sin await: devuelven copias, el llamador no puede
+     corromper el almacén.
+"""
+
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Iterable, Optional
+
+from metricas import registro_o_global
+
+UMBRAL_STOCK_BAJO = 5
+MAX_LAPIDAS = 1000
+
+TIPOS_PRODUCTO = frozenset({
+    "nuevo-producto", "producto-actualizado", "precio-actualizado",
+    "stock-critico", "producto-eliminado",
+})
+# Nombres de campo de los eventos → nombres del recurso /productos
+_CAMPOS = {"producto_id": "id", "producto": "nombre", "precio_nuevo": "precio", "stock_actual": "stock"}
+
+
+@dataclass
+class _Entrada:
+    datos: dict
+    version: Optional[int]
+    actualizado: float  # time.monotonic() de la última escritura
+
+
+def _version(evento_id) -> Optional[int]:
+    if isinstance(evento_id, int):
+        return evento_id
+    if evento_id and str(evento_id).isdigit():
+        return int(evento_id)
+    return None
+
+
+def _es_obsoleta(nueva: Optional[int], actual: Optional[int], gana_empate: bool = False) -> bool:
+    if nueva is None or actual is None:
+        return False
+    return nueva < actual if gana_empate else nueva <= actual
+
+
+def _max_version(a: Optional[int], b: Optional[int]) -> Optional[int]:
+    return b if a is None else a if b is None else max(a, b)
+
+
+class AlmacenProductos:
+    """Productos por id con versión SSE e índices por categoría y stock bajo."""
+
+    tipos = TIPOS_PRODUCTO  # tipos SSE que consume (ClienteSSEMultiplex los decodifica)
+
+    def __init__(self, umbral_stock_bajo: int = UMBRAL_STOCK_BAJO, metricas=None):
+        self._umbral = umbral_stock_bajo
+        self._entradas: dict = {}
+        self._por_nombre: dict = {}
+        self._por_categoria: dict = {}
+        self._stock_bajo: set = set()
+        self._lapidas: OrderedDict = OrderedDict()
+        self._sincronizado = False  # hubo un cargar(completo=True)
+
+        registro = registro_o_global(metricas)
+        self._m_eventos = registro.contador(
+            "ecomarket_almacen_eventos_total",
+            "Eventos aplicados al almacen de productos (aplicado, obsoleto, ignorado)",
+            ("resultado",),
+        )
+        self._m_productos = registro.gauge(
+            "ecomarket_almacen_productos",
+            "Productos materializados en el almacen",
+        )
+
+    # ── Escritura ─────────────────────────────────────────────
+
+    def aplicar(self, tipo: Optional[str], datos: Any, evento_id=None) -> bool:
+        """
+        Aplica un evento SSE; retorna False si se ignoró u obsoleto.
+
+        tipo None: actualización parcial genérica (los campos de `datos`).
+        """
+        if not isinstance(datos, dict) or (tipo is not None and tipo not in TIPOS_PRODUCTO):
+            self._m_eventos.etiquetar("ignorado").inc()
+            return False
+        campos = {_CAMPOS.get(k, k): v for k, v in datos.items()}
+        clave = self._clave(campos)
+        if clave is None:
+            self._m_eventos.etiquetar("ignorado").inc()
+            return False
+        version = _version(evento_id)
+
+        if tipo == "producto-eliminado":
+            aplicado = self._eliminar(clave, version)
+        else:
+            aplicado = self._escribir(clave, campos, version, completo=tipo == "nuevo-producto")
+        self._m_eventos.etiquetar("aplicado" if aplicado else "obsoleto").inc()
+        return aplicado
+
+    def cargar(self, productos: Iterable[dict], version=None, completo: bool = False) -> int:
+        """
+        Materializa productos completos de una respuesta REST; retorna cuántos se aplicaron.
+
+        completo=True: `productos` es el listado entero; lo que no venga en él
+        (y sea más viejo que `version`) se borra.
+        """
+        version = _version(version) if version is not None else int(time.time() * 1000)
+        if isinstance(productos, dict):
+            productos = [productos]
+        aplicados = 0
+        vistos = set()
+        for producto in productos:
+            clave = self._clave(producto) if isinstance(producto, dict) else None
+            if clave is None:
+                continue
+            vistos.add(clave)
+            if self._escribir(clave, dict(producto), version, completo=True, rest=True):
+                aplicados += 1
+        if completo:
+            for clave in [c for c in self._entradas if c not in vistos]:
+                self._eliminar(clave, version, rest=True)  # no borra lo escrito por un evento posterior
+            self._sincronizado = True
+        return aplicados
+
+    def eliminar(self, clave, version=None) -> bool:
+        """Borra un producto (con lápida) por una escritura REST propia."""
+        version = _version(version) if version is not None else int(time.time() * 1000)
+        return self._eliminar(clave, version, rest=True)
+
+    def invalidar(self, clave) -> None:
+        """Quita la entrada sin lápida: la próxima lectura tiene que ir a la red."""
+        entrada = self._entradas.pop(clave, None)
+        if entrada is not None:
+            self._desindexar(clave, entrada.datos)
+            self._m_productos.set(len(self._entradas))
+
+    def _clave(self, campos: dict):
+        if campos.get("id") is not None:
+            return campos["id"]
+        nombre = campos.get("nombre")
+        if nombre is None:
+            return None
+        return self._por_nombre.get(nombre, nombre)
+
+    def _escribir(self, clave, campos: dict, version: Optional[int], completo: bool,
+                  rest: bool = False) -> bool:
+        # rest: respuesta REST con versión = ms del inicio de la petición; con la
+        # misma versión gana (un GET y un PATCH propios en el mismo ms)
+        if clave in self._lapidas:
+            if _es_obsoleta(version, self._lapidas[clave], rest) or not completo:
+                return False  # borrado: solo un registro completo más nuevo lo recrea
+            del self._lapidas[clave]
+
+        entrada = self._entradas.get(clave)
+        if entrada is not None:
+            if _es_obsoleta(version, entrada.version, rest):
+                return False
+            self._desindexar(clave, entrada.datos)
+            datos = dict(campos) if completo else {**entrada.datos, **campos}
+            version = _max_version(version, entrada.version)
+        else:
+            datos = dict(campos)
+
+        # Entrada creada antes solo con el nombre: se fusiona bajo el id
+        nombre = campos.get("nombre")
+        provisional = self._entradas.get(nombre) if nombre is not None and nombre != clave else None
+        if provisional is not None:
+            self._desindexar(nombre, provisional.datos)
+            del self._entradas[nombre]
+            if _es_obsoleta(version, provisional.version):
+                datos = {**datos, **provisional.datos, "id": clave}  # lo provisional es más nuevo
+            version = _max_version(version, provisional.version)
+
+        self._entradas[clave] = _Entrada(datos, version, time.monotonic())
+        self._indexar(clave, datos)
+        self._m_productos.set(len(self._entradas))
+        return True
+
+    def _eliminar(self, clave, version: Optional[int], rest: bool = False) -> bool:
+        entrada = self._entradas.get(clave)
+        if entrada is not None:
+            if _es_obsoleta(version, entrada.version, rest):
+                return False
+            self._desindexar(clave, entrada.datos)
+            del self._entradas[clave]
+            self._m_productos.set(len(self._entradas))
+        elif _es_obsoleta(version, self._lapidas.get(clave), rest):
+            return False
+        self._lapidas[clave] = version
+        self._lapidas.move_to_end(clave)
+        while len(self._lapidas) > MAX_LAPIDAS:
+            self._lapidas.popitem(last=False)
+        return True
+
+    def _indexar(self, clave, datos: dict) -> None:
+        if datos.get("nombre") is not None:
+            self._por_nombre[datos["nombre"]] = clave
+        if datos.get("categoria") is not None:
+            self._por_categoria.setdefault(datos["categoria"], set()).add(clave)
+        stock = datos.get("stock")
+        if isinstance(stock, (int, float)) and stock <= self._umbral:
+            self._stock_bajo.add(clave)
+
+    def _desindexar(self, clave, datos: dict) -> None:
+        if self._por_nombre.get(datos.get("nombre")) == clave:
+            del self._por_nombre[datos["nombre"]]
+        claves = self._por_categoria.get(datos.get("categoria"))
+        if claves is not None:
+            claves.discard(clave)
+            if not claves:
+                del self._por_categoria[datos["categoria"]]
+        self._stock_bajo.discard(clave)
+
+    # ── Lectura (sin red) ─────────────────────────────────────
+
+    def _entrada(self, clave) -> Optional[_Entrada]:
+        entrada = self._entradas.get(clave)
+        if entrada is None and clave in self._por_nombre:
+            entrada = self._entradas.get(self._por_nombre[clave])
+        return entrada
+
+    def obtener(self, clave) -> Optional[dict]:
+        """Producto por id o por nombre (copia), o None."""
+        entrada = self._entrada(clave)
+        return dict(entrada.datos) if entrada is not None else None
+
+    def version(self, clave) -> Optional[int]:
+        entrada = self._entrada(clave)
+        return entrada.version if entrada is not None else None
+
+    def edad(self, clave) -> Optional[float]:
+        """Segundos desde la última escritura de la entrada, o None si no existe."""
+        entrada = self._entrada(clave)
+        return time.monotonic() - entrada.actualizado if entrada is not None else None
+
+    def todos(self) -> list:
+        return [dict(e.datos) for e in self._entradas.values()]
+
+    def por_categoria(self, categoria: str) -> list:
+        return [dict(self._entradas[c].datos) for c in self._por_categoria.get(categoria, ())]
+
+    def stock_bajo(self) -> list:
+        return [dict(self._entradas[c].datos) for c in self._stock_bajo]
+
+    @property
+    def completo(self) -> bool:
+        """True si se cargó un listado completo (los eventos SSE lo mantienen al día)."""
+        return self._sincronizado
+
+    def __len__(self) -> int:
+        return len(self._entradas)
+
+    def __contains__(self, clave) -> bool:
+        return self._entrada(clave) is not None
@@ -0,0 +1,154 @@
+"""
+almacen_tokens.py — Tokens compartidos entre los workers de un host (Semana 10)
+===============================================================================
+
+asyncio.Lock deduplica los refresh dentro de UN proceso (INV-B3), pero con
+N workers por host cada uno refresca su propio token: N llamadas a
+/auth/token por cada expiración. Sin Redis (SETNX) disponible,
+AlmacenTokens guarda el par de tokens vigente en un archivo local protegido
+con lock de archivo, junto con un LEASE: solo el proceso que tiene el
+lease llama a /auth/token; el resto espera y adopta el token publicado.
+
+    almacen = AlmacenTokens("/run/ecomarket/tokens.json")
+    tm = TokenManager(base_url=..., almacen=almacen)   # adopta el token si existe
+
+DECISIONES DE DISEÑO:
+  1. Archivo JSON pequeño + fcntl.flock (LOCK_SH para leer, LOCK_EX para
+     escribir); msvcrt.locking en Windows.
+     → Justificación: el registro se lee una vez por expiración, no por
+     petición (el TokenManager cachea el token en memoria), así que no
+     hace falta mmap. El lock evita lecturas de un archivo a medio escribir.
+  2. Lease con dueño (pid) y vencimiento (`duracion_lease`).
+     → Justificación: si el dueño muere a mitad del refresh, otro worker
+     toma el lease cuando vence; nadie queda esperando para siempre.
+  3. `tomar_lease(token_visto)` es un compare-and-set: si el token del
+     archivo ya no es el que el worker vio expirar, alguien refrescó y el
+     worker lo adopta en lugar de pedir otro.
+     → Justificación: así INV-B3 se cumple en todo el host: una sola
+     llamada a /auth/token por expiración.
+  4. Permisos 0600.
+     → Justificación: el archivo contiene tokens; solo el usuario de los
+     workers puede leerlo. Nunca se loguea su contenido (INV-B2).
+"""
+
+import json
+import os
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+DURACION_LEASE = 10.0
+SONDEO = 0.05
+
+
+@dataclass(frozen=True)
+class RegistroTokens:
+    access_token: Optional[str]
+    refresh_token: Optional[str]
+    version: int
+    lease_pid: int
+    lease_hasta: float   # time.time() (válido entre procesos)
+
+    def lease_vigente(self, ahora: float) -> bool:
+        return bool(self.lease_pid) and ahora < self.lease_hasta
+
+
+class AlmacenTokens:
+    """Par de tokens + lease de refresh en un archivo con lock, compartido por el host."""
+
+    def __init__(self, ruta: str, duracion_lease: float = DURACION_LEASE, sondeo: float = SONDEO):
+        self._ruta = ruta
+        self.duracion_lease = duracion_lease
+        self.sondeo = sondeo
+        fd = os.open(ruta, os.O_RDWR | os.O_CREAT, 0o600)
+        os.close(fd)
+
+    @contextmanager
+    def _abierto(self, exclusivo: bool):
+        with open(self._ruta, "r+", encoding="utf-8") as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX if exclusivo else fcntl.LOCK_SH)
+            else:
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield f
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+    @staticmethod
+    def _leer(f) -> Optional[RegistroTokens]:
+        f.seek(0)
+        contenido = f.read()
+        if not contenido.strip():
+            return None
+        try:
+            return RegistroTokens(**json.loads(contenido))
+        except (ValueError, TypeError):
+            return None  # archivo corrupto: se trata como vacío
+
+    @staticmethod
+    def _escribir(f, registro: RegistroTokens) -> None:
+        f.seek(0)
+        f.truncate()
+        json.dump(registro.__dict__, f)
+        f.flush()
+        os.fsync(f.fileno())
+
+    def leer(self) -> Optional[RegistroTokens]:
+        with self._abierto(exclusivo=False) as f:
+            return self._leer(f)
+
+    def publicar(self, access_token: str, refresh_token: Optional[str]) -> RegistroTokens:
+        """Guarda un par nuevo y libera el lease (fin de login o de refresh)."""
+        with self._abierto(exclusivo=True) as f:
+            previo = self._leer(f)
+            registro = RegistroTokens(
+                access_token, refresh_token, (previo.version if previo else 0) + 1, 0, 0.0,
+            )
+            self._escribir(f, registro)
+            return registro
+
+    def tomar_lease(self, token_visto: Optional[str]) -> "tuple[bool, Optional[RegistroTokens]]":
+        """
+        Compare-and-set del lease de refresh.
+
+        Retorna (True, registro) si este proceso debe llamar a /auth/token.
+        Retorna (False, registro) si el token del archivo ya cambió (hay que
+        adoptarlo) o si otro proceso tiene un lease vigente (hay que esperar).
+        """
+        ahora = time.time()
+        with self._abierto(exclusivo=True) as f:
+            registro = self._leer(f)
+            if registro is not None:
+                if registro.access_token and registro.access_token != token_visto:
+                    return False, registro
+                if registro.lease_vigente(ahora) and registro.lease_pid != os.getpid():
+                    return False, registro
+            nuevo = RegistroTokens(
+                registro.access_token if registro else None,
+                registro.refresh_token if registro else None,
+                registro.version if registro else 0,
+                os.getpid(),
+                ahora + self.duracion_lease,
+            )
+            self._escribir(f, nuevo)
+            return True, nuevo
+
+    def liberar_lease(self) -> None:
+        with self._abierto(exclusivo=True) as f:
+            registro = self._leer(f)
+            if registro is not None and registro.lease_pid == os.getpid():
+                self._escribir(f, RegistroTokens(
+                    registro.access_token, registro.refresh_token, registro.version, 0, 0.0,
+                ))
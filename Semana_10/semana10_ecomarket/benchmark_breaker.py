@@ -0,0 +1,109 @@
+"""
+benchmark_breaker.py — Coste por llamada de CircuitBreaker.ejecutar
+===================================================================
+
+Microbenchmark sin red: mide cuántos nanosegundos añade el breaker a cada
+llamada comparado con hacer `await fn()` directamente.
+
+Ejecutar:
+    python benchmark_breaker.py [--iteraciones 200000]
+
+Caminos medidos (circuito CERRADO; umbral alto para que nunca abra):
+  - exito   → la coroutine retorna
+  - 4xx     → ClientResponseError(404): se re-lanza sin contar como fallo
+  - 5xx     → ClientResponseError(503): cuenta como fallo y se re-lanza
+  - timeout → asyncio.TimeoutError (clasificación resuelta por tipo)
+  - ventana → éxito con ventana="conteo" (necesita reloj por llamada)
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+
+import aiohttp
+from multidict import CIMultiDict, CIMultiDictProxy
+from yarl import URL
+
+from circuit_breaker import CircuitBreaker
+
+ITERACIONES = 200_000
+_URL = URL("http://localhost:3000/api/productos")
+_INFO = aiohttp.RequestInfo(_URL, "GET", CIMultiDictProxy(CIMultiDict()), _URL)
+
+
+def _fabrica(nombre: str):
+    """Retorna un callable que crea la coroutine del camino `nombre`."""
+    if nombre in ("exito", "ventana"):
+        async def _fn():
+            return 1
+    elif nombre == "timeout":
+        async def _fn():
+            raise asyncio.TimeoutError()
+    else:
+        status = 404 if nombre == "4xx" else 503
+
+        async def _fn():
+            raise aiohttp.ClientResponseError(_INFO, (), status=status, message="x")
+    return _fn
+
+
+async def _cronometrar(llamar, fn, iteraciones: int) -> float:
+    """ns por llamada de `await llamar(fn)` (las excepciones se ignoran)."""
+    inicio = time.perf_counter_ns()
+    for _ in range(iteraciones):
+        try:
+            await llamar(fn)
+        except Exception:
+            pass
+    return (time.perf_counter_ns() - inicio) / iteraciones
+
+
+async def _directo(fn):
+    return await fn()
+
+
+async def medir(camino: str, iteraciones: int) -> dict:
+    fn = _fabrica(camino)
+    kwargs = {"ventana": "conteo", "minimo_llamadas": iteraciones + 1} if camino == "ventana" else {}
+    cb = CircuitBreaker(umbral_fallos=iteraciones * 10, nombre=f"bench-{camino}", **kwargs)
+    await _cronometrar(cb.ejecutar, fn, 1000)  # calentamiento (llena la tabla por tipo)
+    directo = await _cronometrar(_directo, fn, iteraciones)
+    breaker = await _cronometrar(cb.ejecutar, fn, iteraciones)
+    return {
+        "camino": camino,
+        "directo_ns": directo,
+        "breaker_ns": breaker,
+        "overhead_ns": breaker - directo,
+    }
+
+
+def imprimir_tabla(resultados: list) -> None:
+    print(f"\n{'Camino':<9} {'directo ns':>11} {'breaker ns':>11} {'overhead ns':>12}")
+    print("-" * 46)
+    for r in resultados:
+        print(
+            f"{r['camino']:<9} {r['directo_ns']:>11.0f} {r['breaker_ns']:>11.0f} "
+            f"{r['overhead_ns']:>12.0f}"
+        )
+
+
+async def main(iteraciones: int) -> list:
+    # Cada fallo 5xx registra un WARNING; sin silenciarlo se mide el logging
+    logging.getLogger("circuit_breaker").setLevel(logging.CRITICAL)
+    print("=" * 46)
+    print("EcoMarket — Overhead de CircuitBreaker.ejecutar")
+    print("=" * 46)
+    resultados = [
+        await medir(camino, iteraciones)
+        for camino in ("exito", "4xx", "5xx", "timeout", "ventana")
+    ]
+    imprimir_tabla(resultados)
+    return resultados
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iteraciones", type=int, default=ITERACIONES)
+    args = parser.parse_args()
+    asyncio.run(main(args.iteraciones))
@@ -0,0 +1,176 @@
+"""
+benchmark_parser_sse.py — Parser SSE por líneas vs ParserSSE sobre bytes
+========================================================================
+
+Microbenchmark sin red: el mismo stream grabado se carga en un
+aiohttp.StreamReader (el tipo de `resp.content`) en bloques del tamaño de un
+segmento TCP y se lee de dos formas:
+
+  - lineas → el bucle anterior de ClienteSSEMultiplex: readline(), decode,
+             _parsear_linea() y un dict por evento
+  - bytes  → iter_chunked() + ParserSSE.alimentar()
+
+Ambos deben producir los mismos eventos (tipo, data, id); se comprueba antes
+de imprimir la tabla. No se instalan handlers, así que se mide el parsing sin
+json.loads (el filtro por suscriptores de ParserSSE queda desactivado).
+
+Ejecutar:
+    python benchmark_parser_sse.py [--eventos 20000] [--repeticiones 5]
+    python benchmark_parser_sse.py --grabacion alertas.sse
+
+Una grabación real se obtiene del mock con:
+    curl -N -H "Authorization: Bearer <token>" http://localhost:3000/api/alertas > alertas.sse
+Sin --grabacion se genera un stream con el formato exacto de
+servidor_mock._formatear_sse (precio-actualizado, stock-critico, keep-alive).
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from aiohttp.base_protocol import BaseProtocol
+from aiohttp.streams import StreamReader
+
+from cliente_sse_multiplex import TAMANO_CHUNK, ClienteSSEMultiplex
+from parser_sse import ParserSSE
+
+EVENTOS = 20_000
+REPETICIONES = 5
+SEGMENTO = 1448  # MSS típico: así llegan los bloques desde el socket
+
+
+def generar_stream(eventos: int, semilla: int = 7) -> bytes:
+    """Stream con el formato de servidor_mock._formatear_sse y keep-alives intercalados."""
+    rnd = random.Random(semilla)
+    id_ms = 1_700_000_000_000
+    partes = []
+    for i in range(eventos):
+        id_ms += rnd.randint(1, 50)
+        if rnd.random() < 0.7:
+            tipo = "precio-actualizado"
+            datos = {"producto_id": rnd.randint(1, 500), "precio_anterior": 10.0,
+                     "precio_nuevo": round(rnd.uniform(5, 15), 2), "usuario": "admin1"}
+        else:
+            tipo = "stock-critico"
+            datos = {"producto_id": rnd.randint(1, 500), "nombre": "Café orgánico",
+                     "stock_actual": rnd.randint(0, 5)}
+        partes.append(f"id: {id_ms}\nevent: {tipo}\ndata: {json.dumps(datos)}\n\n")
+        if i % 50 == 49:
+            partes.append(": ping keep-alive\n\n")
+    return "".join(partes).encode("utf-8")
+
+
+def _lector(datos: bytes, segmento: int) -> StreamReader:
+    """StreamReader ya cargado con `datos` en bloques de `segmento` bytes y EOF."""
+    loop = asyncio.get_running_loop()
+    # Límite por encima del total: con todo cargado no se pausa la "lectura del socket"
+    lector = StreamReader(BaseProtocol(loop), max(len(datos), 2 ** 16), loop=loop)
+    for i in range(0, len(datos), segmento):
+        lector.feed_data(datos[i:i + segmento])
+    lector.feed_eof()
+    return lector
+
+
+class _SinDespacho(ClienteSSEMultiplex):
+    """Cliente cuyo despacho solo anota el evento (se mide el parsing, no los handlers)."""
+
+    def __init__(self):
+        super().__init__("http://localhost:3000", token_manager=None)
+        self.eventos = []
+
+    def _despachar_evento(self, tipo, datos_raw, evento_id):
+        self.eventos.append((tipo, datos_raw, evento_id))
+
+
+async def leer_por_lineas(lector: StreamReader) -> list:
+    """Bucle de _conectar_sse antes de ParserSSE (readline + _parsear_linea)."""
+    cliente = _SinDespacho()
+    evento_parcial = {}
+    while True:
+        line_b = await lector.readline()
+        if not line_b:
+            break
+        line = line_b.decode("utf-8").rstrip("\n").rstrip("\r")
+        if not line:
+            if evento_parcial:
+                cliente._procesar_evento(evento_parcial)
+        elif line.startswith(":"):
+            continue
+        else:
+            cliente._parsear_linea(line, evento_parcial)
+    if evento_parcial:
+        cliente._procesar_evento(evento_parcial)
+    return cliente.eventos
+
+
+async def leer_por_bytes(lector: StreamReader) -> list:
+    """Bucle actual de _conectar_sse (iter_chunked + ParserSSE)."""
+    cliente = _SinDespacho()
+    parser = ParserSSE(crudo=True)  # como en _conectar_sse: el payload se decodifica después
+    async for chunk in lector.iter_chunked(TAMANO_CHUNK):
+        for evento in parser.alimentar(chunk):
+            cliente._despachar_evento(*evento)
+    for evento in parser.finalizar():
+        cliente._despachar_evento(*evento)
+    return cliente.eventos
+
+
+async def medir(nombre: str, datos: bytes, repeticiones: int) -> dict:
+    esperado = await leer_por_lineas(_lector(datos, SEGMENTO))
+    obtenido = await leer_por_bytes(_lector(datos, SEGMENTO))
+    assert obtenido == esperado, "ParserSSE no produce los mismos eventos que el parser por líneas"
+
+    tiempos = {}
+    for modo, leer in (("lineas", leer_por_lineas), ("bytes", leer_por_bytes)):
+        mejor = float("inf")
+        for _ in range(repeticiones):
+            lector = _lector(datos, SEGMENTO)
+            inicio = time.perf_counter_ns()
+            await leer(lector)
+            mejor = min(mejor, time.perf_counter_ns() - inicio)
+        tiempos[modo] = mejor / len(esperado)
+    return {
+        "stream": nombre,
+        "eventos": len(esperado),
+        "mb": len(datos) / 1e6,
+        "lineas_ns": tiempos["lineas"],
+        "bytes_ns": tiempos["bytes"],
+        "aceleracion": tiempos["lineas"] / tiempos["bytes"],
+    }
+
+
+def imprimir_tabla(resultados: list) -> None:
+    print(f"\n{'Stream':<10} {'eventos':>8} {'MB':>6} {'lineas ns/ev':>13} "
+          f"{'bytes ns/ev':>12} {'x':>6}")
+    print("-" * 60)
+    for r in resultados:
+        print(
+            f"{r['stream']:<10} {r['eventos']:>8} {r['mb']:>6.2f} {r['lineas_ns']:>13.0f} "
+            f"{r['bytes_ns']:>12.0f} {r['aceleracion']:>6.2f}"
+        )
+
+
+async def main(eventos: int, repeticiones: int, grabacion: str = None) -> list:
+    print("=" * 60)
+    print("EcoMarket — Parser SSE: readline por líneas vs ParserSSE")
+    print("=" * 60)
+    if grabacion:
+        with open(grabacion, "rb") as f:
+            streams = [("grabacion", f.read())]
+    else:
+        lf = generar_stream(eventos)
+        streams = [("mock-lf", lf), ("mock-crlf", lf.replace(b"\n", b"\r\n"))]
+    resultados = [await medir(nombre, datos, repeticiones) for nombre, datos in streams]
+    imprimir_tabla(resultados)
+    return resultados
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--eventos", type=int, default=EVENTOS)
+    parser.add_argument("--repeticiones", type=int, default=REPETICIONES)
+    parser.add_argument("--grabacion", help="Archivo con bytes crudos de /api/alertas")
+    args = parser.parse_args()
+    asyncio.run(main(args.eventos, args.repeticiones, args.grabacion))
@@ -0,0 +1,123 @@
+"""
+benchmark_transportes.py — aiohttp (HTTP/1.1) vs HTTP/2 multiplexado
+=====================================================================
+
+Compara los dos transportes de ClienteRobusto contra el mock local a
+varios niveles de concurrencia (peticiones simultáneas por operador).
+
+Requisitos:
+    pip install 'httpx[http2]' hypercorn
+    python servidor_mock.py --http2     # hypercorn acepta HTTP/1.1 y h2c
+
+Ejecutar:
+    python benchmark_transportes.py [--peticiones 400] [--niveles 1 10 50 200]
+
+Métricas por transporte y nivel:
+  - throughput (req/s), p50/p95 de latencia por petición
+  - conexiones TCP abiertas (solo aiohttp, vía TrazadorFases). Con HTTP/2
+    todas las peticiones comparten una conexión por host.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from cliente_robusto import TRANSPORTE_AIOHTTP, TRANSPORTE_HTTP2, ClienteRobusto
+from token_manager import TokenManager
+from trazas_http import TrazadorFases
+
+BASE = "http://localhost:3000"
+NIVELES = (1, 10, 50, 200)
+PETICIONES = 400
+
+
+async def medir(tm: TokenManager, transporte: str, concurrencia: int, peticiones: int) -> dict:
+    trazador = TrazadorFases(capacidad=peticiones) if transporte == TRANSPORTE_AIOHTTP else None
+    cliente = ClienteRobusto(
+        base_url=f"{BASE}/api",
+        token_manager=tm,
+        umbral_fallos=peticiones,  # el benchmark no debe abrir el circuito
+        max_retries=0,
+        trazador=trazador,
+        transporte=transporte,
+    )
+    semaforo = asyncio.Semaphore(concurrencia)
+    latencias = []
+    errores = 0
+
+    async def _una():
+        nonlocal errores
+        async with semaforo:
+            inicio = time.perf_counter()
+            try:
+                await cliente.get("/productos")
+            except Exception:
+                errores += 1
+                return
+            latencias.append((time.perf_counter() - inicio) * 1000)
+
+    try:
+        await cliente.get("/productos")  # warm-up: abre la primera conexión
+        if trazador:
+            trazador.limpiar()
+        inicio = time.perf_counter()
+        await asyncio.gather(*(_una() for _ in range(peticiones)))
+        total = time.perf_counter() - inicio
+    finally:
+        await cliente.cerrar()
+
+    latencias.sort()
+    conexiones = None
+    if trazador:
+        conexiones = sum(1 for t in trazador.ultimas() if not t["reutilizada"])
+    return {
+        "transporte": transporte,
+        "concurrencia": concurrencia,
+        "throughput": len(latencias) / total if total else 0.0,
+        "p50": statistics.median(latencias) if latencias else 0.0,
+        "p95": latencias[min(len(latencias) - 1, int(len(latencias) * 0.95))] if latencias else 0.0,
+        "errores": errores,
+        "conexiones": conexiones,
+    }
+
+
+def imprimir_tabla(resultados: list) -> None:
+    print(f"\n{'Transporte':<10} {'Conc.':>6} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'Conex.':>7} {'Err':>4}")
+    print("-" * 58)
+    for r in resultados:
+        conexiones = "1/host" if r["conexiones"] is None else str(r["conexiones"])
+        print(
+            f"{r['transporte']:<10} {r['concurrencia']:>6} {r['throughput']:>9.1f} "
+            f"{r['p50']:>8.2f} {r['p95']:>8.2f} {conexiones:>7} {r['errores']:>4}"
+        )
+
+
+async def main(peticiones: int, niveles) -> list:
+    print("=" * 58)
+    print("EcoMarket — Benchmark de transportes (HTTP/1.1 vs HTTP/2)")
+    print("=" * 58)
+    tm = TokenManager(base_url=BASE)
+    await tm.login(username="op1", rol="viewer")
+    resultados = []
+    try:
+        for concurrencia in niveles:
+            for transporte in (TRANSPORTE_AIOHTTP, TRANSPORTE_HTTP2):
+                r = await medir(tm, transporte, concurrencia, peticiones)
+                resultados.append(r)
+                print(f"  {transporte:<8} x{concurrencia:<4} → {r['throughput']:.1f} req/s")
+    finally:
+        await tm.close()
+
+    imprimir_tabla(resultados)
+    print("\nLectura: con concurrencia alta aiohttp abre hasta `limit` (100) sockets;")
+    print("HTTP/2 mantiene uno por host y multiplexa los streams sobre él.")
+    return resultados
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--peticiones", type=int, default=PETICIONES)
+    parser.add_argument("--niveles", type=int, nargs="+", default=list(NIVELES))
+    args = parser.parse_args()
+    asyncio.run(main(args.peticiones, args.niveles))
@@ -23,13 +23,61 @@ DECISIONES DE DISEÑO:
   5. asyncio.Lock() en estado SEMIABIERTO
      → Justificación: Garantiza que exactamente UNA petición de prueba ejecuta
      simultáneamente. Segundas peticiones concurrentes reciben CircuitOpenError.
+  6. Todas las transiciones pasan por _transicionar()
+     → Justificación: un único punto donde se contabiliza el tiempo por
+     estado y las transiciones para el registro de métricas (metricas.py).
+  7. Modo ventana deslizante opcional (ventana="conteo" | "tiempo")
+     → Justificación: con fallos consecutivos, una tasa de error intermitente
+     del 30% nunca abre el circuito (cada éxito resetea el contador) y las
+     llamadas lentas pero exitosas son invisibles. En modo ventana el
+     circuito abre si, con al menos `minimo_llamadas` en la ventana, la tasa
+     de fallos o la de llamadas lentas supera su umbral. La ventana es un
+     ring buffer de tamaño fijo con actualización O(1); la decisión se toma
+     al registrar cada resultado, así `estado` y `ejecutar` siempre ven lo
+     mismo. 4xx no entran en la ventana (igual que no cuentan como fallo).
+  8. Recuperación gradual opcional (recuperacion="rampa")
+     → Justificación: con una sola petición de prueba, un éxito cierra el
+     circuito y TODO el tráfico acumulado golpea a un backend que apenas se
+     está recuperando. En rampa, SEMIABIERTO admite un porcentaje creciente
+     de peticiones (etapas_rampa, p. ej. 1 → 5 → 25 → 100%), cada etapa dura
+     `duracion_etapa` segundos; se cierra al completar la última. Si la tasa
+     de fallos de la rampa supera `umbral_tasa_fallos` (con al menos
+     `minimo_llamadas_rampa`) se vuelve a ABIERTO; antes de llegar a ese
+     mínimo cualquier fallo reabre, como con la sonda única (si no, una
+     etapa corta podía avanzar con todas sus llamadas fallidas). La admisión es
+     determinista (admitidas/vistas < porcentaje), sin random.
+  9. Backoff de timeout_apertura (factor_backoff, timeout_apertura_max)
+     → Justificación: cada recuperación fallida (SEMIABIERTO → ABIERTO)
+     multiplica el tiempo de apertura; un cierre exitoso lo restablece.
+     Con factor_backoff=1.0 (default) el comportamiento no cambia.
+  10. Coste por llamada mínimo en CERRADO (ver benchmark_breaker.py)
+     → Justificación: el breaker envuelve TODAS las peticiones. En CERRADO sin
+     ventana, ejecutar() no consulta el reloj, el lock ni la propiedad
+     `estado`. La clasificación de excepciones se memoiza por tipo
+     (_CLASIFICACION_POR_TIPO): timeouts, errores de conexión y
+     CircuitOpenError se deciden con un dict lookup. Solo los tipos ambiguos
+     miran la instancia (errno, .status, mensaje). Si la excepción trae un
+     .status entero, ese status decide y no se formatea el mensaje.
+  11. Estado compartido entre procesos opcional (estado_compartido=...)
+     → Justificación: con varios workers por host, cada uno descubría la
+     caída por separado y un worker reiniciado golpeaba al backend caído.
+     Con un EstadoCompartido (estado_compartido.py, archivo mmap) los
+     breakers con el mismo `nombre` comparten fallos consecutivos, estado e
+     instante de apertura. Cada consulta de `estado` lee el registro sin
+     lock y adopta los cambios de otros procesos (disparando los callbacks).
+     Los fallos se suman bajo lock de archivo. En SEMIABIERTO solo el
+     proceso dueño de la sonda la envía; los demás fallan rápido.
 """
 
 import asyncio
+import errno
+import os
 import time
 import logging
 from enum import Enum, auto
 
+from metricas import registro_o_global
+
 logger = logging.getLogger(__name__)
 
 
@@ -48,33 +96,245 @@ class CircuitOpenError(Exception):
         )
 
 
+class VentanaConteo:
+    """
+    Últimas `tamano` llamadas en un ring buffer.
+
+    Cada slot guarda un bit de fallo y uno de lentitud; los totales se
+    mantienen incrementalmente: registrar() es O(1) sin asignaciones.
+    """
+
+    def __init__(self, tamano: int):
+        if tamano < 1:
+            raise ValueError("tamano de ventana debe ser >= 1")
+        self._tamano = tamano
+        self._fallos = bytearray(tamano)
+        self._lentas = bytearray(tamano)
+        self._indice = 0
+        self.llamadas = 0
+        self.total_fallos = 0
+        self.total_lentas = 0
+
+    def registrar(self, fallo: bool, lenta: bool, ahora: float = None) -> None:
+        i = self._indice
+        if self.llamadas == self._tamano:
+            # Slot ocupado: su resultado sale de la ventana
+            self.total_fallos -= self._fallos[i]
+            self.total_lentas -= self._lentas[i]
+        else:
+            self.llamadas += 1
+        self._fallos[i] = fallo
+        self._lentas[i] = lenta
+        self.total_fallos += fallo
+        self.total_lentas += lenta
+        self._indice = (i + 1) % self._tamano
+
+    def avanzar(self, ahora: float) -> None:
+        """Sin efecto: la ventana de conteo no caduca con el tiempo."""
+
+    def reiniciar(self) -> None:
+        self._fallos = bytearray(self._tamano)
+        self._lentas = bytearray(self._tamano)
+        self._indice = 0
+        self.llamadas = self.total_fallos = self.total_lentas = 0
+
+
+class VentanaTiempo:
+    """
+    Llamadas de los últimos `segundos` segundos en buckets de 1 s.
+
+    Un bucket por segundo en un ring buffer; al avanzar el reloj se vacían
+    los buckets que salieron de la ventana (como mucho `segundos` por
+    avance, amortizado O(1) por llamada).
+    """
+
+    def __init__(self, segundos: int):
+        if segundos < 1:
+            raise ValueError("tamano de ventana debe ser >= 1 segundo")
+        self._segundos = segundos
+        self._llamadas = [0] * segundos
+        self._fallos = [0] * segundos
+        self._lentas = [0] * segundos
+        self._segundo_actual = None
+        self.llamadas = 0
+        self.total_fallos = 0
+        self.total_lentas = 0
+
+    def avanzar(self, ahora: float) -> None:
+        segundo = int(ahora)
+        if self._segundo_actual is None:
+            self._segundo_actual = segundo
+            return
+        pasos = min(segundo - self._segundo_actual, self._segundos)
+        for k in range(1, pasos + 1):
+            i = (self._segundo_actual + k) % self._segundos
+            self.llamadas -= self._llamadas[i]
+            self.total_fallos -= self._fallos[i]
+            self.total_lentas -= self._lentas[i]
+            self._llamadas[i] = self._fallos[i] = self._lentas[i] = 0
+        if segundo > self._segundo_actual:
+            self._segundo_actual = segundo
+
+    def registrar(self, fallo: bool, lenta: bool, ahora: float = None) -> None:
+        self.avanzar(time.monotonic() if ahora is None else ahora)
+        i = self._segundo_actual % self._segundos
+        self._llamadas[i] += 1
+        self._fallos[i] += fallo
+        self._lentas[i] += lenta
+        self.llamadas += 1
+        self.total_fallos += fallo
+        self.total_lentas += lenta
+
+    def reiniciar(self) -> None:
+        self.__init__(self._segundos)
+
+
+VENTANAS = {"conteo": VentanaConteo, "tiempo": VentanaTiempo}
+
+RECUPERACION_SONDA = "sonda"   # una petición de prueba (INV-A2)
+RECUPERACION_RAMPA = "rampa"   # porcentaje creciente de tráfico
+ETAPAS_RAMPA = (1, 5, 25, 100)
+
+
+# ----------------------------------------------------------------------
+# Clasificación de excepciones (memoizada por tipo)
+# ----------------------------------------------------------------------
+_FALLO = "fallo"
+_NO_FALLO = "no_fallo"
+_INSPECCIONAR = "inspeccionar"   # depende de la instancia (errno, status, mensaje)
+
+_ERRNO_RED = frozenset({
+    errno.ENETUNREACH, errno.EHOSTUNREACH, errno.ECONNREFUSED,
+    errno.ETIMEDOUT, errno.ECONNRESET, errno.EPIPE,
+    errno.ECONNABORTED, errno.ENETDOWN, errno.ENOTCONN,
+})
+_NOMBRES_ERROR_RED = frozenset({
+    "ServerConnectionError", "ClientConnectorError", "ClientOSError",
+    "ServerDisconnectedError", "ServerTimeoutError", "ConnectTimeout",
+    "ReadTimeout", "NetworkError", "ConnectionError",
+})
+_PATRONES_5XX = ("500", "502", "503", "504", "internal server error")
+
+_CLASIFICACION_POR_TIPO: dict = {}
+
+
+def _clasificar_tipo(tipo: type) -> str:
+    """Parte de la clasificación que solo depende de la clase; se memoiza."""
+    if issubclass(tipo, CircuitOpenError):
+        clase = _NO_FALLO
+    elif issubclass(tipo, (asyncio.TimeoutError, ConnectionError)):
+        clase = _FALLO
+    elif tipo.__name__ in _NOMBRES_ERROR_RED:
+        clase = _FALLO
+    else:
+        clase = _INSPECCIONAR
+    _CLASIFICACION_POR_TIPO[tipo] = clase
+    return clase
+
+
 class CircuitBreaker:
     """
     Implementa el patrón Circuit Breaker del lado del cliente.
 
     El cliente llama a cb.ejecutar(coro) en lugar de await coro directamente.
     Si el circuito está abierto, lanza CircuitOpenError inmediatamente.
+
+    Por defecto abre tras `umbral_fallos` fallos consecutivos. Con
+    `ventana="conteo"` (últimas `tamano_ventana` llamadas) o
+    `ventana="tiempo"` (últimos `tamano_ventana` segundos) abre por tasa:
+        fallos / llamadas  >= umbral_tasa_fallos  (%)
+        lentas / llamadas  >= umbral_tasa_lentas  (%)
+    donde una llamada es lenta si tarda >= duracion_lenta segundos, siempre
+    que la ventana tenga al menos `minimo_llamadas`.
     """
 
     def __init__(
         self,
         umbral_fallos: int = 5,
         timeout_apertura: float = 10.0,
-        nombre: str = "EcoMarketAPI"
+        nombre: str = "EcoMarketAPI",
+        metricas=None,
+        ventana: str = None,
+        tamano_ventana: int = 100,
+        minimo_llamadas: int = 10,
+        umbral_tasa_fallos: float = 50.0,
+        umbral_tasa_lentas: float = 100.0,
+        duracion_lenta: float = 5.0,
+        recuperacion: str = RECUPERACION_SONDA,
+        etapas_rampa=ETAPAS_RAMPA,
+        duracion_etapa: float = 2.0,
+        minimo_llamadas_rampa: int = 3,
+        factor_backoff: float = 1.0,
+        timeout_apertura_max: float = 300.0,
+        estado_compartido=None,
     ):
         self._umbral_fallos = umbral_fallos
         self._timeout_apertura = timeout_apertura
         self._nombre = nombre
 
+        if ventana is not None and ventana not in VENTANAS:
+            raise ValueError(f"ventana debe ser una de {sorted(VENTANAS)}")
+        self._ventana = VENTANAS[ventana](tamano_ventana) if ventana else None
+        self._minimo_llamadas = minimo_llamadas
+        self._umbral_tasa_fallos = umbral_tasa_fallos
+        self._umbral_tasa_lentas = umbral_tasa_lentas
+        self._duracion_lenta = duracion_lenta
+
+        if recuperacion not in (RECUPERACION_SONDA, RECUPERACION_RAMPA):
+            raise ValueError(f"recuperacion debe ser '{RECUPERACION_SONDA}' o '{RECUPERACION_RAMPA}'")
+        if not etapas_rampa or list(etapas_rampa) != sorted(etapas_rampa) or etapas_rampa[-1] != 100:
+            raise ValueError("etapas_rampa debe ser creciente y terminar en 100")
+        self._recuperacion = recuperacion
+        self._etapas_rampa = tuple(etapas_rampa)
+        self._duracion_etapa = duracion_etapa
+        self._minimo_llamadas_rampa = minimo_llamadas_rampa
+        self._factor_backoff = factor_backoff
+        self._timeout_apertura_max = timeout_apertura_max
+        self._timeout_actual = timeout_apertura
+        # Estado de la rampa (solo en SEMIABIERTO con recuperacion="rampa")
+        self._etapa = 0
+        self._inicio_etapa = 0.0
+        self._rampa_vistas = self._rampa_admitidas = 0
+        self._rampa_llamadas = self._rampa_fallos = 0
+
         self._estado = EstadoCircuito.CERRADO
         self._fallos_consecutivos = 0
         self._tiempo_apertura = None  # type: float | None
         self._lock = asyncio.Lock()
 
+        # Métricas: tiempo acumulado por estado + transiciones
+        registro = registro_o_global(metricas)
+        self._desde_estado = time.monotonic()
+        self._m_segundos_estado = registro.contador(
+            "ecomarket_circuit_breaker_estado_segundos_total",
+            "Segundos acumulados en cada EstadoCircuito (se suma al salir del estado)",
+            ("breaker", "estado"),
+        )
+        self._m_transiciones = registro.contador(
+            "ecomarket_circuit_breaker_transiciones_total",
+            "Transiciones de estado del circuit breaker",
+            ("breaker", "desde", "hacia"),
+        )
+        self._m_estado = registro.gauge(
+            "ecomarket_circuit_breaker_estado",
+            "1 para el estado actual del circuit breaker, 0 para el resto",
+            ("breaker", "estado"),
+        )
+        for e in EstadoCircuito:
+            self._m_estado.etiquetar(nombre, e.name).set(1 if e is self._estado else 0)
+
         # Callbacks de observabilidad para el UI (Reto 4)
         self._on_circuit_open = None   # Called when circuit transitions to ABIERTO
         self._on_circuit_close = None  # Called when circuit transitions to CERRADO
 
+        # Estado compartido entre procesos (estado_compartido.py)
+        self._compartido = estado_compartido
+        self._version_compartida = 0
+        self._sonda_ajena = False     # SEMIABIERTO con la sonda en otro proceso
+        self._inicio_sonda_ajena = 0.0
+        if self._compartido is not None:
+            self._sincronizar()  # un worker reiniciado hereda un circuito ABIERTO
+
     @property
     def estado(self) -> EstadoCircuito:
         """Retorna el estado actual. Lee _revisar_timeout() antes de retornar."""
@@ -85,6 +345,14 @@ class CircuitBreaker:
     def esta_abierto(self) -> bool:
         return self.estado == EstadoCircuito.ABIERTO
 
+    @property
+    def nombre(self) -> str:
+        return self._nombre
+
+    @property
+    def fallos_consecutivos(self) -> int:
+        return self._fallos_consecutivos
+
     @property
     def umbral_fallos(self) -> int:
         return self._umbral_fallos
@@ -93,6 +361,41 @@ class CircuitBreaker:
     def timeout_apertura(self) -> float:
         return self._timeout_apertura
 
+    @property
+    def timeout_apertura_actual(self) -> float:
+        """timeout_apertura tras aplicar el backoff de recuperaciones fallidas."""
+        return self._timeout_actual
+
+    @property
+    def porcentaje_admitido(self) -> int:
+        """% de peticiones que el circuito deja pasar ahora mismo."""
+        estado = self.estado
+        if estado == EstadoCircuito.CERRADO:
+            return 100
+        if estado == EstadoCircuito.ABIERTO:
+            return 0
+        if self._recuperacion == RECUPERACION_RAMPA:
+            return self._etapas_rampa[self._etapa]
+        return 0 if self._lock.locked() else 100
+
+    @property
+    def tasa_fallos(self) -> float:
+        """% de fallos en la ventana (0.0 sin ventana o sin llamadas)."""
+        v = self._ventana
+        if v is None:
+            return 0.0
+        v.avanzar(time.monotonic())
+        return v.total_fallos * 100.0 / v.llamadas if v.llamadas else 0.0
+
+    @property
+    def tasa_lentas(self) -> float:
+        """% de llamadas lentas en la ventana (0.0 sin ventana o sin llamadas)."""
+        v = self._ventana
+        if v is None:
+            return 0.0
+        v.avanzar(time.monotonic())
+        return v.total_lentas * 100.0 / v.llamadas if v.llamadas else 0.0
+
     # ------------------------------------------------------------------
     # Callbacks de observabilidad
     # ------------------------------------------------------------------
@@ -114,20 +417,97 @@ class CircuitBreaker:
     def on_circuit_close(self, callback):
         self._on_circuit_close = callback
 
+    def _transicionar(self, nuevo: EstadoCircuito) -> None:
+        """Cambia de estado y contabiliza el tiempo pasado en el anterior."""
+        previo = self._estado
+        ahora = time.monotonic()
+        self._m_segundos_estado.etiquetar(self._nombre, previo.name).inc(ahora - self._desde_estado)
+        self._desde_estado = ahora
+        self._estado = nuevo
+        if previo is not nuevo:
+            if self._ventana is not None:
+                # Cada periodo CERRADO empieza con la ventana vacía
+                self._ventana.reiniciar()
+            self._m_transiciones.etiquetar(self._nombre, previo.name, nuevo.name).inc()
+            self._m_estado.etiquetar(self._nombre, previo.name).set(0)
+            self._m_estado.etiquetar(self._nombre, nuevo.name).set(1)
+
     def _revisar_timeout(self) -> None:
         """
         Si el circuito está ABIERTO y el timeout_apertura expiró,
         transiciona a SEMIABIERTO para permitir una petición de prueba.
         """
+        if self._compartido is not None:
+            self._sincronizar()
+            if self._sonda_ajena and time.monotonic() - self._inicio_sonda_ajena >= self._timeout_actual:
+                # La sonda de otro proceso no se resolvió a tiempo: se intenta tomar
+                self._tomar_sonda()
         if self._estado == EstadoCircuito.ABIERTO and self._tiempo_apertura is not None:
             transcurrido = time.monotonic() - self._tiempo_apertura
-            if transcurrido >= self._timeout_apertura:
-                self._estado = EstadoCircuito.SEMIABIERTO
+            if transcurrido >= self._timeout_actual:
+                if self._compartido is not None and not self._tomar_sonda():
+                    return
+                self._transicionar(EstadoCircuito.SEMIABIERTO)
                 self._tiempo_apertura = None
+                if self._recuperacion == RECUPERACION_RAMPA:
+                    self._iniciar_rampa()
                 logger.info(
                     "[%s] Transición ABIERTO → SEMIABIERTO (timeout expiró)",
                     self._nombre
                 )
+        elif self._estado == EstadoCircuito.SEMIABIERTO and self._recuperacion == RECUPERACION_RAMPA:
+            self._avanzar_rampa()
+
+    # ------------------------------------------------------------------
+    # Recuperación gradual (recuperacion="rampa")
+    # ------------------------------------------------------------------
+    def _iniciar_rampa(self) -> None:
+        self._etapa = 0
+        self._inicio_etapa = time.monotonic()
+        self._rampa_vistas = self._rampa_admitidas = 0
+        self._rampa_llamadas = self._rampa_fallos = 0
+
+    def _avanzar_rampa(self) -> None:
+        """Pasa de etapa cada `duracion_etapa` s; tras la última, CERRADO."""
+        ahora = time.monotonic()
+        while ahora - self._inicio_etapa >= self._duracion_etapa:
+            self._inicio_etapa += self._duracion_etapa
+            if self._etapa == len(self._etapas_rampa) - 1:
+                self._cerrar("rampa completada")
+                return
+            self._etapa += 1
+            self._rampa_vistas = self._rampa_admitidas = 0
+            logger.info(
+                "[%s] Rampa: etapa %d → %d%% del tráfico",
+                self._nombre, self._etapa, self._etapas_rampa[self._etapa]
+            )
+
+    def _admitir_en_rampa(self) -> bool:
+        porcentaje = self._etapas_rampa[self._etapa]
+        self._rampa_vistas += 1
+        if self._rampa_admitidas * 100 < porcentaje * self._rampa_vistas:
+            self._rampa_admitidas += 1
+            return True
+        return False
+
+    def _registrar_en_rampa(self, fallo: bool) -> None:
+        self._rampa_llamadas += 1
+        self._rampa_fallos += fallo
+        if not fallo:
+            return
+        if self._rampa_llamadas < self._minimo_llamadas_rampa:
+            # Sin muestra suficiente para una tasa, un fallo reabre (como la sonda única)
+            self._abrir(
+                f"rampa en {self._etapas_rampa[self._etapa]}%: "
+                f"fallo en la llamada {self._rampa_llamadas} de {self._minimo_llamadas_rampa}"
+            )
+            return
+        tasa = self._rampa_fallos * 100.0 / self._rampa_llamadas
+        if tasa >= self._umbral_tasa_fallos:
+            self._abrir(
+                f"rampa en {self._etapas_rampa[self._etapa]}%: "
+                f"tasa de fallos {tasa:.0f}% en {self._rampa_llamadas} llamadas"
+            )
 
     def _es_fallo_servidor(self, excepcion: Exception) -> bool:
         """
@@ -146,117 +526,192 @@ class CircuitBreaker:
           - Errores de parseo JSON
           - CircuitOpenError (el breaker ya está abierto — no es fallo del servidor)
         """
-        # CircuitOpenError NUNCA cuenta como fallo del servidor
-        if isinstance(excepcion, CircuitOpenError):
-            return False
-
-        # TimeoutError siempre cuenta como fallo de infraestructura
-        if isinstance(excepcion, asyncio.TimeoutError):
-            return True
+        clase = _CLASIFICACION_POR_TIPO.get(type(excepcion))
+        if clase is None:
+            clase = _clasificar_tipo(type(excepcion))
+        if clase is not _INSPECCIONAR:
+            return clase is _FALLO
 
-        # Errores de conexión TCP/OS
-        if isinstance(excepcion, (
-            ConnectionRefusedError,
-            ConnectionResetError,
-            ConnectionAbortedError,
-            ConnectionError,
-            BrokenPipeError,
-        )):
+        # OSError de red — verificamos errno
+        if isinstance(excepcion, OSError) and excepcion.errno in _ERRNO_RED:
             return True
 
-        # OSError de red — verificamos errno
-        if isinstance(excepcion, OSError):
-            import errno
-            # Errores de red comunes: ENETUNREACH, EHOSTUNREACH, ECONNREFUSED, ETIMEDOUT, etc.
-            errores_red = {
-                errno.ENETUNREACH, errno.EHOSTUNREACH, errno.ECONNREFUSED,
-                errno.ETIMEDOUT, errno.ECONNRESET, errno.EPIPE,
-                errno.ECONNABORTED, errno.ENETDOWN, errno.ENOTCONN
-            }
-            if excepcion.errno in errores_red:
-                return True
-
-        # Excepciones con atributo .status (aiohttp, httpx, etc.)
+        # Excepciones con atributo .status (aiohttp, httpx, etc.): si el status
+        # es un entero, es la fuente de verdad y no se mira nada más
         status = getattr(excepcion, "status", None)
-        if status is not None and status >= 500:
-            return True
+        if isinstance(status, int):
+            return status >= 500
 
         # Excepciones con .code (algunas bibliotecas)
         code = getattr(excepcion, "code", None)
-        if code is not None and code >= 500:
-            return True
-
-        # Errores de bibliotecas HTTP conocidas por nombre de clase
-        nombre_clase = type(excepcion).__name__
-        errores_http_cliente = {
-            "ServerConnectionError", "ClientConnectorError", "ClientOSError",
-            "ServerDisconnectedError", "ServerTimeoutError", "ConnectTimeout",
-            "ReadTimeout", "NetworkError", "ConnectionError"
-        }
-        if nombre_clase in errores_http_cliente:
+        if isinstance(code, int) and code >= 500:
             return True
 
         # Mensaje que indica fallo de servidor (heurística conservadora)
         msg = str(excepcion).lower()
-        if any(p in msg for p in ("503", "502", "504", "500", "502 bad gateway",
-                                    "503 service unavailable", "504 gateway timeout",
-                                    "internal server error")):
-            return True
-
-        return False
+        return any(p in msg for p in _PATRONES_5XX)
 
     def _registrar_exito(self) -> None:
         """Registra éxito: resetea contador y cierra el circuito."""
         estado_previo = self._estado
+        if self._compartido is not None and self._fallos_consecutivos:
+            registro = self._compartido.reiniciar_fallos(self._nombre)
+            if registro is not None:
+                self._version_compartida = registro.version
         self._fallos_consecutivos = 0
 
         if self._estado == EstadoCircuito.SEMIABIERTO:
-            self._estado = EstadoCircuito.CERRADO
-            logger.info(
-                "[%s] Transición SEMIABIERTO → CERRADO (recuperación exitosa)",
-                self._nombre
-            )
-            # INV-A3: _fallos_consecutivos ya se reseteó arriba.
-            # Notificar al UI que el circuito se cerró.
-            if self._on_circuit_close is not None:
-                try:
-                    self._on_circuit_close()
-                except Exception:
-                    logger.exception(
-                        "[%s] Error en on_circuit_close callback",
-                        self._nombre
-                    )
+            if self._recuperacion == RECUPERACION_RAMPA:
+                # En rampa se cierra al completar la última etapa, no con un éxito
+                self._registrar_en_rampa(False)
+                return
+            self._cerrar("recuperación exitosa")
         elif estado_previo == EstadoCircuito.CERRADO and self._fallos_consecutivos == 0:
             # Éxito en estado cerrado — aseguramos que el contador esté en 0
             pass
 
+    def _cerrar(self, motivo: str) -> None:
+        """SEMIABIERTO → CERRADO: restablece el backoff y notifica al UI."""
+        self._fallos_consecutivos = 0
+        self._timeout_actual = self._timeout_apertura
+        self._transicionar(EstadoCircuito.CERRADO)
+        logger.info(
+            "[%s] Transición SEMIABIERTO → CERRADO (%s)",
+            self._nombre, motivo
+        )
+        # INV-A3: _fallos_consecutivos ya se reseteó arriba.
+        self._publicar()
+        # Notificar al UI que el circuito se cerró.
+        self._invocar(self._on_circuit_close, "on_circuit_close")
+
+    def _invocar(self, callback, etiqueta: str) -> None:
+        if callback is not None:
+            try:
+                callback()
+            except Exception:
+                logger.exception("[%s] Error en %s callback", self._nombre, etiqueta)
+
     def _registrar_fallo(self) -> None:
         """Registra fallo del servidor: incrementa contador o abre el circuito."""
+        if self._compartido is not None:
+            self._sincronizar()
+            registro = self._compartido.sumar_fallo(self._nombre)
+            self._version_compartida = registro.version
+            self._fallos_consecutivos = registro.fallos
+        else:
+            self._fallos_consecutivos += 1
         estado_previo = self._estado
-        self._fallos_consecutivos += 1
         logger.warning(
             "[%s] Fallo registrado #%d/%d",
             self._nombre, self._fallos_consecutivos, self._umbral_fallos
         )
 
+        if estado_previo == EstadoCircuito.SEMIABIERTO and self._recuperacion == RECUPERACION_RAMPA:
+            self._registrar_en_rampa(True)
+            return
+
+        if self._ventana is not None:
+            # Modo ventana: en CERRADO decide la tasa (_registrar_en_ventana);
+            # en SEMIABIERTO la prueba fallida reabre siempre
+            if estado_previo == EstadoCircuito.SEMIABIERTO:
+                self._abrir("falló la petición de prueba")
+            return
         if self._fallos_consecutivos >= self._umbral_fallos:
-            self._estado = EstadoCircuito.ABIERTO
-            self._tiempo_apertura = time.monotonic()
-            logger.error(
-                "[%s] Transición %s → ABIERTO (umbral alcanzado: %d fallos)",
-                self._nombre, estado_previo.name, self._fallos_consecutivos
+            self._abrir(f"umbral alcanzado: {self._fallos_consecutivos} fallos")
+
+    def _registrar_en_ventana(self, fallo: bool, duracion: float) -> None:
+        """Modo ventana, estado CERRADO: registra y abre si se supera una tasa."""
+        v = self._ventana
+        v.registrar(fallo, duracion >= self._duracion_lenta, time.monotonic())
+        if v.llamadas < self._minimo_llamadas:
+            return
+        tasa_fallos = v.total_fallos * 100.0 / v.llamadas
+        tasa_lentas = v.total_lentas * 100.0 / v.llamadas
+        if tasa_fallos >= self._umbral_tasa_fallos:
+            self._abrir(f"tasa de fallos {tasa_fallos:.0f}% en {v.llamadas} llamadas")
+        elif tasa_lentas >= self._umbral_tasa_lentas:
+            self._abrir(f"tasa de llamadas lentas {tasa_lentas:.0f}% en {v.llamadas} llamadas")
+
+    def _abrir(self, motivo: str) -> None:
+        estado_previo = self._estado
+        if estado_previo == EstadoCircuito.SEMIABIERTO:
+            # Recuperación fallida: backoff exponencial del tiempo de apertura
+            self._timeout_actual = min(
+                self._timeout_actual * self._factor_backoff, self._timeout_apertura_max
+            )
+        self._transicionar(EstadoCircuito.ABIERTO)
+        self._tiempo_apertura = time.monotonic()
+        logger.error(
+            "[%s] Transición %s → ABIERTO (%s, reabre en %.1fs)",
+            self._nombre, estado_previo.name, motivo, self._timeout_actual
+        )
+        self._publicar()
+        # Solo notificar al UI si la transición es desde CERRADO o SEMIABIERTO
+        # (evita notificaciones duplicadas si ya estaba ABIERTO)
+        if estado_previo != EstadoCircuito.ABIERTO:
+            self._invocar(self._on_circuit_open, "on_circuit_open")
+
+    # ------------------------------------------------------------------
+    # Estado compartido entre procesos (estado_compartido=...)
+    # ------------------------------------------------------------------
+    def _publicar(self) -> None:
+        if self._compartido is not None:
+            registro = self._compartido.escribir(
+                self._nombre, self._estado.value, self._fallos_consecutivos,
+                self._tiempo_apertura or 0.0, self._timeout_actual,
             )
-            # Solo notificar al UI si la transición es desde CERRADO o SEMIABIERTO
-            # (evita notificaciones duplicadas si ya estaba ABIERTO)
-            if estado_previo != EstadoCircuito.ABIERTO:
-                if self._on_circuit_open is not None:
-                    try:
-                        self._on_circuit_open()
-                    except Exception:
-                        logger.exception(
-                            "[%s] Error en on_circuit_open callback",
-                            self._nombre
-                        )
+            self._version_compartida = registro.version
+            self._sonda_ajena = False
+
+    def _tomar_sonda(self) -> bool:
+        """CAS en el archivo: True si este proceso queda como dueño de la sonda."""
+        registro = self._compartido.tomar_sonda(self._nombre, time.monotonic())
+        if registro is None:
+            self._sincronizar()
+            return False
+        self._version_compartida = registro.version
+        self._sonda_ajena = False
+        if self._estado is EstadoCircuito.SEMIABIERTO:
+            # Sonda ajena vencida: la tomamos sin cambiar de estado
+            if self._recuperacion == RECUPERACION_RAMPA:
+                self._iniciar_rampa()
+        return True
+
+    def _sincronizar(self) -> None:
+        """Adopta el registro compartido si otro proceso lo cambió (lectura sin lock)."""
+        registro = self._compartido.leer(self._nombre)
+        if registro is None or registro.version == self._version_compartida:
+            return
+        self._version_compartida = registro.version
+        self._fallos_consecutivos = registro.fallos
+        if registro.timeout:
+            self._timeout_actual = registro.timeout
+        nuevo = EstadoCircuito(registro.estado)
+        if nuevo is EstadoCircuito.SEMIABIERTO and self._recuperacion == RECUPERACION_SONDA:
+            self._sonda_ajena = registro.dueno not in (0, os.getpid())
+            self._inicio_sonda_ajena = registro.tiempo
+        else:
+            self._sonda_ajena = False
+        previo = self._estado
+        if nuevo is EstadoCircuito.ABIERTO:
+            self._tiempo_apertura = registro.tiempo
+        if nuevo is previo:
+            return
+
+        self._transicionar(nuevo)
+        logger.info(
+            "[%s] Transición %s → %s (estado compartido por otro proceso)",
+            self._nombre, previo.name, nuevo.name
+        )
+        if nuevo is EstadoCircuito.ABIERTO:
+            self._invocar(self._on_circuit_open, "on_circuit_open")
+        elif nuevo is EstadoCircuito.SEMIABIERTO:
+            self._tiempo_apertura = None
+            if self._recuperacion == RECUPERACION_RAMPA:
+                self._iniciar_rampa()
+        else:
+            self._tiempo_apertura = None
+            self._invocar(self._on_circuit_close, "on_circuit_close")
 
     async def ejecutar(self, fn):
         """
@@ -268,7 +723,7 @@ class CircuitBreaker:
         crear coroutines que nunca se ejecutan (y generan warnings).
 
         Flujo:
-          1. Verifica el estado del circuito
+          1. Verifica el estado del circuito (CERRADO sin ventana → camino rápido)
           2. Si ABIERTO → lanza CircuitOpenError con tiempo restante
           3. Si SEMIABIERTO → adquiere lock (solo una petición de prueba)
           4. Ejecuta fn() → await coro
@@ -276,20 +731,43 @@ class CircuitBreaker:
           6. En fallo de servidor → _registrar_fallo(), re-lanza la excepción
           7. En fallo de cliente (4xx) → re-lanza SIN registrar fallo
         """
+        # 1. Camino rápido: CERRADO sin ventana no necesita reloj, lock ni
+        #    _revisar_timeout(); solo await y, en el caso común, un reset
+        if self._estado is EstadoCircuito.CERRADO and self._ventana is None and self._compartido is None:
+            try:
+                resultado = await fn()
+            except Exception as e:
+                if self._es_fallo_servidor(e):
+                    self._registrar_fallo()
+                raise
+            if self._estado is EstadoCircuito.CERRADO:
+                self._fallos_consecutivos = 0
+            else:
+                # Otra tarea cambió el estado mientras esperábamos
+                self._registrar_exito()
+            return resultado
+
         estado_actual = self.estado  # llama _revisar_timeout() internamente
 
         # 2. ABIERTO → falla rápido
         if estado_actual == EstadoCircuito.ABIERTO:
             if self._tiempo_apertura is not None:
                 transcurrido = time.monotonic() - self._tiempo_apertura
-                tiempo_restante = max(0.0, self._timeout_apertura - transcurrido)
+                tiempo_restante = max(0.0, self._timeout_actual - transcurrido)
             else:
                 tiempo_restante = 0.0
             raise CircuitOpenError(tiempo_restante)
 
         # 3. SEMIABIERTO → adquiere lock (solo UNA petición de prueba)
         lock_adquirido = False
-        if estado_actual == EstadoCircuito.SEMIABIERTO:
+        if estado_actual == EstadoCircuito.SEMIABIERTO and self._recuperacion == RECUPERACION_RAMPA:
+            # 3b. Rampa: solo pasa el porcentaje de la etapa actual
+            if not self._admitir_en_rampa():
+                raise CircuitOpenError(0.0)
+        elif estado_actual == EstadoCircuito.SEMIABIERTO:
+            if self._sonda_ajena:
+                # 3c. Estado compartido: la sonda la envía otro proceso
+                raise CircuitOpenError(0.0)
             # En asyncio single-threaded, locked() + acquire() es atómico respecto
             # a otras tareas porque no cedemos control entre ambas operaciones.
             if self._lock.locked():
@@ -297,6 +775,8 @@ class CircuitBreaker:
             await self._lock.acquire()
             lock_adquirido = True
 
+        en_ventana = self._ventana is not None and estado_actual == EstadoCircuito.CERRADO
+        inicio = time.monotonic()
         try:
             # 4. Ejecuta la coroutine (se crea aquí, no antes)
             coro = fn()
@@ -304,6 +784,8 @@ class CircuitBreaker:
 
             # 5. Éxito → registra y retorna
             self._registrar_exito()
+            if en_ventana and self._estado == EstadoCircuito.CERRADO:
+                self._registrar_en_ventana(False, time.monotonic() - inicio)
             return resultado
 
         except Exception as e:
@@ -311,6 +793,8 @@ class CircuitBreaker:
             # 7. Fallo de cliente → solo re-lanza
             if self._es_fallo_servidor(e):
                 self._registrar_fallo()
+                if en_ventana and self._estado == EstadoCircuito.CERRADO:
+                    self._registrar_en_ventana(True, time.monotonic() - inicio)
             # Siempre re-lanza — el caller decide cómo manejar
             raise
 
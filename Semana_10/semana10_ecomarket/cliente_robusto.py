@@ -8,6 +8,7 @@ Arquitectura de capas (de afuera hacia adentro):
     ├── TokenManager    (gestiona JWT, adjunta Bearer)
     ├── ClienteSSEMultiplex (conexion SSE independiente, TC-X1/TC-X3)
     └── aiohttp.ClientSession  (transporte HTTP real)
+        o TransporteHttp2      (opcional: httpx http2=True, un socket multiplexado)
 
 Orden de aplicacion de capas:
   1. ClienteRobusto recibe la peticion del UI/operador
@@ -28,17 +29,54 @@ DECISIONES DE DISENO:
   - INV-A1: ClienteRobusto no decodifica JWT ni verifica roles.
   - INV-B1: TokenManager no tiene atributos del circuit breaker.
   - INV-B2: El token nunca aparece en logs, ni parcialmente.
+  - transporte="http2" cambia aiohttp por httpx con http2=True detras de la
+    misma API get/post/put/patch/delete (transporte_http2.py). Las trazas
+    por fase solo aplican al transporte aiohttp.
+  - Trazas por fase (trazas_http.TrazadorFases) son opt-in: solo se
+    registra el TraceConfig en la sesion si se pasa `trazador=`.
+  - Outbox opcional (outbox.py): con el circuito ABIERTO las escrituras
+    (POST/PUT/PATCH/DELETE) se persisten en disco en lugar de perderse y se
+    drenan al cerrarse el circuito. Mientras un path tenga escrituras en el
+    outbox, las nuevas escrituras a ese path tambien se encolan para no
+    adelantarse a las viejas.
+  - breakers_por_ruta (registro_breakers.py): un CircuitBreaker por grupo
+    de endpoints en lugar del unico "EcoMarketAPI"; una caida de
+    /inventario no hace fallar rapido a /productos ni a /perfil. El UI
+    recibe la ruta afectada en `datos["ruta"]` y puede consultar
+    ruta_disponible(path) para deshabilitar solo esa funcionalidad.
+  - estado_compartido (estado_compartido.py): los workers del mismo host
+    comparten el estado de los breakers (mismo nombre) via un archivo mmap.
+  - Metricas: cada intento HTTP se mide en un histograma por metodo y
+    plantilla de ruta (/productos/{id}), para no crear una serie por id.
+  - Almacen de productos (almacen_productos.py) en lugar del dict plano
+    `_cache_sse`: lo alimenta el SSE (materializador=) y las respuestas de
+    GET /productos. GET /productos/{id} se responde sin red si la entrada
+    tiene menos de `frescura_almacen` segundos, y con el circuito ABIERTO
+    GET /productos[/{id}] se responde desde el almacen en lugar de fallar,
+    marcado con `__fallback__`/`__origen__`. El listado va envuelto en
+    {"productos": [...], "completo": bool}: armado solo con eventos SSE el
+    almacen no sabe si tiene todos los productos. Un GET /productos sin
+    filtros exitoso borra del almacen los productos que ya no existen.
+    Las escrituras propias (PUT/PATCH/DELETE /productos/{id}, POST
+    /productos) tambien se reflejan en el almacen: un GET inmediato no
+    devuelve el producto de antes de la escritura.
 """
 
 import asyncio
+import functools
 import json
 import logging
+import re
 import time
 from typing import Callable, Optional
 
 import aiohttp
 
+from almacen_productos import AlmacenProductos
 from circuit_breaker import CircuitBreaker, CircuitOpenError, EstadoCircuito
+from metricas import registro_o_global
+from outbox import METODOS_MUTANTES
+from registro_breakers import RegistroBreakers
 from token_manager import TokenManager
 
 logger = logging.getLogger(__name__)
@@ -47,6 +85,27 @@ BASE_URL = "http://localhost:3000/api"
 TIMEOUT_PETICION = 5.0
 MAX_RETRIES = 3
 ESPERA_INICIAL = 1.0
+TRANSPORTE_AIOHTTP = "aiohttp"
+TRANSPORTE_HTTP2 = "http2"
+FRESCURA_ALMACEN = 5.0  # segundos; None = GET /productos/{id} siempre va a la red
+ORIGEN_ALMACEN = "almacen"
+RUTA_PRODUCTOS = "/productos"
+RUTA_PRODUCTO = "/productos/{id}"
+
+
+_SEGMENTO_ID = re.compile(r"/\d+(?=/|$)")
+
+
+@functools.lru_cache(maxsize=512)
+def plantilla_ruta(path: str) -> str:
+    """Normaliza un path a su plantilla: '/productos/42?x=1' -> '/productos/{id}'."""
+    path = "/" + path.split("?", 1)[0].lstrip("/")
+    return _SEGMENTO_ID.sub("/{id}", path)
+
+
+def _id_producto(path: str) -> int:
+    """'/productos/42?x=1' -> 42 (path con plantilla RUTA_PRODUCTO)."""
+    return int(path.split("?", 1)[0].rstrip("/").rsplit("/", 1)[1])
 
 
 class EstadoUI:
@@ -68,31 +127,120 @@ class ClienteRobusto:
         base_url: str = BASE_URL,
         max_retries: int = MAX_RETRIES,
         espera_inicial: float = ESPERA_INICIAL,
+        metricas=None,
+        trazador=None,
+        transporte: str = TRANSPORTE_AIOHTTP,
+        outbox=None,
+        breakers_por_ruta=None,
+        estado_compartido=None,
+        almacen: Optional[AlmacenProductos] = None,
+        frescura_almacen: Optional[float] = FRESCURA_ALMACEN,
     ):
+        if transporte not in (TRANSPORTE_AIOHTTP, TRANSPORTE_HTTP2):
+            raise ValueError(f"Transporte desconocido: {transporte}")
         self._base_url = base_url.rstrip("/")
-        self._tm = token_manager or TokenManager(base_url=base_url.replace("/api", ""))
+        self._tm = token_manager or TokenManager(
+            base_url=base_url.replace("/api", ""), metricas=metricas
+        )
         self._cb = CircuitBreaker(
             umbral_fallos=umbral_fallos,
             timeout_apertura=timeout_apertura,
-            nombre="EcoMarketAPI"
+            nombre="EcoMarketAPI",
+            metricas=metricas,
+            estado_compartido=estado_compartido,
         )
         self._session: Optional[aiohttp.ClientSession] = None
         self._estado_ui = EstadoUI.CONECTADO
         self._observadores: list[Callable] = []
-        self._cache_sse: dict = {}
+        self._almacen = almacen if almacen is not None else AlmacenProductos(metricas=metricas)
+        self._frescura_almacen = frescura_almacen
         self._max_retries = max_retries
         self._espera_inicial = espera_inicial
+        self._trazador = trazador  # TrazadorFases opcional (trazas_http.py)
+        self._transporte = transporte
+        self._outbox = outbox  # Outbox opcional (outbox.py)
+        self._tarea_drenado: Optional[asyncio.Task] = None
+
+        registro = registro_o_global(metricas)
+        self._m_latencia = registro.histograma(
+            "ecomarket_http_peticion_segundos",
+            "Latencia de cada intento HTTP por metodo y plantilla de ruta",
+            ("metodo", "ruta"),
+        )
+        self._m_peticiones = registro.contador(
+            "ecomarket_http_peticiones_total",
+            "Intentos HTTP por metodo, plantilla de ruta y resultado",
+            ("metodo", "ruta", "resultado"),
+        )
 
         self._cb.on_circuit_open = lambda: self._notificar(
             EstadoUI.DEGRADADO,
             "Circuito ABIERTO - servicio no disponible",
             {"circuito_abierto": True}
         )
-        self._cb.on_circuit_close = lambda: self._notificar(
+        self._cb.on_circuit_close = self._al_cerrar_circuito
+        if self._cb.estado == EstadoCircuito.ABIERTO:
+            # Estado compartido: otro worker ya abrio el circuito
+            self._estado_ui = EstadoUI.DEGRADADO
+
+        # breakers_por_ruta: True (config del cliente) o un RegistroBreakers propio
+        if breakers_por_ruta is True:
+            breakers_por_ruta = RegistroBreakers(
+                config={
+                    "umbral_fallos": umbral_fallos,
+                    "timeout_apertura": timeout_apertura,
+                    "estado_compartido": estado_compartido,
+                },
+                metricas=metricas,
+            )
+        # (ojo: un RegistroBreakers vacio es falsy por __len__)
+        self._breakers: Optional[RegistroBreakers] = (
+            breakers_por_ruta if isinstance(breakers_por_ruta, RegistroBreakers) else None
+        )
+        if self._breakers is not None:
+            self._breakers.on_cambio = self._al_cambiar_breaker_ruta
+
+    def _al_cerrar_circuito(self):
+        self._notificar(
             EstadoUI.CONECTADO,
             "Circuito CERRADO - conexion restablecida",
             {"circuito_abierto": False}
         )
+        self._programar_drenado()
+
+    def _al_cambiar_breaker_ruta(self, clave: str, estado: EstadoCircuito):
+        abiertos = self._breakers.estado_agregado()["abiertos"]
+        if estado == EstadoCircuito.ABIERTO:
+            self._notificar(
+                EstadoUI.DEGRADADO,
+                f"Circuito ABIERTO en {clave} - funcionalidad no disponible",
+                {"circuito_abierto": True, "ruta": clave, "rutas_abiertas": abiertos}
+            )
+            return
+        if abiertos:
+            self._notificar(
+                EstadoUI.DEGRADADO,
+                f"Circuito CERRADO en {clave}; siguen sin servicio: {', '.join(abiertos)}",
+                {"circuito_abierto": False, "ruta": clave, "rutas_abiertas": abiertos}
+            )
+        else:
+            self._notificar(
+                EstadoUI.CONECTADO,
+                "Circuito CERRADO - conexion restablecida",
+                {"circuito_abierto": False, "ruta": clave, "rutas_abiertas": []}
+            )
+        self._programar_drenado()
+
+    def _breaker_para(self, path: str) -> CircuitBreaker:
+        if self._breakers is None:
+            return self._cb
+        return self._breakers.para_ruta(path)
+
+    def ruta_disponible(self, path: str) -> bool:
+        """False si el breaker que protege `path` esta ABIERTO."""
+        if self._breakers is not None and self._breakers.clave(path) not in self._breakers:
+            return True  # sin breaker todavia: nunca ha fallado
+        return self._breaker_para(path).estado != EstadoCircuito.ABIERTO
 
     def suscribir_estado(self, fn: Callable):
         self._observadores.append(fn)
@@ -114,34 +262,81 @@ class ClienteRobusto:
 
     async def _session_actual(self) -> aiohttp.ClientSession:
         if self._session is None or self._session.closed:
+            if self._transporte == TRANSPORTE_HTTP2:
+                # Import diferido: httpx[http2] es dependencia opcional
+                from transporte_http2 import TransporteHttp2
+                self._session = TransporteHttp2(timeout=TIMEOUT_PETICION)
+                return self._session
             timeout = aiohttp.ClientTimeout(total=TIMEOUT_PETICION)
-            self._session = aiohttp.ClientSession(timeout=timeout)
+            trace_configs = [self._trazador.trace_config] if self._trazador else None
+            self._session = aiohttp.ClientSession(timeout=timeout, trace_configs=trace_configs)
         return self._session
 
     async def cerrar(self):
+        if self._tarea_drenado and not self._tarea_drenado.done():
+            # Lo no enviado sigue en disco y se drena en la proxima ejecucion
+            self._tarea_drenado.cancel()
+            try:
+                await self._tarea_drenado
+            except asyncio.CancelledError:
+                pass
         if self._session and not self._session.closed:
             await self._session.close()
 
     async def get(self, path: str, **kwargs):
-        return await self._request_con_cb("GET", path, **kwargs)
+        ruta = plantilla_ruta(path)
+        if ruta not in (RUTA_PRODUCTOS, RUTA_PRODUCTO):
+            return await self._request_con_cb("GET", path, **kwargs)
+
+        local = self._leer_almacen(path, kwargs.get("params"), solo_frescos=True)
+        if local is not None:
+            self._m_peticiones.etiquetar("GET", ruta, "almacen").inc()
+            return local
+        version = int(time.time() * 1000)  # antes de pedir: un evento posterior le gana
+        try:
+            respuesta = await self._request_con_cb("GET", path, **kwargs)
+        except CircuitOpenError:
+            local = self.obtener_fallback(path, kwargs.get("params"))
+            if local is None:
+                raise
+            self._m_peticiones.etiquetar("GET", ruta, "almacen").inc()
+            return local
+        # Sin filtro de categoria la respuesta es el listado entero
+        completo = ruta == RUTA_PRODUCTOS and not (kwargs.get("params") or {}).get("categoria")
+        self._almacen.cargar(respuesta, version=version, completo=completo)
+        return respuesta
 
     async def post(self, path: str, **kwargs):
-        return await self._request_con_cb("POST", path, **kwargs)
+        return await self._escribir("POST", path, **kwargs)
 
     async def put(self, path: str, **kwargs):
-        return await self._request_con_cb("PUT", path, **kwargs)
+        return await self._escribir("PUT", path, **kwargs)
 
     async def patch(self, path: str, **kwargs):
-        return await self._request_con_cb("PATCH", path, **kwargs)
+        return await self._escribir("PATCH", path, **kwargs)
 
     async def delete(self, path: str, **kwargs):
-        return await self._request_con_cb("DELETE", path, **kwargs)
+        return await self._escribir("DELETE", path, **kwargs)
+
+    async def _escribir(self, method: str, path: str, **kwargs):
+        version = int(time.time() * 1000)  # antes de pedir, como en get()
+        respuesta = await self._request_con_cb(method, path, **kwargs)
+        if not (isinstance(respuesta, dict) and respuesta.get("__encolado__")):
+            self._materializar_escritura(method, path, respuesta, version)
+        return respuesta
 
-    async def _request_con_cb(self, method: str, path: str, **kwargs):
+    async def _request_con_cb(self, method: str, path: str, encolable: bool = True, **kwargs):
         """
         Ejecuta una peticion HTTP pasando por el Circuit Breaker.
         Incluye retry con backoff exponencial controlado por el breaker.
+
+        Con outbox, una escritura `encolable` se persiste en lugar de lanzar
+        CircuitOpenError; el drenado la reenvia con encolable=False.
         """
+        encolable = encolable and self._puede_encolar(method, kwargs)
+        if encolable and self._outbox.tiene_pendientes(path):
+            return await self._encolar(method, path, kwargs)
+
         headers_base = dict(kwargs.pop("headers", {}) or {})
 
         async def _hacer_peticion():
@@ -173,19 +368,43 @@ class ClienteRobusto:
                     )
                 return await resp.json()
 
+        ruta = plantilla_ruta(path)
+        cb = self._breaker_para(path)
+        m_latencia = self._m_latencia.etiquetar(method, ruta)
+
+        async def _peticion_medida():
+            inicio = time.perf_counter()
+            resultado = "error"
+            try:
+                respuesta = await _hacer_peticion()
+                resultado = "ok"
+                return respuesta
+            except aiohttp.ClientResponseError as e:
+                resultado = str(e.status)
+                raise
+            finally:
+                m_latencia.observar(time.perf_counter() - inicio)
+                self._m_peticiones.etiquetar(method, ruta, resultado).inc()
+
         ultimo_error = None
         for intento in range(self._max_retries + 1):
             try:
                 await self._asegurar_token_vigente()
-                resultado = await self._cb.ejecutar(_hacer_peticion)
-                if self._estado_ui != EstadoUI.CONECTADO:
+                resultado = await cb.ejecutar(_peticion_medida)
+                if self._estado_ui != EstadoUI.CONECTADO and self.estado_circuito != EstadoCircuito.ABIERTO:
                     self._notificar(EstadoUI.CONECTADO, "Conexion restablecida")
                 return resultado
             except CircuitOpenError as e:
+                self._m_peticiones.etiquetar(method, ruta, "circuito_abierto").inc()
+                if encolable:
+                    return await self._encolar(method, path, kwargs)
+                datos = {"tiempo_restante": e.tiempo_restante, "circuito_abierto": True}
+                if self._breakers is not None:
+                    datos["ruta"] = self._breakers.clave(path)
                 self._notificar(
                     EstadoUI.DEGRADADO,
                     f"Servicio no disponible. Reintenta en {e.tiempo_restante:.1f}s",
-                    {"tiempo_restante": e.tiempo_restante, "circuito_abierto": True}
+                    datos
                 )
                 raise
             except aiohttp.ClientResponseError as e:
@@ -213,6 +432,65 @@ class ClienteRobusto:
             raise ultimo_error
         raise Exception("Peticion fallo despues de todos los reintentos")
 
+    # ── Outbox ────────────────────────────────────────────────
+
+    def _puede_encolar(self, method: str, kwargs: dict) -> bool:
+        # Solo se persisten json/params: headers (token) y cuerpos binarios no
+        return (
+            self._outbox is not None
+            and method in METODOS_MUTANTES
+            and set(kwargs) <= {"json", "params", "headers"}
+        )
+
+    async def _encolar(self, method: str, path: str, kwargs: dict) -> dict:
+        entrada = await self._outbox.encolar(
+            method, path, json=kwargs.get("json"), params=kwargs.get("params")
+        )
+        self._notificar(
+            EstadoUI.DEGRADADO,
+            f"Escritura {method} {path} guardada para reenviar",
+            {"encolado": True, "seq": entrada.seq, "pendientes": len(self._outbox)}
+        )
+        if self._breaker_para(path).estado == EstadoCircuito.CERRADO:
+            self._programar_drenado()
+        return {"__encolado__": True, "__origen__": "outbox", "seq": entrada.seq}
+
+    def _programar_drenado(self):
+        if self._outbox is None or not self._outbox.tiene_pendientes():
+            return
+        if self._tarea_drenado is not None and not self._tarea_drenado.done():
+            return
+        self._tarea_drenado = asyncio.get_running_loop().create_task(self.drenar_outbox())
+
+    async def _enviar_desde_outbox(self, entrada) -> bool:
+        kwargs = {k: v for k, v in (("json", entrada.json), ("params", entrada.params)) if v is not None}
+        version = int(time.time() * 1000)
+        try:
+            respuesta = await self._request_con_cb(entrada.metodo, entrada.path, encolable=False, **kwargs)
+        except aiohttp.ClientResponseError as e:
+            if 400 <= e.status < 500:
+                # Rechazo definitivo (validacion, 404...): reenviar no lo arregla
+                logger.warning("Outbox: %s %s descartada | status=%s", entrada.metodo, entrada.path, e.status)
+                return False
+            raise
+        self._materializar_escritura(entrada.metodo, entrada.path, respuesta, version)
+        return True
+
+    async def drenar_outbox(self) -> dict:
+        """
+        Reenvia las escrituras pendientes del outbox (concurrencia y tasa
+        acotadas por el Outbox). Se lanza sola al cerrarse el circuito.
+        """
+        if self._outbox is None:
+            return {"enviadas": 0, "descartadas": 0, "pendientes": 0, "error": None}
+        resumen = await self._outbox.drenar(self._enviar_desde_outbox)
+        if resumen["enviadas"] or resumen["descartadas"]:
+            logger.info(
+                "Outbox drenado: %d enviadas, %d descartadas, %d pendientes",
+                resumen["enviadas"], resumen["descartadas"], resumen["pendientes"]
+            )
+        return resumen
+
     async def _asegurar_token_vigente(self) -> bool:
         """
         Ejecuta el refresh proactivo antes de entrar al CircuitBreaker.
@@ -237,20 +515,107 @@ class ClienteRobusto:
             logger.error("Error refrescando token: %s", type(e).__name__)
             return False
 
-    def actualizar_cache_sse(self, datos: dict):
-        """Recibe datos del ClienteSSEMultiplex para usar como fallback."""
-        self._cache_sse.update(datos)
+    # ── Almacen de productos ──────────────────────────────────
+
+    def _leer_almacen(self, path: str, params: Optional[dict] = None, solo_frescos: bool = False):
+        """Producto o lista de /productos desde el almacen, o None si no hay datos."""
+        if plantilla_ruta(path) == RUTA_PRODUCTO:
+            producto_id = _id_producto(path)
+            if solo_frescos:
+                edad = self._almacen.edad(producto_id)
+                if self._frescura_almacen is None or edad is None or edad > self._frescura_almacen:
+                    return None
+            return self._almacen.obtener(producto_id)
+        if solo_frescos or not self._almacen:
+            return None  # el almacen no sabe si tiene el listado completo
+        params = params or {}
+        categoria = params.get("categoria")
+        productos = self._almacen.por_categoria(categoria) if categoria else self._almacen.todos()
+        if params.get("orden") in ("precio_asc", "precio_desc"):  # mismos filtros que el servidor
+            productos.sort(key=lambda p: p.get("precio", 0), reverse=params["orden"] == "precio_desc")
+        return productos
+
+    def _materializar_escritura(self, method: str, path: str, respuesta, version: int) -> None:
+        """
+        Refleja en el almacen una escritura 2xx propia (lee lo que escribio).
+
+        PUT/PATCH /productos/{id} y POST /productos cargan el producto de la
+        respuesta; DELETE deja lapida. Sin cuerpo reconocible se invalida la
+        entrada para que el siguiente GET vaya a la red.
+        """
+        ruta = plantilla_ruta(path)
+        if ruta == RUTA_PRODUCTOS and method == "POST":
+            if isinstance(respuesta, dict) and respuesta.get("id") is not None:
+                self._almacen.cargar([respuesta], version=version)
+            return
+        if ruta != RUTA_PRODUCTO:
+            return
+        producto_id = _id_producto(path)
+        if method == "DELETE":
+            self._almacen.eliminar(producto_id, version=version)
+        elif isinstance(respuesta, dict) and respuesta.get("id") == producto_id:
+            self._almacen.cargar([respuesta], version=version)
+        else:
+            self._almacen.invalidar(producto_id)
+
+    def actualizar_cache_sse(self, datos: dict, tipo: Optional[str] = None, evento_id=None) -> bool:
+        """Aplica un evento SSE al almacen (si no se conecto como materializador=)."""
+        return self._almacen.aplicar(tipo, datos, evento_id)
+
+    def obtener_fallback(self, path: str = RUTA_PRODUCTOS, params: Optional[dict] = None) -> Optional[dict]:
+        """
+        Datos del almacen para `path` cuando el circuito esta abierto, o None.
+
+        Producto: {"__fallback__": True, "__origen__": "almacen", **producto}.
+        Listado: {"__fallback__": True, "__origen__": "almacen",
+        "completo": bool, "productos": [...]}; completo=False si el almacen
+        nunca cargo un GET /productos entero (solo tiene lo visto por SSE).
+        """
+        if plantilla_ruta(path) not in (RUTA_PRODUCTOS, RUTA_PRODUCTO):
+            return None
+        datos = self._leer_almacen(path, params)
+        if datos is None:
+            return None
+        marca = {"__fallback__": True, "__origen__": ORIGEN_ALMACEN}
+        if isinstance(datos, list):
+            return {**marca, "completo": self._almacen.completo, "productos": datos}
+        return {**marca, **datos}
+
+    @property
+    def almacen(self) -> AlmacenProductos:
+        return self._almacen
 
-    def obtener_fallback(self) -> Optional[dict]:
-        """Retorna datos del cache SSE cuando el circuito esta abierto."""
-        if self._cache_sse:
-            return {"__fallback__": True, "__origen__": "cache_sse", **self._cache_sse}
-        return None
+    @property
+    def outbox(self):
+        return self._outbox
+
+    @property
+    def trazador(self):
+        return self._trazador
 
     @property
     def estado_circuito(self) -> EstadoCircuito:
+        """Estado del breaker unico o, por ruta, el peor de todos."""
+        if self._breakers is not None:
+            return self._breakers.peor_estado()
         return self._cb.estado
 
+    def estado_circuitos(self) -> dict:
+        """Estado agregado: {total, abiertos, semiabiertos, por_clave}."""
+        if self._breakers is not None:
+            return self._breakers.estado_agregado()
+        estado = self._cb.estado
+        return {
+            "total": 1,
+            "abiertos": [self._cb.nombre] if estado == EstadoCircuito.ABIERTO else [],
+            "semiabiertos": [self._cb.nombre] if estado == EstadoCircuito.SEMIABIERTO else [],
+            "por_clave": {self._cb.nombre: estado.name},
+        }
+
+    @property
+    def breakers_por_ruta(self) -> Optional[RegistroBreakers]:
+        return self._breakers
+
     @property
     def esta_degradado(self) -> bool:
         return self._estado_ui == EstadoUI.DEGRADADO
@@ -4,7 +4,8 @@ cliente_sse_multiplex.py — Cliente SSE real para EcoMarket (Semana 10)
 Conecta a http://localhost:3000/api/alertas vía SSE con:
   - Autenticación Bearer vía TokenManager
   - Soporte Last-Event-ID para reconexión (TC-X3)
-  - Reconexión automática con backoff exponencial (máx 5 reintentos)
+  - Reconexión automática ilimitada: backoff exponencial con full jitter,
+    tope de espera, `retry:` del servidor y token bucket (control_reconexion.py)
   - Parsing completo de campos SSE: id, event, data, retry, comentarios
   - EventRouter heredado de Semana 7 (handlers dict)
   - Integración con ClienteRobusto para actualización de caché SSE
@@ -16,17 +17,50 @@ DECISIONES DE DISEÑO:
     UNA vez dentro del mismo ciclo de conexión.
   - ultimo_id se preserva en self._ultimo_id para enviarlo como
     Last-Event-ID en reconexiones subsiguientes.
-  - Se usa aiohttp.ClientSession con streaming real (resp.content.readline).
+  - Se usa aiohttp.ClientSession con streaming real: los bloques de
+    resp.content.iter_chunked() van a ParserSSE (parser_sse.py), que
+    trabaja sobre bytes y decodifica solo el payload data.
+  - Lag SSE: el mock usa como id el timestamp de emision en ms, asi que
+    lag = ahora_ms - id. Ids no numericos no generan observacion de lag.
+  - despacho="async" (o un DespachadorAsync): los handlers corren en
+    workers por tipo de evento con colas acotadas (despachador_async.py);
+    el bucle de lectura solo encola y aplica backpressure.
+  - Decodificacion perezosa: el parser recibe el set de tipos con
+    suscriptores y no copia ni decodifica el payload de los demas
+    (siguen contando en metricas y en Last-Event-ID). json.loads corre
+    una sola vez por evento y solo si algun handler JSON (o el callback)
+    lo quiere; el mismo objeto se comparte entre todos los handlers.
+    suscribir(..., crudo=True) entrega el payload en bytes sin decodificar.
+  - materializador= (AlmacenProductos): recibe (tipo, datos, id) de sus
+    tipos en el bucle de lectura, antes del despachador, para aplicar los
+    eventos en orden con el id como version.
+  - Tormenta de reconexion: si el mock se reinicia, todos los clientes
+    pierden el stream a la vez. La espera es uniforme en
+    [0, min(espera_maxima, base * 2**n)) con base = `retry:` del servidor
+    (o espera_inicial); tambien tras un cierre limpio (n = 0), que antes
+    reconectaba al instante. Antes de cada intento se toma un token de un
+    CuboReconexiones (propio, o compartido con cubo_reconexion=).
+    max_reintentos=None: reintenta siempre; el contador vuelve a 0 cada
+    vez que el handshake tiene exito.
 """
 
 import asyncio
+import inspect
 import json
 import logging
+import time
 
 import aiohttp
 
+from control_reconexion import CuboReconexiones, espera_full_jitter
+from despachador_async import DespachadorAsync
+from metricas import registro_o_global
+from parser_sse import ParserSSE
+
 logger = logging.getLogger(__name__)
 
+TAMANO_CHUNK = 64 * 1024
+
 
 # ═════════════════════════════════════════════════════════════
 # EventRouter (de Semana 7)
@@ -46,13 +80,19 @@ class EventRouter:
             self.handlers[tipo].remove(fn)
 
     def despachar(self, tipo, datos):
+        """Llama a los handlers de `tipo`; retorna los awaitables de los handlers async."""
+        pendientes = []
         if tipo not in self.handlers:
-            return
+            return pendientes
         for fn in self.handlers[tipo]:
             try:
-                fn(datos)
+                resultado = fn(datos)
             except Exception as e:
                 logger.error("Handler para '%s' fallo: %s", tipo, e)
+                continue
+            if inspect.isawaitable(resultado):
+                pendientes.append(resultado)
+        return pendientes
 
 
 # ═════════════════════════════════════════════════════════════
@@ -65,30 +105,90 @@ class ClienteSSEMultiplex:
     - SSE connection is independent of CircuitBreaker (TC-X1/TC-X3)
     - On reconnection, sends Last-Event-ID header
     - Uses TokenManager for auth, refreshes token if 401 on SSE connect
-    - Exponential backoff with max 5 retries
+    - Full-jitter exponential backoff honouring `retry:`, capped delay,
+      unlimited retries by default, reconnect token bucket
     - Notifies cliente_robusto cache on events via callback
+    - materializador (AlmacenProductos) applies product events in stream order
     """
 
-    def __init__(self, base_url, token_manager, on_event_callback=None):
+    def __init__(self, base_url, token_manager, on_event_callback=None, metricas=None,
+                 despacho=None, tipos_callback=None, espera_inicial=1.0, espera_maxima=30.0,
+                 max_reintentos=None, cubo_reconexion=None, materializador=None):
         self._base_url = base_url.rstrip("/")
         self._tm = token_manager
         self._router = EventRouter()
+        self._router_crudo = EventRouter()  # handlers que reciben el payload en bytes
+        # Tipos con algun suscriptor (bytes, como los ve ParserSSE)
+        self._tipos_interes = set()
         self._ultimo_id = None  # Preserved across reconnections (TC-X3)
         self._estado = "DESCONECTADO"
         self._reintentos = 0
-        self._max_reintentos = 5
-        self._espera_inicial = 1.0
+        self._max_reintentos = max_reintentos  # None: sin limite
+        self._espera_inicial = espera_inicial
+        self._espera_maxima = espera_maxima
+        self._retry_servidor = None  # ultimo `retry:` recibido, en segundos
+        self._cubo = cubo_reconexion if cubo_reconexion is not None else CuboReconexiones()
         self._parar = False
         self._session = None
         self._on_event_callback = on_event_callback  # For ClienteRobusto cache
+        # None: el callback recibe todos los tipos (y entonces no se filtra nada)
+        self._tipos_callback = frozenset(tipos_callback) if tipos_callback is not None else None
+        if on_event_callback and tipos_callback:
+            self._tipos_interes.update(t.encode("utf-8") for t in tipos_callback)
+        # Vista materializada (almacen_productos.py): aplicar(tipo, datos, evento_id)
+        self._materializador = materializador
+        if materializador is not None:
+            self._tipos_interes.update(t.encode("utf-8") for t in materializador.tipos)
+        # None: handlers dentro del bucle de lectura (comportamiento original)
+        if despacho == "async":
+            despacho = DespachadorAsync(metricas=metricas)
+        if despacho is not None:
+            despacho.vincular(self._entregar)
+        self._despachador = despacho
+        self._tareas_handlers = set()
+
+        registro = registro_o_global(metricas)
+        self._m_eventos = registro.contador(
+            "ecomarket_sse_eventos_total",
+            "Eventos SSE recibidos por tipo",
+            ("evento",),
+        )
+        self._m_lag = registro.histograma(
+            "ecomarket_sse_lag_segundos",
+            "Retraso entre la emision (id del evento en ms) y el despacho",
+            ("evento",),
+            buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+        )
 
     # ── Suscripción a eventos ─────────────────────────────────
 
-    def suscribir(self, tipo_evento, handler_fn):
-        self._router.registrar(tipo_evento, handler_fn)
+    def suscribir(self, tipo_evento, handler_fn, crudo=False):
+        """crudo=True: handler_fn recibe el payload data en bytes (sin json.loads)."""
+        (self._router_crudo if crudo else self._router).registrar(tipo_evento, handler_fn)
+        self._tipos_interes.add(tipo_evento.encode("utf-8"))
 
     def desuscribir(self, tipo_evento, handler_fn):
         self._router.desregistrar(tipo_evento, handler_fn)
+        self._router_crudo.desregistrar(tipo_evento, handler_fn)
+        if not (self._router.handlers.get(tipo_evento)
+                or self._router_crudo.handlers.get(tipo_evento)
+                or self._callback_quiere(tipo_evento)
+                or self._materializa(tipo_evento)):
+            self._tipos_interes.discard(tipo_evento.encode("utf-8"))
+
+    def _callback_quiere(self, tipo):
+        return self._on_event_callback is not None and (
+            self._tipos_callback is None or tipo in self._tipos_callback
+        )
+
+    def _materializa(self, tipo):
+        return self._materializador is not None and tipo in self._materializador.tipos
+
+    def _tipos_parser(self):
+        """Filtro para ParserSSE: None si el callback quiere todos los tipos."""
+        if self._on_event_callback is not None and self._tipos_callback is None:
+            return None
+        return self._tipos_interes  # el mismo set: suscribir() en caliente surte efecto
 
     # ── Propiedades públicas ──────────────────────────────────
 
@@ -103,7 +203,12 @@ class ClienteSSEMultiplex:
     # ── Parsing SSE ───────────────────────────────────────────
 
     def _parsear_linea(self, linea, evento_parcial):
-        """Parsea una línea SSE y acumula en evento_parcial."""
+        """
+        Parsea una línea SSE ya decodificada y acumula en evento_parcial.
+
+        Parser por líneas original; el stream usa ParserSSE. Se conserva para
+        quien alimente líneas sueltas (y como referencia en benchmark_parser_sse.py).
+        """
         if not linea:
             return
         if linea.startswith(":"):
@@ -134,27 +239,88 @@ class ClienteSSEMultiplex:
                 pass
 
     def _procesar_evento(self, evento_parcial):
-        """Despacha un evento completo a los handlers registrados."""
-        if "id" in evento_parcial:
-            self._ultimo_id = evento_parcial["id"]  # Preserve for reconnection (TC-X3)
+        """Despacha un evento acumulado por _parsear_linea y vacía el dict."""
+        self._despachar_evento(
+            evento_parcial.get("event", "message"),
+            evento_parcial.get("data", "").encode("utf-8"),
+            evento_parcial.get("id"),
+        )
+        evento_parcial.clear()
+
+    def _despachar_evento(self, tipo, datos_raw, evento_id):
+        """
+        Despacha un evento completo. datos_raw son los bytes del payload, o
+        None si el parser lo descarto por no tener suscriptores.
+        """
+        if evento_id is not None:
+            self._ultimo_id = evento_id  # Preserve for reconnection (TC-X3)
 
-        tipo = evento_parcial.get("event", "message")
-        datos_raw = evento_parcial.get("data", "")
+        self._registrar_metricas_evento(tipo, evento_id)
+        if datos_raw is None:
+            return
+
+        crudos = self._router_crudo.handlers.get(tipo)
+        if crudos:
+            # Handlers de bytes: en el bucle de lectura (reenvio/grabacion sin coste de decode)
+            self._router_crudo.despachar(tipo, datos_raw)
+
+        materializa = self._materializa(tipo)
+        if not materializa and not self._router.handlers.get(tipo) and not self._callback_quiere(tipo):
+            return  # nadie necesita el JSON: no se decodifica
 
+        # Una sola decodificacion por evento; el mismo objeto para todos los handlers
         try:
             datos = json.loads(datos_raw) if datos_raw else {}
-        except json.JSONDecodeError:
-            datos = {"raw": datos_raw}
+        except ValueError:  # JSON invalido o UTF-8 invalido
+            datos = {"raw": datos_raw.decode("utf-8", "replace")}
 
-        self._router.despachar(tipo, datos)
+        if materializa:
+            # En el bucle de lectura: el almacen ve los eventos en el orden del stream
+            try:
+                self._materializador.aplicar(tipo, datos, evento_id)
+            except Exception as e:
+                logger.error("Materializador fallo para '%s': %s", tipo, e)
+            if not self._router.handlers.get(tipo) and not self._callback_quiere(tipo):
+                return
 
-        if self._on_event_callback:
+        if self._despachador is not None:
+            self._despachador.ofrecer(tipo, datos)
+            return
+        pendiente = self._entregar(tipo, datos)
+        if pendiente is not None:
+            # Handlers async sin despachador: corren aparte, sin orden garantizado
+            tarea = asyncio.ensure_future(pendiente)
+            self._tareas_handlers.add(tarea)
+            tarea.add_done_callback(self._tareas_handlers.discard)
+
+    def _entregar(self, tipo, datos):
+        """Handlers del tipo + on_event_callback; retorna un awaitable si hay handlers async."""
+        pendientes = self._router.despachar(tipo, datos)
+
+        if self._callback_quiere(tipo):
             try:
                 self._on_event_callback(datos)
             except Exception as e:
                 logger.error("on_event_callback fallo: %s", e)
 
-        evento_parcial.clear()
+        if pendientes:
+            return self._esperar_handlers(tipo, pendientes)
+        return None
+
+    @staticmethod
+    async def _esperar_handlers(tipo, pendientes):
+        for pendiente in pendientes:
+            try:
+                await pendiente
+            except Exception as e:
+                logger.error("Handler async para '%s' fallo: %s", tipo, e)
+
+    def _registrar_metricas_evento(self, tipo, evento_id):
+        self._m_eventos.etiquetar(tipo).inc()
+        if evento_id and evento_id.isdigit():
+            lag = time.time() - int(evento_id) / 1000.0
+            if lag >= 0:
+                self._m_lag.etiquetar(tipo).observar(lag)
 
     # ── Conexión SSE con reconexión automática ────────────────
 
@@ -162,20 +328,30 @@ class ClienteSSEMultiplex:
         """Connect to SSE endpoint with auth and retry on failure."""
         self._estado = "CONECTANDO"
         self._reintentos = 0
-        while not self._parar and self._reintentos < self._max_reintentos:
+        while not self._parar:
+            await self._cubo.adquirir()
+            if self._parar:
+                break
             try:
-                await self._conectar_sse()
-                self._reintentos = 0
+                await self._conectar_sse()  # retorna al cerrar el servidor el stream
             except Exception as e:
                 if self._parar:
                     break
-                logger.warning("SSE error: %s, retrying...", e)
-                self._estado = "RECONECTANDO"
                 self._reintentos += 1
-                espera = self._espera_inicial * (2 ** (self._reintentos - 1))
-                await asyncio.sleep(min(espera, 30))
+                if self._max_reintentos is not None and self._reintentos >= self._max_reintentos:
+                    logger.error("SSE error: %s, sin mas reintentos", e)
+                    break
+                logger.warning("SSE error: %s, retrying...", e)
+            if self._parar:
+                break
+            self._estado = "RECONECTANDO"
+            await asyncio.sleep(self._espera_reconexion())
         self._estado = "DESCONECTADO"
 
+    def _espera_reconexion(self):
+        base = self._retry_servidor if self._retry_servidor is not None else self._espera_inicial
+        return espera_full_jitter(base, self._reintentos, self._espera_maxima)
+
     async def _conectar_sse(self):
         """Real SSE connection using aiohttp."""
         url = f"{self._base_url}/api/alertas"
@@ -213,32 +389,28 @@ class ClienteSSEMultiplex:
 
         resp.raise_for_status()
         self._estado = "CONECTADO"
+        self._reintentos = 0
         logger.info("SSE conectado a %s", url)
 
+        parser = ParserSSE(ultimo_id=self._ultimo_id, tipos=self._tipos_parser(), crudo=True)
         try:
-            evento_parcial = {}
-            while True:
-                line_b = await resp.content.readline()
-                if not line_b:
-                    # Conexión cerrada por el servidor
-                    break
-
-                line = line_b.decode("utf-8").rstrip("\n").rstrip("\r")
-
-                if not line:
-                    # Línea en blanco → fin de evento
-                    if evento_parcial:
-                        self._procesar_evento(evento_parcial)
-                elif line.startswith(":"):
-                    # Comentario o keep-alive
-                    continue
-                else:
-                    self._parsear_linea(line, evento_parcial)
-
-            # Procesar evento final si no terminó con línea en blanco
-            if evento_parcial:
-                self._procesar_evento(evento_parcial)
+            # Bloques tal como llegan; el parser separa eventos y maneja CRLF/CR
+            async for chunk in resp.content.iter_chunked(TAMANO_CHUNK):
+                for tipo, datos_raw, evento_id in parser.alimentar(chunk):
+                    self._despachar_evento(tipo, datos_raw, evento_id)
+                # Un bloque solo con `id:` no despacha evento pero mueve el checkpoint
+                self._ultimo_id = parser.ultimo_id
+                if self._despachador is not None:
+                    # Backpressure: no se piden mas bytes con colas "bloquear" llenas
+                    await self._despachador.esperar_espacio()
+
+            # Conexión cerrada por el servidor: evento final sin línea en blanco
+            for tipo, datos_raw, evento_id in parser.finalizar():
+                self._despachar_evento(tipo, datos_raw, evento_id)
         finally:
+            self._ultimo_id = parser.ultimo_id
+            if parser.retry is not None:
+                self._retry_servidor = parser.retry / 1000.0
             resp.release()
 
     # ── Control de ciclo de vida ──────────────────────────────
@@ -254,6 +426,8 @@ class ClienteSSEMultiplex:
         return self._session
 
     async def close(self):
+        if self._despachador is not None:
+            await self._despachador.cerrar()
         if self._session and not self._session.closed:
             await self._session.close()
 
@@ -0,0 +1,242 @@
+"""
+cliente_sse_shards.py — Un cliente SSE para varios shards (Semana 10)
+=====================================================================
+
+ClienteSSEMultiplex se conecta a UN base_url. Cuando los eventos salen de
+varias instancias del backend (shards), ClienteSSEShards abre una conexión
+por shard en el mismo event loop y entrega un único stream:
+
+    cliente = ClienteSSEShards(
+        {"norte": "http://localhost:3001", "sur": "http://localhost:3002"},
+        token_manager=tm,
+        ordenado=True,
+    )
+    cliente.suscribir("precio-actualizado", handler_precio_actualizado)
+    await cliente.conectar()
+
+Para probarlo en local, una instancia del mock por shard:
+
+    python servidor_mock.py --puerto 3001 --shard norte
+    python servidor_mock.py --puerto 3002 --shard sur
+
+DECISIONES DE DISEÑO:
+  1. ClienteSSEShards hereda de ClienteSSEMultiplex y cada shard es un
+     _LectorShard (también ClienteSSEMultiplex) que solo lee y reconecta.
+     → Justificación: suscribir(..., crudo=), la decodificación perezosa,
+     despacho="async" y on_event_callback funcionan igual que con un solo
+     servidor; el lector reenvía los bytes al agregador y el JSON se
+     decodifica una vez, en el despacho final.
+  2. Un solo TokenManager y una sola aiohttp.ClientSession para todos.
+     → Justificación: un token vale en todos los shards (mismo secreto);
+     si varios reciben 401 a la vez, el lock de refresh del TokenManager
+     hace un único /auth/token. La sesión comparte pool de conexiones.
+  3. Last-Event-ID y reconexión por shard (el bucle de conectar() de cada
+     lector, con su backoff).
+     → Justificación: los ids son del historial de cada instancia; mandar
+     a un shard el id de otro perdería o repetiría eventos. Que un shard
+     caiga no corta a los demás (estado agregado "DEGRADADO"). Todos los
+     lectores comparten un CuboReconexiones (control_reconexion.py): si
+     caen juntos, el proceso no reconecta más rápido que su tasa.
+  4. ordenado=True mezcla por timestamp (id en ms) con un heap pequeño:
+     sale la cabeza cuando todos los shards ya enviaron algo igual o más
+     nuevo (marca de agua = mínimo de los máximos por shard), o cuando
+     lleva `ventana_orden` s esperando.
+     → Justificación: con shards activos el orden es exacto sin esperar
+     nada fijo; un shard callado o caído retrasa como mucho la ventana.
+     Un evento de un shard más atrasado que la ventana puede salir fuera
+     de orden: la latencia queda acotada. El heap solo guarda los eventos
+     de esa ventana (O(log n) por evento). La espera se mide sobre el
+     evento pendiente que llegó primero (una FIFO de llegadas), no sobre la
+     cabeza del heap: si no, eventos con ts menor que siguen llegando
+     renuevan la cabeza y uno con ts mayor esperaría sin límite.
+  5. Eventos sin suscriptor (payload None) no entran al heap: solo métricas.
+  6. ecomarket_sse_shard_lag_segundos{shard} y
+     ecomarket_sse_shard_eventos_total{shard} se miden al llegar del shard
+     (antes del heap); ecomarket_sse_lag_segundos{evento} sigue midiendo al
+     despachar, e incluye la espera de ordenación.
+"""
+
+import asyncio
+import collections
+import heapq
+import itertools
+import logging
+import time
+
+from cliente_sse_multiplex import ClienteSSEMultiplex
+from control_reconexion import RAFAGA_RECONEXIONES, CuboReconexiones
+from metricas import registro_o_global
+
+logger = logging.getLogger(__name__)
+
+VENTANA_ORDEN = 0.25
+
+
+class _LectorShard(ClienteSSEMultiplex):
+    """Conexión a un shard: lee, reconecta y lleva su Last-Event-ID; despacha el agregador."""
+
+    def __init__(self, nombre, base_url, agregador, token_manager, metricas=None,
+                 cubo_reconexion=None):
+        super().__init__(base_url, token_manager, metricas=metricas,
+                         cubo_reconexion=cubo_reconexion)
+        self.nombre = nombre
+        self._agregador = agregador
+
+    def _tipos_parser(self):
+        return self._agregador._tipos_parser()
+
+    async def _get_session(self):
+        return await self._agregador._get_session()
+
+    def _despachar_evento(self, tipo, datos_raw, evento_id):
+        if evento_id is not None:
+            self._ultimo_id = evento_id  # Last-Event-ID propio de este shard
+        self._agregador._recibir(self.nombre, tipo, datos_raw, evento_id)
+
+
+class ClienteSSEShards(ClienteSSEMultiplex):
+    """Varios shards SSE, un stream: conexiones independientes y mezcla opcional por timestamp."""
+
+    def __init__(self, shards, token_manager, ordenado=False, ventana_orden=VENTANA_ORDEN,
+                 on_event_callback=None, metricas=None, despacho=None, tipos_callback=None,
+                 cubo_reconexion=None, materializador=None):
+        super().__init__("", token_manager, on_event_callback=on_event_callback,
+                         metricas=metricas, despacho=despacho, tipos_callback=tipos_callback,
+                         materializador=materializador)
+        if not isinstance(shards, dict):
+            shards = {url: url for url in shards}
+        if not shards:
+            raise ValueError("Se necesita al menos un shard")
+        if cubo_reconexion is None:  # uno para todos los shards del proceso
+            cubo_reconexion = CuboReconexiones(rafaga=max(RAFAGA_RECONEXIONES, len(shards)))
+        self._lectores = {
+            nombre: _LectorShard(nombre, url, self, token_manager, metricas=metricas,
+                                 cubo_reconexion=cubo_reconexion)
+            for nombre, url in shards.items()
+        }
+        self._ordenado = ordenado
+        self._ventana_orden = ventana_orden
+        # (ts_ms, secuencia, tipo, datos_raw, evento_id)
+        self._heap = []
+        # (llegada, secuencia) en orden de llegada; las ya despachadas se
+        # quitan de la cabeza al pasar (sus secuencias quedan en _liberadas)
+        self._llegadas = collections.deque()
+        self._liberadas = set()
+        self._secuencia = itertools.count()
+        self._maximo_ts = dict.fromkeys(self._lectores, -1)  # mayor ts visto por shard
+        self._timer = None
+
+        registro = registro_o_global(metricas)
+        self._m_shard_eventos = registro.contador(
+            "ecomarket_sse_shard_eventos_total",
+            "Eventos SSE recibidos por shard",
+            ("shard",),
+        )
+        self._m_shard_lag = registro.histograma(
+            "ecomarket_sse_shard_lag_segundos",
+            "Retraso entre la emision (id en ms) y la llegada desde cada shard",
+            ("shard",),
+            buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+        )
+
+    # ── Propiedades públicas ──────────────────────────────────
+
+    @property
+    def estados(self):
+        return {nombre: lector.estado for nombre, lector in self._lectores.items()}
+
+    @property
+    def estado(self):
+        estados = set(self.estados.values())
+        if estados == {"CONECTADO"}:
+            return "CONECTADO"
+        if "CONECTADO" in estados:
+            return "DEGRADADO"
+        if estados == {"DESCONECTADO"}:
+            return "DESCONECTADO"
+        return "RECONECTANDO"
+
+    @property
+    def ultimos_ids(self):
+        return {nombre: lector.ultimo_id for nombre, lector in self._lectores.items()}
+
+    # ── Mezcla de shards ──────────────────────────────────────
+
+    def _recibir(self, shard, tipo, datos_raw, evento_id):
+        """Evento llegado de `shard` (lo llama su _LectorShard)."""
+        self._m_shard_eventos.etiquetar(shard).inc()
+        ts = int(evento_id) if evento_id and evento_id.isdigit() else None
+        if ts is not None:
+            lag = time.time() - ts / 1000.0
+            if lag >= 0:
+                self._m_shard_lag.etiquetar(shard).observar(lag)
+
+        if not self._ordenado:
+            self._despachar_evento(tipo, datos_raw, evento_id)
+            return
+
+        if ts is None:  # id no numerico: se ordena por la hora de llegada
+            ts = int(time.time() * 1000)
+        if ts > self._maximo_ts[shard]:
+            self._maximo_ts[shard] = ts  # tambien los descartados hacen avanzar la marca
+        if datos_raw is None:
+            self._despachar_evento(tipo, None, evento_id)
+        else:
+            secuencia = next(self._secuencia)
+            heapq.heappush(self._heap, (ts, secuencia, tipo, datos_raw, evento_id))
+            self._llegadas.append((time.monotonic(), secuencia))
+        if self._heap:
+            self._liberar()
+
+    def _liberar(self, todo=False):
+        """
+        Despacha la cabeza del heap mientras sea seguro (marca de agua) o el
+        evento pendiente más antiguo haya expirado (hasta que salga ese).
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        heap, llegadas, liberadas = self._heap, self._llegadas, self._liberadas
+        marca = min(self._maximo_ts.values())
+        limite = time.monotonic() - self._ventana_orden
+        while heap:
+            while llegadas[0][1] in liberadas:
+                liberadas.discard(llegadas.popleft()[1])
+            if not (todo or heap[0][0] <= marca or llegadas[0][0] <= limite):
+                break
+            _, secuencia, tipo, datos_raw, evento_id = heapq.heappop(heap)
+            liberadas.add(secuencia)
+            self._despachar_evento(tipo, datos_raw, evento_id)
+        if heap:
+            espera = llegadas[0][0] + self._ventana_orden - time.monotonic()
+            self._timer = asyncio.get_running_loop().call_later(max(espera, 0), self._liberar)
+        else:
+            llegadas.clear()
+            liberadas.clear()
+
+    # ── Conexión y ciclo de vida ──────────────────────────────
+
+    async def conectar(self):
+        """Conecta todos los shards; retorna cuando todos se detuvieron o agotaron reintentos."""
+        self._estado = "CONECTANDO"
+        try:
+            await asyncio.gather(*(lector.conectar() for lector in self._lectores.values()))
+        finally:
+            if self._heap:
+                self._liberar(todo=True)
+            self._estado = "DESCONECTADO"
+
+    def detener(self):
+        super().detener()
+        for lector in self._lectores.values():
+            lector.detener()
+
+    async def close(self):
+        if self._heap:
+            self._liberar(todo=True)
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        for lector in self._lectores.values():
+            await lector.close()
+        await super().close()
@@ -0,0 +1,154 @@
+"""
+coalescedor.py — Último valor por producto para handlers de UI (Semana 10)
+==========================================================================
+
+En una tormenta de repricing llegan miles de `precio-actualizado` por
+segundo y un handler de UI repinta por cada uno, aunque el precio ya haya
+sido reemplazado por otro más nuevo. Coalescedor se registra como un
+handler más y entrega a la UI, a ritmo de fotogramas, SOLO el último evento
+de cada producto, en lote:
+
+    def repintar_precios(lote):            # lote = [datos, datos, ...]
+        for datos in lote:
+            tabla.actualizar(datos["producto_id"], datos["precio_nuevo"])
+
+    cliente.suscribir("precio-actualizado", Coalescedor(repintar_precios, fps=30))
+    cliente.suscribir("precio-actualizado", auditoria)   # sin coalescer: ve todos
+
+DECISIONES DE DISEÑO:
+  1. Es un callable `fn(datos)`: se suscribe con suscribir() como cualquier
+     handler.
+     → Justificación: ni EventRouter ni ClienteSSEMultiplex cambian; los
+     handlers que necesitan todos los eventos (auditoría) se suscriben
+     directamente y no pasan por él. Funciona igual con despacho="async".
+  2. Dict clave → último datos (clave = producto_id por defecto, `clave=`).
+     → Justificación: reemplazar conserva la posición de la primera
+     llegada, así que el lote sale en orden de primera aparición sin
+     ordenar nada; memoria acotada por el número de productos distintos.
+  3. Se vacía en un timer de 1/fps s (loop.call_later) armado con el primer
+     evento pendiente, o antes si se juntan `max_lote` claves distintas.
+     → Justificación: sin eventos no hay timer; la latencia máxima añadida
+     es un fotograma y los lotes no superan `max_lote` (salvo mientras un
+     `fn` async anterior sigue corriendo, ver 4).
+  4. `fn(lote)` puede ser async; el lote siguiente espera a que termine el
+     anterior.
+     → Justificación: si repintar tarda más que un fotograma, los eventos
+     siguen coalesciéndose en lugar de acumular repintados concurrentes.
+  5. Eventos sin clave (clave None) no se coalescen: cada uno va en el lote.
+"""
+
+import asyncio
+import inspect
+import itertools
+import logging
+from typing import Any, Callable, List, Optional
+
+from despachador_async import clave_producto
+from metricas import registro_o_global
+
+logger = logging.getLogger(__name__)
+
+FPS = 30.0
+MAX_LOTE = 500
+
+
+class Coalescedor:
+    """Handler que entrega a `fn(lote)` el último evento por clave, por fotograma."""
+
+    def __init__(
+        self,
+        fn: Callable[[List[Any]], Any],
+        fps: float = FPS,
+        max_lote: int = MAX_LOTE,
+        clave: Callable[[str, Any], Any] = clave_producto,
+        tipo: str = "",
+        nombre: Optional[str] = None,
+        metricas=None,
+    ):
+        if fps <= 0 or max_lote < 1:
+            raise ValueError("fps debe ser > 0 y max_lote >= 1")
+        self._fn = fn
+        self._intervalo = 1.0 / fps
+        self._max_lote = max_lote
+        self._clave = clave
+        self._tipo = tipo
+        self.nombre = nombre or getattr(fn, "__name__", "coalescedor")
+        self._pendientes: dict = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._en_curso: Optional[asyncio.Task] = None
+        self._sin_clave = itertools.count()
+
+        registro = registro_o_global(metricas)
+        self._m_eventos = registro.contador(
+            "ecomarket_sse_coalescencia_total",
+            "Eventos recibidos por un Coalescedor (entregado o reemplazado por uno mas nuevo)",
+            ("handler", "resultado"),
+        )
+        self._m_lote = registro.histograma(
+            "ecomarket_sse_coalescencia_lote",
+            "Eventos por lote entregado por un Coalescedor",
+            ("handler",),
+            buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000),
+        )
+
+    @property
+    def pendientes(self) -> int:
+        return len(self._pendientes)
+
+    def __call__(self, datos: Any) -> None:
+        clave = self._clave(self._tipo, datos)
+        if clave is None:
+            clave = (Coalescedor, next(self._sin_clave))
+        if clave in self._pendientes:
+            self._m_eventos.etiquetar(self.nombre, "reemplazado").inc()
+        self._pendientes[clave] = datos
+
+        if len(self._pendientes) >= self._max_lote and not self._ocupado():
+            self._vaciar()
+        elif self._timer is None:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:  # sin loop (uso síncrono): entrega inmediata
+                self._vaciar()
+                return
+            self._timer = loop.call_later(self._intervalo, self._vaciar)
+
+    def _ocupado(self) -> bool:
+        return self._en_curso is not None and not self._en_curso.done()
+
+    def _vaciar(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pendientes:
+            return
+        if self._ocupado():
+            # fn(lote) async anterior aún corre: seguir coalesciendo un fotograma más
+            self._timer = asyncio.get_running_loop().call_later(self._intervalo, self._vaciar)
+            return
+
+        lote = list(self._pendientes.values())
+        self._pendientes.clear()
+        self._m_eventos.etiquetar(self.nombre, "entregado").inc(len(lote))
+        self._m_lote.etiquetar(self.nombre).observar(len(lote))
+        try:
+            resultado = self._fn(lote)
+        except Exception as e:
+            logger.error("Handler coalescido '%s' fallo: %s", self.nombre, e)
+            return
+        if inspect.isawaitable(resultado):
+            self._en_curso = asyncio.ensure_future(self._esperar(resultado))
+
+    async def _esperar(self, resultado) -> None:
+        try:
+            await resultado
+        except Exception as e:
+            logger.error("Handler coalescido '%s' fallo: %s", self.nombre, e)
+
+    async def cerrar(self) -> None:
+        """Entrega lo pendiente ya (sin esperar al fotograma) y espera al último lote."""
+        if self._en_curso is not None:
+            await self._en_curso
+        self._vaciar()
+        if self._en_curso is not None:
+            await self._en_curso
@@ -0,0 +1,78 @@
+"""
+control_reconexion.py — Control de tormentas de reconexión SSE (Semana 10)
+=========================================================================
+
+Cuando el servidor se reinicia, todos los operadores pierden el stream en
+el mismo instante. Con backoff determinista (espera_inicial * 2**n) todos
+vuelven a conectar en el mismo milisegundo, una y otra vez. Aquí:
+
+  - espera_full_jitter(): espera uniforme en [0, min(tope, base * 2**n)).
+  - CuboReconexiones: token bucket del lado del cliente; limita cuántas
+    reconexiones por segundo hace un proceso (p. ej. todos los shards de
+    ClienteSSEShards comparten uno).
+
+Uso (ClienteSSEMultiplex ya lo hace en conectar()):
+    cubo = CuboReconexiones(tasa=0.5, rafaga=5)
+    await cubo.adquirir()
+    await asyncio.sleep(espera_full_jitter(base=1.0, intento=3, tope=30.0))
+
+DECISIONES DE DISEÑO:
+  1. Full jitter (uniforme desde 0) en lugar de "igual + ruido".
+     → Justificación: reparte los reintentos de N clientes por toda la
+     ventana; con ±10% de ruido seguirían llegando en un pico estrecho.
+  2. La base la fija el campo `retry:` del servidor si lo envió; si no,
+     espera_inicial. El tope acota la espera con reintentos ilimitados.
+     → Justificación: el servidor sabe cuánto tarda en volver; el tope
+     evita que un cliente quede minutos sin intentar tras una caída larga.
+  3. El cubo reserva el token al pedirlo (los tokens pueden quedar en
+     negativo) y duerme lo que falte; si la espera se cancela, lo devuelve.
+     → Justificación: O(1) por reconexión, sin bucles de sondeo, y los que
+     esperan salen en orden de llegada a tasa constante.
+"""
+
+import asyncio
+import random
+import time
+
+TASA_RECONEXIONES = 0.5  # reconexiones/s sostenidas por cliente
+RAFAGA_RECONEXIONES = 5
+
+
+def espera_full_jitter(base: float, intento: int, tope: float) -> float:
+    """Segundos a esperar antes del reintento `intento` (0 = tras un cierre limpio)."""
+    return random.uniform(0, min(tope, base * (2 ** max(intento - 1, 0))))
+
+
+class CuboReconexiones:
+    """Token bucket: como mucho `rafaga` reconexiones seguidas y `tasa` por segundo después."""
+
+    def __init__(self, tasa: float = TASA_RECONEXIONES, rafaga: int = RAFAGA_RECONEXIONES):
+        if tasa <= 0 or rafaga < 1:
+            raise ValueError("tasa debe ser > 0 y rafaga >= 1")
+        self._tasa = tasa
+        self._rafaga = rafaga
+        self._tokens = float(rafaga)
+        self._ultimo = time.monotonic()
+
+    @property
+    def tokens(self) -> float:
+        """Tokens disponibles ahora (negativo: reservas pendientes)."""
+        return min(self._rafaga, self._tokens + (time.monotonic() - self._ultimo) * self._tasa)
+
+    def _reservar(self) -> float:
+        ahora = time.monotonic()
+        self._tokens = min(self._rafaga, self._tokens + (ahora - self._ultimo) * self._tasa)
+        self._ultimo = ahora
+        self._tokens -= 1
+        return -self._tokens / self._tasa if self._tokens < 0 else 0.0
+
+    async def adquirir(self) -> float:
+        """Espera hasta tener permiso para reconectar; retorna los segundos esperados."""
+        espera = self._reservar()
+        if espera > 0:
+            try:
+                await asyncio.sleep(espera)
+            except asyncio.CancelledError:
+                self._tokens += 1
+                raise
+        return espera
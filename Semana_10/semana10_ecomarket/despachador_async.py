@@ -0,0 +1,260 @@
+"""
+despachador_async.py — Despacho SSE desacoplado de la lectura del socket (Semana 10)
+===================================================================================
+
+EventRouter.despachar() ejecuta los handlers dentro del bucle de lectura de
+ClienteSSEMultiplex: un handler lento (refresco de UI, escritura de
+auditoría) deja de leer el socket y la cola del servidor crece sin límite.
+Con DespachadorAsync el lector solo encola; cada tipo de evento tiene su
+cola acotada y su propia tarea worker que llama a los handlers:
+
+    despacho = DespachadorAsync(
+        capacidad=500,
+        politica="bloquear",
+        politicas={"precio-actualizado": "ultimo_por_clave"},
+    )
+    cliente = ClienteSSEMultiplex(base_url, tm, despacho=despacho)   # o despacho="async"
+
+DECISIONES DE DISEÑO:
+  1. Una cola y un worker por tipo de evento, creados con el primer evento.
+     → Justificación: un handler lento de `precio-actualizado` no retrasa
+     los `stock-critico`; dentro de un tipo se conserva el orden.
+  2. Política de desborde por tipo (`politica` por defecto + `politicas`):
+       - "bloquear": el lector espera a que la cola baje de `capacidad`
+         antes de pedir más bytes; el backpressure llega al servidor por
+         control de flujo TCP. Nunca se pierde un evento.
+       - "descartar_antiguo": la cola es un ring (deque con tope); entra el
+         nuevo y sale el más viejo.
+       - "ultimo_por_clave": un evento con la misma clave (producto_id por
+         defecto, `clave=`) reemplaza al pendiente en su misma posición;
+         si no cabe, sale la clave más vieja.
+     → Justificación: auditoría necesita todos los eventos; la UI de
+     precios solo necesita el último por producto.
+  3. El lector encola de forma síncrona (`ofrecer`) y espera UNA vez por
+     bloque leído (`esperar_espacio`).
+     → Justificación: ClienteSSEMultiplex._despachar_evento sigue siendo
+     síncrono; una cola "bloquear" puede pasarse de su capacidad como
+     mucho en los eventos de un bloque (iter_chunked de 64 KiB).
+  4. Cesión cooperativa: lector y workers hacen `await asyncio.sleep(0)`
+     cada `lote_ceder` eventos.
+     → Justificación: si el socket ya tiene datos, read() no suspende; sin
+     ceder, una ráfaga de miles de eventos dejaría sin turno a las
+     peticiones HTTP de ClienteRobusto en el mismo loop.
+  5. `entregar(tipo, datos)` puede retornar un awaitable (handlers async).
+     → Justificación: el worker lo espera sin bloquear al lector; es lo
+     que permite que una escritura de auditoría no frene la lectura.
+     Los errores se loguean y el worker sigue, igual que EventRouter.
+"""
+
+import asyncio
+import inspect
+import itertools
+import logging
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from metricas import registro_o_global
+
+logger = logging.getLogger(__name__)
+
+BLOQUEAR = "bloquear"
+DESCARTAR_ANTIGUO = "descartar_antiguo"
+ULTIMO_POR_CLAVE = "ultimo_por_clave"
+POLITICAS = (BLOQUEAR, DESCARTAR_ANTIGUO, ULTIMO_POR_CLAVE)
+
+CAPACIDAD = 1000
+LOTE_CEDER = 64
+
+
+def clave_producto(tipo: str, datos: Any) -> Any:
+    """Clave por defecto de "ultimo_por_clave": el producto_id del evento."""
+    return datos.get("producto_id") if isinstance(datos, dict) else None
+
+
+class _Cola:
+    __slots__ = ("tipo", "politica", "capacidad", "items", "hay_items", "hay_espacio", "worker")
+
+    def __init__(self, tipo: str, politica: str, capacidad: int):
+        self.tipo = tipo
+        self.politica = politica
+        self.capacidad = capacidad
+        self.items = OrderedDict() if politica == ULTIMO_POR_CLAVE else deque()
+        self.hay_items = asyncio.Event()
+        self.hay_espacio = asyncio.Event()
+        self.worker: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def poner(self, datos: Any, clave: Any) -> Optional[str]:
+        """Encola `datos`; retorna el motivo si otro evento se perdió o se reemplazó."""
+        items = self.items
+        motivo = None
+        if self.politica == ULTIMO_POR_CLAVE:
+            if clave in items:
+                items[clave] = datos
+                return "coalescido"
+            if len(items) >= self.capacidad:
+                items.popitem(last=False)
+                motivo = "desborde"
+            items[clave] = datos
+        else:
+            if self.politica == DESCARTAR_ANTIGUO and len(items) >= self.capacidad:
+                items.popleft()
+                motivo = "desborde"
+            items.append(datos)
+        self.hay_items.set()
+        return motivo
+
+    def sacar(self) -> Any:
+        if self.politica == ULTIMO_POR_CLAVE:
+            return self.items.popitem(last=False)[1]
+        return self.items.popleft()
+
+
+class DespachadorAsync:
+    """Colas acotadas por tipo de evento + un worker por cola."""
+
+    def __init__(
+        self,
+        entregar: Optional[Callable[[str, Any], Optional[Awaitable]]] = None,
+        capacidad: int = CAPACIDAD,
+        politica: str = BLOQUEAR,
+        politicas: Optional[Dict[str, str]] = None,
+        clave: Callable[[str, Any], Any] = clave_producto,
+        lote_ceder: int = LOTE_CEDER,
+        metricas=None,
+    ):
+        politicas = dict(politicas or {})
+        for p in (politica, *politicas.values()):
+            if p not in POLITICAS:
+                raise ValueError(f"politica desconocida: {p!r} (usar {', '.join(POLITICAS)})")
+        if capacidad < 1:
+            raise ValueError("capacidad debe ser >= 1")
+        self._entregar = entregar
+        self._capacidad = capacidad
+        self._politica = politica
+        self._politicas = politicas
+        self._clave = clave
+        self._lote_ceder = max(1, lote_ceder)
+        self._colas: Dict[str, _Cola] = {}
+        self._pendientes = 0
+        self._vacio = asyncio.Event()
+        self._vacio.set()
+        self._sin_ceder = 0
+        self._sin_clave = itertools.count()
+
+        registro = registro_o_global(metricas)
+        self._m_cola = registro.gauge(
+            "ecomarket_sse_cola_eventos",
+            "Eventos SSE pendientes de despacho por tipo",
+            ("evento",),
+        )
+        self._m_descartes = registro.contador(
+            "ecomarket_sse_descartes_total",
+            "Eventos SSE no despachados (desborde de cola o reemplazados por uno mas nuevo)",
+            ("evento", "motivo"),
+        )
+
+    def vincular(self, entregar: Callable[[str, Any], Optional[Awaitable]]) -> None:
+        """Fija la función que entrega un evento a sus handlers (la llama ClienteSSEMultiplex)."""
+        self._entregar = entregar
+
+    @property
+    def pendientes(self) -> int:
+        return self._pendientes
+
+    def profundidad(self, tipo: str) -> int:
+        cola = self._colas.get(tipo)
+        return len(cola) if cola is not None else 0
+
+    # ------------------------------------------------------------------
+    # Lado del lector
+    # ------------------------------------------------------------------
+    def ofrecer(self, tipo: str, datos: Any) -> None:
+        """Encola un evento ya decodificado (síncrono; ver esperar_espacio)."""
+        cola = self._colas.get(tipo)
+        if cola is None:
+            cola = self._crear_cola(tipo)
+        clave = None
+        if cola.politica == ULTIMO_POR_CLAVE:
+            clave = self._clave(tipo, datos)
+            if clave is None:
+                clave = (_Cola, next(self._sin_clave))  # sin clave: nunca se reemplaza
+        motivo = cola.poner(datos, clave)
+        if motivo is None:
+            self._pendientes += 1
+            self._vacio.clear()
+        else:
+            self._m_descartes.etiquetar(tipo, motivo).inc()
+        self._m_cola.etiquetar(tipo).set(len(cola))
+        self._sin_ceder += 1
+
+    async def esperar_espacio(self) -> None:
+        """
+        Backpressure para el lector: espera a que las colas "bloquear" vuelvan
+        a su capacidad y, en ráfagas, cede el loop cada `lote_ceder` eventos.
+        """
+        for cola in list(self._colas.values()):
+            while cola.politica == BLOQUEAR and len(cola) > cola.capacidad:
+                cola.hay_espacio.clear()
+                await cola.hay_espacio.wait()
+                self._sin_ceder = 0
+        if self._sin_ceder >= self._lote_ceder:
+            self._sin_ceder = 0
+            await asyncio.sleep(0)
+
+    # ------------------------------------------------------------------
+    # Workers
+    # ------------------------------------------------------------------
+    def _crear_cola(self, tipo: str) -> _Cola:
+        cola = _Cola(tipo, self._politicas.get(tipo, self._politica), self._capacidad)
+        self._colas[tipo] = cola
+        cola.worker = asyncio.get_running_loop().create_task(self._trabajar(cola))
+        return cola
+
+    async def _trabajar(self, cola: _Cola) -> None:
+        seguidos = 0
+        while True:
+            if not cola.items:
+                cola.hay_items.clear()
+                await cola.hay_items.wait()
+                seguidos = 0
+                continue
+            datos = cola.sacar()
+            if len(cola) <= cola.capacidad:
+                cola.hay_espacio.set()
+            self._m_cola.etiquetar(cola.tipo).set(len(cola))
+            try:
+                resultado = self._entregar(cola.tipo, datos)
+                if inspect.isawaitable(resultado):
+                    await resultado
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Despacho de '%s' fallo: %s", cola.tipo, e)
+            self._pendientes -= 1
+            if not self._pendientes:
+                self._vacio.set()
+            seguidos += 1
+            if seguidos >= self._lote_ceder:
+                seguidos = 0
+                await asyncio.sleep(0)
+
+    async def vaciar(self) -> None:
+        """Espera a que todos los eventos encolados se hayan entregado."""
+        await self._vacio.wait()
+
+    async def cerrar(self, timeout: float = 5.0) -> None:
+        """Entrega lo pendiente (hasta `timeout` s) y detiene los workers."""
+        try:
+            await asyncio.wait_for(self.vaciar(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("DespachadorAsync: %d eventos sin entregar al cerrar", self._pendientes)
+        workers = [cola.worker for cola in self._colas.values() if cola.worker is not None]
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        self._colas.clear()
+        self._pendientes = 0
+        self._vacio.set()
@@ -0,0 +1,261 @@
+"""
+estado_compartido.py — Estado de CircuitBreaker compartido entre procesos (Semana 10)
+=====================================================================================
+
+Con varios workers por host, cada proceso tiene su propio CircuitBreaker en
+memoria: cada uno descubre la caída por su cuenta (umbral_fallos fallos
+POR PROCESO) y un worker recién reiniciado golpea al backend caído de
+inmediato. EstadoCompartido guarda en un archivo mapeado en memoria
+(mmap) el estado, los fallos consecutivos y el instante de apertura de
+cada breaker, indexado por `nombre`:
+
+    compartido = EstadoCompartido("/tmp/ecomarket_breakers.mmap")
+    cb = CircuitBreaker(nombre="EcoMarketAPI", estado_compartido=compartido)
+
+Todos los procesos que usen el mismo archivo y el mismo `nombre` ven el
+mismo circuito.
+
+DECISIONES DE DISEÑO:
+  1. Archivo de tamaño fijo con `slots` registros binarios (struct).
+     → Justificación: mmap permite leer el estado sin syscalls en el camino
+     caliente. El slot de un nombre se busca por hash con sondeo lineal y
+     se cachea en el proceso.
+  2. Escrituras bajo lock de archivo (fcntl.flock / msvcrt.locking) y
+     lecturas sin lock con contador de versión tipo seqlock.
+     → Justificación: las escrituras son raras (fallos y transiciones);
+     las lecturas ocurren en cada llamada. El escritor deja la versión
+     impar mientras escribe; el lector reintenta si la ve impar o si cambió
+     entre el inicio y el fin de la lectura.
+     Los reintentos están acotados (MAX_REINTENTOS_LECTURA): un worker
+     muerto a mitad de escritura (SIGKILL, OOM) deja la versión impar para
+     siempre. Tras el límite el lector toma el lock; si sigue impar, el
+     dueño del lock ya no existe y el slot se reinicia a CERRADO (los
+     campos pueden estar a medio escribir).
+  3. Los instantes usan time.monotonic().
+     → Justificación: en Linux (CLOCK_MONOTONIC), Windows y macOS el reloj
+     monotónico es común a todos los procesos del host. Por eso el archivo
+     solo tiene sentido entre procesos de la MISMA máquina.
+  4. Una sola petición de prueba por host en SEMIABIERTO (`tomar_sonda`).
+     → Justificación: sin coordinación, N workers mandarían N sondas a la
+     vez al backend que se recupera. El paso ABIERTO → SEMIABIERTO es un
+     compare-and-set bajo el lock que registra el pid dueño de la sonda.
+     Si el dueño no resuelve en `timeout`, otro proceso puede tomarla.
+"""
+
+import errno
+import hashlib
+import logging
+import mmap
+import os
+import struct
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Optional
+
+from circuit_breaker import EstadoCircuito
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+_MAGIA = b"ECB1"
+_CABECERA = struct.Struct("<4sI")          # magia, número de slots
+# nombre, versión, estado, fallos, pid dueño de la sonda, tiempo, timeout actual
+_SLOT = struct.Struct("<56sQB3xIidd4x")
+_VERSION = struct.Struct("<Q")
+_OFFSET_VERSION = 56
+SLOTS = 64
+MAX_REINTENTOS_LECTURA = 10_000
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class RegistroCompartido:
+    version: int
+    estado: int        # EstadoCircuito.value
+    fallos: int
+    dueno: int         # pid con la sonda de SEMIABIERTO (0 = nadie)
+    tiempo: float      # monotonic de apertura / inicio de SEMIABIERTO
+    timeout: float     # timeout de apertura vigente (con backoff)
+
+
+class EstadoCompartido:
+    """Registros de breakers en un archivo mmap compartido por los procesos del host."""
+
+    def __init__(self, ruta: str, slots: int = SLOTS):
+        self._ruta = ruta
+        tamano = _CABECERA.size + slots * _SLOT.size
+        self._fd = os.open(ruta, os.O_RDWR | os.O_CREAT, 0o600)
+        with self._bloqueo():
+            actual = os.fstat(self._fd).st_size
+            if actual == 0:
+                os.ftruncate(self._fd, tamano)
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                os.write(self._fd, _CABECERA.pack(_MAGIA, slots))
+            else:
+                tamano = actual
+        self._mm = mmap.mmap(self._fd, tamano)
+        magia, self._slots = _CABECERA.unpack_from(self._mm, 0)
+        if magia != _MAGIA or _CABECERA.size + self._slots * _SLOT.size > tamano:
+            self.cerrar()
+            raise ValueError(f"{ruta} no es un archivo de EstadoCompartido válido")
+        self._indices = {}  # nombre → offset del slot (cache por proceso)
+
+    @contextmanager
+    def _bloqueo(self):
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+        else:
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            msvcrt.locking(self._fd, msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+
+    # ------------------------------------------------------------------
+    # Localización de slots
+    # ------------------------------------------------------------------
+    def _offset(self, nombre: str, crear: bool) -> Optional[int]:
+        offset = self._indices.get(nombre)
+        if offset is not None:
+            return offset
+        clave = nombre.encode("utf-8")[:56].ljust(56, b"\0")
+        inicio = int.from_bytes(hashlib.blake2b(clave, digest_size=4).digest(), "little") % self._slots
+        for i in range(self._slots):
+            offset = _CABECERA.size + ((inicio + i) % self._slots) * _SLOT.size
+            actual = self._mm[offset:offset + 56]
+            if actual == clave:
+                self._indices[nombre] = offset
+                return offset
+            if actual == b"\0" * 56:
+                if not crear:
+                    return None
+                # Reservar el slot libre (el llamador ya tiene el lock)
+                self._mm[offset:offset + _SLOT.size] = _SLOT.pack(clave, 0, 0, 0, 0, 0.0, 0.0)
+                self._indices[nombre] = offset
+                return offset
+        raise OSError(errno.ENOSPC, f"EstadoCompartido lleno ({self._slots} breakers)", self._ruta)
+
+    def _leer_slot(self, offset: int, bloqueado: bool = False) -> RegistroCompartido:
+        """Lectura seqlock; `bloqueado` = el llamador ya tiene el lock (nadie más escribe)."""
+        mm = self._mm
+        for _ in range(MAX_REINTENTOS_LECTURA):
+            v1 = _VERSION.unpack_from(mm, offset + _OFFSET_VERSION)[0]
+            if v1 & 1:
+                if bloqueado:
+                    break  # con el lock tomado, impar = escritor muerto
+                continue  # escritura en curso
+            _, version, estado, fallos, dueno, tiempo, timeout = _SLOT.unpack_from(mm, offset)
+            if version == v1 == _VERSION.unpack_from(mm, offset + _OFFSET_VERSION)[0]:
+                return RegistroCompartido(version, estado, fallos, dueno, tiempo, timeout)
+        if bloqueado:
+            return self._reparar_slot(offset)
+        # Escritor lento (desplanificado) o muerto: esperar el lock y releer
+        with self._bloqueo():
+            return self._leer_slot(offset, bloqueado=True)
+
+    def _reparar_slot(self, offset: int) -> RegistroCompartido:
+        """Con el lock tomado: reinicia un slot que quedó con versión impar."""
+        mm = self._mm
+        clave = mm[offset:offset + 56]
+        version = _VERSION.unpack_from(mm, offset + _OFFSET_VERSION)[0]
+        logger.warning(
+            "EstadoCompartido: breaker '%s' con escritura a medias (version=%d); se reinicia a CERRADO",
+            clave.rstrip(b"\0").decode("utf-8", "replace"), version,
+        )
+        registro = RegistroCompartido(version + 1, EstadoCircuito.CERRADO.value, 0, 0, 0.0, 0.0)
+        _SLOT.pack_into(mm, offset, clave, registro.version, registro.estado, 0, 0, 0.0, 0.0)
+        return registro
+
+    def _escribir_slot(self, offset: int, previo: RegistroCompartido, **cambios) -> RegistroCompartido:
+        """Escribe con el lock tomado; la versión queda impar durante la escritura."""
+        mm = self._mm
+        _VERSION.pack_into(mm, offset + _OFFSET_VERSION, previo.version + 1)
+        nuevo = RegistroCompartido(**{**previo.__dict__, **cambios, "version": previo.version + 2})
+        clave = mm[offset:offset + 56]
+        _SLOT.pack_into(
+            mm, offset, clave, previo.version + 1, nuevo.estado, nuevo.fallos,
+            nuevo.dueno, nuevo.tiempo, nuevo.timeout,
+        )
+        _VERSION.pack_into(mm, offset + _OFFSET_VERSION, nuevo.version)
+        return nuevo
+
+    # ------------------------------------------------------------------
+    # API
+    # ------------------------------------------------------------------
+    def leer(self, nombre: str) -> Optional[RegistroCompartido]:
+        """Lectura sin lock; None si ningún proceso registró aún ese breaker."""
+        offset = self._offset(nombre, crear=False)
+        if offset is None:
+            return None
+        registro = self._leer_slot(offset)
+        return registro if registro.version else None
+
+    def escribir(self, nombre: str, estado: int, fallos: int, tiempo: float, timeout: float) -> RegistroCompartido:
+        """Publica el estado completo del breaker (transiciones locales)."""
+        with self._bloqueo():
+            offset = self._offset(nombre, crear=True)
+            previo = self._leer_slot(offset, bloqueado=True)
+            return self._escribir_slot(
+                offset, previo, estado=estado, fallos=fallos, dueno=0,
+                tiempo=tiempo, timeout=timeout,
+            )
+
+    def sumar_fallo(self, nombre: str) -> RegistroCompartido:
+        """Incrementa atómicamente los fallos consecutivos del breaker."""
+        with self._bloqueo():
+            offset = self._offset(nombre, crear=True)
+            previo = self._leer_slot(offset, bloqueado=True)
+            if not previo.version:
+                previo = RegistroCompartido(0, EstadoCircuito.CERRADO.value, 0, 0, 0.0, 0.0)
+            return self._escribir_slot(offset, previo, fallos=previo.fallos + 1)
+
+    def reiniciar_fallos(self, nombre: str) -> Optional[RegistroCompartido]:
+        with self._bloqueo():
+            offset = self._offset(nombre, crear=False)
+            if offset is None:
+                return None
+            previo = self._leer_slot(offset, bloqueado=True)
+            if previo.fallos == 0:
+                return previo
+            return self._escribir_slot(offset, previo, fallos=0)
+
+    def tomar_sonda(self, nombre: str, ahora: float) -> Optional[RegistroCompartido]:
+        """
+        Compare-and-set ABIERTO → SEMIABIERTO con este proceso como dueño de
+        la sonda. Se concede si el timeout de apertura expiró, o si la sonda
+        de otro proceso lleva más de `timeout` sin resolverse. Retorna el
+        registro nuevo, o None si otro proceso tiene la sonda.
+        """
+        with self._bloqueo():
+            offset = self._offset(nombre, crear=False)
+            if offset is None:
+                return None
+            previo = self._leer_slot(offset, bloqueado=True)
+            vencido = ahora - previo.tiempo >= previo.timeout
+            if previo.estado == EstadoCircuito.ABIERTO.value:
+                if not vencido:
+                    return None
+            elif previo.estado != EstadoCircuito.SEMIABIERTO.value or (previo.dueno and not vencido):
+                return None
+            return self._escribir_slot(
+                offset, previo, estado=EstadoCircuito.SEMIABIERTO.value,
+                dueno=os.getpid(), tiempo=ahora,
+            )
+
+    def cerrar(self) -> None:
+        if getattr(self, "_mm", None) is not None:
+            self._mm.close()
+            self._mm = None
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
@@ -0,0 +1,396 @@
+"""
+grabacion_sse.py — Grabar /api/alertas y reproducirlo para medir handlers (Semana 10)
+====================================================================================
+
+Para comparar handlers SSE hace falta el MISMO stream en cada corrida.
+GrabadorSSE guarda los bloques de bytes tal como llegan de /api/alertas,
+con su instante de llegada, en un log binario; ReproductorSSE lo abre con
+mmap y lo inyecta en un ClienteSSEMultiplex o en cualquier EventRouter, en
+tiempo real o tan rápido como se pueda, y reporta eventos/s y la latencia
+de cada handler:
+
+    python grabacion_sse.py grabar alertas.ecosse --segundos 60
+    python grabacion_sse.py reproducir alertas.ecosse            # máxima velocidad
+    python grabacion_sse.py reproducir alertas.ecosse --velocidad 1
+
+    with ReproductorSSE("alertas.ecosse") as rep:
+        resultado = await rep.reproducir(cliente)     # o un EventRouter
+        resultado.imprimir()
+
+Formato del log (little-endian):
+    cabecera  b"ECOSSE\\x01\\n" + <d epoch de inicio de la grabación
+    registro  <Q microsegundos desde el inicio + <I largo + bytes del bloque
+
+DECISIONES DE DISEÑO:
+  1. Se graban bloques crudos de iter_chunked(), no eventos parseados.
+     → Justificación: la reproducción ejercita también ParserSSE con las
+     mismas fronteras de bloque (eventos partidos, keep-alives, CRLF) que
+     vio el cliente real; 12 bytes de cabecera por bloque, no por evento.
+  2. El reproductor usa mmap y recorre los registros con struct.unpack_from.
+     → Justificación: no lee el archivo entero a memoria ni hace read()
+     por registro; el SO pagina la grabación bajo demanda. Un último
+     registro truncado (grabación cortada con Ctrl+C) se ignora.
+  3. Destino ClienteSSEMultiplex: los bloques pasan por el mismo camino
+     que el socket (ParserSSE crudo con sus tipos de interés,
+     _despachar_evento y backpressure del despachador si lo hay).
+     Destino EventRouter (Semana 7 o Semana 10): se parsea y se llama
+     despachar(tipo, datos); `decodificar=False` pasa el data como str
+     (los handlers de Semana 7 reciben str).
+  4. Latencia por handler: durante la reproducción cada handler se
+     envuelve con un cronómetro y al final se restaura. Para handlers
+     async se mide hasta que el awaitable termina. Routers sin lista de
+     handlers accesible se miden por tipo de evento (despachar completo).
+  5. velocidad=None → máxima velocidad (cede el loop una vez por bloque);
+     velocidad=1.0 → tiempo real, 2.0 → el doble de rápido, etc.
+"""
+
+import argparse
+import asyncio
+import functools
+import inspect
+import json
+import logging
+import mmap
+import statistics
+import struct
+import time
+from dataclasses import dataclass, field
+
+import aiohttp
+
+from cliente_sse_multiplex import TAMANO_CHUNK, ClienteSSEMultiplex
+from parser_sse import ParserSSE
+
+logger = logging.getLogger(__name__)
+
+MAGIA = b"ECOSSE\x01\n"
+_CABECERA = struct.Struct("<8sd")
+_REGISTRO = struct.Struct("<QI")
+
+
+# ═════════════════════════════════════════════════════════════
+# Grabación
+# ═════════════════════════════════════════════════════════════
+
+class GrabadorSSE:
+    """Escribe bloques SSE crudos con su instante de llegada en un log binario."""
+
+    def __init__(self, ruta):
+        self._archivo = open(ruta, "wb")
+        self._inicio = time.monotonic()
+        self._archivo.write(_CABECERA.pack(MAGIA, time.time()))
+        self.bloques = 0
+        self.bytes = 0
+
+    def escribir(self, bloque: bytes) -> None:
+        desde_inicio = int((time.monotonic() - self._inicio) * 1_000_000)
+        self._archivo.write(_REGISTRO.pack(desde_inicio, len(bloque)))
+        self._archivo.write(bloque)
+        self.bloques += 1
+        self.bytes += len(bloque)
+
+    def cerrar(self) -> None:
+        self._archivo.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+
+async def grabar(base_url, token_manager, ruta, segundos=None, max_bytes=None,
+                 last_event_id=None) -> GrabadorSSE:
+    """Graba /api/alertas en `ruta` hasta `segundos`, `max_bytes` o el cierre del servidor."""
+    headers = token_manager.get_auth_header()
+    headers["Accept"] = "text/event-stream"
+    if last_event_id:
+        headers["Last-Event-ID"] = last_event_id
+    url = f"{base_url.rstrip('/')}/api/alertas"
+
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=None)) as session:
+        async with session.get(url, headers=headers) as resp:
+            resp.raise_for_status()
+            with GrabadorSSE(ruta) as grabador:
+
+                async def _leer():
+                    async for bloque in resp.content.iter_chunked(TAMANO_CHUNK):
+                        grabador.escribir(bloque)
+                        if max_bytes and grabador.bytes >= max_bytes:
+                            return
+
+                try:
+                    await asyncio.wait_for(_leer(), segundos)  # None: sin limite
+                except asyncio.TimeoutError:
+                    pass
+    logger.info("Grabados %d bloques (%d bytes) en %s", grabador.bloques, grabador.bytes, ruta)
+    return grabador
+
+
+# ═════════════════════════════════════════════════════════════
+# Reproducción
+# ═════════════════════════════════════════════════════════════
+
+@dataclass
+class ResultadoReproduccion:
+    """Eventos/s de una reproducción y latencias (s) por handler."""
+    eventos: int
+    bytes: int
+    segundos: float
+    latencias: dict = field(default_factory=dict)
+
+    @property
+    def eventos_por_segundo(self) -> float:
+        return self.eventos / self.segundos if self.segundos > 0 else 0.0
+
+    def resumen(self) -> dict:
+        """Llamadas y p50/p95/max (ms) por handler."""
+        resultado = {}
+        for handler, muestras in self.latencias.items():
+            if not muestras:
+                continue
+            valores = sorted(m * 1000 for m in muestras)
+            resultado[handler] = {
+                "llamadas": len(valores),
+                "p50": statistics.median(valores),
+                "p95": valores[min(len(valores) - 1, int(len(valores) * 0.95))],
+                "max": valores[-1],
+            }
+        return resultado
+
+    def imprimir(self) -> None:
+        print(f"\n  {self.eventos:,} eventos, {self.bytes:,} bytes en {self.segundos:.3f} s"
+              f" → {self.eventos_por_segundo:,.0f} eventos/s")
+        print(f"  {'Handler':<45} {'llamadas':>9} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}")
+        print("  " + "-" * 82)
+        for handler, r in self.resumen().items():
+            print(f"  {handler:<45} {r['llamadas']:>9,} {r['p50']:>8.3f} {r['p95']:>8.3f} {r['max']:>8.3f}")
+
+
+def _nombre_handler(fn) -> str:
+    return getattr(fn, "__qualname__", None) or getattr(fn, "nombre", None) or type(fn).__name__
+
+
+def _cronometrado(fn, muestras):
+    """Envuelve fn para anotar su duración; los async se miden hasta terminar."""
+
+    async def _esperar(resultado, inicio):
+        try:
+            return await resultado
+        finally:
+            muestras.append(time.perf_counter() - inicio)
+
+    @functools.wraps(fn)
+    def cronometrado(datos):
+        inicio = time.perf_counter()
+        try:
+            resultado = fn(datos)
+        except BaseException:
+            muestras.append(time.perf_counter() - inicio)
+            raise
+        if inspect.isawaitable(resultado):
+            return _esperar(resultado, inicio)
+        muestras.append(time.perf_counter() - inicio)
+        return resultado
+
+    return cronometrado
+
+
+def _instrumentar(router, latencias):
+    """Cronometra los handlers de `router`; retorna una función que los restaura."""
+    if isinstance(getattr(router, "handlers", None), dict):  # EventRouter (Semana 7 y 10)
+        originales = {tipo: list(fns) for tipo, fns in router.handlers.items()}
+        for tipo, fns in router.handlers.items():
+            fns[:] = [_cronometrado(fn, latencias.setdefault(f"{tipo}:{_nombre_handler(fn)}", []))
+                      for fn in fns]
+
+        def restaurar():
+            for tipo, fns in originales.items():
+                router.handlers[tipo][:] = fns
+        return restaurar
+
+    if isinstance(getattr(router, "_registro", None), dict):  # EventRouterPrioritizado
+        originales = {tipo: list(regs) for tipo, regs in router._registro.items()}
+        for tipo, regs in router._registro.items():
+            regs[:] = [(prioridad, orden, _cronometrado(
+                fn, latencias.setdefault(f"{tipo}:{_nombre_handler(fn)}", [])))
+                for prioridad, orden, fn in regs]
+            router._compilar(tipo)
+
+        def restaurar():
+            for tipo, regs in originales.items():
+                router._registro[tipo][:] = regs
+                router._compilar(tipo)
+        return restaurar
+
+    return None
+
+
+class ReproductorSSE:
+    """Lee con mmap un log de GrabadorSSE y lo inyecta en un cliente o router."""
+
+    def __init__(self, ruta):
+        self._archivo = open(ruta, "rb")
+        try:
+            self._mm = mmap.mmap(self._archivo.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # archivo vacío
+            self._archivo.close()
+            raise ValueError(f"{ruta}: no es una grabacion SSE")
+        if len(self._mm) < _CABECERA.size or self._mm[:len(MAGIA)] != MAGIA:
+            self.cerrar()
+            raise ValueError(f"{ruta}: no es una grabacion SSE")
+        self.inicio_epoch = _CABECERA.unpack_from(self._mm)[1]
+
+    def bloques(self):
+        """Itera (segundos desde el inicio, bytes) en orden de llegada."""
+        mm = self._mm
+        total = len(mm)
+        pos = _CABECERA.size
+        while pos + _REGISTRO.size <= total:
+            micros, largo = _REGISTRO.unpack_from(mm, pos)
+            pos += _REGISTRO.size
+            if pos + largo > total:
+                logger.warning("Registro final truncado (%d de %d bytes): ignorado", total - pos, largo)
+                return
+            yield micros / 1_000_000, mm[pos:pos + largo]
+            pos += largo
+
+    async def reproducir(self, destino, velocidad=None, decodificar=True) -> ResultadoReproduccion:
+        """
+        Inyecta la grabación en `destino` (ClienteSSEMultiplex o EventRouter).
+
+        velocidad=None: máxima velocidad; 1.0: respeta los tiempos grabados.
+        decodificar: solo para routers; False pasa el data como str.
+        """
+        if velocidad is not None and velocidad <= 0:
+            raise ValueError("velocidad debe ser > 0 (o None para maxima velocidad)")
+        latencias = {}
+        es_cliente = isinstance(destino, ClienteSSEMultiplex)
+        if es_cliente:
+            restauradores = [_instrumentar(destino._router, latencias),
+                             _instrumentar(destino._router_crudo, latencias)]
+            parser = ParserSSE(tipos=destino._tipos_parser(), crudo=True)
+            entregar = destino._despachar_evento
+        else:
+            restauradores = [_instrumentar(destino, latencias)]
+            parser = ParserSSE()
+            entregar = self._entregador(destino, decodificar,
+                                        latencias if restauradores[0] is None else None)
+        pendientes = []
+        eventos = n_bytes = 0
+        loop = asyncio.get_running_loop()
+        inicio = loop.time()
+        t0 = time.perf_counter()
+        try:
+            for instante, bloque in self.bloques():
+                if velocidad is not None:
+                    espera = inicio + instante / velocidad - loop.time()
+                    if espera > 0:
+                        await asyncio.sleep(espera)
+                n_bytes += len(bloque)
+                for tipo, datos, evento_id in parser.alimentar(bloque):
+                    eventos += 1
+                    resultado = entregar(tipo, datos, evento_id)
+                    if resultado:
+                        pendientes.extend(resultado)
+                if es_cliente and destino._despachador is not None:
+                    await destino._despachador.esperar_espacio()
+                else:
+                    await asyncio.sleep(0)
+            for tipo, datos, evento_id in parser.finalizar():
+                eventos += 1
+                resultado = entregar(tipo, datos, evento_id)
+                if resultado:
+                    pendientes.extend(resultado)
+
+            # Lo que quedó en curso también cuenta en el tiempo de la corrida
+            if pendientes:
+                await asyncio.gather(*pendientes, return_exceptions=True)
+            if es_cliente:
+                if destino._despachador is not None:
+                    await destino._despachador.vaciar()
+                if destino._tareas_handlers:
+                    await asyncio.gather(*destino._tareas_handlers, return_exceptions=True)
+            segundos = time.perf_counter() - t0
+        finally:
+            for restaurar in restauradores:
+                if restaurar is not None:
+                    restaurar()
+        return ResultadoReproduccion(eventos, n_bytes, segundos, latencias)
+
+    @staticmethod
+    def _entregador(router, decodificar, latencias_por_tipo):
+        """despachar() de un router; si no se pudo instrumentar, se cronometra por tipo."""
+
+        def entregar(tipo, datos, evento_id):
+            if decodificar:
+                try:
+                    datos = json.loads(datos) if datos else {}
+                except ValueError:
+                    datos = {"raw": datos}
+            if latencias_por_tipo is None:
+                return router.despachar(tipo, datos)
+            inicio = time.perf_counter()
+            try:
+                return router.despachar(tipo, datos)
+            finally:
+                latencias_por_tipo.setdefault(f"{tipo}:despachar", []).append(
+                    time.perf_counter() - inicio)
+
+        return entregar
+
+    def cerrar(self) -> None:
+        self._mm.close()
+        self._archivo.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+
+# ═════════════════════════════════════════════════════════════
+# CLI
+# ═════════════════════════════════════════════════════════════
+
+async def _cli_grabar(args) -> None:
+    from token_manager import TokenManager
+
+    tm = TokenManager(base_url=args.url, refresh_programado=False)
+    await tm.login(username=args.usuario)
+    try:
+        grabador = await grabar(args.url, tm, args.archivo, segundos=args.segundos)
+    finally:
+        await tm.close()
+    print(f"  {grabador.bloques} bloques, {grabador.bytes:,} bytes → {args.archivo}")
+
+
+async def _cli_reproducir(args) -> None:
+    from cliente_sse_multiplex import handler_precio_actualizado, handler_stock_critico
+
+    cliente = ClienteSSEMultiplex("http://grabacion", token_manager=None, metricas=None,
+                                  despacho="async" if args.despacho_async else None)
+    cliente.suscribir("precio-actualizado", handler_precio_actualizado)
+    cliente.suscribir("stock-critico", handler_stock_critico)
+    with ReproductorSSE(args.archivo) as reproductor:
+        resultado = await reproductor.reproducir(cliente, velocidad=args.velocidad)
+    await cliente.close()
+    resultado.imprimir()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    comandos = parser.add_subparsers(dest="comando", required=True)
+    p_grabar = comandos.add_parser("grabar", help="Grabar /api/alertas del mock")
+    p_grabar.add_argument("archivo")
+    p_grabar.add_argument("--url", default="http://localhost:3000")
+    p_grabar.add_argument("--usuario", default="op1")
+    p_grabar.add_argument("--segundos", type=float, default=60.0)
+    p_rep = comandos.add_parser("reproducir", help="Reproducir una grabacion en ClienteSSEMultiplex")
+    p_rep.add_argument("archivo")
+    p_rep.add_argument("--velocidad", type=float, default=None,
+                       help="1 = tiempo real; sin valor = maxima velocidad")
+    p_rep.add_argument("--despacho-async", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(_cli_grabar(args) if args.comando == "grabar" else _cli_reproducir(args))
@@ -0,0 +1,327 @@
+"""
+metricas.py — Registro de métricas de bajo overhead para EcoMarket (Semana 10)
+==============================================================================
+
+Instrumenta el stack cliente (ClienteRobusto, CircuitBreaker, TokenManager,
+ClienteSSEMultiplex) y exporta en formato de texto de Prometheus:
+
+  - Contador    → valores monótonos (peticiones, refreshes, transiciones)
+  - Gauge       → valor puntual (estado actual del circuito)
+  - Histograma  → buckets FIJOS (latencias por ruta, lag SSE, refresh)
+
+Exportación:
+  - registro.exportar_prometheus()      → str en text format 0.0.4
+  - registro.volcar_archivo(ruta)       → escritura atómica (textfile collector)
+  - registro.servir_http(puerto=9464)   → GET /metrics en un hilo daemon
+
+DECISIONES DE DISEÑO:
+  1. Sin locks en el camino caliente.
+     → Justificación: toda la instrumentación ocurre dentro del event loop
+     (un solo hilo), así que los incrementos no compiten entre sí. El hilo
+     HTTP de exportación solo LEE: toma una copia de los dicts con list(),
+     que bajo el GIL es una operación atómica. Una lectura puede ver un
+     histograma a mitad de actualización (count ya sumado, sum todavía no),
+     lo cual es aceptable para un scrape de Prometheus.
+  2. Buckets fijos + bisect (O(log n) por observación).
+     → Justificación: memoria constante por serie y sin asignaciones por
+     observación. Un HDR histogram daría más resolución pero no aporta para
+     latencias HTTP de 1 ms a 10 s.
+  3. Series hijas cacheadas por tupla de etiquetas (patrón labels() de
+     prometheus_client). El caller puede guardar la serie hija y evitar el
+     lookup en cada observación.
+  4. Registro global por defecto (REGISTRO_GLOBAL), igual que
+     logging.getLogger: las clases instrumentadas aceptan `metricas=` para
+     inyectar un registro aislado en tests.
+"""
+
+import abc
+import bisect
+import logging
+import math
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Buckets por defecto para latencias (segundos): 1 ms … 10 s
+BUCKETS_LATENCIA = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+CONTENT_TYPE_PROMETHEUS = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _formatear_valor(valor: float) -> str:
+    if valor == math.inf:
+        return "+Inf"
+    if valor == -math.inf:
+        return "-Inf"
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return repr(valor)
+
+
+def _escapar(valor: str) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _formatear_etiquetas(nombres, valores, extra: str = "") -> str:
+    partes = [f'{n}="{_escapar(v)}"' for n, v in zip(nombres, valores)]
+    if extra:
+        partes.append(extra)
+    if not partes:
+        return ""
+    return "{" + ",".join(partes) + "}"
+
+
+# ═════════════════════════════════════════════════════════════
+# Series (valores de una métrica para una combinación de etiquetas)
+# ═════════════════════════════════════════════════════════════
+
+class _SerieContador:
+    __slots__ = ("valor",)
+
+    def __init__(self):
+        self.valor = 0.0
+
+    def inc(self, cantidad: float = 1.0) -> None:
+        if cantidad < 0:
+            raise ValueError("Un contador solo puede incrementarse")
+        self.valor += cantidad
+
+
+class _SerieGauge:
+    __slots__ = ("valor",)
+
+    def __init__(self):
+        self.valor = 0.0
+
+    def set(self, valor: float) -> None:
+        self.valor = valor
+
+    def inc(self, cantidad: float = 1.0) -> None:
+        self.valor += cantidad
+
+    def dec(self, cantidad: float = 1.0) -> None:
+        self.valor -= cantidad
+
+
+class _SerieHistograma:
+    __slots__ = ("_limites", "conteos", "suma", "total")
+
+    def __init__(self, limites):
+        self._limites = limites
+        # Un slot extra para el bucket +Inf
+        self.conteos = [0] * (len(limites) + 1)
+        self.suma = 0.0
+        self.total = 0
+
+    def observar(self, valor: float) -> None:
+        self.conteos[bisect.bisect_left(self._limites, valor)] += 1
+        self.suma += valor
+        self.total += 1
+
+
+# ═════════════════════════════════════════════════════════════
+# Familias de métricas
+# ═════════════════════════════════════════════════════════════
+
+class _Metrica(abc.ABC):
+    tipo = ""
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas=()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._series: dict = {}
+        if not self.etiquetas:
+            self._series[()] = self._nueva_serie()
+
+    @abc.abstractmethod
+    def _nueva_serie(self):
+        """Serie vacía del tipo de la familia (una por combinación de etiquetas)."""
+
+    def etiquetar(self, *valores, **por_nombre):
+        """
+        Retorna (y cachea) la serie para una combinación de etiquetas.
+
+        Acepta valores posicionales en el orden declarado o por nombre.
+        """
+        if por_nombre:
+            valores = tuple(str(por_nombre[n]) for n in self.etiquetas)
+        else:
+            valores = tuple(str(v) for v in valores)
+        serie = self._series.get(valores)
+        if serie is None:
+            if len(valores) != len(self.etiquetas):
+                raise ValueError(
+                    f"{self.nombre}: se esperaban etiquetas {self.etiquetas}"
+                )
+            serie = self._series[valores] = self._nueva_serie()
+        return serie
+
+    def _serie_sin_etiquetas(self):
+        if self.etiquetas:
+            raise ValueError(f"{self.nombre} requiere etiquetas {self.etiquetas}")
+        return self._series[()]
+
+    def valor(self, *valores, **por_nombre) -> float:
+        return self.etiquetar(*valores, **por_nombre).valor
+
+    def _lineas(self):
+        yield f"# HELP {self.nombre} {self.ayuda}"
+        yield f"# TYPE {self.nombre} {self.tipo}"
+        for valores, serie in list(self._series.items()):
+            etiquetas = _formatear_etiquetas(self.etiquetas, valores)
+            yield f"{self.nombre}{etiquetas} {_formatear_valor(serie.valor)}"
+
+
+class Contador(_Metrica):
+    tipo = "counter"
+
+    def _nueva_serie(self):
+        return _SerieContador()
+
+    def inc(self, cantidad: float = 1.0) -> None:
+        self._serie_sin_etiquetas().inc(cantidad)
+
+
+class Gauge(_Metrica):
+    tipo = "gauge"
+
+    def _nueva_serie(self):
+        return _SerieGauge()
+
+    def set(self, valor: float) -> None:
+        self._serie_sin_etiquetas().set(valor)
+
+
+class Histograma(_Metrica):
+    tipo = "histogram"
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas=(), buckets=BUCKETS_LATENCIA):
+        self.buckets = tuple(sorted(float(b) for b in buckets if b != math.inf))
+        super().__init__(nombre, ayuda, etiquetas)
+
+    def _nueva_serie(self):
+        return _SerieHistograma(self.buckets)
+
+    def observar(self, valor: float) -> None:
+        self._serie_sin_etiquetas().observar(valor)
+
+    def valor(self, *valores, **por_nombre) -> float:
+        """Un histograma no tiene un valor único: leer .total / .suma / .conteos de la serie."""
+        raise TypeError(
+            f"{self.nombre} es un histograma: usar etiquetar(...).total, .suma o .conteos"
+        )
+
+    def _lineas(self):
+        yield f"# HELP {self.nombre} {self.ayuda}"
+        yield f"# TYPE {self.nombre} {self.tipo}"
+        limites = self.buckets + (math.inf,)
+        for valores, serie in list(self._series.items()):
+            acumulado = 0
+            for limite, conteo in zip(limites, list(serie.conteos)):
+                acumulado += conteo
+                etiquetas = _formatear_etiquetas(
+                    self.etiquetas, valores, f'le="{_formatear_valor(limite)}"'
+                )
+                yield f"{self.nombre}_bucket{etiquetas} {acumulado}"
+            etiquetas = _formatear_etiquetas(self.etiquetas, valores)
+            yield f"{self.nombre}_sum{etiquetas} {_formatear_valor(serie.suma)}"
+            yield f"{self.nombre}_count{etiquetas} {serie.total}"
+
+
+# ═════════════════════════════════════════════════════════════
+# Registro
+# ═════════════════════════════════════════════════════════════
+
+class RegistroMetricas:
+    """
+    Colección de métricas con get-or-create por nombre.
+
+    Varias instancias de ClienteRobusto/CircuitBreaker comparten la misma
+    familia de métricas y se distinguen por etiquetas.
+    """
+
+    def __init__(self):
+        self._metricas: dict = {}
+
+    def _obtener_o_crear(self, clase, nombre, ayuda, etiquetas, **kwargs):
+        metrica = self._metricas.get(nombre)
+        if metrica is None:
+            metrica = self._metricas[nombre] = clase(nombre, ayuda, etiquetas, **kwargs)
+        elif type(metrica) is not clase or metrica.etiquetas != tuple(etiquetas):
+            raise ValueError(f"La métrica '{nombre}' ya existe con otro tipo o etiquetas")
+        return metrica
+
+    def contador(self, nombre: str, ayuda: str, etiquetas=()) -> Contador:
+        return self._obtener_o_crear(Contador, nombre, ayuda, etiquetas)
+
+    def gauge(self, nombre: str, ayuda: str, etiquetas=()) -> Gauge:
+        return self._obtener_o_crear(Gauge, nombre, ayuda, etiquetas)
+
+    def histograma(
+        self, nombre: str, ayuda: str, etiquetas=(), buckets=BUCKETS_LATENCIA
+    ) -> Histograma:
+        return self._obtener_o_crear(Histograma, nombre, ayuda, etiquetas, buckets=buckets)
+
+    def obtener(self, nombre: str):
+        return self._metricas.get(nombre)
+
+    def exportar_prometheus(self) -> str:
+        """Serializa todas las métricas en el text format de Prometheus."""
+        lineas = []
+        for metrica in list(self._metricas.values()):
+            lineas.extend(metrica._lineas())
+        return "\n".join(lineas) + "\n"
+
+    def volcar_archivo(self, ruta: str) -> None:
+        """
+        Escribe el dump en `ruta` de forma atómica (tmp + os.replace), apto
+        para el textfile collector de node_exporter.
+        """
+        tmp = f"{ruta}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.exportar_prometheus())
+        os.replace(tmp, ruta)
+
+    def servir_http(self, host: str = "127.0.0.1", puerto: int = 9464) -> ThreadingHTTPServer:
+        """
+        Expone GET /metrics en un hilo daemon. Retorna el servidor para que
+        el caller pueda llamar a .shutdown() al terminar.
+        """
+        registro = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                cuerpo = registro.exportar_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE_PROMETHEUS)
+                self.send_header("Content-Length", str(len(cuerpo)))
+                self.end_headers()
+                self.wfile.write(cuerpo)
+
+            def log_message(self, formato, *args):
+                logger.debug("metricas http: " + formato, *args)
+
+        servidor = ThreadingHTTPServer((host, puerto), _Handler)
+        hilo = threading.Thread(
+            target=servidor.serve_forever, name="metricas-http", daemon=True
+        )
+        hilo.start()
+        logger.info("Métricas Prometheus en http://%s:%d/metrics", host, servidor.server_address[1])
+        return servidor
+
+
+REGISTRO_GLOBAL = RegistroMetricas()
+
+
+def registro_o_global(metricas: Optional[RegistroMetricas]) -> RegistroMetricas:
+    return metricas if metricas is not None else REGISTRO_GLOBAL
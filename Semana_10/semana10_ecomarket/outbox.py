@@ -0,0 +1,353 @@
+"""
+outbox.py — Outbox durable para escrituras con el circuito ABIERTO (Semana 10)
+==============================================================================
+
+Cuando el CircuitBreaker está ABIERTO, ClienteRobusto.post/put/patch/delete
+lanzan CircuitOpenError y la escritura se pierde. Con un Outbox configurado
+la escritura se persiste en disco y se reenvía cuando el circuito se cierra:
+
+    outbox = Outbox("ecomarket_outbox.log")
+    cliente = ClienteRobusto(..., outbox=outbox)
+    await cliente.patch("/productos/3", json={"stock": 0})
+      → {"__encolado__": True, "__origen__": "outbox", "seq": 17}
+
+Formato del archivo (JSON Lines, append-only):
+    {"op":"encolar","seq":17,"metodo":"PATCH","path":"/productos/3","json":{...},...}
+    {"op":"ack","seq":17}
+
+Al abrir se reproduce el log: un "encolar" posterior con el mismo seq
+reemplaza al anterior (PATCH colapsado) y un "ack" lo elimina.
+
+DECISIONES DE DISEÑO:
+  1. fsync agrupado (group commit).
+     → Justificación: un fsync por escritura limita el throughput a lo que
+     aguante el disco (~100-1000/s). encolar() escribe la línea y espera al
+     lote actual; el lote se sincroniza al llegar a `fsync_lote` registros o
+     tras `fsync_espera` segundos. Cuando encolar() retorna, la escritura ya
+     está en disco.
+  2. PATCH colapsado por path.
+     → Justificación: si la última entrada pendiente para /productos/3 es un
+     PATCH que todavía no salió, el nuevo PATCH se fusiona en ella (los campos
+     nuevos ganan). Solo se colapsa contra la ÚLTIMA entrada del path, así un
+     PUT o DELETE intermedio nunca queda reordenado.
+  3. Orden por path, concurrencia entre paths.
+     → Justificación: las escrituras al mismo producto se envían en orden
+     estricto; productos distintos se drenan en paralelo con `max_concurrencia`
+     workers y un límite de `tasa_maxima` peticiones/s para no tumbar al
+     servidor que se acaba de recuperar.
+  4. Entrega at-least-once.
+     → Justificación: el "ack" se escribe después de la respuesta. Si el
+     proceso muere entre ambas, la entrada se reenvía al reiniciar (un POST
+     puede duplicarse). Los headers NO se persisten: el token se adjunta al
+     enviar (INV-B2).
+  5. Compactación: al abrir y cuando el outbox queda vacío, el archivo se
+     reescribe solo con las entradas pendientes. Al abrir se reescribe
+     también si hay una línea ilegible o el archivo no termina en "\n"
+     (crash a mitad de escritura), aunque no haya acks.
+     → Justificación: si no, el siguiente encolar() se anexa a la línea
+     truncada; su fsync tiene éxito pero la línea resultante es ilegible y
+     la escritura se pierde al reabrir.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Awaitable, Callable, Optional
+
+from metricas import registro_o_global
+
+logger = logging.getLogger(__name__)
+
+METODOS_MUTANTES = frozenset({"POST", "PUT", "PATCH", "DELETE"})
+
+
+@dataclass
+class EntradaOutbox:
+    """Una escritura pendiente de envío."""
+    seq: int
+    metodo: str
+    path: str
+    json: Optional[dict] = None
+    params: Optional[dict] = None
+    creada: float = field(default_factory=time.time)
+    colapsadas: int = 0
+
+
+class Outbox:
+    """
+    Cola durable de escrituras respaldada por un archivo append-only.
+    """
+
+    def __init__(
+        self,
+        ruta: str,
+        fsync_lote: int = 32,
+        fsync_espera: float = 0.005,
+        max_concurrencia: int = 4,
+        tasa_maxima: float = 20.0,
+        metricas=None,
+    ):
+        self._ruta = ruta
+        self._fsync_lote = fsync_lote
+        self._fsync_espera = fsync_espera
+        self.max_concurrencia = max_concurrencia
+        self.tasa_maxima = tasa_maxima
+
+        self._pendientes: dict = {}        # seq → EntradaOutbox, en orden de seq
+        self._ultima_por_path: dict = {}   # path → seq de la última entrada pendiente
+        self._en_vuelo: set = set()
+        self._siguiente_seq = 1
+
+        self._lote: Optional[asyncio.Future] = None
+        self._en_lote = 0
+        self._timer_fsync = None
+        self._lock_drenado = asyncio.Lock()
+        self._proximo_turno = 0.0
+
+        registro = registro_o_global(metricas)
+        self._m_pendientes = registro.gauge(
+            "ecomarket_outbox_pendientes", "Escrituras pendientes en el outbox"
+        )
+        self._m_eventos = registro.contador(
+            "ecomarket_outbox_eventos_total",
+            "Escrituras encoladas, colapsadas, enviadas y descartadas por el outbox",
+            ("evento",),
+        )
+
+        self._cargar()
+        self._archivo = open(self._ruta, "a", encoding="utf-8")
+
+    # ── Persistencia ──────────────────────────────────────────
+
+    def _cargar(self) -> None:
+        """Reproduce el log y lo compacta a solo las entradas pendientes."""
+        registros = 0
+        danado = False  # línea ilegible o sin "\n" final: el próximo append caería en ella
+        if os.path.exists(self._ruta):
+            with open(self._ruta, encoding="utf-8") as f:
+                for numero, linea in enumerate(f, 1):
+                    if not linea.endswith("\n"):
+                        danado = True
+                    if not linea.strip():
+                        continue
+                    try:
+                        registro = json.loads(linea)
+                    except json.JSONDecodeError:
+                        # Línea truncada por un crash a mitad de escritura
+                        logger.warning("Outbox: línea %d ilegible, se ignora", numero)
+                        danado = True
+                        continue
+                    registros += 1
+                    seq = registro["seq"]
+                    self._siguiente_seq = max(self._siguiente_seq, seq + 1)
+                    if registro["op"] == "ack":
+                        self._pendientes.pop(seq, None)
+                    else:
+                        del registro["op"]
+                        self._pendientes[seq] = EntradaOutbox(**registro)
+        for seq in sorted(self._pendientes):
+            self._ultima_por_path[self._pendientes[seq].path] = seq
+        self._pendientes = {seq: self._pendientes[seq] for seq in sorted(self._pendientes)}
+        if danado or registros > len(self._pendientes):
+            self._reescribir()
+        self._m_pendientes.set(len(self._pendientes))
+        if self._pendientes:
+            logger.info("Outbox: %d escrituras pendientes recuperadas de %s",
+                        len(self._pendientes), self._ruta)
+
+    def _reescribir(self) -> None:
+        tmp = f"{self._ruta}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for entrada in self._pendientes.values():
+                f.write(self._serializar("encolar", entrada))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._ruta)
+
+    @staticmethod
+    def _serializar(op: str, entrada: EntradaOutbox) -> str:
+        return json.dumps({"op": op, **asdict(entrada)}, separators=(",", ":")) + "\n"
+
+    async def _escribir(self, linea: str) -> None:
+        """Escribe una línea y espera a que su lote quede sincronizado en disco."""
+        self._archivo.write(linea)
+        if self._lote is None:
+            loop = asyncio.get_running_loop()
+            self._lote = loop.create_future()
+            self._en_lote = 0
+            self._timer_fsync = loop.call_later(self._fsync_espera, self._cerrar_lote)
+        lote = self._lote
+        self._en_lote += 1
+        if self._en_lote >= self._fsync_lote:
+            self._cerrar_lote()
+        await asyncio.shield(lote)
+
+    def _cerrar_lote(self) -> None:
+        lote, self._lote = self._lote, None
+        if lote is None:
+            return
+        self._timer_fsync.cancel()
+        self._archivo.flush()
+        asyncio.get_running_loop().create_task(self._fsync(lote))
+
+    async def _fsync(self, lote: asyncio.Future) -> None:
+        try:
+            await asyncio.to_thread(os.fsync, self._archivo.fileno())
+        except Exception as e:
+            if not lote.done():
+                lote.set_exception(e)
+            return
+        if not lote.done():
+            lote.set_result(None)
+
+    # ── API ───────────────────────────────────────────────────
+
+    async def encolar(
+        self, metodo: str, path: str, json: Optional[dict] = None, params: Optional[dict] = None
+    ) -> EntradaOutbox:
+        """Persiste una escritura. Retorna la entrada (nueva o la colapsada)."""
+        metodo = metodo.upper()
+        if metodo not in METODOS_MUTANTES:
+            raise ValueError(f"El outbox solo acepta escrituras, no {metodo}")
+
+        seq_previa = self._ultima_por_path.get(path)
+        previa = self._pendientes.get(seq_previa)
+        if (
+            metodo == "PATCH"
+            and previa is not None
+            and previa.metodo == "PATCH"
+            and previa.params == params
+            and seq_previa not in self._en_vuelo
+            and isinstance(previa.json, dict)
+            and isinstance(json, dict)
+        ):
+            previa.json = {**previa.json, **json}
+            previa.colapsadas += 1
+            self._m_eventos.etiquetar("colapsada").inc()
+            await self._escribir(self._serializar("encolar", previa))
+            return previa
+
+        entrada = EntradaOutbox(
+            seq=self._siguiente_seq, metodo=metodo, path=path, json=json, params=params
+        )
+        self._siguiente_seq += 1
+        self._pendientes[entrada.seq] = entrada
+        self._ultima_por_path[path] = entrada.seq
+        self._m_pendientes.set(len(self._pendientes))
+        self._m_eventos.etiquetar("encolada").inc()
+        await self._escribir(self._serializar("encolar", entrada))
+        return entrada
+
+    async def confirmar(self, seq: int) -> None:
+        """Marca una entrada como entregada (registro "ack")."""
+        entrada = self._pendientes.pop(seq, None)
+        if entrada is None:
+            return
+        if self._ultima_por_path.get(entrada.path) == seq:
+            del self._ultima_por_path[entrada.path]
+        self._m_pendientes.set(len(self._pendientes))
+        await self._escribir(json.dumps({"op": "ack", "seq": seq}) + "\n")
+
+    def pendientes(self) -> list:
+        return list(self._pendientes.values())
+
+    def tiene_pendientes(self, path: Optional[str] = None) -> bool:
+        if path is None:
+            return bool(self._pendientes)
+        return path in self._ultima_por_path
+
+    def __len__(self) -> int:
+        return len(self._pendientes)
+
+    @property
+    def drenando(self) -> bool:
+        return self._lock_drenado.locked()
+
+    async def _esperar_turno(self) -> None:
+        """Espaciado simple a `tasa_maxima` envíos por segundo."""
+        if not self.tasa_maxima:
+            return
+        loop = asyncio.get_running_loop()
+        ahora = loop.time()
+        turno = max(ahora, self._proximo_turno)
+        self._proximo_turno = turno + 1.0 / self.tasa_maxima
+        if turno > ahora:
+            await asyncio.sleep(turno - ahora)
+
+    async def drenar(self, enviar: Callable[[EntradaOutbox], Awaitable[bool]]) -> dict:
+        """
+        Reenvía las entradas pendientes.
+
+        `enviar(entrada)` retorna True si se entregó o False si el servidor la
+        rechazó de forma definitiva (4xx): en ambos casos se confirma. Si lanza
+        una excepción el drenado se detiene y lo no enviado queda pendiente.
+
+        Retorna {"enviadas", "descartadas", "pendientes", "error"}.
+        """
+        resumen = {"enviadas": 0, "descartadas": 0, "pendientes": 0, "error": None}
+        if self._lock_drenado.locked():
+            resumen["pendientes"] = len(self._pendientes)
+            return resumen
+
+        async with self._lock_drenado:
+            while self._pendientes and resumen["error"] is None:
+                por_path: dict = {}
+                for entrada in self._pendientes.values():
+                    por_path.setdefault(entrada.path, []).append(entrada.seq)
+                cola: asyncio.Queue = asyncio.Queue()
+                for seqs in por_path.values():
+                    cola.put_nowait(seqs)
+
+                async def _worker():
+                    while resumen["error"] is None:
+                        try:
+                            seqs = cola.get_nowait()
+                        except asyncio.QueueEmpty:
+                            return
+                        for seq in seqs:
+                            entrada = self._pendientes.get(seq)
+                            if entrada is None or resumen["error"] is not None:
+                                continue
+                            await self._esperar_turno()
+                            self._en_vuelo.add(seq)
+                            try:
+                                entregada = await enviar(entrada)
+                            except Exception as e:
+                                resumen["error"] = e
+                                return
+                            finally:
+                                self._en_vuelo.discard(seq)
+                            evento = "enviada" if entregada else "descartada"
+                            resumen["enviadas" if entregada else "descartadas"] += 1
+                            self._m_eventos.etiquetar(evento).inc()
+                            await self.confirmar(seq)
+
+                workers = min(self.max_concurrencia, len(por_path))
+                await asyncio.gather(*(_worker() for _ in range(workers)))
+
+            if not self._pendientes:
+                self._compactar()
+
+        resumen["pendientes"] = len(self._pendientes)
+        if resumen["error"] is not None:
+            logger.warning("Outbox: drenado detenido (%s), %d pendientes",
+                           type(resumen["error"]).__name__, resumen["pendientes"])
+        return resumen
+
+    def _compactar(self) -> None:
+        """Outbox vacío: trunca el log (con O_APPEND las escrituras siguen al final)."""
+        if self._lote is not None:
+            return  # hay un lote en curso; se compactará en el próximo vaciado
+        self._archivo.flush()
+        self._archivo.truncate(0)
+        os.fsync(self._archivo.fileno())
+
+    async def cerrar(self) -> None:
+        if self._lote is not None:
+            lote = self._lote
+            self._cerrar_lote()
+            await asyncio.shield(lote)
+        self._archivo.close()
@@ -0,0 +1,187 @@
+"""
+parser_sse.py — Parser SSE incremental sobre bytes (Semana 10)
+==============================================================
+
+ClienteSSEMultiplex leía el stream con `resp.content.readline()`: una
+espera por línea, un `decode()` por línea, `split(":")` y un dict por
+evento. ParserSSE recibe los bloques tal como llegan de la red
+(`resp.content.iter_chunked(n)`) y devuelve los eventos completos:
+
+    parser = ParserSSE(ultimo_id=None)
+    async for chunk in resp.content.iter_chunked(64 * 1024):
+        for tipo, datos, evento_id in parser.alimentar(chunk):
+            ...
+    for tipo, datos, evento_id in parser.finalizar():
+        ...
+
+DECISIONES DE DISEÑO:
+  1. Un bytearray reutilizable por conexión; los límites de evento se
+     buscan con `find(b"\\n\\n")`.
+     → Justificación: un evento incompleto no se parsea hasta que llega
+     su línea en blanco, y lo ya escaneado no se vuelve a recorrer. El
+     buffer se compacta una vez por lectura, no por línea.
+  2. Solo se decodifica el payload `data`, una vez por evento.
+     → Justificación: los nombres de campo se comparan como bytes dentro
+     del buffer (`startswith(campo, pos)`, sin cortar la línea); varias
+     líneas `data:` se unen con b"\\n".join y se decodifican juntas. Decodificar
+     desde un memoryview resultó más lento que slice + decode para payloads
+     de ~100 bytes, así que el payload se copia una vez. UTF-8 inválido se
+     reemplaza (U+FFFD) en lugar de cortar la conexión.
+  3. CRLF y CR se normalizan a LF al recibir el bloque, solo si el bloque
+     contiene b"\\r". Un CR al final de un bloque deja pendiente descartar
+     el LF inicial del siguiente (CRLF partido entre dos lecturas).
+     → Justificación: el mock emite LF; el camino habitual no copia nada
+     extra. El BOM inicial también se descarta, como pide la especificación.
+  4. Semántica de campos según la especificación de EventSource: se quita un
+     solo espacio tras ':', `id` con NUL se ignora, `retry` solo si son
+     dígitos, campos desconocidos se ignoran y un bloque sin `data` no se
+     despacha (comentarios y keep-alive no generan eventos).
+     → Justificación: es lo que hace un navegador con el mismo stream.
+     Como antes, `finalizar()` entrega el evento final aunque el servidor
+     cierre sin línea en blanco.
+  5. Los eventos son tuplas (tipo, datos, id) — `id` es None si el evento
+     no trae `id:`; `parser.ultimo_id` conserva el último visto y
+     `parser.retry` el último `retry:` (ms).
+     → Justificación: sin dict por evento; el cliente ya sabe qué hacer
+     con cada campo.
+  6. Límite de tamaño por evento (`max_evento`, 1 MiB).
+     → Justificación: sin él, un servidor que nunca envía la línea en
+     blanco haría crecer el buffer sin fin. ValueError hace que el cliente
+     reconecte, igual que el "Line is too long" de readline().
+  7. Filtro por tipo a nivel de bytes (`tipos`: set de bytes o None) y
+     payload sin decodificar (`crudo=True`).
+     → Justificación: las líneas `data:` se recuerdan como posiciones y el
+     payload solo se copia al cerrar el evento, cuando ya se conoce su
+     tipo. Un evento cuyo tipo no está en `tipos` sale como
+     (tipo, None, id): cuenta para métricas y Last-Event-ID pero su payload
+     nunca se copia ni se decodifica. `tipos` se consulta en cada evento,
+     así que el dueño puede modificar el set mientras el stream está abierto.
+"""
+
+from typing import List, Optional, Set, Tuple, Union
+
+MAX_EVENTO = 1024 * 1024
+
+_BOM = b"\xef\xbb\xbf"
+_DOS_PUNTOS = 0x3A
+_ESPACIO = 0x20
+
+Evento = Tuple[str, Union[str, bytes, None], Optional[str]]
+
+
+class ParserSSE:
+    """Parser incremental de text/event-stream: bloques de bytes → eventos."""
+
+    __slots__ = ("_buf", "_escaneado", "_cr_pendiente", "_inicio_stream",
+                 "max_evento", "tipos", "crudo", "ultimo_id", "retry")
+
+    def __init__(self, ultimo_id: Optional[str] = None, max_evento: int = MAX_EVENTO,
+                 tipos: Optional[Set[bytes]] = None, crudo: bool = False):
+        self._buf = bytearray()
+        self._escaneado = 0        # posición desde la que seguir buscando b"\n\n"
+        self._cr_pendiente = False
+        self._inicio_stream = True
+        self.max_evento = max_evento
+        self.tipos = tipos         # None: todos los tipos llevan payload
+        self.crudo = crudo         # True: payload en bytes, sin decodificar
+        self.ultimo_id = ultimo_id
+        self.retry: Optional[int] = None
+
+    def alimentar(self, chunk: bytes) -> List[Evento]:
+        """Añade un bloque recibido y retorna los eventos que quedaron completos."""
+        if self._cr_pendiente:
+            self._cr_pendiente = False
+            if chunk[:1] == b"\n":
+                chunk = chunk[1:]
+        if b"\r" in chunk:
+            self._cr_pendiente = chunk.endswith(b"\r")
+            chunk = chunk.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+
+        buf = self._buf
+        buf += chunk
+        if self._inicio_stream:
+            if len(buf) < len(_BOM) and _BOM.startswith(buf):
+                return []  # aún no se sabe si hay BOM
+            if buf.startswith(_BOM):
+                del buf[:len(_BOM)]
+            self._inicio_stream = False
+
+        eventos: List[Evento] = []
+        inicio = 0
+        fin = buf.find(b"\n\n", self._escaneado)
+        if fin >= 0:
+            while fin >= 0:
+                self._bloque(buf, inicio, fin, eventos)
+                inicio = fin + 2
+                fin = buf.find(b"\n\n", inicio)
+            del buf[:inicio]
+
+        if len(buf) > self.max_evento:
+            self._buf = bytearray()
+            self._escaneado = 0
+            raise ValueError(f"Evento SSE supera {self.max_evento} bytes sin línea en blanco")
+        self._escaneado = max(len(buf) - 1, 0)
+        return eventos
+
+    def finalizar(self) -> List[Evento]:
+        """Fin del stream: entrega el evento pendiente aunque no termine en línea en blanco."""
+        buf = self._buf
+        eventos: List[Evento] = []
+        if buf:
+            self._bloque(buf, 0, len(buf), eventos)
+        self._buf = bytearray()
+        self._escaneado = 0
+        self._cr_pendiente = False
+        return eventos
+
+    def _bloque(self, buf: bytearray, inicio: int, fin: int, eventos: List[Evento]) -> None:
+        """Parsea las líneas de buf[inicio:fin] (un evento) y lo añade a `eventos`."""
+        datos = []                 # posiciones [inicio, fin, inicio, fin, ...] de cada data
+        inicio_tipo = fin_tipo = -1
+        evento_id = None
+        pos = inicio
+        while pos < fin:
+            eol = buf.find(b"\n", pos, fin)
+            if eol < 0:
+                eol = fin
+            if eol > pos and buf[pos] != _DOS_PUNTOS:  # ni línea vacía ni comentario
+                dos_puntos = buf.find(b":", pos, eol)
+                if dos_puntos < 0:
+                    fin_nombre = valor = eol
+                else:
+                    fin_nombre = dos_puntos
+                    valor = dos_puntos + 1
+                    if valor < eol and buf[valor] == _ESPACIO:
+                        valor += 1
+                largo = fin_nombre - pos
+                if largo == 4 and buf.startswith(b"data", pos):
+                    datos.append(valor)
+                    datos.append(eol)
+                elif largo == 5 and buf.startswith(b"event", pos):
+                    inicio_tipo, fin_tipo = valor, eol
+                elif largo == 2 and buf.startswith(b"id", pos):
+                    if buf.find(b"\0", valor, eol) < 0:
+                        evento_id = buf[valor:eol].decode("utf-8", "replace")
+                        self.ultimo_id = evento_id
+                elif largo == 5 and buf.startswith(b"retry", pos):
+                    digitos = bytes(buf[valor:eol])
+                    if digitos.isdigit():
+                        self.retry = int(digitos)
+            pos = eol + 1
+
+        if not datos:
+            return
+        tipo_b = buf[inicio_tipo:fin_tipo] if inicio_tipo >= 0 else b"message"
+        tipo = tipo_b.decode("utf-8", "replace")
+        if self.tipos is not None and bytes(tipo_b) not in self.tipos:
+            eventos.append((tipo, None, evento_id))  # sin suscriptores: payload intacto
+            return
+
+        if len(datos) == 2:
+            payload = buf[datos[0]:datos[1]]
+        else:
+            payload = b"\n".join([buf[datos[i]:datos[i + 1]] for i in range(0, len(datos), 2)])
+        if self.crudo:
+            eventos.append((tipo, bytes(payload), evento_id))
+        else:
+            eventos.append((tipo, payload.decode("utf-8", "replace"), evento_id))
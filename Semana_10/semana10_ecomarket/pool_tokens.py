@@ -0,0 +1,282 @@
+"""
+pool_tokens.py — Tokens de muchos operadores en un solo proceso (Semana 10)
+===========================================================================
+
+El gateway del backend actúa en nombre de cientos de operadores (viewer,
+admin). Con un TokenManager por usuario hay una aiohttp.ClientSession por
+usuario y, si todos hicieron login en el mismo minuto, todos refrescan en
+el mismo segundo contra /auth/token. PoolTokens guarda un TokenManager por
+identidad sobre UNA sesión compartida y planifica los refresh proactivos:
+
+    pool = PoolTokens(base_url="http://localhost:3000", max_identidades=500)
+    await pool.login("op1", rol="viewer")
+    await pool.login("admin7", rol="admin")
+    headers = await pool.auth_header("op1")   # refresca solo si hace falta
+    ...
+    await pool.cerrar()
+
+DECISIONES DE DISEÑO:
+  1. Un TokenManager por identidad, creado con `session=` compartida y
+     `refresh_programado=False`.
+     → Justificación: se reutiliza el single-flight de refresh_access_token()
+     (INV-B3 por identidad) y el cache de claims; el pool solo sustituye el
+     timer individual por un planificador común.
+  2. Planificador único con heap de vencimientos + dispersión por identidad.
+     → Justificación: el refresh de cada identidad vence en
+     `exp - margen - dispersión`, con dispersión determinista en
+     [0, ventana_dispersion) derivada del nombre (crc32). Logins
+     simultáneos quedan repartidos en la ventana. Además, como mucho
+     `max_refresh_por_segundo` refresh por segundo: si vencen más, los
+     siguientes se corren unos milisegundos (el margen lo absorbe).
+  3. El heap guarda solo identidades; el vencimiento real se recalcula al
+     sacarlas.
+     → Justificación: si una petición ya refrescó la identidad (o hizo login
+     de nuevo) su `exp` cambió; el planificador lo detecta y la reprograma
+     sin necesidad de callbacks desde TokenManager.
+  4. LRU acotado (`max_identidades`) + expulsión de ociosas.
+     → Justificación: refrescar tokens de operadores que no hacen peticiones
+     es tráfico inútil. Una identidad sin uso durante `tiempo_ocioso` se
+     expulsa cuando le toca refrescar; al superar `max_identidades` se
+     expulsa la menos usada que no tenga un refresh en curso.
+"""
+
+import asyncio
+import heapq
+import logging
+import time
+import zlib
+from collections import OrderedDict
+from typing import Optional
+
+import aiohttp
+
+from metricas import registro_o_global
+from token_manager import BASE_URL, TokenManager
+
+logger = logging.getLogger(__name__)
+
+MAX_IDENTIDADES = 256
+REINTENTO_FALLIDO = 5.0  # s hasta reintentar un refresh proactivo fallido
+
+
+class _Identidad:
+    __slots__ = ("tm", "ultimo_uso", "en_heap")
+
+    def __init__(self, tm: TokenManager):
+        self.tm = tm
+        self.ultimo_uso = time.monotonic()
+        self.en_heap = False
+
+
+class PoolTokens:
+    """TokenManagers por identidad con sesión compartida y refresh repartido en el tiempo."""
+
+    def __init__(
+        self,
+        base_url: str = BASE_URL,
+        max_identidades: int = MAX_IDENTIDADES,
+        margen: float = 60.0,
+        ventana_dispersion: float = 30.0,
+        max_refresh_por_segundo: float = 10.0,
+        tiempo_ocioso: float = 900.0,
+        metricas=None,
+    ):
+        self._base_url = base_url.rstrip("/")
+        self._max_identidades = max_identidades
+        self._margen = margen
+        self._ventana_dispersion = ventana_dispersion
+        self._intervalo_refresh = 1.0 / max_refresh_por_segundo if max_refresh_por_segundo else 0.0
+        self._tiempo_ocioso = tiempo_ocioso
+        self._metricas = metricas
+        self._identidades: "OrderedDict[str, _Identidad]" = OrderedDict()
+        self._heap: list = []  # (vence_en time.time(), identidad)
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._planificador: Optional[asyncio.Task] = None
+        self._despertar = asyncio.Event()
+        self._refrescos: set = set()
+        self._proximo_cupo = 0.0
+
+        registro = registro_o_global(metricas)
+        self._m_identidades = registro.gauge(
+            "ecomarket_pool_tokens_identidades",
+            "Identidades con token en el PoolTokens",
+        )
+        self._m_eventos = registro.contador(
+            "ecomarket_pool_tokens_eventos_total",
+            "Eventos del PoolTokens (refresh proactivo, expulsiones)",
+            ("evento",),
+        )
+
+    # ------------------------------------------------------------------
+    # API
+    # ------------------------------------------------------------------
+    async def login(self, identidad: str, password: str = "", rol: str = "viewer") -> dict:
+        """POST /auth/login para `identidad` y la deja planificada para refresh."""
+        tm = self._obtener(identidad, crear=True).tm
+        datos = await tm.login(username=identidad, password=password, rol=rol)
+        self._programar(identidad)
+        return datos
+
+    def agregar(self, identidad: str, access_token: str, refresh_token: str) -> None:
+        """Registra tokens obtenidos fuera del pool (p. ej. reenviados por el gateway)."""
+        self._obtener(identidad, crear=True).tm.store_tokens(access_token, refresh_token)
+        self._programar(identidad)
+
+    def token_manager(self, identidad: str) -> TokenManager:
+        """TokenManager de la identidad (KeyError si no hay login)."""
+        return self._obtener(identidad, crear=False).tm
+
+    async def auth_header(self, identidad: str) -> dict:
+        """Header Authorization vigente; si el token vence, refresh single-flight."""
+        tm = self._obtener(identidad, crear=False).tm
+        if tm.is_expiring_soon(self._margen):
+            await tm.refresh_access_token()
+        return tm.get_auth_header()
+
+    def expulsar(self, identidad: str) -> bool:
+        entrada = self._identidades.pop(identidad, None)
+        if entrada is None:
+            return False
+        entrada.tm.logout()
+        self._m_identidades.set(len(self._identidades))
+        return True
+
+    def __contains__(self, identidad: str) -> bool:
+        return identidad in self._identidades
+
+    def __len__(self) -> int:
+        return len(self._identidades)
+
+    async def cerrar(self) -> None:
+        if self._planificador is not None:
+            self._planificador.cancel()
+            await asyncio.gather(self._planificador, return_exceptions=True)
+            self._planificador = None
+        for tarea in list(self._refrescos):
+            tarea.cancel()
+        await asyncio.gather(*self._refrescos, return_exceptions=True)
+        for entrada in self._identidades.values():
+            entrada.tm.logout()
+        self._identidades.clear()
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    # ------------------------------------------------------------------
+    # Identidades (LRU)
+    # ------------------------------------------------------------------
+    def _obtener(self, identidad: str, crear: bool) -> _Identidad:
+        entrada = self._identidades.get(identidad)
+        if entrada is not None:
+            self._identidades.move_to_end(identidad)
+            entrada.ultimo_uso = time.monotonic()
+            return entrada
+        if not crear:
+            raise KeyError(f"Identidad sin login en el pool: {identidad}")
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession()
+        tm = TokenManager(
+            base_url=self._base_url, metricas=self._metricas,
+            session=self._session, refresh_programado=False,
+        )
+        # El refresh proactivo llega hasta `ventana_dispersion` s antes del margen
+        tm._margen_expiracion = self._margen + self._ventana_dispersion
+        entrada = self._identidades[identidad] = _Identidad(tm)
+        if len(self._identidades) > self._max_identidades:
+            self._expulsar_lru(excepto=identidad)
+        self._m_identidades.set(len(self._identidades))
+        return entrada
+
+    def _expulsar_lru(self, excepto: str) -> None:
+        for identidad, entrada in self._identidades.items():
+            if identidad != excepto and not entrada.tm.refresh_en_curso:
+                self.expulsar(identidad)
+                self._m_eventos.etiquetar("expulsion_lru").inc()
+                return
+        logger.warning("PoolTokens: todas las identidades refrescando; se excede max_identidades")
+
+    # ------------------------------------------------------------------
+    # Planificador de refresh proactivo
+    # ------------------------------------------------------------------
+    def _dispersion(self, identidad: str) -> float:
+        return (zlib.crc32(identidad.encode("utf-8")) % 1000) / 1000 * self._ventana_dispersion
+
+    def _vencimiento(self, entrada: _Identidad, identidad: str) -> Optional[float]:
+        claims = entrada.tm.claims
+        if not claims or "exp" not in claims:
+            return None
+        return claims["exp"] - self._margen - self._dispersion(identidad)
+
+    def _programar(self, identidad: str, vence_en: Optional[float] = None) -> None:
+        entrada = self._identidades.get(identidad)
+        if entrada is None or entrada.en_heap:
+            return
+        if vence_en is None:
+            vence_en = self._vencimiento(entrada, identidad)
+            if vence_en is None:
+                return
+        entrada.en_heap = True
+        heapq.heappush(self._heap, (vence_en, identidad))
+        if self._heap[0][1] == identidad:
+            self._despertar.set()
+        if self._planificador is None or self._planificador.done():
+            self._planificador = asyncio.create_task(self._planificar())
+
+    async def _planificar(self) -> None:
+        while True:
+            if not self._heap:
+                await self._despertar.wait()
+                self._despertar.clear()
+                continue
+            vence_en, identidad = self._heap[0]
+            espera = vence_en - time.time()
+            if espera > 0:
+                try:
+                    await asyncio.wait_for(self._despertar.wait(), espera)
+                except asyncio.TimeoutError:
+                    pass
+                self._despertar.clear()
+                continue
+
+            heapq.heappop(self._heap)
+            entrada = self._identidades.get(identidad)
+            if entrada is None:
+                continue  # expulsada mientras esperaba
+            entrada.en_heap = False
+            actual = self._vencimiento(entrada, identidad)
+            if actual is not None and actual > time.time():
+                # Ya se refrescó bajo demanda: nuevo vencimiento
+                self._programar(identidad, actual)
+                continue
+            if time.monotonic() - entrada.ultimo_uso > self._tiempo_ocioso:
+                self.expulsar(identidad)
+                self._m_eventos.etiquetar("expulsion_ociosa").inc()
+                continue
+
+            await self._esperar_cupo()
+            tarea = asyncio.create_task(self._refrescar(identidad, entrada))
+            self._refrescos.add(tarea)
+            tarea.add_done_callback(self._refrescos.discard)
+
+    async def _esperar_cupo(self) -> None:
+        """Espaciado entre refresh proactivos (max_refresh_por_segundo)."""
+        loop = asyncio.get_running_loop()
+        espera = self._proximo_cupo - loop.time()
+        if espera > 0:
+            await asyncio.sleep(espera)
+        self._proximo_cupo = max(self._proximo_cupo, loop.time()) + self._intervalo_refresh
+
+    async def _refrescar(self, identidad: str, entrada: _Identidad) -> None:
+        try:
+            await entrada.tm.refresh_access_token()
+        except Exception as exc:
+            # INV-B2: nunca el token en logs, solo el tipo de error
+            logger.error("Refresh proactivo de '%s' falló: %s", identidad, type(exc).__name__)
+            self._m_eventos.etiquetar("refresh_error").inc()
+            self._programar(identidad, time.time() + REINTENTO_FALLIDO)
+            return
+        self._m_eventos.etiquetar("refresh_proactivo").inc()
+        vence_en = self._vencimiento(entrada, identidad)
+        if vence_en is None or vence_en <= time.time():
+            # Token nuevo con vida menor que el margen: no reintentar en bucle
+            vence_en = time.time() + REINTENTO_FALLIDO
+        self._programar(identidad, vence_en)
@@ -0,0 +1,137 @@
+"""
+registro_breakers.py — Un CircuitBreaker por grupo de endpoints (Semana 10)
+===========================================================================
+
+Con un único CircuitBreaker("EcoMarketAPI"), un /api/inventario caído hace
+fallar rápido también a /api/productos y /api/perfil, que están sanos.
+RegistroBreakers mantiene un breaker por clave (grupo de endpoints) para
+que una caída parcial degrade solo las funcionalidades afectadas:
+
+    registro = RegistroBreakers(
+        config={"umbral_fallos": 5, "timeout_apertura": 10.0},
+        overrides={"/inventario": {"umbral_fallos": 2}},
+    )
+    cliente = ClienteRobusto(..., breakers_por_ruta=registro)
+
+    registro.estado_agregado()
+      → {"total": 3, "abiertos": ["/inventario"], "semiabiertos": [],
+         "por_clave": {"/inventario": "ABIERTO", "/productos": "CERRADO", ...}}
+
+DECISIONES DE DISEÑO:
+  1. Clave por defecto = primer segmento del path (grupo_endpoint):
+     /productos y /productos/{id} comparten breaker porque comparten backend.
+     → Justificación: un breaker por plantilla exacta repartiría la evidencia
+     de una misma caída entre varios breakers y tardaría más en abrir. Se
+     puede pasar `clave=` para agrupar distinto (p. ej. plantilla_ruta).
+  2. Creación perezosa + LRU acotado (`max_breakers`).
+     → Justificación: las claves vienen de los paths que usa el cliente. Al
+     superar el límite se expulsa el breaker menos usado que esté OCIOSO
+     (CERRADO y sin fallos acumulados). Un breaker ABIERTO/SEMIABIERTO nunca
+     se expulsa: perderlo reabriría el tráfico a un backend caído. Si no hay
+     ninguno expulsable el límite se excede temporalmente.
+  3. Config compartida + overrides por clave, aplicados al crear el breaker.
+  4. Los callbacks on_circuit_open/close de cada breaker se reenvían a
+     `on_cambio(clave, estado)` para que el cliente avise al UI con la ruta.
+"""
+
+import logging
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from circuit_breaker import CircuitBreaker, EstadoCircuito
+
+logger = logging.getLogger(__name__)
+
+MAX_BREAKERS = 64
+
+
+def grupo_endpoint(path: str) -> str:
+    """'/productos/42?x=1' → '/productos'; '/' → '/'."""
+    path = path.split("?", 1)[0].strip("/")
+    return "/" + path.split("/", 1)[0]
+
+
+class RegistroBreakers:
+    """Breakers por clave, creados bajo demanda y con expulsión LRU de los ociosos."""
+
+    def __init__(
+        self,
+        config: Optional[dict] = None,
+        overrides: Optional[dict] = None,
+        clave: Callable[[str], str] = grupo_endpoint,
+        max_breakers: int = MAX_BREAKERS,
+        metricas=None,
+    ):
+        self._config = dict(config or {})
+        self._overrides = {k: dict(v) for k, v in (overrides or {}).items()}
+        self._clave = clave
+        self._max_breakers = max_breakers
+        self._metricas = metricas
+        self._breakers: "OrderedDict[str, CircuitBreaker]" = OrderedDict()
+        self.on_cambio: Optional[Callable[[str, EstadoCircuito], None]] = None
+        self.expulsados = 0
+
+    def clave(self, path: str) -> str:
+        return self._clave(path)
+
+    def para_ruta(self, path: str) -> CircuitBreaker:
+        return self.obtener(self._clave(path))
+
+    def obtener(self, clave: str) -> CircuitBreaker:
+        """Retorna (creándolo si hace falta) el breaker de `clave` y lo marca como usado."""
+        cb = self._breakers.get(clave)
+        if cb is not None:
+            self._breakers.move_to_end(clave)
+            return cb
+        cb = self._crear(clave)
+        self._breakers[clave] = cb
+        if len(self._breakers) > self._max_breakers:
+            self._expulsar_ocioso(excepto=clave)
+        return cb
+
+    def _crear(self, clave: str) -> CircuitBreaker:
+        config = {**self._config, **self._overrides.get(clave, {})}
+        cb = CircuitBreaker(nombre=clave, metricas=self._metricas, **config)
+        cb.on_circuit_open = lambda: self._avisar(clave, EstadoCircuito.ABIERTO)
+        cb.on_circuit_close = lambda: self._avisar(clave, EstadoCircuito.CERRADO)
+        return cb
+
+    def _avisar(self, clave: str, estado: EstadoCircuito) -> None:
+        if self.on_cambio is not None:
+            self.on_cambio(clave, estado)
+
+    def _expulsar_ocioso(self, excepto: str) -> None:
+        # OrderedDict: el primero es el menos usado recientemente
+        for clave, cb in self._breakers.items():
+            if clave != excepto and cb.estado == EstadoCircuito.CERRADO and cb.fallos_consecutivos == 0:
+                del self._breakers[clave]
+                self.expulsados += 1
+                logger.debug("Breaker '%s' expulsado (LRU ocioso)", clave)
+                return
+        logger.warning(
+            "RegistroBreakers: %d breakers y ninguno ocioso; se excede max_breakers=%d",
+            len(self._breakers), self._max_breakers
+        )
+
+    def estado_agregado(self) -> dict:
+        por_clave = {clave: cb.estado for clave, cb in self._breakers.items()}
+        return {
+            "total": len(por_clave),
+            "abiertos": [c for c, e in por_clave.items() if e == EstadoCircuito.ABIERTO],
+            "semiabiertos": [c for c, e in por_clave.items() if e == EstadoCircuito.SEMIABIERTO],
+            "por_clave": {c: e.name for c, e in por_clave.items()},
+        }
+
+    def peor_estado(self) -> EstadoCircuito:
+        """ABIERTO si alguno lo está, si no SEMIABIERTO si alguno lo está, si no CERRADO."""
+        estados = {cb.estado for cb in self._breakers.values()}
+        for estado in (EstadoCircuito.ABIERTO, EstadoCircuito.SEMIABIERTO):
+            if estado in estados:
+                return estado
+        return EstadoCircuito.CERRADO
+
+    def __contains__(self, clave: str) -> bool:
+        return clave in self._breakers
+
+    def __len__(self) -> int:
+        return len(self._breakers)
@@ -12,6 +12,11 @@ SEMANA 10 - Cambios respecto a Semana 9:
   - Contador de peticiones a /auth/token para verificar INV-B3 (refresh singleton)
   - Mantenidos todos los modos de fallo: normal, fallo_503, timeout, auth_401
   - Mantenidos todos los endpoints CRUD de productos
+  - SSE envía `retry: 3000` al conectar (los clientes reconectan con
+    backoff con jitter sobre esa base, sin tormenta tras un reinicio)
+  - Modo shard (--shard NOMBRE): varias instancias en distintos puertos,
+    cada una con su propio historial SSE; los eventos llevan "shard" en data.
+    POST /admin/emitir publica un evento SSE arbitrario (pruebas multi-shard)
 """
 
 import time
@@ -96,10 +101,20 @@ eventos_sse_historial = []
 eventos_sse_lock = threading.Lock()
 ultimo_evento_sse_id = int(time.time() * 1000)
 MAX_EVENTOS_SSE = 100
+RETRY_SSE_MS = 3000  # `retry:` enviado al conectar: base del backoff de reconexion
+shard_nombre = None  # --shard: instancia de un backend particionado
+
+
+def configurar_shard(nombre):
+    """Marca esta instancia como shard `nombre` (cliente_sse_shards.py)."""
+    global shard_nombre
+    shard_nombre = nombre
 
 
 def _crear_evento_sse(tipo_evento, datos, guardar=True):
     global ultimo_evento_sse_id
+    if shard_nombre is not None and isinstance(datos, dict):
+        datos = {**datos, 'shard': shard_nombre}
     with eventos_sse_lock:
         ultimo_evento_sse_id = max(ultimo_evento_sse_id + 1, int(time.time() * 1000))
         evento = {
@@ -290,6 +305,20 @@ def reset_contador():
         auth_token_requests = 0
     return jsonify({"mensaje": "Contadores reseteados", "peticiones_recibidas": 0, "auth_token_requests": 0}), 200
 
+
+@app.route('/admin/emitir', methods=['POST'])
+def emitir_evento():
+    """Publica un evento SSE sin pasar por el CRUD: {"tipo": ..., "datos": {...}}."""
+    datos = request.get_json(silent=True) or {}
+    tipo = datos.get('tipo')
+    if not tipo:
+        return jsonify({"error": "Falta 'tipo'"}), 400
+    evento = _crear_evento_sse(tipo, datos.get('datos', {}))
+    for q in clientes_sse:
+        q.put(evento)
+    log_request('POST', f'/admin/emitir ({tipo})', 200)
+    return jsonify({"id": evento['id'], "shard": shard_nombre}), 200
+
 # ============================================================
 # SSE ENDPOINT (con auth y Last-Event-ID)
 # ============================================================
@@ -312,6 +341,7 @@ def sse_alertas():
 
     def generar_eventos():
         try:
+            yield f"retry: {RETRY_SSE_MS}\n\n"
             if last_event_id:
                 for evento in _eventos_sse_desde(last_event_id):
                     yield _formatear_sse(evento)
@@ -568,6 +598,7 @@ if __name__ == '__main__':
     print("  POST   /admin/modo               - Cambiar modo servidor")
     print("  GET    /admin/modo               - Consultar modo servidor")
     print("  POST   /admin/reset              - Resetear contadores")
+    print("  POST   /admin/emitir             - Publicar evento SSE (pruebas)")
     print("-" * 60)
     print("Modos de fallo:")
     print("  normal     -> Responde 200 OK")
@@ -580,4 +611,28 @@ if __name__ == '__main__':
     print("  Default user: op1 (rol: viewer), admin (rol: admin)")
     print("Presiona Ctrl+C para detener el servidor\n")
 
-    app.run(host='localhost', port=3000, debug=True)
+    import argparse
+    parser = argparse.ArgumentParser(description="EcoMarket Mock Server")
+    parser.add_argument("--puerto", type=int, default=3000)
+    parser.add_argument("--http2", action="store_true",
+                        help="Servir HTTP/2 en claro (h2c) con hypercorn")
+    parser.add_argument("--shard", metavar="NOMBRE",
+                        help="Correr como shard NOMBRE (una instancia por puerto)")
+    args = parser.parse_args()
+    if args.shard:
+        configurar_shard(args.shard)
+        print(f"Shard '{args.shard}' en puerto {args.puerto}")
+
+    if args.http2:
+        # Werkzeug solo habla HTTP/1.1: hypercorn envuelve la app WSGI y
+        # acepta h2 con prior knowledge (lo que usa transporte_http2.py).
+        import asyncio
+        from hypercorn.asyncio import serve
+        from hypercorn.config import Config
+
+        config = Config()
+        config.bind = [f"localhost:{args.puerto}"]
+        print(f"Modo HTTP/2 (h2c) en puerto {args.puerto}")
+        asyncio.run(serve(app, config, mode="wsgi"))
+    else:
+        app.run(host='localhost', port=args.puerto, debug=True)
@@ -0,0 +1,225 @@
+"""
+test_almacen_productos.py — Vista materializada de productos alimentada por SSE
+===============================================================================
+
+Ejecutar: python -m pytest test_almacen_productos.py -q
+"""
+
+import json
+
+import pytest
+
+from almacen_productos import AlmacenProductos
+from circuit_breaker import CircuitOpenError
+from cliente_robusto import ClienteRobusto
+from cliente_sse_multiplex import ClienteSSEMultiplex
+from metricas import RegistroMetricas
+from test_parser_sse import _Contenido, _RespuestaSSE, _SesionSSE, _TokenManagerFijo
+
+BOLSA = {"id": 1, "nombre": "Bolsa Reutilizable", "precio": 3.5, "categoria": "accesorios", "stock": 40}
+CEPILLO = {"id": 2, "nombre": "Cepillo de Bambu", "precio": 2.0, "categoria": "higiene", "stock": 12}
+
+
+def _evento(id_, tipo, datos) -> bytes:
+    return f"id: {id_}\nevent: {tipo}\ndata: {json.dumps(datos)}\n\n".encode()
+
+
+def test_eventos_por_producto_versionados_idempotentes_y_lapidas():
+    registro = RegistroMetricas()
+    almacen = AlmacenProductos(umbral_stock_bajo=5, metricas=registro)
+    almacen.cargar([BOLSA, CEPILLO], version=100)
+
+    # Eventos de dos productos intercalados: el dict plano los mezclaba
+    assert almacen.aplicar("precio-actualizado", {"producto": "Bolsa Reutilizable", "precio": 4.0}, "101")
+    assert almacen.aplicar("stock-critico", {"producto": "Cepillo de Bambu", "stock": 3}, "102")
+    assert almacen.obtener(1)["precio"] == 4.0 and almacen.obtener(1)["stock"] == 40
+    assert almacen.obtener("Cepillo de Bambu") == {**CEPILLO, "stock": 3}
+    assert [p["id"] for p in almacen.stock_bajo()] == [2]
+
+    # Reenvío (Last-Event-ID) y evento atrasado: no cambian nada
+    assert not almacen.aplicar("precio-actualizado", {"producto": "Bolsa Reutilizable", "precio": 4.0}, "101")
+    assert not almacen.aplicar("precio-actualizado", {"producto_id": 1, "precio_nuevo": 9.9}, "100")
+    assert almacen.obtener(1)["precio"] == 4.0 and almacen.version(1) == 101
+
+    # Borrado: un update viejo no lo resucita; un alta más nueva sí
+    assert almacen.aplicar("producto-eliminado", {"id": 2, "producto": "Cepillo de Bambu"}, "103")
+    assert not almacen.aplicar("stock-critico", {"producto_id": 2, "stock_actual": 1}, "102")
+    assert 2 not in almacen and almacen.stock_bajo() == [] and almacen.por_categoria("higiene") == []
+    assert almacen.aplicar("nuevo-producto", {**CEPILLO, "precio": 2.5}, "104")
+    assert almacen.obtener(2)["precio"] == 2.5
+
+    # Solo el nombre antes que el registro completo: se fusiona bajo el id
+    assert almacen.aplicar("precio-actualizado", {"producto": "Jabon Solido", "precio": 5.0}, "110")
+    almacen.cargar([{"id": 3, "nombre": "Jabon Solido", "precio": 4.0, "categoria": "higiene"}], version=105)
+    assert almacen.obtener(3)["precio"] == 5.0 and "Jabon Solido" not in almacen._entradas
+    assert sorted(p["id"] for p in almacen.por_categoria("higiene")) == [2, 3]
+
+    assert not almacen.aplicar("sistema", {"mensaje": "hola"}, "111")
+    eventos = registro.obtener("ecomarket_almacen_eventos_total")
+    assert eventos.valor("obsoleto") == 3 and eventos.valor("ignorado") == 1
+    assert registro.obtener("ecomarket_almacen_productos").valor() == 3
+
+
+@pytest.mark.asyncio
+async def test_cliente_sse_materializa_sin_handlers_y_tolera_reenvio():
+    almacen = AlmacenProductos(metricas=RegistroMetricas())
+    cliente = ClienteSSEMultiplex("http://localhost:3000", _TokenManagerFijo(),
+                                  metricas=RegistroMetricas(), materializador=almacen)
+    stream = b"".join([
+        _evento(1, "nuevo-producto", BOLSA),
+        _evento(2, "nuevo-producto", CEPILLO),
+        _evento(3, "precio-actualizado", {"producto": "Bolsa Reutilizable", "precio": 4.25}),
+        _evento(4, "stock-critico", {"producto": "Cepillo de Bambu", "stock": 2}),
+        _evento(5, "sistema", {"mensaje": "ignorado"}),
+    ])
+    # El servidor reenvía todo tras reconectar (at-least-once)
+    for tamano in (7, 64):
+        sesion = _SesionSSE(_RespuestaSSE(_Contenido(stream, tamano=tamano)))
+
+        async def _get_session():
+            return sesion
+
+        cliente._get_session = _get_session
+        await cliente._conectar_sse()
+
+    assert len(almacen) == 2
+    assert almacen.obtener(1) == {**BOLSA, "precio": 4.25}
+    assert [p["nombre"] for p in almacen.stock_bajo()] == ["Cepillo de Bambu"]
+    assert almacen.version(2) == 4
+
+    vistos = []
+    cliente.suscribir("precio-actualizado", vistos.append)
+    cliente.desuscribir("precio-actualizado", vistos.append)
+    assert b"precio-actualizado" in cliente._tipos_interes  # el almacen lo sigue queriendo
+    await cliente.close()
+
+
+class _TokenManagerRobusto(_TokenManagerFijo):
+    access_token = None  # sin expiracion: ClienteRobusto no intenta refresh
+
+
+class _RespuestaProducto:
+    status = 200
+
+    def __init__(self, cuerpo):
+        self._cuerpo = cuerpo
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+    async def json(self):
+        return self._cuerpo
+
+
+class _SesionProductos:
+    closed = False
+
+    def __init__(self):
+        self.urls = []
+
+    def request(self, method, url, headers=None, **kwargs):
+        self.urls.append(url)
+        return _RespuestaProducto([BOLSA, CEPILLO] if url.endswith("/productos") else BOLSA)
+
+
+@pytest.mark.asyncio
+async def test_cliente_robusto_lee_del_almacen_si_esta_fresco_o_el_circuito_abierto():
+    almacen = AlmacenProductos(metricas=RegistroMetricas())
+    registro = RegistroMetricas()
+    cliente = ClienteRobusto(token_manager=_TokenManagerRobusto(), almacen=almacen,
+                             frescura_almacen=60.0, metricas=registro, max_retries=0)
+    sesion = _SesionProductos()
+    cliente._session = sesion
+
+    assert await cliente.get("/productos") == [BOLSA, CEPILLO]  # carga el almacen
+    cliente.actualizar_cache_sse({"producto": "Bolsa Reutilizable", "precio": 3.0},
+                                 tipo="precio-actualizado", evento_id=int(1e15))
+    assert (await cliente.get("/productos/1"))["precio"] == 3.0  # sin red
+    assert len(sesion.urls) == 1
+    assert registro.obtener("ecomarket_http_peticiones_total").valor("GET", "/productos/{id}", "almacen") == 1
+
+    cliente.circuit_breaker._abrir("prueba")
+    en_fallback = await cliente.get("/productos", params={"categoria": "higiene"})
+    assert en_fallback == {"__fallback__": True, "__origen__": "almacen",
+                           "completo": True, "productos": [CEPILLO]}
+    assert len(sesion.urls) == 1
+    assert cliente.obtener_fallback("/productos/2") == {"__fallback__": True, "__origen__": "almacen", **CEPILLO}
+    assert cliente.obtener_fallback("/perfil") is None
+    with pytest.raises(CircuitOpenError):
+        await cliente.get("/perfil")  # sin copia local: sigue fallando rápido
+
+
+def test_listado_completo_borra_lo_que_ya_no_existe_y_marca_el_almacen():
+    almacen = AlmacenProductos(metricas=RegistroMetricas())
+    jabon = {"id": 3, "nombre": "Jabon Solido", "precio": 4.0, "categoria": "higiene"}
+    almacen.aplicar("nuevo-producto", BOLSA, "100")
+    almacen.aplicar("nuevo-producto", CEPILLO, "101")
+    assert not almacen.completo  # solo eventos SSE: puede faltar cualquier producto
+
+    # Una respuesta por categoria no dice nada de los demas productos
+    almacen.cargar([CEPILLO], version=200)
+    assert 1 in almacen and not almacen.completo
+
+    # El listado entero no trae la bolsa (borrada con el SSE caido); el jabon
+    # llego por un evento posterior al inicio de la peticion y se conserva
+    almacen.aplicar("nuevo-producto", jabon, "300")
+    almacen.cargar([CEPILLO], version=250, completo=True)
+    assert almacen.completo
+    assert 1 not in almacen and 2 in almacen and 3 in almacen
+    assert not almacen.aplicar("stock-critico", {"producto_id": 1, "stock_actual": 2}, "240")
+
+
+@pytest.mark.asyncio
+async def test_fallback_de_un_almacen_solo_sse_no_se_presenta_como_listado_completo():
+    almacen = AlmacenProductos(metricas=RegistroMetricas())
+    almacen.aplicar("nuevo-producto", CEPILLO, "101")
+    cliente = ClienteRobusto(token_manager=_TokenManagerRobusto(), almacen=almacen,
+                             metricas=RegistroMetricas(), max_retries=0)
+    cliente._session = _SesionProductos()
+    cliente.circuit_breaker._abrir("prueba")
+
+    listado = await cliente.get("/productos")
+    assert listado["__fallback__"] and listado["completo"] is False
+    assert listado["productos"] == [CEPILLO]
+
+
+class _SesionEscrituras(_SesionProductos):
+    """PATCH devuelve el producto actualizado; DELETE, cuerpo vacio (204 del mock)."""
+
+    def __init__(self):
+        super().__init__()
+        self.productos = {1: dict(BOLSA), 2: dict(CEPILLO)}
+
+    def request(self, method, url, headers=None, json=None, **kwargs):
+        self.urls.append(url)
+        producto_id = int(url.rsplit("/", 1)[1])
+        if method == "PATCH":
+            self.productos[producto_id].update(json)
+        elif method == "DELETE":
+            del self.productos[producto_id]
+            return _RespuestaProducto(None)
+        return _RespuestaProducto(dict(self.productos[producto_id]))
+
+
+@pytest.mark.asyncio
+async def test_el_cliente_lee_sus_propias_escrituras_del_almacen():
+    almacen = AlmacenProductos(metricas=RegistroMetricas())
+    cliente = ClienteRobusto(token_manager=_TokenManagerRobusto(), almacen=almacen,
+                             frescura_almacen=60.0, metricas=RegistroMetricas(), max_retries=0)
+    sesion = _SesionEscrituras()
+    cliente._session = sesion
+
+    assert (await cliente.get("/productos/1"))["stock"] == 40  # carga el almacen
+    await cliente.patch("/productos/1", json={"stock": 50})
+    assert (await cliente.get("/productos/1"))["stock"] == 50
+    assert len(sesion.urls) == 2  # el GET siguio sin red, pero con el dato nuevo
+
+    await cliente.get("/productos/2")
+    await cliente.delete("/productos/2")
+    assert 2 not in almacen
+    # Un evento SSE anterior al DELETE no lo resucita
+    assert not cliente.actualizar_cache_sse({"producto_id": 2, "stock_actual": 1},
+                                            tipo="stock-critico", evento_id=1)
@@ -0,0 +1,136 @@
+"""
+test_almacen_tokens.py — INV-B3 en todo el host con AlmacenTokens
+=================================================================
+
+Levanta servidor_mock en un hilo (werkzeug) y lanza N workers como
+procesos separados que comparten el archivo de tokens. /auth/token-count
+debe registrar UNA sola llamada por expiración.
+
+Ejecutar: python -m pytest test_almacen_tokens.py -q
+"""
+
+import json
+import os
+import socket
+import subprocess
+import sys
+import textwrap
+import threading
+import time
+import urllib.request
+
+import pytest
+
+pytest.importorskip("flask")
+pytest.importorskip("flask_cors")
+
+from werkzeug.serving import make_server
+
+import servidor_mock
+from almacen_tokens import AlmacenTokens
+from test_circuit_breaker import CountingRefreshTokenManager, _jwt_con_exp
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+WORKERS = 6
+
+
+def _puerto_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture(scope="module")
+def servidor():
+    puerto = _puerto_libre()
+    srv = make_server("127.0.0.1", puerto, servidor_mock.app, threaded=True)
+    hilo = threading.Thread(target=srv.serve_forever, daemon=True)
+    hilo.start()
+    yield f"http://127.0.0.1:{puerto}"
+    srv.shutdown()
+
+
+def _http(url: str, datos: dict = None) -> dict:
+    cuerpo = json.dumps(datos).encode() if datos is not None else None
+    req = urllib.request.Request(url, data=cuerpo, method="POST" if cuerpo is not None else "GET",
+                                 headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(req, timeout=10) as r:
+        return json.loads(r.read())
+
+
+def _lanzar_workers(base: str, ruta: str, compartido: bool) -> list:
+    codigo = textwrap.dedent(f"""
+        import asyncio
+        from almacen_tokens import AlmacenTokens
+        from token_manager import TokenManager
+
+        async def main():
+            almacen = AlmacenTokens({ruta!r}) if {compartido!r} else None
+            tm = TokenManager(base_url={base!r}, almacen=almacen)
+            if almacen is None:
+                registro = AlmacenTokens({ruta!r}).leer()
+                tm.store_tokens(registro.access_token, registro.refresh_token)
+                assert tm.is_expiring_soon()
+            print(await tm.refresh_access_token())
+            await tm.close()
+
+        asyncio.run(main())
+    """)
+    procesos = [
+        subprocess.Popen([sys.executable, "-c", codigo], cwd=DIRECTORIO,
+                         stdout=subprocess.PIPE, text=True)
+        for _ in range(WORKERS)
+    ]
+    salidas = [p.communicate(timeout=60)[0].strip() for p in procesos]
+    assert all(p.returncode == 0 for p in procesos)
+    return salidas
+
+
+def _preparar(base: str, ruta: str) -> None:
+    """Login con un token que expira en 5 s (dentro del margen de 60 s)."""
+    datos = _http(f"{base}/auth/login", {"username": "op1", "rol": "viewer", "exp_seconds": 5})
+    AlmacenTokens(ruta).publicar(datos["access_token"], datos["refresh_token"])
+    _http(f"{base}/auth/token-count/reset", {})
+
+
+def test_sin_almacen_cada_worker_refresca(servidor, tmp_path):
+    ruta = str(tmp_path / "tokens.json")
+    _preparar(servidor, ruta)
+    _lanzar_workers(servidor, ruta, compartido=False)
+    assert _http(f"{servidor}/auth/token-count")["auth_token_requests"] == WORKERS
+
+
+def test_inv_b3_en_todo_el_host(servidor, tmp_path):
+    ruta = str(tmp_path / "tokens.json")
+    _preparar(servidor, ruta)
+
+    tokens = _lanzar_workers(servidor, ruta, compartido=True)
+
+    assert _http(f"{servidor}/auth/token-count")["auth_token_requests"] == 1
+    assert len(set(tokens)) == 1
+    assert AlmacenTokens(ruta).leer().access_token == tokens[0]
+
+
+@pytest.mark.asyncio
+async def test_lease_de_worker_caido_vence_y_otro_refresca(tmp_path):
+    ruta = str(tmp_path / "tokens.json")
+    viejo = _jwt_con_exp(int(time.time()) + 5)
+    almacen = AlmacenTokens(ruta, duracion_lease=1.0)
+    almacen.publicar(viejo, "mock_refresh")
+    # Un worker toma el lease y muere sin publicar ni liberar
+    subprocess.run([sys.executable, "-c", textwrap.dedent(f"""
+        from almacen_tokens import AlmacenTokens
+        assert AlmacenTokens({ruta!r}, duracion_lease=1.0).tomar_lease({viejo!r})[0]
+    """)], cwd=DIRECTORIO, check=True, timeout=30)
+
+    tm = CountingRefreshTokenManager()
+    tm._almacen = almacen
+    tm.store_tokens(viejo, "mock_refresh")
+    inicio = time.monotonic()
+    nuevo = await tm.refresh_access_token()
+
+    assert time.monotonic() - inicio >= 0.5  # esperó a que venciera el lease
+    assert tm.refresh_calls == 1
+    assert almacen.leer().access_token == nuevo
+    assert almacen.leer().lease_pid == 0
+    tm.logout()
@@ -0,0 +1,64 @@
+"""
+test_camino_rapido.py — Camino rápido en CERRADO y clasificación memoizada
+==========================================================================
+
+Ejecutar: python -m pytest test_camino_rapido.py -q
+"""
+
+import asyncio
+
+import aiohttp
+import pytest
+from multidict import CIMultiDict, CIMultiDictProxy
+from yarl import URL
+
+import circuit_breaker
+from circuit_breaker import CircuitBreaker, CircuitOpenError, EstadoCircuito
+from test_circuit_breaker import _coro_exito, _coro_fallo_503
+
+pytestmark = pytest.mark.asyncio
+
+
+def _error_http(status, url="http://localhost:3000/api/productos"):
+    info = aiohttp.RequestInfo(URL(url), "GET", CIMultiDictProxy(CIMultiDict()), URL(url))
+    return aiohttp.ClientResponseError(info, (), status=status, message="x")
+
+
+async def test_clasificacion_por_tipo_se_memoiza():
+    cb = CircuitBreaker(nombre="clasif")
+    circuit_breaker._CLASIFICACION_POR_TIPO.clear()
+
+    assert cb._es_fallo_servidor(asyncio.TimeoutError())
+    assert cb._es_fallo_servidor(ConnectionResetError())
+    assert not cb._es_fallo_servidor(CircuitOpenError(1.0))
+    assert cb._es_fallo_servidor(_error_http(503))
+    assert not cb._es_fallo_servidor(_error_http(404))
+    assert cb._es_fallo_servidor(RuntimeError("503 Service Unavailable"))
+    assert not cb._es_fallo_servidor(ValueError("json inválido"))
+
+    tabla = circuit_breaker._CLASIFICACION_POR_TIPO
+    assert tabla[asyncio.TimeoutError] == circuit_breaker._FALLO
+    assert tabla[CircuitOpenError] == circuit_breaker._NO_FALLO
+    assert tabla[aiohttp.ClientResponseError] == circuit_breaker._INSPECCIONAR
+
+
+async def test_status_http_decide_sin_mirar_el_mensaje():
+    # La URL contiene "500" pero el status es 404: no es fallo del servidor
+    cb = CircuitBreaker(nombre="status")
+    assert not cb._es_fallo_servidor(_error_http(404, "http://localhost:3000/api/productos/500"))
+
+
+async def test_camino_rapido_mantiene_contador_y_apertura():
+    cb = CircuitBreaker(umbral_fallos=2, nombre="rapido")
+    with pytest.raises(Exception):
+        await cb.ejecutar(_coro_fallo_503)
+    assert cb.fallos_consecutivos == 1
+    assert await cb.ejecutar(_coro_exito) == "ok"
+    assert cb.fallos_consecutivos == 0
+
+    for _ in range(2):
+        with pytest.raises(Exception):
+            await cb.ejecutar(_coro_fallo_503)
+    assert cb.estado == EstadoCircuito.ABIERTO
+    with pytest.raises(CircuitOpenError):
+        await cb.ejecutar(_coro_exito)
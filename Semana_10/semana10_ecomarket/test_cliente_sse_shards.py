@@ -0,0 +1,182 @@
+"""
+test_cliente_sse_shards.py — Un cliente SSE para varios shards
+==============================================================
+
+Levanta varias instancias de servidor_mock.py (--shard), cada una en su
+propio proceso y puerto, con historial SSE independiente.
+
+Ejecutar: python -m pytest test_cliente_sse_shards.py -q
+"""
+
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+import pytest
+
+pytest.importorskip("flask")
+pytest.importorskip("flask_cors")
+
+from cliente_sse_shards import ClienteSSEShards
+from metricas import RegistroMetricas
+from token_manager import TokenManager
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+SHARDS = ("norte", "centro", "sur")
+
+
+def _puerto_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _lanzar_shard(nombre: str):
+    puerto = _puerto_libre()
+    codigo = (
+        "import servidor_mock as s; from werkzeug.serving import make_server; "
+        f"s.configurar_shard({nombre!r}); "
+        f"make_server('127.0.0.1', {puerto}, s.app, threaded=True).serve_forever()"
+    )
+    proceso = subprocess.Popen([sys.executable, "-c", codigo], cwd=DIRECTORIO,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{puerto}"
+    limite = time.monotonic() + 30
+    while True:
+        try:
+            urllib.request.urlopen(f"{url}/admin/modo", timeout=1).close()
+            return proceso, url
+        except OSError:
+            if time.monotonic() > limite:
+                proceso.kill()
+                raise
+            time.sleep(0.1)
+
+
+def _emitir(url: str, tipo: str, datos: dict) -> str:
+    peticion = urllib.request.Request(
+        f"{url}/admin/emitir", data=json.dumps({"tipo": tipo, "datos": datos}).encode(),
+        headers={"Content-Type": "application/json"}, method="POST",
+    )
+    with urllib.request.urlopen(peticion, timeout=5) as resp:
+        return json.loads(resp.read())["id"]
+
+
+async def _esperar(condicion, timeout=10.0):
+    limite = time.monotonic() + timeout
+    while not condicion():
+        assert time.monotonic() < limite, "timeout esperando condicion"
+        await asyncio.sleep(0.01)
+
+
+@pytest.fixture
+def shards():
+    lanzados = {nombre: _lanzar_shard(nombre) for nombre in SHARDS}
+    yield lanzados
+    for proceso, _ in lanzados.values():
+        proceso.kill()
+        proceso.wait()
+
+
+@pytest.mark.asyncio
+async def test_tres_shards_un_stream_ordenado_y_caida_independiente(shards):
+    urls = {nombre: url for nombre, (_, url) in shards.items()}
+    registro = RegistroMetricas()
+    tm = TokenManager(base_url=urls["norte"], refresh_programado=False)
+    await tm.login(username="op1")  # un token para todos: mismo secreto JWT
+    cliente = ClienteSSEShards(urls, tm, ordenado=True, ventana_orden=0.2, metricas=registro)
+    sistema, precios = [], []
+    cliente.suscribir("sistema", sistema.append)
+    cliente.suscribir("precio-actualizado", precios.append)
+    tarea = asyncio.create_task(cliente.conectar())
+    try:
+        await _esperar(lambda: len(sistema) == 3)
+        assert cliente.estado == "CONECTADO"
+
+        ids = {}
+        for i in range(12):
+            shard = SHARDS[i % 3]
+            ids[shard] = await asyncio.to_thread(_emitir, urls[shard], "precio-actualizado", {"seq": i})
+        await _esperar(lambda: len(precios) == 12)
+
+        assert [p["seq"] for p in precios] == list(range(12))  # mezcla por timestamp
+        assert [p["shard"] for p in precios[:3]] == list(SHARDS)
+        assert cliente.ultimos_ids == ids  # Last-Event-ID propio de cada shard
+        por_shard = registro.obtener("ecomarket_sse_shard_eventos_total")
+        assert [por_shard.valor(s) for s in SHARDS] == [5, 5, 5]  # sistema + 4 precios
+        assert 'ecomarket_sse_shard_lag_segundos_count{shard="sur"} 5' in registro.exportar_prometheus()
+
+        # Cae un shard: los demás siguen; la ventana acota la espera por él
+        proceso, _ = shards["centro"]
+        proceso.kill()
+        proceso.wait()
+        await _esperar(lambda: cliente.estados["centro"] == "RECONECTANDO")
+        assert cliente.estado == "DEGRADADO"
+        inicio = time.monotonic()
+        await asyncio.to_thread(_emitir, urls["sur"], "precio-actualizado", {"seq": 12})
+        await _esperar(lambda: len(precios) == 13)
+        assert time.monotonic() - inicio < 2
+        assert cliente.ultimos_ids["centro"] == ids["centro"]
+    finally:
+        cliente.detener()
+        tarea.cancel()
+        await asyncio.gather(tarea, return_exceptions=True)
+        await cliente.close()
+        await tm.close()
+
+
+@pytest.mark.asyncio
+async def test_heap_marca_de_agua_y_ventana():
+    cliente = ClienteSSEShards({"a": "http://a", "b": "http://b"}, None, ordenado=True,
+                               ventana_orden=0.05, metricas=RegistroMetricas())
+    salida = []
+    cliente.suscribir("precio-actualizado", lambda d: salida.append(d["ts"]))
+
+    def llega(shard, ts):
+        cliente._recibir(shard, "precio-actualizado", json.dumps({"ts": ts}).encode(), str(ts))
+
+    llega("a", 1000)
+    llega("a", 1003)
+    assert salida == []  # b aún no envió nada: podría traer algo anterior
+    llega("b", 1001)
+    assert salida == [1000, 1001]  # marca de agua = min(1003, 1001)
+    cliente._recibir("b", "devolucion", None, "1004")  # sin suscriptor: igual avanza la marca
+    assert salida == [1000, 1001, 1003]
+    llega("a", 1006)
+    assert salida == [1000, 1001, 1003]
+    await asyncio.sleep(0.1)  # b callado: 1006 sale al vencer la ventana
+    assert salida == [1000, 1001, 1003, 1006]
+
+
+@pytest.mark.asyncio
+async def test_ventana_se_mide_desde_el_evento_pendiente_mas_antiguo():
+    cliente = ClienteSSEShards({"a": "http://a", "b": "http://b", "c": "http://c"}, None,
+                               ordenado=True, ventana_orden=0.2, metricas=RegistroMetricas())
+    salida = []
+    cliente.suscribir("precio-actualizado", lambda d: salida.append(d["ts"]))
+
+    def llega(shard, ts):
+        cliente._recibir(shard, "precio-actualizado", json.dumps({"ts": ts}).encode(), str(ts))
+
+    llega("a", 2000)
+    await asyncio.sleep(0.12)
+    llega("b", 1000)  # nueva cabeza del heap, pero 2000 ya lleva 0.12 s esperando
+    assert salida == []
+    await asyncio.sleep(0.12)  # 2000 venció (0.24 s); 1000 aún no (0.12 s)
+    assert salida == [1000, 2000]  # sale 2000 y, para no romper el orden, 1000 antes
+    assert not cliente._llegadas and not cliente._liberadas
+
+
+def test_sin_orden_despacha_al_llegar():
+    cliente = ClienteSSEShards(["http://a", "http://b"], None, metricas=RegistroMetricas())
+    salida = []
+    cliente.suscribir("stock-critico", lambda d: salida.append(d["ts"]))
+    for shard, ts in (("http://b", 5), ("http://a", 3), ("http://b", 4)):
+        cliente._recibir(shard, "stock-critico", json.dumps({"ts": ts}).encode(), str(ts))
+    assert salida == [5, 3, 4]
+    assert set(cliente.estados) == {"http://a", "http://b"}
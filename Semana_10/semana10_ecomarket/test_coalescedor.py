@@ -0,0 +1,89 @@
+"""
+test_coalescedor.py — Último valor por producto para handlers de UI
+===================================================================
+
+Ejecutar: python -m pytest test_coalescedor.py -q
+"""
+
+import asyncio
+import json
+import time
+
+import pytest
+
+from cliente_sse_multiplex import ClienteSSEMultiplex
+from coalescedor import Coalescedor
+from metricas import RegistroMetricas
+from test_parser_sse import _Contenido, _RespuestaSSE, _SesionSSE, _TokenManagerFijo
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_tormenta_de_precios_un_repintado_y_auditoria_completa():
+    registro = RegistroMetricas()
+    stream = b"".join(
+        f"id: {i}\nevent: precio-actualizado\n"
+        f"data: {json.dumps({'producto_id': i % 50, 'precio_nuevo': i})}\n\n".encode()
+        for i in range(5000)
+    )
+    cliente = ClienteSSEMultiplex("http://localhost:3000", _TokenManagerFijo(), metricas=registro)
+    sesion = _SesionSSE(_RespuestaSSE(_Contenido(stream, 64 * 1024)))
+
+    async def _get_session():
+        return sesion
+
+    cliente._get_session = _get_session
+    repintados, auditoria = [], []
+    cliente.suscribir("precio-actualizado", Coalescedor(repintados.append, fps=20, metricas=registro))
+    cliente.suscribir("precio-actualizado", auditoria.append)
+
+    await cliente._conectar_sse()
+    await asyncio.sleep(0.1)
+
+    assert len(auditoria) == 5000  # la auditoría no pasa por el coalescedor
+    assert len(repintados) == 1
+    lote = repintados[0]
+    assert [d["producto_id"] for d in lote] == list(range(50))  # orden de primera llegada
+    assert [d["precio_nuevo"] for d in lote] == list(range(4950, 5000))  # último valor
+    eventos = registro.obtener("ecomarket_sse_coalescencia_total")
+    assert eventos.valor("append", "reemplazado") == 4950
+    assert eventos.valor("append", "entregado") == 50
+
+
+async def test_max_lote_y_ritmo_de_fotogramas():
+    lotes = []
+    coalescedor = Coalescedor(lambda lote: lotes.append((time.monotonic(), lote)),
+                              fps=10, max_lote=4, metricas=RegistroMetricas())
+    for producto in (1, 2, 1, 3, 4):  # al llegar la 4ª clave distinta se entrega sin esperar
+        coalescedor({"producto_id": producto, "v": producto})
+    assert [len(l) for _, l in lotes] == [4]
+
+    inicio = time.monotonic()
+    coalescedor({"producto_id": 9})
+    coalescedor({"v": "sin clave"})
+    coalescedor({"v": "sin clave"})  # sin producto_id: no se coalescen
+    await asyncio.sleep(0.05)
+    assert len(lotes) == 1  # aún no pasó el fotograma (100 ms)
+    await asyncio.sleep(0.1)
+    assert len(lotes) == 2 and lotes[1][0] - inicio >= 0.09
+    assert [d.get("producto_id") for d in lotes[1][1]] == [9, None, None]
+
+
+async def test_fn_async_lenta_sigue_coalesciendo_y_cerrar_entrega_lo_pendiente():
+    lotes = []
+
+    async def repintar(lote):
+        await asyncio.sleep(0.1)
+        lotes.append([d["v"] for d in lote])
+
+    coalescedor = Coalescedor(repintar, fps=100, metricas=RegistroMetricas())
+    coalescedor({"producto_id": 1, "v": 1})
+    await asyncio.sleep(0.02)  # primer lote en curso (tarda 100 ms)
+    for v in range(2, 30):
+        coalescedor({"producto_id": 1, "v": v})
+        await asyncio.sleep(0.002)
+
+    await coalescedor.cerrar()
+
+    assert lotes == [[1], [29]]  # un solo repintado con el último valor, no 28
+    assert coalescedor.pendientes == 0
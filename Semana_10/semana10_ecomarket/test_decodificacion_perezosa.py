@@ -0,0 +1,89 @@
+"""
+test_decodificacion_perezosa.py — Payload SSE decodificado solo si alguien lo quiere
+====================================================================================
+
+Ejecutar: python -m pytest test_decodificacion_perezosa.py -q
+"""
+
+import json
+
+import pytest
+
+import cliente_sse_multiplex
+from cliente_sse_multiplex import ClienteSSEMultiplex
+from metricas import RegistroMetricas
+from parser_sse import ParserSSE
+from test_parser_sse import _Contenido, _RespuestaSSE, _SesionSSE, _TokenManagerFijo
+
+pytestmark = pytest.mark.asyncio
+
+TIPOS = ("precio-actualizado", "stock-critico", "pedido-nuevo",
+         "pedido-enviado", "devolucion", "sistema")
+STREAM = b"".join(
+    f"id: {i}\nevent: {TIPOS[i % len(TIPOS)]}\ndata: {json.dumps({'producto_id': i})}\n\n".encode()
+    for i in range(60)
+)
+
+
+def _cliente(monkeypatch, **kwargs):
+    registro = RegistroMetricas()
+    cliente = ClienteSSEMultiplex("http://localhost:3000", _TokenManagerFijo(),
+                                  metricas=registro, **kwargs)
+    sesion = _SesionSSE(_RespuestaSSE(_Contenido(STREAM, 512)))
+
+    async def _get_session():
+        return sesion
+
+    cliente._get_session = _get_session
+    decodificados = []
+    loads = json.loads
+    monkeypatch.setattr(cliente_sse_multiplex.json, "loads",
+                        lambda s, *a, **k: (decodificados.append(s), loads(s, *a, **k))[1])
+    return cliente, registro, decodificados
+
+
+async def test_parser_no_copia_payload_de_tipos_sin_suscriptor():
+    parser = ParserSSE(tipos={b"stock-critico"}, crudo=True)
+    eventos = parser.alimentar(STREAM[:STREAM.index(b"id: 6\n")])
+
+    assert [(tipo, datos) for tipo, datos, _ in eventos] == [
+        ("precio-actualizado", None), ("stock-critico", b'{"producto_id": 1}'),
+        ("pedido-nuevo", None), ("pedido-enviado", None), ("devolucion", None), ("sistema", None),
+    ]
+    assert parser.ultimo_id == "5"  # Last-Event-ID avanza también con los descartados
+
+
+async def test_json_una_vez_por_evento_compartido_y_solo_para_suscritos(monkeypatch):
+    cliente, registro, decodificados = _cliente(monkeypatch)
+    vistos_a, vistos_b, stock = [], [], []
+    cliente.suscribir("precio-actualizado", vistos_a.append)
+    cliente.suscribir("precio-actualizado", vistos_b.append)
+    cliente.suscribir("stock-critico", stock.append)
+
+    await cliente._conectar_sse()
+
+    assert len(decodificados) == 20  # 10 precio + 10 stock; los otros 4 tipos nunca
+    assert len(vistos_a) == len(stock) == 10
+    assert all(a is b for a, b in zip(vistos_a, vistos_b))  # mismo objeto para ambos handlers
+    exportado = registro.exportar_prometheus()
+    assert 'ecomarket_sse_eventos_total{evento="devolucion"} 10' in exportado
+    assert cliente.ultimo_id == "59"
+
+
+async def test_handler_crudo_y_callback_filtrado(monkeypatch):
+    cache = []
+    cliente, _, decodificados = _cliente(
+        monkeypatch, on_event_callback=cache.append, tipos_callback=("stock-critico",),
+    )
+    crudos = []
+    cliente.suscribir("pedido-nuevo", crudos.append, crudo=True)
+
+    await cliente._conectar_sse()
+
+    assert crudos[:2] == [b'{"producto_id": 2}', b'{"producto_id": 8}']
+    assert len(cache) == 10 and all(d["producto_id"] % 6 == 1 for d in cache)
+    assert len(decodificados) == 10  # solo stock-critico (callback); pedido-nuevo va en bytes
+
+    cliente.desuscribir("pedido-nuevo", crudos.append)
+    assert b"pedido-nuevo" not in cliente._tipos_parser()
+    assert b"stock-critico" in cliente._tipos_parser()
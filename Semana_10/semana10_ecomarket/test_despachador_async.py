@@ -0,0 +1,123 @@
+"""
+test_despachador_async.py — Despacho SSE con colas acotadas por tipo
+====================================================================
+
+Ejecutar: python -m pytest test_despachador_async.py -q
+"""
+
+import asyncio
+import json
+
+import pytest
+
+from cliente_sse_multiplex import ClienteSSEMultiplex
+from despachador_async import DespachadorAsync
+from metricas import RegistroMetricas
+from test_parser_sse import _Contenido, _RespuestaSSE, _SesionSSE, _TokenManagerFijo
+
+pytestmark = pytest.mark.asyncio
+
+
+def _evento(tipo: str, datos: dict, i: int) -> bytes:
+    return f"id: {i}\nevent: {tipo}\ndata: {json.dumps(datos)}\n\n".encode()
+
+
+def _cliente(stream: bytes, tamano: int, despacho) -> ClienteSSEMultiplex:
+    cliente = ClienteSSEMultiplex("http://localhost:3000", _TokenManagerFijo(),
+                                  metricas=RegistroMetricas(), despacho=despacho)
+    sesion = _SesionSSE(_RespuestaSSE(_Contenido(stream, tamano)))
+
+    async def _get_session():
+        return sesion
+
+    cliente._get_session = _get_session
+    return cliente
+
+
+async def test_bloquear_aplica_backpressure_sin_perder_eventos():
+    despacho = DespachadorAsync(capacidad=5, metricas=RegistroMetricas())
+    un_evento = len(_evento("stock-critico", {"producto_id": 0}, 0))
+    stream = b"".join(_evento("stock-critico", {"producto_id": i}, i) for i in range(50))
+    cliente = _cliente(stream, un_evento, despacho)
+    recibidos, profundidades = [], []
+
+    async def auditoria(datos):
+        profundidades.append(despacho.profundidad("stock-critico"))
+        await asyncio.sleep(0.001)
+        recibidos.append(datos["producto_id"])
+
+    cliente.suscribir("stock-critico", auditoria)
+    await cliente._conectar_sse()
+    await despacho.vaciar()
+
+    assert recibidos == list(range(50))
+    assert max(profundidades) <= 5  # el lector esperó en lugar de acumular
+    await cliente.close()
+
+
+async def test_descartar_antiguo_y_ultimo_por_clave():
+    registro = RegistroMetricas()
+    entregados = []
+    despacho = DespachadorAsync(
+        lambda tipo, datos: entregados.append((tipo, datos["producto_id"], datos["precio"])),
+        capacidad=3,
+        politica="descartar_antiguo",
+        politicas={"precio-actualizado": "ultimo_por_clave"},
+        metricas=registro,
+    )
+    # Ráfaga encolada sin ceder el loop: los workers aún no corrieron
+    for i in range(10):
+        despacho.ofrecer("stock-critico", {"producto_id": i, "precio": 0})
+    for precio, producto in enumerate([1, 2, 1, 1, 3, 2, 4]):
+        despacho.ofrecer("precio-actualizado", {"producto_id": producto, "precio": precio})
+    await despacho.vaciar()
+
+    assert [p for t, p, _ in entregados if t == "stock-critico"] == [7, 8, 9]
+    # 1 y 2 se reemplazaron por su último precio; al llegar 4 no cabía y salió 1
+    assert [(p, v) for t, p, v in entregados if t == "precio-actualizado"] == [(2, 5), (3, 4), (4, 6)]
+    descartes = registro.obtener("ecomarket_sse_descartes_total")
+    assert descartes.valor("stock-critico", "desborde") == 7
+    assert descartes.valor("precio-actualizado", "coalescido") == 3
+    assert descartes.valor("precio-actualizado", "desborde") == 1
+    await despacho.cerrar()
+
+    with pytest.raises(ValueError):
+        DespachadorAsync(politica="descartar_nuevo")
+
+
+async def test_handler_lento_no_frena_otros_tipos_ni_al_loop():
+    despacho = DespachadorAsync(capacidad=10_000, lote_ceder=64, metricas=RegistroMetricas())
+    stream = b"".join(
+        _evento("stock-critico" if i % 200 == 0 else "precio-actualizado", {"producto_id": i}, i)
+        for i in range(2000)
+    )
+    cliente = _cliente(stream, 64 * 1024, despacho)
+    precios, stock = [], []
+
+    async def ui_lenta(datos):
+        await asyncio.sleep(0.05)
+        stock.append(datos)
+
+    cliente.suscribir("stock-critico", ui_lenta)
+    cliente.suscribir("precio-actualizado", precios.append)
+
+    turnos = 0
+    parar = False
+
+    async def otra_tarea():  # p. ej. peticiones HTTP de ClienteRobusto en el mismo loop
+        nonlocal turnos
+        while not parar:
+            turnos += 1
+            await asyncio.sleep(0)
+
+    vecina = asyncio.create_task(otra_tarea())
+    await cliente._conectar_sse()
+    while len(precios) < 1990:
+        await asyncio.sleep(0.001)
+    parar = True
+    await vecina
+
+    assert len(stock) < 10  # los precios no esperaron a la UI lenta de stock
+    assert turnos >= 2000 // 64  # la ráfaga cedió el loop cada lote_ceder eventos
+    await cliente.close()
+    assert len(stock) == 10  # cerrar() entrega lo pendiente
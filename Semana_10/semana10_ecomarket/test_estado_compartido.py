@@ -0,0 +1,141 @@
+"""
+test_estado_compartido.py — CircuitBreaker compartido entre procesos (mmap)
+===========================================================================
+
+Ejecutar: python -m pytest test_estado_compartido.py -q
+"""
+
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import textwrap
+import threading
+
+import pytest
+
+from circuit_breaker import CircuitBreaker, CircuitOpenError, EstadoCircuito
+from estado_compartido import EstadoCompartido
+from test_circuit_breaker import _coro_exito, _coro_fallo_503
+
+pytestmark = pytest.mark.asyncio
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+
+
+def _en_otro_proceso(codigo: str) -> None:
+    subprocess.run(
+        [sys.executable, "-c", textwrap.dedent(codigo)], cwd=DIRECTORIO, check=True, timeout=30,
+    )
+
+
+async def test_fallos_se_suman_entre_breakers_del_mismo_nombre(tmp_path):
+    ruta = str(tmp_path / "breakers.mmap")
+    aperturas = []
+    cb1 = CircuitBreaker(umbral_fallos=3, nombre="api", estado_compartido=EstadoCompartido(ruta))
+    cb2 = CircuitBreaker(umbral_fallos=3, nombre="api", estado_compartido=EstadoCompartido(ruta))
+    otro = CircuitBreaker(umbral_fallos=3, nombre="otro", estado_compartido=EstadoCompartido(ruta))
+    cb1.on_circuit_open = lambda: aperturas.append("cb1")
+
+    for cb in (cb1, cb2, cb2):
+        with pytest.raises(Exception):
+            await cb.ejecutar(_coro_fallo_503)
+
+    assert cb2.estado == EstadoCircuito.ABIERTO
+    assert cb1.estado == EstadoCircuito.ABIERTO
+    assert aperturas == ["cb1"]
+    assert otro.estado == EstadoCircuito.CERRADO
+
+
+async def test_worker_reiniciado_hereda_circuito_abierto(tmp_path):
+    ruta = str(tmp_path / "breakers.mmap")
+    _en_otro_proceso(f"""
+        import asyncio
+        from circuit_breaker import CircuitBreaker
+        from estado_compartido import EstadoCompartido
+        from test_circuit_breaker import _coro_fallo_503
+
+        async def main():
+            cb = CircuitBreaker(umbral_fallos=2, timeout_apertura=30.0, nombre="api",
+                                estado_compartido=EstadoCompartido({ruta!r}))
+            for _ in range(2):
+                try:
+                    await cb.ejecutar(_coro_fallo_503)
+                except Exception:
+                    pass
+            assert cb.estado.name == "ABIERTO"
+
+        asyncio.run(main())
+    """)
+
+    llamadas = []
+
+    async def _no_deberia_llamarse():
+        llamadas.append(True)
+
+    cb = CircuitBreaker(umbral_fallos=2, timeout_apertura=30.0, nombre="api",
+                        estado_compartido=EstadoCompartido(ruta))
+    assert cb.estado == EstadoCircuito.ABIERTO
+    with pytest.raises(CircuitOpenError):
+        await cb.ejecutar(_no_deberia_llamarse)
+    assert llamadas == []
+
+
+async def test_una_sola_sonda_por_host(tmp_path):
+    ruta = str(tmp_path / "breakers.mmap")
+    cb = CircuitBreaker(umbral_fallos=1, timeout_apertura=0.2, nombre="api",
+                        estado_compartido=EstadoCompartido(ruta))
+    with pytest.raises(Exception):
+        await cb.ejecutar(_coro_fallo_503)
+    await asyncio.sleep(0.21)
+
+    # Otro proceso gana el compare-and-set ABIERTO → SEMIABIERTO
+    _en_otro_proceso(f"""
+        import time
+        from estado_compartido import EstadoCompartido
+        assert EstadoCompartido({ruta!r}).tomar_sonda("api", time.monotonic()) is not None
+    """)
+
+    assert cb.estado == EstadoCircuito.SEMIABIERTO
+    with pytest.raises(CircuitOpenError):
+        await cb.ejecutar(_coro_exito)
+
+    # La sonda ajena no se resolvió en timeout_apertura: este proceso la toma
+    await asyncio.sleep(0.21)
+    assert await cb.ejecutar(_coro_exito) == "ok"
+    assert cb.estado == EstadoCircuito.CERRADO
+    registro = EstadoCompartido(ruta).leer("api")
+    assert (registro.estado, registro.fallos) == (EstadoCircuito.CERRADO.value, 0)
+
+
+@pytest.mark.skipif(not hasattr(signal, "SIGKILL"), reason="requiere SIGKILL (POSIX)")
+async def test_escritor_muerto_a_mitad_no_bloquea_a_los_lectores(tmp_path):
+    ruta = str(tmp_path / "breakers.mmap")
+    EstadoCompartido(ruta).escribir("api", EstadoCircuito.ABIERTO.value, 5, 1.0, 30.0)
+
+    # Un worker toma el lock, deja la versión impar y muere (SIGKILL) antes de terminar
+    proceso = subprocess.run([sys.executable, "-c", textwrap.dedent(f"""
+        import os, signal
+        from estado_compartido import _OFFSET_VERSION, _VERSION, EstadoCompartido
+        compartido = EstadoCompartido({ruta!r})
+        with compartido._bloqueo():
+            offset = compartido._offset("api", crear=False)
+            version = _VERSION.unpack_from(compartido._mm, offset + _OFFSET_VERSION)[0]
+            _VERSION.pack_into(compartido._mm, offset + _OFFSET_VERSION, version + 1)
+            os.kill(os.getpid(), signal.SIGKILL)
+    """)], cwd=DIRECTORIO, timeout=30)
+    assert proceso.returncode != 0
+
+    lector = EstadoCompartido(ruta)
+    resultado = []
+    hilo = threading.Thread(target=lambda: resultado.append(lector.leer("api")), daemon=True)
+    hilo.start()
+    hilo.join(timeout=5)
+    assert resultado, "el lector quedó girando sobre la versión impar"
+
+    registro = resultado[0]
+    assert registro.version % 2 == 0
+    assert (registro.estado, registro.fallos) == (EstadoCircuito.CERRADO.value, 0)
+    # Los escritores (que leen bajo el lock) también siguen funcionando
+    assert EstadoCompartido(ruta).sumar_fallo("api").fallos == 1
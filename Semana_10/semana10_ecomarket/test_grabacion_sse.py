@@ -0,0 +1,152 @@
+"""
+test_grabacion_sse.py — Grabación de /api/alertas y reproducción con mmap
+=========================================================================
+
+Ejecutar: python -m pytest test_grabacion_sse.py -q
+"""
+
+import asyncio
+import json
+import socket
+import threading
+import time
+
+import pytest
+
+from cliente_sse_multiplex import ClienteSSEMultiplex, EventRouter
+from grabacion_sse import GrabadorSSE, ReproductorSSE, grabar
+from metricas import RegistroMetricas
+from test_parser_sse import _TokenManagerFijo
+
+STREAM = b"".join(
+    f"id: {i}\nevent: {'stock-critico' if i % 4 == 0 else 'precio-actualizado'}\n"
+    f"data: {json.dumps({'producto_id': i % 7, 'precio_nuevo': i})}\n\n".encode()
+    for i in range(200)
+)
+
+
+def _grabar_local(ruta, datos, tamano, pausa=0.0):
+    with GrabadorSSE(ruta) as grabador:
+        for i in range(0, len(datos), tamano):
+            grabador.escribir(datos[i:i + tamano])
+            if pausa:
+                time.sleep(pausa)
+
+
+def test_formato_bloques_identicos_y_registro_truncado(tmp_path):
+    ruta = tmp_path / "alertas.ecosse"
+    _grabar_local(ruta, STREAM, 333)  # fronteras que parten eventos
+    with open(ruta, "ab") as f:
+        f.write(b"\x00" * 7)  # registro a medio escribir (grabación cortada)
+
+    with ReproductorSSE(ruta) as reproductor:
+        bloques = list(reproductor.bloques())
+        assert abs(reproductor.inicio_epoch - time.time()) < 60
+
+    assert b"".join(b for _, b in bloques) == STREAM
+    assert len(bloques[0][1]) == 333
+    instantes = [t for t, _ in bloques]
+    assert instantes == sorted(instantes)
+
+    (tmp_path / "otro.sse").write_bytes(b"id: 1\ndata: {}\n\n")
+    with pytest.raises(ValueError):
+        ReproductorSSE(tmp_path / "otro.sse")
+
+
+@pytest.mark.asyncio
+async def test_reproducir_en_cliente_maxima_velocidad_y_tiempo_real(tmp_path):
+    ruta = tmp_path / "alertas.ecosse"
+    _grabar_local(ruta, STREAM, len(STREAM) // 4 + 1, pausa=0.1)  # 4 bloques en ~0.3 s
+    cliente = ClienteSSEMultiplex("http://grabacion", _TokenManagerFijo(), metricas=RegistroMetricas())
+    precios, stock = [], []
+
+    async def ui_stock(datos):
+        await asyncio.sleep(0.001)
+        stock.append(datos)
+
+    cliente.suscribir("precio-actualizado", precios.append)
+    cliente.suscribir("stock-critico", ui_stock)
+
+    with ReproductorSSE(ruta) as reproductor:
+        rapido = await reproductor.reproducir(cliente)
+        assert len(precios) == 150 and len(stock) == 50
+        assert rapido.eventos == 200 and rapido.bytes == len(STREAM)
+        assert rapido.segundos < 0.25  # no respeta las pausas grabadas
+
+        tiempo_real = await reproductor.reproducir(cliente, velocidad=1.0)
+        assert tiempo_real.segundos >= 0.29
+        doble = await reproductor.reproducir(cliente, velocidad=2.0)
+        assert 0.14 <= doble.segundos < tiempo_real.segundos
+
+    resumen = rapido.resumen()
+    assert resumen["precio-actualizado:list.append"]["llamadas"] == 150
+    async_ms = resumen["stock-critico:test_reproducir_en_cliente_maxima_velocidad_y_tiempo_real.<locals>.ui_stock"]
+    assert async_ms["llamadas"] == 50 and async_ms["p50"] >= 1.0  # medido hasta terminar el await
+    assert cliente._router.handlers["precio-actualizado"] == [precios.append]  # restaurado
+    assert cliente.ultimo_id == "199"
+    await cliente.close()
+
+
+@pytest.mark.asyncio
+async def test_reproducir_en_event_router_y_router_opaco(tmp_path):
+    ruta = tmp_path / "alertas.ecosse"
+    _grabar_local(ruta, STREAM, 4096)
+
+    router = EventRouter()  # handlers de Semana 7: reciben el data como str
+    vistos = []
+    router.registrar("stock-critico", lambda datos: vistos.append(json.loads(datos)["producto_id"]))
+
+    class RouterOpaco:  # solo despachar(): se mide por tipo de evento
+        def __init__(self):
+            self.eventos = []
+
+        def despachar(self, tipo, datos):
+            self.eventos.append((tipo, datos["precio_nuevo"]))
+
+    opaco = RouterOpaco()
+    with ReproductorSSE(ruta) as reproductor:
+        en_router = await reproductor.reproducir(router, decodificar=False)
+        en_opaco = await reproductor.reproducir(opaco)
+
+    assert vistos == [i % 7 for i in range(0, 200, 4)]
+    assert [len(m) for m in en_router.latencias.values()] == [50]
+    assert opaco.eventos[:2] == [("stock-critico", 0), ("precio-actualizado", 1)]
+    assert set(en_opaco.resumen()) == {"stock-critico:despachar", "precio-actualizado:despachar"}
+
+
+@pytest.mark.asyncio
+async def test_grabar_del_mock_y_reproducir(tmp_path):
+    pytest.importorskip("flask")
+    pytest.importorskip("flask_cors")
+    from werkzeug.serving import make_server
+
+    import servidor_mock
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        puerto = s.getsockname()[1]
+    srv = make_server("127.0.0.1", puerto, servidor_mock.app, threaded=True)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    tm = _TokenManagerFijo()
+    token = servidor_mock.create_jwt({"sub": "op1", "rol": "viewer", "exp": time.time() + 600})
+    tm.get_auth_header = lambda: {"Authorization": f"Bearer {token}"}
+    ruta = tmp_path / "mock.ecosse"
+    try:
+        conectados = len(servidor_mock.clientes_sse)
+        tarea = asyncio.create_task(grabar(f"http://127.0.0.1:{puerto}", tm, ruta, segundos=1.0))
+        while len(servidor_mock.clientes_sse) == conectados and not tarea.done():
+            await asyncio.sleep(0.01)
+        for precio in range(5):
+            servidor_mock.notificar_clientes("precio-actualizado", {"producto_id": 1, "precio_nuevo": precio})
+        grabador = await tarea
+    finally:
+        srv.shutdown()
+
+    assert grabador.bytes > 0
+    cliente = ClienteSSEMultiplex("http://grabacion", _TokenManagerFijo(), metricas=RegistroMetricas())
+    precios = []
+    cliente.suscribir("precio-actualizado", lambda d: precios.append(d["precio_nuevo"]))
+    with ReproductorSSE(ruta) as reproductor:
+        resultado = await reproductor.reproducir(cliente)
+    assert precios == [0, 1, 2, 3, 4]
+    assert resultado.eventos == 6  # + el evento "sistema" de bienvenida
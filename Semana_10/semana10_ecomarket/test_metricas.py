@@ -0,0 +1,154 @@
+"""
+test_metricas.py — Pruebas del registro de métricas y la instrumentación
+========================================================================
+
+Ejecutar: python -m pytest test_metricas.py -q
+"""
+
+import asyncio
+import time
+import urllib.request
+
+import pytest
+
+from circuit_breaker import CircuitBreaker, EstadoCircuito
+from cliente_robusto import ClienteRobusto, plantilla_ruta
+from cliente_sse_multiplex import ClienteSSEMultiplex
+from metricas import RegistroMetricas, _Metrica
+from token_manager import TokenManager
+from test_circuit_breaker import (
+    CountingRefreshTokenManager,
+    FakeExpiringTokenManager,
+    FakeSession,
+    _coro_exito,
+    _coro_fallo_503,
+    _jwt_con_exp,
+)
+
+pytestmark = pytest.mark.asyncio
+
+
+class _CountingRefreshConRegistro(CountingRefreshTokenManager):
+    def __init__(self, registro):
+        TokenManager.__init__(self, base_url="http://localhost:3000", metricas=registro)
+        self.refresh_calls = 0
+
+
+async def test_histograma_exporta_buckets_acumulados():
+    registro = RegistroMetricas()
+    h = registro.histograma("lat_segundos", "latencia", ("ruta",), buckets=(0.1, 1.0))
+    serie = h.etiquetar(ruta="/x")
+    for v in (0.05, 0.1, 0.5, 3.0):
+        serie.observar(v)
+
+    texto = registro.exportar_prometheus()
+
+    assert "# TYPE lat_segundos histogram" in texto
+    assert 'lat_segundos_bucket{ruta="/x",le="0.1"} 2' in texto
+    assert 'lat_segundos_bucket{ruta="/x",le="1"} 3' in texto
+    assert 'lat_segundos_bucket{ruta="/x",le="+Inf"} 4' in texto
+    assert 'lat_segundos_count{ruta="/x"} 4' in texto
+
+
+async def test_registro_reutiliza_familia_y_rechaza_conflictos():
+    registro = RegistroMetricas()
+    c1 = registro.contador("x_total", "x", ("a",))
+    assert registro.contador("x_total", "x", ("a",)) is c1
+    with pytest.raises(ValueError):
+        registro.gauge("x_total", "x", ("a",))
+
+
+async def test_familia_sin_nueva_serie_falla_al_instanciar():
+    class _SinSerie(_Metrica):
+        tipo = "counter"
+
+    with pytest.raises(TypeError):
+        _SinSerie("y_total", "y")
+
+
+async def test_histograma_valor_falla_con_un_error_claro():
+    registro = RegistroMetricas()
+    histograma = registro.histograma("h_segundos", "h", ("ruta",), buckets=(0.1,))
+    histograma.etiquetar("/x").observar(0.05)
+    with pytest.raises(TypeError, match="histograma"):
+        histograma.valor("/x")
+    serie = histograma.etiquetar("/x")
+    assert (serie.total, serie.suma) == (1, 0.05)
+
+
+async def test_breaker_contabiliza_tiempo_por_estado():
+    registro = RegistroMetricas()
+    cb = CircuitBreaker(umbral_fallos=1, timeout_apertura=0.05, nombre="t", metricas=registro)
+
+    with pytest.raises(Exception):
+        await cb.ejecutar(_coro_fallo_503)
+    await asyncio.sleep(0.06)
+    assert cb.estado == EstadoCircuito.SEMIABIERTO
+    await cb.ejecutar(_coro_exito)
+
+    segundos = registro.obtener("ecomarket_circuit_breaker_estado_segundos_total")
+    transiciones = registro.obtener("ecomarket_circuit_breaker_transiciones_total")
+    estado = registro.obtener("ecomarket_circuit_breaker_estado")
+    assert segundos.valor("t", "ABIERTO") >= 0.05
+    assert transiciones.valor("t", "CERRADO", "ABIERTO") == 1
+    assert transiciones.valor("t", "SEMIABIERTO", "CERRADO") == 1
+    assert estado.valor("t", "CERRADO") == 1
+    assert estado.valor("t", "ABIERTO") == 0
+
+
+async def test_cliente_robusto_mide_por_plantilla_de_ruta():
+    registro = RegistroMetricas()
+    eventos = []
+    cliente = ClienteRobusto(
+        token_manager=FakeExpiringTokenManager(eventos),
+        max_retries=0,
+        metricas=registro,
+    )
+    cliente._session = FakeSession(eventos)
+
+    await cliente.get("/productos/1")
+    await cliente.get("/productos/2?detalle=1")
+
+    assert plantilla_ruta("/productos/2?detalle=1") == "/productos/{id}"
+    latencia = registro.obtener("ecomarket_http_peticion_segundos")
+    assert latencia.etiquetar("GET", "/productos/{id}").total == 2
+    peticiones = registro.obtener("ecomarket_http_peticiones_total")
+    assert peticiones.valor("GET", "/productos/{id}", "ok") == 2
+
+
+async def test_token_manager_cuenta_refresh_real():
+    registro = RegistroMetricas()
+    tm = _CountingRefreshConRegistro(registro)
+    tm.store_tokens(_jwt_con_exp(int(time.time()) - 10), "mock_refresh")
+
+    await asyncio.gather(*(tm.refresh_access_token() for _ in range(5)))
+
+    assert registro.obtener("ecomarket_token_refresh_total").valor("ok") == 1
+    assert registro.obtener("ecomarket_token_refresh_segundos").etiquetar().total == 1
+    await tm.close()
+
+
+async def test_sse_lag_desde_id_timestamp():
+    registro = RegistroMetricas()
+    cliente = ClienteSSEMultiplex("http://localhost:3000", token_manager=None, metricas=registro)
+    emitido_ms = int(time.time() * 1000) - 200
+
+    cliente._procesar_evento({"id": str(emitido_ms), "event": "stock-critico", "data": "{}"})
+
+    lag = registro.obtener("ecomarket_sse_lag_segundos").etiquetar("stock-critico")
+    assert lag.total == 1
+    assert lag.suma >= 0.2
+    assert registro.obtener("ecomarket_sse_eventos_total").valor("stock-critico") == 1
+
+
+async def test_endpoint_http_sirve_metricas():
+    registro = RegistroMetricas()
+    registro.contador("demo_total", "demo").inc(3)
+    servidor = registro.servir_http(puerto=0)
+    try:
+        url = f"http://127.0.0.1:{servidor.server_address[1]}/metrics"
+        cuerpo = await asyncio.to_thread(lambda: urllib.request.urlopen(url).read().decode())
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
+    assert "demo_total 3" in cuerpo
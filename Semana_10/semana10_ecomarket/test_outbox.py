@@ -0,0 +1,200 @@
+"""
+test_outbox.py — Pruebas del outbox durable de escrituras
+=========================================================
+
+Ejecutar: python -m pytest test_outbox.py -q
+"""
+
+import asyncio
+
+import aiohttp
+import pytest
+from multidict import CIMultiDict, CIMultiDictProxy
+from yarl import URL
+
+from circuit_breaker import EstadoCircuito
+from cliente_robusto import ClienteRobusto
+from metricas import RegistroMetricas
+from outbox import Outbox
+from test_circuit_breaker import FakeExpiringTokenManager, FakeResponse
+
+pytestmark = pytest.mark.asyncio
+
+
+class _RespuestaConStatus(FakeResponse):
+    def __init__(self, status, url):
+        self.status = status
+        self.request_info = aiohttp.RequestInfo(URL(url), "GET", CIMultiDictProxy(CIMultiDict()), URL(url))
+
+
+class _SesionGrabadora:
+    """Registra (metodo, url, json) y responde con el status configurado."""
+    closed = False
+
+    def __init__(self):
+        self.enviadas = []
+        self.status = 200
+        self.status_por_url = {}
+
+    def request(self, method, url, headers=None, **kwargs):
+        self.enviadas.append((method, url.split("/api", 1)[-1], kwargs.get("json")))
+        return _RespuestaConStatus(self.status_por_url.get(url, self.status), url)
+
+    async def close(self):
+        self.closed = True
+
+
+def _cliente(outbox, sesion):
+    cliente = ClienteRobusto(
+        token_manager=FakeExpiringTokenManager([]),
+        umbral_fallos=1,
+        timeout_apertura=0.05,
+        max_retries=0,
+        metricas=RegistroMetricas(),
+        outbox=outbox,
+    )
+    cliente._session = sesion
+    return cliente
+
+
+async def test_outbox_sobrevive_reinicio_y_descarta_linea_truncada(tmp_path):
+    ruta = tmp_path / "outbox.log"
+    outbox = Outbox(str(ruta), metricas=RegistroMetricas())
+    a = await outbox.encolar("POST", "/productos", json={"nombre": "Bolsa"})
+    b = await outbox.encolar("DELETE", "/productos/2")
+    await outbox.confirmar(a.seq)
+    await outbox.cerrar()
+    with open(ruta, "a", encoding="utf-8") as f:
+        f.write('{"op":"encolar","seq":9,"met')  # crash a mitad de línea
+
+    recuperado = Outbox(str(ruta), metricas=RegistroMetricas())
+    nueva = await recuperado.encolar("PUT", "/productos/3", json={"stock": 1})
+    await recuperado.cerrar()
+
+    assert [e.seq for e in recuperado.pendientes()] == [b.seq, nueva.seq]
+    assert nueva.seq > b.seq
+    # Compactado al abrir: solo quedan las pendientes
+    assert ruta.read_text(encoding="utf-8").count("\n") == 2
+
+
+async def test_linea_truncada_sin_acks_no_se_traga_la_siguiente_escritura(tmp_path):
+    ruta = tmp_path / "outbox.log"
+    outbox = Outbox(str(ruta), metricas=RegistroMetricas())
+    a = await outbox.encolar("PATCH", "/a", json={"stock": 1})
+    await outbox.cerrar()
+    with open(ruta, "a", encoding="utf-8") as f:
+        f.write('{"op":"encolar","seq":2,"met')  # crash a mitad de línea, sin acks
+
+    segundo = Outbox(str(ruta), metricas=RegistroMetricas())
+    b = await segundo.encolar("PATCH", "/b", json={"stock": 2})  # ya reportada como durable
+    await segundo.cerrar()
+
+    tercero = Outbox(str(ruta), metricas=RegistroMetricas())
+    assert [(e.seq, e.path) for e in tercero.pendientes()] == [(a.seq, "/a"), (b.seq, "/b")]
+    await tercero.cerrar()
+
+
+async def test_patch_se_colapsa_solo_contra_la_ultima_entrada_del_path(tmp_path):
+    outbox = Outbox(str(tmp_path / "outbox.log"), metricas=RegistroMetricas())
+    await outbox.encolar("PATCH", "/productos/1", json={"stock": 5, "precio": 10})
+    await outbox.encolar("PATCH", "/productos/1", json={"stock": 3})
+    await outbox.encolar("PUT", "/productos/2", json={"nombre": "x"})
+    await outbox.encolar("PATCH", "/productos/2", json={"stock": 1})
+    await outbox.cerrar()
+
+    pendientes = outbox.pendientes()
+    assert [(e.metodo, e.path) for e in pendientes] == [
+        ("PATCH", "/productos/1"), ("PUT", "/productos/2"), ("PATCH", "/productos/2"),
+    ]
+    assert pendientes[0].json == {"stock": 3, "precio": 10}
+    assert pendientes[0].colapsadas == 1
+
+    recuperado = Outbox(str(tmp_path / "outbox.log"), metricas=RegistroMetricas())
+    assert recuperado.pendientes()[0].json == {"stock": 3, "precio": 10}
+    await recuperado.cerrar()
+
+
+async def test_fsync_agrupado_en_lotes(tmp_path, monkeypatch):
+    import outbox as modulo
+    llamadas = []
+    fsync_real = modulo.os.fsync
+    monkeypatch.setattr(modulo.os, "fsync", lambda fd: (llamadas.append(fd), fsync_real(fd)))
+
+    outbox = Outbox(str(tmp_path / "outbox.log"), fsync_lote=10, fsync_espera=1.0,
+                    metricas=RegistroMetricas())
+    await asyncio.gather(*(
+        outbox.encolar("POST", "/productos", json={"n": i}) for i in range(30)
+    ))
+    await outbox.cerrar()
+
+    assert len(outbox) == 30
+    assert len(llamadas) == 3
+
+
+async def test_cliente_encola_con_circuito_abierto_y_drena_al_cerrar(tmp_path):
+    sesion = _SesionGrabadora()
+    outbox = Outbox(str(tmp_path / "outbox.log"), tasa_maxima=0, metricas=RegistroMetricas())
+    cliente = _cliente(outbox, sesion)
+
+    sesion.status = 503
+    with pytest.raises(Exception):
+        await cliente.get("/inventario")
+    assert cliente.estado_circuito == EstadoCircuito.ABIERTO
+
+    r1 = await cliente.patch("/productos/1", json={"stock": 4})
+    await cliente.patch("/productos/1", json={"precio": 9})
+    await cliente.post("/productos", json={"nombre": "Botella"})
+    assert r1["__encolado__"] is True
+    assert len(outbox) == 2
+    assert cliente.esta_degradado
+
+    await asyncio.sleep(0.06)
+    sesion.status = 200
+    sesion.enviadas.clear()
+    await cliente.get("/inventario")  # petición de prueba: SEMIABIERTO → CERRADO
+    await cliente._tarea_drenado
+
+    assert sorted(sesion.enviadas[1:]) == [
+        ("PATCH", "/productos/1", {"stock": 4, "precio": 9}),
+        ("POST", "/productos", {"nombre": "Botella"}),
+    ]
+    assert len(outbox) == 0
+    await cliente.cerrar()
+    await outbox.cerrar()
+
+
+async def test_drenado_respeta_orden_por_path_y_descarta_4xx(tmp_path):
+    sesion = _SesionGrabadora()
+    outbox = Outbox(str(tmp_path / "outbox.log"), max_concurrencia=4, tasa_maxima=0,
+                    metricas=RegistroMetricas())
+    await outbox.encolar("PUT", "/productos/1", json={"v": 1})
+    await outbox.encolar("POST", "/productos", json={"nombre": ""})
+    await outbox.encolar("DELETE", "/productos/1")
+    sesion.status_por_url["http://localhost:3000/api/productos"] = 400
+    cliente = _cliente(outbox, sesion)
+
+    resumen = await cliente.drenar_outbox()
+
+    assert resumen == {"enviadas": 2, "descartadas": 1, "pendientes": 0, "error": None}
+    orden_producto_1 = [m for m, path, _ in sesion.enviadas if path == "/productos/1"]
+    assert orden_producto_1 == ["PUT", "DELETE"]
+    await cliente.cerrar()
+    await outbox.cerrar()
+
+
+async def test_drenado_se_detiene_si_el_circuito_vuelve_a_abrir(tmp_path):
+    sesion = _SesionGrabadora()
+    outbox = Outbox(str(tmp_path / "outbox.log"), max_concurrencia=1, tasa_maxima=0,
+                    metricas=RegistroMetricas())
+    for i in range(3):
+        await outbox.encolar("PATCH", f"/productos/{i}", json={"stock": i})
+    sesion.status = 503
+    cliente = _cliente(outbox, sesion)
+
+    resumen = await cliente.drenar_outbox()
+
+    assert resumen["error"] is not None
+    assert resumen["pendientes"] == 3
+    assert len(sesion.enviadas) == 1  # el breaker (umbral 1) corta el resto
+    await cliente.cerrar()
+    await outbox.cerrar()
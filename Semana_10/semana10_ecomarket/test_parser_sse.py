@@ -0,0 +1,162 @@
+"""
+test_parser_sse.py — ParserSSE incremental sobre bytes
+======================================================
+
+Ejecutar: python -m pytest test_parser_sse.py -q
+"""
+
+import aiohttp
+import pytest
+
+from cliente_sse_multiplex import TAMANO_CHUNK, ClienteSSEMultiplex
+from metricas import RegistroMetricas
+from parser_sse import ParserSSE
+
+STREAM = (
+    b'id: 1\nevent: precio-actualizado\ndata: {"producto_id": 7, "precio_nuevo": 9.5}\n\n'
+    b": ping keep-alive\n\n"
+    b"data: linea uno\ndata:linea dos\ndata:  con espacio\n\n"
+    b"retry: 2500\nid: 2\nevent: stock-critico\ndata: {\"stock_actual\": 1}\n\n"
+    b"event: sin-datos\n\n"
+) + "data: café\n\n".encode("utf-8")
+ESPERADO = [
+    ("precio-actualizado", '{"producto_id": 7, "precio_nuevo": 9.5}', "1"),
+    ("message", "linea uno\nlinea dos\n con espacio", None),
+    ("stock-critico", '{"stock_actual": 1}', "2"),
+    ("message", "café", None),
+]
+
+
+def _parsear(stream: bytes, tamano: int) -> tuple:
+    parser = ParserSSE()
+    eventos = []
+    for i in range(0, len(stream), tamano):
+        eventos += parser.alimentar(stream[i:i + tamano])
+    eventos += parser.finalizar()
+    return eventos, parser
+
+
+@pytest.mark.parametrize("fin_linea", [b"\n", b"\r\n", b"\r"])
+def test_cualquier_particion_y_fin_de_linea_da_los_mismos_eventos(fin_linea):
+    stream = b"\xef\xbb\xbf" + STREAM.replace(b"\n", fin_linea)
+    for tamano in (1, 2, 3, 7, 64, len(stream)):
+        eventos, parser = _parsear(stream, tamano)
+        assert eventos == ESPERADO, f"bloques de {tamano} bytes"
+        assert parser.retry == 2500 and parser.ultimo_id == "2"
+
+
+def test_semantica_de_campos_y_limite_de_evento():
+    eventos, parser = _parsear(
+        b"id: a\0b\ndata: x\n\n"          # id con NUL se ignora
+        b"retry: 10s\ndata: y\n\n"        # retry no numérico se ignora
+        b"campo: raro\ndata\n\n"          # campo desconocido; 'data' sin ':' = ""
+        b"id: 9\nevent: final\ndata: z",  # sin línea en blanco: finalizar() lo entrega
+        tamano=5,
+    )
+    assert eventos == [("message", "x", None), ("message", "y", None),
+                       ("message", "", None), ("final", "z", "9")]
+    assert parser.retry is None and parser.ultimo_id == "9"
+
+    parser = ParserSSE(max_evento=100)
+    with pytest.raises(ValueError):
+        parser.alimentar(b"data: " + b"x" * 200)
+
+
+class _Contenido:
+    def __init__(self, stream: bytes, tamano: int):
+        self._bloques = [stream[i:i + tamano] for i in range(0, len(stream), tamano)]
+        self.tamanos_pedidos = []
+
+    async def _iterar(self):
+        for bloque in self._bloques:
+            yield bloque
+
+    def iter_chunked(self, n):
+        self.tamanos_pedidos.append(n)
+        return self._iterar()
+
+
+class _RespuestaSSE:
+    status = 200
+
+    def __init__(self, contenido):
+        self.content = contenido
+        self.liberada = False
+
+    def raise_for_status(self):
+        pass
+
+    def release(self):
+        self.liberada = True
+
+
+class _SesionSSE:
+    closed = False
+
+    def __init__(self, respuesta):
+        self.respuesta = respuesta
+        self.headers = None
+
+    async def get(self, url, headers=None):
+        self.headers = headers
+        return self.respuesta
+
+
+class _TokenManagerFijo:
+    def get_auth_header(self):
+        return {"Authorization": "Bearer t"}
+
+
+@pytest.mark.asyncio
+async def test_cliente_despacha_desde_bloques_y_conserva_last_event_id():
+    registro = RegistroMetricas()
+    cliente = ClienteSSEMultiplex("http://localhost:3000", _TokenManagerFijo(), metricas=registro)
+    recibidos = []
+    cliente.suscribir("precio-actualizado", recibidos.append)
+    cliente.suscribir("stock-critico", recibidos.append)
+    cliente._ultimo_id = "0"
+    respuesta = _RespuestaSSE(_Contenido(STREAM.replace(b"\n", b"\r\n"), tamano=5))
+    sesion = _SesionSSE(respuesta)
+
+    async def _get_session():
+        return sesion
+
+    cliente._get_session = _get_session
+    await cliente._conectar_sse()
+
+    assert sesion.headers["Last-Event-ID"] == "0"
+    assert recibidos == [{"producto_id": 7, "precio_nuevo": 9.5}, {"stock_actual": 1}]
+    assert cliente.ultimo_id == "2"
+    assert respuesta.content.tamanos_pedidos == [TAMANO_CHUNK]
+    assert respuesta.liberada
+    assert 'ecomarket_sse_eventos_total{evento="message"} 2' in registro.exportar_prometheus()
+
+
+class _ContenidoCortado(_Contenido):
+    """Entrega sus bloques y luego la conexión se corta."""
+
+    async def _iterar(self):
+        async for bloque in super()._iterar():
+            yield bloque
+        raise aiohttp.ClientPayloadError("conexión cortada")
+
+
+@pytest.mark.asyncio
+async def test_bloque_solo_id_mueve_el_last_event_id_aunque_se_corte_la_conexion():
+    cliente = ClienteSSEMultiplex("http://localhost:3000", _TokenManagerFijo(), metricas=RegistroMetricas())
+    recibidos = []
+    cliente.suscribir("stock-critico", recibidos.append)
+    stream = b'id: 5\nevent: stock-critico\ndata: {"stock_actual": 1}\n\nid: 6\n\n'
+    sesiones = [_SesionSSE(_RespuestaSSE(_ContenidoCortado(stream, tamano=8))),
+                _SesionSSE(_RespuestaSSE(_Contenido(b"", tamano=8)))]
+
+    async def _get_session():
+        return sesiones[0] if sesiones[0].headers is None else sesiones[1]
+
+    cliente._get_session = _get_session
+    with pytest.raises(aiohttp.ClientPayloadError):
+        await cliente._conectar_sse()
+    assert recibidos == [{"stock_actual": 1}] and cliente.ultimo_id == "6"
+
+    await cliente._conectar_sse()  # reconexión: pide desde el checkpoint del bloque solo-id
+    assert sesiones[1].headers["Last-Event-ID"] == "6"
@@ -0,0 +1,89 @@
+"""
+test_pool_tokens.py — Pool de tokens por identidad
+==================================================
+
+Ejecutar: python -m pytest test_pool_tokens.py -q
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from metricas import RegistroMetricas
+from pool_tokens import PoolTokens
+from test_circuit_breaker import _jwt_con_exp
+
+pytestmark = pytest.mark.asyncio
+
+
+def _contar_refresh(pool, identidad, registro):
+    """Sustituye el POST /auth/token de la identidad por uno local que anota el instante."""
+    tm = pool.token_manager(identidad)
+
+    async def _do_refresh():
+        registro.append((identidad, time.monotonic()))
+        await asyncio.sleep(0.02)
+        tm.store_tokens(_jwt_con_exp(int(time.time()) + 900, sub=identidad), "mock_refresh")
+        return tm.access_token
+
+    tm._do_refresh = _do_refresh
+
+
+async def test_refresh_proactivo_repartido_y_con_cupo():
+    exp = int(time.time()) + 120
+    margen = exp - time.time() - 0.4  # todas vencen entre +0.1 s y +0.4 s
+    pool = PoolTokens(margen=margen, ventana_dispersion=0.3, max_refresh_por_segundo=50,
+                      metricas=RegistroMetricas())
+    refrescos = []
+    for i in range(20):
+        pool.agregar(f"op{i}", _jwt_con_exp(exp, sub=f"op{i}"), "mock_refresh")
+        _contar_refresh(pool, f"op{i}", refrescos)
+
+    await asyncio.sleep(0.8)
+
+    assert sorted(i for i, _ in refrescos) == sorted(f"op{i}" for i in range(20))
+    instantes = sorted(t for _, t in refrescos)
+    assert instantes[-1] - instantes[0] > 0.15  # repartidos en la ventana
+    assert min(b - a for a, b in zip(instantes, instantes[1:])) >= 0.018  # ≤ 50/s
+    await pool.cerrar()
+
+
+async def test_single_flight_por_identidad_y_sesion_compartida():
+    pool = PoolTokens(metricas=RegistroMetricas())
+    vencido = _jwt_con_exp(int(time.time()) - 10)
+    refrescos = []
+    for identidad in ("op1", "admin1"):
+        pool.agregar(identidad, vencido, "mock_refresh")
+        _contar_refresh(pool, identidad, refrescos)
+
+    headers = await asyncio.gather(*(
+        pool.auth_header(identidad) for identidad in ("op1", "admin1") for _ in range(10)
+    ))
+
+    assert sorted(i for i, _ in refrescos) == ["admin1", "op1"]
+    assert len({h["Authorization"] for h in headers}) == 2
+    assert pool.token_manager("op1")._session is pool.token_manager("admin1")._session
+    await pool.cerrar()
+
+
+async def test_lru_y_expulsion_de_ociosas():
+    metricas = RegistroMetricas()
+    pool = PoolTokens(max_identidades=2, metricas=metricas)
+    lejano = _jwt_con_exp(int(time.time()) + 900)
+    pool.agregar("a", lejano, "r")
+    pool.agregar("b", lejano, "r")
+    pool.token_manager("a")  # uso reciente
+    pool.agregar("c", lejano, "r")
+    assert "b" not in pool and "a" in pool and "c" in pool
+    await pool.cerrar()
+
+    exp = int(time.time()) + 120
+    pool = PoolTokens(margen=exp - time.time() - 0.1, ventana_dispersion=0.01,
+                      tiempo_ocioso=0.0, metricas=metricas)
+    refrescos = []
+    pool.agregar("ociosa", _jwt_con_exp(exp), "r")
+    _contar_refresh(pool, "ociosa", refrescos)
+    await asyncio.sleep(0.3)
+    assert refrescos == [] and "ociosa" not in pool
+    await pool.cerrar()
@@ -0,0 +1,118 @@
+"""
+test_rampa_recuperacion.py — Recuperación gradual desde SEMIABIERTO
+==================================================================
+
+Ejecutar: python -m pytest test_rampa_recuperacion.py -q
+"""
+
+import asyncio
+
+import pytest
+
+from circuit_breaker import CircuitBreaker, CircuitOpenError, EstadoCircuito
+from test_circuit_breaker import _coro_fallo_503
+
+pytestmark = pytest.mark.asyncio
+
+
+async def _ok():
+    return "ok"
+
+
+async def _abrir(cb):
+    with pytest.raises(Exception):
+        await cb.ejecutar(_coro_fallo_503)
+    assert cb.estado == EstadoCircuito.ABIERTO
+
+
+async def _admitidas(cb, n, fn=_ok):
+    admitidas = 0
+    for _ in range(n):
+        try:
+            await cb.ejecutar(fn)
+            admitidas += 1
+        except CircuitOpenError:
+            pass
+        except Exception:
+            admitidas += 1
+    return admitidas
+
+
+async def test_rampa_admite_porcentaje_creciente_y_cierra_al_final():
+    cierres = []
+    cb = CircuitBreaker(
+        umbral_fallos=1, timeout_apertura=0.05, nombre="rampa",
+        recuperacion="rampa", etapas_rampa=(10, 50, 100), duracion_etapa=0.1,
+    )
+    cb.on_circuit_close = lambda: cierres.append(True)
+    await _abrir(cb)
+    await asyncio.sleep(0.06)
+
+    assert cb.estado == EstadoCircuito.SEMIABIERTO
+    assert cb.porcentaje_admitido == 10
+    assert await _admitidas(cb, 20) == 2
+    await asyncio.sleep(0.1)
+    assert cb.porcentaje_admitido == 50
+    assert await _admitidas(cb, 20) == 10
+    await asyncio.sleep(0.1)
+    assert await _admitidas(cb, 20) == 20
+    assert cb.estado == EstadoCircuito.SEMIABIERTO  # un éxito no cierra en rampa
+    await asyncio.sleep(0.1)
+
+    assert cb.estado == EstadoCircuito.CERRADO
+    assert cierres == [True]
+
+
+async def test_rampa_reabre_con_backoff_exponencial():
+    cb = CircuitBreaker(
+        umbral_fallos=1, timeout_apertura=0.05, nombre="backoff",
+        recuperacion="rampa", etapas_rampa=(50, 100), duracion_etapa=0.2,
+        minimo_llamadas_rampa=2, factor_backoff=2.0, timeout_apertura_max=0.15,
+    )
+    await _abrir(cb)
+
+    esperados = (0.1, 0.15)
+    espera = 0.05
+    for esperado in esperados:
+        await asyncio.sleep(espera + 0.01)
+        assert cb.estado == EstadoCircuito.SEMIABIERTO
+        # 50%: de 4 intentos pasan 2, ambos fallan → 100% ≥ 50% → ABIERTO
+        await _admitidas(cb, 4, _coro_fallo_503)
+        assert cb.estado == EstadoCircuito.ABIERTO
+        assert cb.timeout_apertura_actual == pytest.approx(esperado)
+        espera = esperado
+
+    # Una rampa completa restablece el timeout base
+    await asyncio.sleep(espera + 0.01)
+    await _admitidas(cb, 2)
+    await asyncio.sleep(0.41)
+    assert cb.estado == EstadoCircuito.CERRADO
+    assert cb.timeout_apertura_actual == 0.05
+
+
+async def test_rampa_reabre_si_falla_antes_del_minimo_de_llamadas():
+    cb = CircuitBreaker(
+        umbral_fallos=1, timeout_apertura=0.05, nombre="minimo",
+        recuperacion="rampa", etapas_rampa=(10, 100), duracion_etapa=0.05,
+        minimo_llamadas_rampa=5,
+    )
+    await _abrir(cb)
+    await asyncio.sleep(0.06)
+    assert cb.estado == EstadoCircuito.SEMIABIERTO
+
+    # 10% de 10 intentos: pasa 1 (< mínimo de 5) y falla → no sigue en la rampa
+    assert await _admitidas(cb, 10, _coro_fallo_503) == 1
+    assert cb.estado == EstadoCircuito.ABIERTO
+    await asyncio.sleep(0.04)
+    assert cb.estado == EstadoCircuito.ABIERTO  # no avanzó de etapa ni cerró
+
+
+async def test_backoff_tambien_con_sonda_unica():
+    cb = CircuitBreaker(umbral_fallos=1, timeout_apertura=0.05, nombre="sonda", factor_backoff=3.0)
+    await _abrir(cb)
+    await asyncio.sleep(0.06)
+    with pytest.raises(Exception):
+        await cb.ejecutar(_coro_fallo_503)
+    assert cb.timeout_apertura_actual == pytest.approx(0.15)
+    await asyncio.sleep(0.1)
+    assert cb.estado == EstadoCircuito.ABIERTO  # 0.1 s < 0.15 s
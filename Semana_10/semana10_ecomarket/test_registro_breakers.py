@@ -0,0 +1,82 @@
+"""
+test_registro_breakers.py — Breakers por grupo de endpoints en ClienteRobusto
+=============================================================================
+
+Ejecutar: python -m pytest test_registro_breakers.py -q
+"""
+
+import pytest
+
+from circuit_breaker import CircuitOpenError, EstadoCircuito
+from cliente_robusto import ClienteRobusto, EstadoUI
+from metricas import RegistroMetricas
+from registro_breakers import RegistroBreakers, grupo_endpoint
+from test_circuit_breaker import FakeExpiringTokenManager, _coro_fallo_503
+from test_outbox import _SesionGrabadora
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_grupo_endpoint():
+    assert grupo_endpoint("/productos/42?detalle=1") == "/productos"
+    assert grupo_endpoint("inventario") == "/inventario"
+    assert grupo_endpoint("/") == "/"
+
+
+async def test_config_compartida_con_overrides():
+    registro = RegistroBreakers(
+        config={"umbral_fallos": 5, "timeout_apertura": 30.0},
+        overrides={"/inventario": {"umbral_fallos": 2}},
+        metricas=RegistroMetricas(),
+    )
+    assert registro.obtener("/inventario").umbral_fallos == 2
+    assert registro.obtener("/productos").umbral_fallos == 5
+    assert registro.obtener("/inventario").timeout_apertura == 30.0
+
+
+async def test_lru_expulsa_solo_breakers_ociosos():
+    registro = RegistroBreakers(config={"umbral_fallos": 1}, max_breakers=2, metricas=RegistroMetricas())
+    abierto = registro.obtener("/a")
+    with pytest.raises(Exception):
+        await abierto.ejecutar(_coro_fallo_503)
+    registro.obtener("/b")
+    registro.obtener("/c")  # expulsa /b (ocioso), nunca /a (ABIERTO)
+
+    assert "/a" in registro and "/c" in registro and "/b" not in registro
+    assert registro.expulsados == 1
+    assert registro.obtener("/a") is abierto
+
+
+async def test_caida_parcial_solo_degrada_la_ruta_afectada():
+    sesion = _SesionGrabadora()
+    sesion.status_por_url["http://localhost:3000/api/inventario"] = 503
+    avisos = []
+    cliente = ClienteRobusto(
+        token_manager=FakeExpiringTokenManager([]),
+        umbral_fallos=2,
+        max_retries=0,
+        metricas=RegistroMetricas(),
+        breakers_por_ruta=True,
+    )
+    cliente._session = sesion
+    cliente.suscribir_estado(lambda estado, msg, datos: avisos.append((estado, datos)))
+
+    for _ in range(2):
+        with pytest.raises(Exception):
+            await cliente.get("/inventario")
+    with pytest.raises(CircuitOpenError):
+        await cliente.get("/inventario")
+
+    assert await cliente.get("/productos/1") == {"ok": True, "productos": 3}
+    assert await cliente.get("/perfil") == {"ok": True, "productos": 3}
+
+    assert not cliente.ruta_disponible("/inventario")
+    assert cliente.ruta_disponible("/productos/7")
+    assert cliente.estado_circuito == EstadoCircuito.ABIERTO
+    assert cliente.esta_degradado  # un exito en /productos no oculta la caida
+    agregado = cliente.estado_circuitos()
+    assert agregado["abiertos"] == ["/inventario"]
+    assert agregado["por_clave"]["/productos"] == "CERRADO"
+    assert (EstadoUI.DEGRADADO, {
+        "circuito_abierto": True, "ruta": "/inventario", "rutas_abiertas": ["/inventario"],
+    }) in avisos
@@ -0,0 +1,85 @@
+"""
+test_token_refresh_programado.py — Claims decodificados una vez y refresh con call_at
+====================================================================================
+
+Ejecutar: python -m pytest test_token_refresh_programado.py -q
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from test_circuit_breaker import CountingRefreshTokenManager, _jwt_con_exp
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_claims_se_decodifican_una_vez_por_token():
+    tm = CountingRefreshTokenManager()
+    decodificaciones = []
+    original = tm.decode_payload
+    tm.decode_payload = lambda token: (decodificaciones.append(1), original(token))[1]
+
+    tm.store_tokens(_jwt_con_exp(int(time.time()) + 900), "mock_refresh")
+    for _ in range(1000):
+        assert not tm.is_expiring_soon()
+    assert len(decodificaciones) == 1
+    assert tm.claims["sub"] == "op1"
+
+    # Reemplazo directo del token (sin store_tokens): se decodifica de nuevo
+    tm._access_token = _jwt_con_exp(int(time.time()) - 10)
+    assert tm.is_expiring_soon()
+    assert len(decodificaciones) == 2
+    tm.logout()
+
+
+async def test_refresh_programado_en_exp_menos_margen():
+    tm = CountingRefreshTokenManager()
+    exp = int(time.time()) + 120
+    tm._margen_expiracion = exp - time.time() - 0.1  # el margen vence en ~0.1 s
+    tm.store_tokens(_jwt_con_exp(exp), "mock_refresh")
+    viejo = tm.access_token
+
+    await asyncio.sleep(0.05)
+    assert tm.refresh_calls == 0
+    await asyncio.sleep(0.2)
+
+    assert tm.refresh_calls == 1
+    assert tm.access_token != viejo
+    # Las peticiones concurrentes durante un refresh en curso esperan el mismo
+    tm._margen_expiracion = 10_000
+    tokens = await asyncio.gather(*(tm.refresh_access_token() for _ in range(20)))
+    assert tm.refresh_calls == 2
+    assert len(set(tokens)) == 1
+    tm.logout()
+
+
+async def test_logout_cancela_el_refresh_programado():
+    tm = CountingRefreshTokenManager()
+    exp = int(time.time()) + 120
+    tm._margen_expiracion = exp - time.time() - 0.05
+    tm.store_tokens(_jwt_con_exp(exp), "mock_refresh")
+    tm.logout()
+    await asyncio.sleep(0.15)
+    assert tm.refresh_calls == 0
+
+
+class _RefreshColgado(CountingRefreshTokenManager):
+    async def _do_refresh(self) -> str:
+        self.refresh_calls += 1
+        await asyncio.Event().wait()  # el servidor no responde
+
+
+async def test_close_cancela_el_refresh_programado_en_vuelo():
+    tm = _RefreshColgado()
+    exp = int(time.time()) + 120
+    tm._margen_expiracion = exp - time.time() - 0.05
+    tm.store_tokens(_jwt_con_exp(exp), "mock_refresh")
+    await asyncio.sleep(0.15)
+
+    tarea = tm._tarea_programada
+    assert tm.refresh_calls == 1 and tarea is not None and not tarea.done()
+    await tm.close()
+    assert tarea.cancelled() and tm._tarea_programada is None
+    assert tm._refresh_task.cancelled()  # la cancelación llega al refresh compartido
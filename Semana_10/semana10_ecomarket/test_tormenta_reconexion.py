@@ -0,0 +1,174 @@
+"""
+test_tormenta_reconexion.py — 1000 clientes SSE virtuales y un reinicio del servidor
+===================================================================================
+
+El servidor virtual registra el instante de cada intento de conexión; tras
+un "reinicio" se mide el pico de intentos por ventana de 50 ms.
+
+Ejecutar: python -m pytest test_tormenta_reconexion.py -q
+"""
+
+import asyncio
+import time
+
+import aiohttp
+import pytest
+
+import control_reconexion
+from cliente_sse_multiplex import ClienteSSEMultiplex
+from control_reconexion import CuboReconexiones, espera_full_jitter
+from metricas import RegistroMetricas
+from test_parser_sse import _TokenManagerFijo
+
+CLIENTES = 1000
+VENTANA = 0.05
+
+
+class _ServidorVirtual:
+    """Acepta streams SSE que envían `retry:` y quedan abiertos hasta reiniciar()."""
+
+    def __init__(self, retry_ms: int):
+        self.retry_ms = retry_ms
+        self.arriba = True
+        self.intentos = []
+        self.abiertos = 0
+        self._caida = asyncio.Event()
+
+    async def get(self, url, headers):
+        self.intentos.append(time.monotonic())
+        if not self.arriba:
+            raise aiohttp.ClientConnectionError("Connection refused")
+        return _RespuestaVirtual(self, self._caida)
+
+    def reiniciar(self, caido: float) -> None:
+        self.arriba = False
+        self._caida.set()
+        self._caida = asyncio.Event()
+
+        def levantar():
+            self.arriba = True
+
+        asyncio.get_running_loop().call_later(caido, levantar)
+
+
+class _StreamVirtual:
+    def __init__(self, servidor, caida):
+        self._servidor = servidor
+        self._caida = caida
+
+    async def iter_chunked(self, n):
+        self._servidor.abiertos += 1
+        try:
+            yield f"retry: {self._servidor.retry_ms}\n\nid: 1\nevent: sistema\ndata: {{}}\n\n".encode()
+            await self._caida.wait()
+        finally:
+            self._servidor.abiertos -= 1
+        raise aiohttp.ClientPayloadError("Response payload is not completed")
+
+
+class _RespuestaVirtual:
+    status = 200
+
+    def __init__(self, servidor, caida):
+        self.content = _StreamVirtual(servidor, caida)
+
+    def raise_for_status(self):
+        pass
+
+    def release(self):
+        pass
+
+
+async def _esperar(condicion, timeout=30.0):
+    limite = time.monotonic() + timeout
+    while not condicion():
+        assert time.monotonic() < limite, "timeout esperando condicion"
+        await asyncio.sleep(0.01)
+
+
+async def _simular_reinicio(servidor) -> list:
+    """Conecta CLIENTES, reinicia el servidor y retorna los intentos tras el reinicio."""
+    registro = RegistroMetricas()
+    clientes = []
+    for _ in range(CLIENTES):
+        # espera_inicial de 10 s: si se respeta `retry:` (500 ms) la prueba lo nota
+        cliente = ClienteSSEMultiplex("http://virtual", _TokenManagerFijo(), metricas=registro,
+                                      espera_inicial=10.0, espera_maxima=1.0)
+
+        async def _get_session():
+            return servidor
+
+        cliente._get_session = _get_session
+        clientes.append(cliente)
+    tareas = [asyncio.create_task(c.conectar()) for c in clientes]
+    try:
+        await _esperar(lambda: servidor.abiertos == CLIENTES)
+        reinicio = time.monotonic()
+        servidor.reiniciar(caido=0.3)
+        await _esperar(lambda: servidor.abiertos == 0)
+        await _esperar(lambda: servidor.abiertos == CLIENTES)
+        assert all(c.estado == "CONECTADO" for c in clientes)
+        return [t - reinicio for t in servidor.intentos if t >= reinicio]
+    finally:
+        for cliente in clientes:
+            cliente.detener()
+        for tarea in tareas:
+            tarea.cancel()
+        await asyncio.gather(*tareas, return_exceptions=True)
+
+
+def _pico(instantes: list) -> int:
+    """Máximo de intentos dentro de cualquier ventana de VENTANA segundos."""
+    instantes = sorted(instantes)
+    pico, inicio = 0, 0
+    for fin, t in enumerate(instantes):
+        while t - instantes[inicio] > VENTANA:
+            inicio += 1
+        pico = max(pico, fin - inicio + 1)
+    return pico
+
+
+@pytest.mark.asyncio
+async def test_mil_clientes_reinicio_sin_pico_de_reconexion(monkeypatch):
+    # Referencia: backoff sin jitter (la espera es siempre el máximo del rango)
+    monkeypatch.setattr(control_reconexion.random, "uniform", lambda a, b: b)
+    sin_jitter = await _simular_reinicio(_ServidorVirtual(retry_ms=500))
+    monkeypatch.undo()
+
+    con_jitter = await _simular_reinicio(_ServidorVirtual(retry_ms=500))
+
+    # Sin jitter vuelven todos juntos (el pico solo se ensancha lo que tarda
+    # el loop en procesar las 1000 caídas); con jitter se reparten en `retry:`
+    assert _pico(sin_jitter) > CLIENTES // 2
+    assert _pico(con_jitter) * 4 < _pico(sin_jitter)
+    assert max(con_jitter) < 5.0  # base 500 ms del `retry:`, no espera_inicial=10 s
+
+
+@pytest.mark.asyncio
+async def test_cubo_limita_tasa_y_devuelve_token_al_cancelar():
+    cubo = CuboReconexiones(tasa=100, rafaga=10)
+    inicio = time.monotonic()
+    esperas = await asyncio.gather(*(cubo.adquirir() for _ in range(40)))
+    duracion = time.monotonic() - inicio
+
+    assert esperas[:10] == [0.0] * 10  # la ráfaga pasa sin esperar
+    assert 0.25 <= duracion < 1.0  # las otras 30 salen a 100/s
+    assert esperas == sorted(esperas)  # en orden de llegada
+
+    lento = CuboReconexiones(tasa=1, rafaga=1)
+    await lento.adquirir()
+    tarea = asyncio.create_task(lento.adquirir())  # esperaría 1 s
+    await asyncio.sleep(0)
+    tarea.cancel()
+    await asyncio.gather(tarea, return_exceptions=True)
+    assert lento.tokens == pytest.approx(0, abs=0.05)  # la reserva cancelada se devolvió
+
+    with pytest.raises(ValueError):
+        CuboReconexiones(tasa=0)
+
+
+def test_full_jitter_con_tope():
+    esperas = [espera_full_jitter(0.5, intento, tope=4.0) for intento in (0, 1, 3, 10) for _ in range(200)]
+    assert all(0 <= e < 4.0 for e in esperas)
+    assert max(esperas[:200]) <= 0.5  # cierre limpio: hasta la base
+    assert max(esperas[600:]) > 2.0  # intento 10: tope 4 s, no 0.5 * 2**9
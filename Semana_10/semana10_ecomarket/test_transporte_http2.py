@@ -0,0 +1,108 @@
+"""
+test_transporte_http2.py — ClienteRobusto sobre el transporte HTTP/2 (h2c)
+==========================================================================
+
+Levanta una app WSGI mínima con hypercorn en el mismo event loop.
+Se omite si httpx[http2] o hypercorn no están instalados.
+
+Ejecutar: python -m pytest test_transporte_http2.py -q
+"""
+
+import asyncio
+import json
+import socket
+
+import aiohttp
+import pytest
+
+pytest.importorskip("h2")
+pytest.importorskip("httpx")
+pytest.importorskip("hypercorn")
+
+from hypercorn.asyncio import serve
+from hypercorn.config import Config
+
+from cliente_robusto import ClienteRobusto
+from test_circuit_breaker import FakeExpiringTokenManager
+from transporte_http2 import TransporteHttp2
+
+pytestmark = pytest.mark.asyncio
+
+
+def _app(environ, start_response):
+    if environ["PATH_INFO"] == "/api/fallo":
+        start_response("503 Service Unavailable", [("Content-Type", "text/plain")])
+        return [b"caido"]
+    cuerpo = json.dumps({
+        "protocolo": environ["SERVER_PROTOCOL"],
+        "auth": environ.get("HTTP_AUTHORIZATION"),
+    }).encode()
+    start_response("200 OK", [("Content-Type", "application/json")])
+    return [cuerpo]
+
+
+def _puerto_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+async def servidor_h2c():
+    puerto = _puerto_libre()
+    config = Config()
+    config.bind = [f"127.0.0.1:{puerto}"]
+    config.accesslog = None
+    parar = asyncio.Event()
+    tarea = asyncio.create_task(serve(_app, config, mode="wsgi", shutdown_trigger=parar.wait))
+    # Esperar a que el socket acepte conexiones
+    for _ in range(100):
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", puerto)
+            writer.close()
+            break
+        except OSError:
+            await asyncio.sleep(0.02)
+    yield f"http://127.0.0.1:{puerto}"
+    parar.set()
+    await tarea
+
+
+async def test_transporte_multiplexa_en_http2(servidor_h2c):
+    transporte = TransporteHttp2(timeout=2.0)
+    try:
+        async def _una():
+            async with transporte.request("GET", f"{servidor_h2c}/api/x") as resp:
+                return resp.http_version, await resp.json()
+
+        resultados = await asyncio.gather(*(_una() for _ in range(20)))
+    finally:
+        await transporte.close()
+
+    assert all(version == "HTTP/2" for version, _ in resultados)
+    assert all(datos["protocolo"] == "HTTP/2" for _, datos in resultados)
+
+
+async def test_cliente_robusto_con_transporte_http2(servidor_h2c):
+    eventos = []
+    cliente = ClienteRobusto(
+        base_url=f"{servidor_h2c}/api",
+        token_manager=FakeExpiringTokenManager(eventos),
+        max_retries=0,
+        transporte="http2",
+    )
+    try:
+        datos = await cliente.get("/productos/1")
+        with pytest.raises(aiohttp.ClientResponseError) as exc:
+            await cliente.get("/fallo")
+    finally:
+        await cliente.cerrar()
+
+    assert datos == {"protocolo": "HTTP/2", "auth": "Bearer token_fresco"}
+    assert exc.value.status == 503
+    assert cliente.circuit_breaker._fallos_consecutivos == 1
+
+
+async def test_transporte_desconocido_se_rechaza():
+    with pytest.raises(ValueError):
+        ClienteRobusto(token_manager=FakeExpiringTokenManager([]), transporte="quic")
@@ -0,0 +1,81 @@
+"""
+test_trazas_http.py — Pruebas del trazado por fases (aiohttp.TraceConfig)
+=========================================================================
+
+Levanta un servidor aiohttp local en un puerto libre; no requiere
+servidor_mock.py.
+
+Ejecutar: python -m pytest test_trazas_http.py -q
+"""
+
+import pytest
+from aiohttp import web
+from aiohttp import test_utils
+
+from cliente_robusto import ClienteRobusto
+from metricas import RegistroMetricas
+from test_circuit_breaker import FakeExpiringTokenManager
+from trazas_http import TrazadorFases
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+async def servidor_local():
+    async def inventario(request):
+        return web.json_response({"productos": 3})
+
+    app = web.Application()
+    app.router.add_get("/api/inventario", inventario)
+    servidor = test_utils.TestServer(app)
+    await servidor.start_server()
+    yield servidor
+    await servidor.close()
+
+
+async def _cliente(servidor, trazador):
+    return ClienteRobusto(
+        token_manager=FakeExpiringTokenManager([]),
+        base_url=str(servidor.make_url("/api")),
+        max_retries=0,
+        metricas=RegistroMetricas(),
+        trazador=trazador,
+    )
+
+
+async def test_traza_fases_y_reuso_de_conexion(servidor_local):
+    trazador = TrazadorFases(capacidad=10)
+    cliente = await _cliente(servidor_local, trazador)
+
+    await cliente.get("/inventario")
+    await cliente.get("/inventario")
+    await cliente.cerrar()
+
+    primera, segunda = trazador.ultimas()
+    assert primera["status"] == 200
+    assert primera["reutilizada"] is False
+    assert segunda["reutilizada"] is True
+    for fase in ("envio", "ttfb", "cuerpo", "total"):
+        assert primera[fase] is not None and primera[fase] >= 0
+    assert primera["total"] >= primera["ttfb"]
+    resumen = trazador.resumen()
+    assert resumen["trazas"] == 2
+    assert resumen["tasa_reutilizacion"] == 50.0
+    assert "ttfb" in resumen["fases_ms"]
+
+
+async def test_ring_buffer_y_muestreo(servidor_local):
+    trazador = TrazadorFases(capacidad=2, tasa_muestreo=1.0)
+    cliente = await _cliente(servidor_local, trazador)
+    for _ in range(3):
+        await cliente.get("/inventario")
+    assert len(trazador.ultimas()) == 2
+
+    trazador.tasa_muestreo = 0.0
+    trazador.limpiar()
+    await cliente.get("/inventario")
+    await cliente.cerrar()
+
+    assert trazador.ultimas() == []
+    assert trazador.peticiones_vistas == 4
+    assert trazador.peticiones_muestreadas == 3
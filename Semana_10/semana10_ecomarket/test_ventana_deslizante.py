@@ -0,0 +1,119 @@
+"""
+test_ventana_deslizante.py — CircuitBreaker en modo ventana deslizante
+=====================================================================
+
+Ejecutar: python -m pytest test_ventana_deslizante.py -q
+"""
+
+import asyncio
+
+import pytest
+
+from circuit_breaker import (
+    CircuitBreaker,
+    CircuitOpenError,
+    EstadoCircuito,
+    VentanaConteo,
+    VentanaTiempo,
+)
+from test_circuit_breaker import _coro_exito, _coro_exito_lento, _coro_fallo_401, _coro_fallo_503
+
+pytestmark = pytest.mark.asyncio
+
+
+async def _patron_30_por_ciento(cb, llamadas):
+    """3 fallos de cada 10, nunca consecutivos más de 1."""
+    for i in range(llamadas):
+        fn = _coro_fallo_503 if i % 10 in (1, 4, 7) else _coro_exito
+        try:
+            await cb.ejecutar(fn)
+        except CircuitOpenError:
+            return i
+        except Exception:
+            pass
+    return None
+
+
+async def test_ventana_conteo_es_ring_buffer():
+    v = VentanaConteo(3)
+    for fallo in (True, True, False):
+        v.registrar(fallo, False)
+    assert (v.llamadas, v.total_fallos) == (3, 2)
+    v.registrar(False, True)  # expulsa el primer fallo
+    assert (v.llamadas, v.total_fallos, v.total_lentas) == (3, 1, 1)
+
+
+async def test_ventana_tiempo_caduca_buckets_viejos():
+    v = VentanaTiempo(5)
+    v.registrar(True, False, ahora=100.2)
+    v.registrar(False, False, ahora=102.7)
+    assert (v.llamadas, v.total_fallos) == (2, 1)
+    v.avanzar(105.1)  # el bucket del segundo 100 sale de la ventana
+    assert (v.llamadas, v.total_fallos) == (1, 0)
+    v.avanzar(200.0)
+    assert v.llamadas == 0
+
+
+async def test_fallos_intermitentes_solo_abren_en_modo_ventana():
+    consecutivo = CircuitBreaker(umbral_fallos=3, nombre="consecutivo")
+    assert await _patron_30_por_ciento(consecutivo, 40) is None
+    assert consecutivo.estado == EstadoCircuito.CERRADO
+
+    cb = CircuitBreaker(
+        nombre="ventana", ventana="conteo", tamano_ventana=10,
+        minimo_llamadas=10, umbral_tasa_fallos=30.0,
+    )
+    rechazada_en = await _patron_30_por_ciento(cb, 40)
+    assert rechazada_en == 10
+    assert cb.estado == EstadoCircuito.ABIERTO
+
+
+async def test_minimo_de_llamadas_y_4xx_no_cuentan():
+    cb = CircuitBreaker(nombre="minimo", ventana="conteo", tamano_ventana=20, minimo_llamadas=5)
+    for _ in range(4):
+        with pytest.raises(Exception):
+            await cb.ejecutar(_coro_fallo_503)
+    for _ in range(5):
+        with pytest.raises(Exception):
+            await cb.ejecutar(_coro_fallo_401)
+    assert cb.estado == EstadoCircuito.CERRADO
+    assert cb.tasa_fallos == 100.0
+
+    with pytest.raises(Exception):
+        await cb.ejecutar(_coro_fallo_503)
+    assert cb.estado == EstadoCircuito.ABIERTO
+
+
+async def test_llamadas_lentas_abren_el_circuito():
+    cb = CircuitBreaker(
+        nombre="lentas", ventana="tiempo", tamano_ventana=10, minimo_llamadas=4,
+        umbral_tasa_lentas=50.0, duracion_lenta=0.03,
+    )
+    await cb.ejecutar(_coro_exito)
+    await cb.ejecutar(_coro_exito)
+    await cb.ejecutar(lambda: _coro_exito_lento(0.04))
+    assert cb.estado == EstadoCircuito.CERRADO
+    await cb.ejecutar(lambda: _coro_exito_lento(0.04))  # 2/4 lentas = 50%
+    assert cb.estado == EstadoCircuito.ABIERTO
+
+
+async def test_semiabierto_en_modo_ventana():
+    cb = CircuitBreaker(
+        nombre="semi", timeout_apertura=0.05, ventana="conteo",
+        tamano_ventana=4, minimo_llamadas=2,
+    )
+    for _ in range(2):
+        with pytest.raises(Exception):
+            await cb.ejecutar(_coro_fallo_503)
+    assert cb.estado == EstadoCircuito.ABIERTO
+
+    await asyncio.sleep(0.06)
+    assert cb.estado == EstadoCircuito.SEMIABIERTO
+    with pytest.raises(Exception):
+        await cb.ejecutar(_coro_fallo_503)
+    assert cb.estado == EstadoCircuito.ABIERTO
+
+    await asyncio.sleep(0.06)
+    await cb.ejecutar(_coro_exito)
+    assert cb.estado == EstadoCircuito.CERRADO
+    assert cb.tasa_fallos == 0.0  # la ventana empieza vacía tras cerrar
@@ -6,6 +6,8 @@ import logging
 
 import aiohttp
 
+from metricas import registro_o_global
+
 logger = logging.getLogger(__name__)
 
 BASE_URL = "http://localhost:3000"
@@ -20,21 +22,69 @@ class TokenManager:
       (client-side validation only; server verifies signature).
     - is_expiring_soon() uses a configurable margin (default 60 s) to
       proactively refresh tokens before they expire.
+    - Claims are decoded once per token (at store_tokens, or lazily if
+      ``_access_token`` is replaced directly) and cached, so the
+      per-request is_expiring_soon() check is an attribute read plus
+      time.time() instead of split + base64 + json.loads.
+    - store_tokens() schedules a single refresh with loop.call_at at
+      ``exp - margin``. Requests do not poll; they only await the shared
+      refresh task while a refresh is actually in flight.
     - refresh_access_token() uses an asyncio.Lock + shared Task pattern
       to guarantee INV-B3: only one concurrent HTTP request is sent to
       /auth/token even when multiple coroutines request a refresh.
     - All methods avoid logging token values (INV-B2).
     - No circuit-breaker attributes are stored (INV-B1).
+    - ``almacen=`` (almacen_tokens.py) shares the token pair between the
+      workers of a host; a file lease makes INV-B3 hold host-wide.
+    - ``session=`` lets many managers share one aiohttp session (see
+      ``pool_tokens.py``); a shared session is never closed by close().
+    - Refresh count and latency are recorded in the metrics registry
+      (``metricas.py``) around every real call to /auth/token.
     """
 
-    def __init__(self, base_url: str = BASE_URL):
+    def __init__(
+        self,
+        base_url: str = BASE_URL,
+        metricas=None,
+        session: aiohttp.ClientSession | None = None,
+        refresh_programado: bool = True,
+        almacen=None,
+    ):
         self._base_url = base_url.rstrip("/")
         self._access_token: str | None = None
         self._refresh_token: str | None = None
-        self._session: aiohttp.ClientSession | None = None
+        # A shared session (e.g. from PoolTokens) is used but never closed here
+        self._session: aiohttp.ClientSession | None = session
+        self._session_propia = session is None
+        # False when an external scheduler (PoolTokens) spreads the refreshes
+        self._refresh_con_timer = refresh_programado
         self._refresh_lock = asyncio.Lock()
         self._refresh_task: asyncio.Task | None = None
         self._margen_expiracion = 60  # seconds before expiry to consider "expiring soon"
+        # Decode-once cache: claims of the token they were decoded from
+        self._claims_token: str | None = None
+        self._claims: dict | None = None
+        self._exp: float | None = None
+        self._timer_refresh: asyncio.TimerHandle | None = None
+        # Strong reference to the scheduled refresh (the loop only keeps a weak one)
+        self._tarea_programada: asyncio.Task | None = None
+        # Cross-process token store (almacen_tokens.py): one refresh per host
+        self._almacen = almacen
+        if self._almacen is not None:
+            registro = self._almacen.leer()
+            if registro is not None and registro.access_token:
+                self.store_tokens(registro.access_token, registro.refresh_token)
+
+        registro = registro_o_global(metricas)
+        self._m_refresh_total = registro.contador(
+            "ecomarket_token_refresh_total",
+            "Real refresh calls to /auth/token by outcome",
+            ("resultado",),
+        )
+        self._m_refresh_segundos = registro.histograma(
+            "ecomarket_token_refresh_segundos",
+            "Latency of real refresh calls to /auth/token",
+        )
 
     def decode_payload(self, token: str) -> dict:
         """
@@ -76,20 +126,39 @@ class TokenManager:
         """
         if self._access_token is None:
             return True
+        if self._access_token is not self._claims_token:
+            self._cachear_claims()
+        if self._exp is None:
+            # If decoding failed, treat the token as expiring
+            return True
 
         margen = (
             margen_segundos
             if margen_segundos is not None
             else self._margen_expiracion
         )
+        return time.time() + margen >= self._exp
 
+    def _cachear_claims(self) -> None:
+        """Decode the current access token once and keep its claims."""
+        self._claims_token = self._access_token
         try:
-            payload = self.decode_payload(self._access_token)
-            exp = payload.get("exp", 0)
-            return time.time() + margen >= exp
+            self._claims = self.decode_payload(self._access_token)
+            self._exp = self._claims.get("exp", 0)
         except Exception:
-            # If decoding fails, treat the token as expiring
-            return True
+            self._claims = None
+            self._exp = None
+
+    @property
+    def refresh_en_curso(self) -> bool:
+        return self._refresh_task is not None and not self._refresh_task.done()
+
+    @property
+    def claims(self) -> dict | None:
+        """Cached claims of the current access token (None if undecodable)."""
+        if self._access_token is not None and self._access_token is not self._claims_token:
+            self._cachear_claims()
+        return self._claims if self._access_token is not None else None
 
     def get_auth_header(self) -> dict:
         """
@@ -133,6 +202,19 @@ class TokenManager:
         logger.info("Access token refreshed successfully")
         return self._access_token
 
+    async def _do_refresh_medido(self) -> str:
+        """Wrap ``_do_refresh`` recording its outcome and latency."""
+        inicio = time.perf_counter()
+        try:
+            token = await self._do_refresh()
+        except Exception:
+            self._m_refresh_total.etiquetar("error").inc()
+            raise
+        finally:
+            self._m_refresh_segundos.observar(time.perf_counter() - inicio)
+        self._m_refresh_total.etiquetar("ok").inc()
+        return token
+
     async def refresh_access_token(self) -> str:
         """
         Singleton refresh: only one concurrent HTTP call to /auth/token.
@@ -144,6 +226,9 @@ class TokenManager:
         # Fast path: token is still valid and not near expiry
         if self._access_token and not self.is_expiring_soon():
             return self._access_token
+        # A refresh is already in flight: just wait for its result
+        if self._refresh_task is not None and not self._refresh_task.done():
+            return await self._refresh_task
 
         async with self._refresh_lock:
             # Double-check after acquiring the lock in case another caller
@@ -155,7 +240,11 @@ class TokenManager:
             if self._refresh_task is not None and not self._refresh_task.done():
                 task = self._refresh_task
             else:
-                self._refresh_task = asyncio.create_task(self._do_refresh())
+                refresco = (
+                    self._refrescar_coordinado() if self._almacen is not None
+                    else self._do_refresh_medido()
+                )
+                self._refresh_task = asyncio.create_task(refresco)
                 task = self._refresh_task
 
         # Await the shared task outside the lock so other concurrent callers
@@ -163,6 +252,33 @@ class TokenManager:
         # the same result without spawning additional HTTP requests.
         return await task
 
+    async def _refrescar_coordinado(self) -> str:
+        """
+        Host-wide INV-B3: only the holder of the store's lease calls /auth/token.
+
+        Other workers poll the store until the holder publishes the new pair
+        (or its lease expires, e.g. it crashed) and adopt that token.
+        """
+        visto = self._access_token
+        while True:
+            concedido, registro = self._almacen.tomar_lease(visto)
+            if concedido:
+                try:
+                    token = await self._do_refresh_medido()
+                except Exception:
+                    self._almacen.liberar_lease()
+                    raise
+                self._almacen.publicar(self._access_token, self._refresh_token)
+                return token
+            if registro.access_token != visto:
+                self.store_tokens(registro.access_token, registro.refresh_token)
+                if not self.is_expiring_soon():
+                    logger.info("Access token adopted from the shared store")
+                    return self._access_token
+                visto = registro.access_token  # the shared one is stale too
+                continue
+            await asyncio.sleep(self._almacen.sondeo)
+
     def store_tokens(self, access_token: str, refresh_token: str) -> None:
         """
         Persist access and refresh tokens in memory.
@@ -171,6 +287,60 @@ class TokenManager:
         """
         self._access_token = access_token
         self._refresh_token = refresh_token
+        if access_token is not None:
+            self._cachear_claims()
+        self._programar_refresh()
+
+    def _programar_refresh(self) -> None:
+        """
+        Schedule one proactive refresh at ``exp - margin`` with loop.call_at.
+
+        Without a running loop (tokens stored from sync code) nothing is
+        scheduled; requests still refresh on demand via is_expiring_soon().
+        """
+        self._cancelar_timer_refresh()
+        if not self._refresh_con_timer or self._access_token is None or self._exp is None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        retraso = self._exp - self._margen_expiracion - time.time()
+        if retraso <= 0:
+            # Already inside the margin (lifetime shorter than the margin):
+            # scheduling now would refresh in a tight loop; refresh on demand
+            return
+        self._timer_refresh = loop.call_at(loop.time() + retraso, self._al_vencer_margen)
+
+    def _cancelar_timer_refresh(self) -> None:
+        if self._timer_refresh is not None:
+            self._timer_refresh.cancel()
+            self._timer_refresh = None
+
+    def _cancelar_tarea_programada(self) -> asyncio.Task | None:
+        """Cancel an in-flight scheduled refresh; returns it so close() can await it."""
+        tarea, self._tarea_programada = self._tarea_programada, None
+        if tarea is None or tarea.done():
+            return None
+        tarea.cancel()
+        return tarea
+
+    def _al_vencer_margen(self) -> None:
+        self._timer_refresh = None
+        if self._access_token is None:
+            return
+        if not self.is_expiring_soon():
+            # loop.time() and time.time() drift apart slightly: try again later
+            self._programar_refresh()
+            return
+        self._tarea_programada = asyncio.ensure_future(self._refresh_programado())
+
+    async def _refresh_programado(self) -> None:
+        try:
+            await self.refresh_access_token()
+        except Exception as exc:
+            # Requests will retry on demand; never log token values (INV-B2)
+            logger.error("Scheduled token refresh failed: %s", type(exc).__name__)
 
     async def login(
         self,
@@ -202,6 +372,8 @@ class TokenManager:
             raise RuntimeError("Login response missing access_token")
 
         self.store_tokens(access_token, refresh_token)
+        if self._almacen is not None:
+            self._almacen.publicar(access_token, refresh_token)
         logger.info("Login successful for user '%s'", username)
         return data
 
@@ -213,15 +385,25 @@ class TokenManager:
         """Clear stored tokens."""
         self._access_token = None
         self._refresh_token = None
+        self._cancelar_timer_refresh()
+        self._cancelar_tarea_programada()
         logger.info("User logged out, tokens cleared")
 
     # Helper
     async def _get_session(self):
-        if self._session is None or self._session.closed:
+        if self._session is None or (self._session_propia and self._session.closed):
             self._session = aiohttp.ClientSession()
+            self._session_propia = True
         return self._session
 
     async def close(self):
         """Close the underlying aiohttp session."""
-        if self._session and not self._session.closed:
+        self._cancelar_timer_refresh()
+        tarea = self._cancelar_tarea_programada()
+        if tarea is not None:
+            try:
+                await tarea
+            except asyncio.CancelledError:
+                pass
+        if self._session_propia and self._session and not self._session.closed:
             await self._session.close()
@@ -0,0 +1,129 @@
+"""
+transporte_http2.py — Transporte HTTP/2 multiplexado para ClienteRobusto
+========================================================================
+
+Con aiohttp (HTTP/1.1) cada petición concurrente ocupa su propia conexión
+TCP del pool. Con HTTP/2 todas las peticiones al mismo host viajan como
+streams de UNA sola conexión: menos sockets y menos handshakes.
+
+TransporteHttp2 envuelve httpx.AsyncClient(http2=True) y expone la misma
+superficie que ClienteRobusto usa de aiohttp.ClientSession:
+
+    async with transporte.request(method, url, headers=..., json=...) as resp:
+        resp.status / await resp.json() / await resp.text()
+
+así el pipeline de ClienteRobusto (TokenManager → CircuitBreaker → retry)
+no cambia.
+
+DECISIONES DE DISEÑO:
+  1. Dependencia OPCIONAL: httpx[http2] solo se importa al construir el
+     transporte. Sin ella, ClienteRobusto sigue funcionando con aiohttp.
+  2. Errores traducidos a los tipos de aiohttp:
+       httpx.TimeoutException → asyncio.TimeoutError
+       httpx.TransportError   → aiohttp.ClientConnectionError
+     para que el retry de ClienteRobusto y _es_fallo_servidor() del
+     CircuitBreaker los clasifiquen igual que con el transporte HTTP/1.1.
+  3. http:// usa h2 con "prior knowledge" (h2c, sin Upgrade): httpx solo
+     negocia h2 por ALPN sobre TLS, así que para el mock local en claro
+     se desactiva HTTP/1.1 (servidor_mock.py --http2 lo soporta).
+"""
+
+import asyncio
+
+import aiohttp
+from multidict import CIMultiDict, CIMultiDictProxy
+from yarl import URL
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover - dependencia opcional
+    httpx = None
+
+
+class _RespuestaHttp2:
+    """Adapta httpx.Response a la interfaz de aiohttp.ClientResponse usada por ClienteRobusto."""
+
+    def __init__(self, respuesta, method: str, url: str):
+        self._respuesta = respuesta
+        self.status = respuesta.status_code
+        self.headers = CIMultiDictProxy(CIMultiDict(respuesta.headers.items()))
+        self.history = ()
+        self.http_version = respuesta.http_version
+        self.request_info = aiohttp.RequestInfo(
+            URL(url), method, CIMultiDictProxy(CIMultiDict()), URL(url)
+        )
+
+    async def json(self):
+        return self._respuesta.json()
+
+    async def text(self):
+        return self._respuesta.text
+
+    async def read(self):
+        return self._respuesta.content
+
+
+class _PeticionHttp2:
+    """Async context manager devuelto por TransporteHttp2.request()."""
+
+    def __init__(self, cliente, method, url, kwargs):
+        self._cliente = cliente
+        self._method = method
+        self._url = url
+        self._kwargs = kwargs
+
+    async def __aenter__(self):
+        try:
+            respuesta = await self._cliente.request(self._method, self._url, **self._kwargs)
+        except httpx.TimeoutException as e:
+            raise asyncio.TimeoutError(str(e)) from e
+        except httpx.TransportError as e:
+            raise aiohttp.ClientConnectionError(str(e)) from e
+        return _RespuestaHttp2(respuesta, self._method, self._url)
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+
+class TransporteHttp2:
+    """Sesión HTTP/2 con la interfaz mínima de aiohttp.ClientSession."""
+
+    def __init__(self, timeout: float = 5.0, max_conexiones: int = 10, verify=True):
+        if httpx is None:
+            raise ImportError(
+                "El transporte HTTP/2 requiere httpx con soporte h2: pip install 'httpx[http2]'"
+            )
+        self._timeout = timeout
+        self._limites = httpx.Limits(max_connections=max_conexiones)
+        self._verify = verify
+        self._clientes = {}
+        self.closed = False
+
+    def _cliente_para(self, url: str):
+        # h2 en claro (prior knowledge) necesita http1=False; con TLS se negocia por ALPN
+        es_https = url.startswith("https://")
+        cliente = self._clientes.get(es_https)
+        if cliente is None:
+            cliente = self._clientes[es_https] = httpx.AsyncClient(
+                http2=True,
+                http1=es_https,
+                timeout=self._timeout,
+                limits=self._limites,
+                verify=self._verify,
+            )
+        return cliente
+
+    def request(self, method: str, url: str, **kwargs) -> _PeticionHttp2:
+        return _PeticionHttp2(self._cliente_para(url), method, url, kwargs)
+
+    def get(self, url: str, **kwargs) -> _PeticionHttp2:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> _PeticionHttp2:
+        return self.request("POST", url, **kwargs)
+
+    async def close(self):
+        self.closed = True
+        clientes, self._clientes = list(self._clientes.values()), {}
+        for cliente in clientes:
+            await cliente.aclose()
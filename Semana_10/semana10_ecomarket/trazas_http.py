@@ -0,0 +1,206 @@
+"""
+trazas_http.py — Trazado por fases de peticiones HTTP (Semana 10)
+=================================================================
+
+Desglosa cada petición de aiohttp en fases usando aiohttp.TraceConfig:
+
+  cola      → espera por un slot libre del pool (limit/limit_per_host)
+  dns       → resolución del host (0 si hubo cache hit o conexión reusada)
+  conexion  → TCP connect + handshake TLS (aiohttp no separa ambas señales)
+  envio     → request_start → headers enviados
+  ttfb      → headers enviados → headers de respuesta recibidos
+  cuerpo    → headers de respuesta → cuerpo leído (resp.read()/json()/text())
+
+y registra si la conexión se REUSÓ del pool o se creó nueva.
+
+Uso:
+    trazador = TrazadorFases(capacidad=1000, tasa_muestreo=0.1)
+    cliente = ClienteRobusto(..., trazador=trazador)
+    ...
+    trazador.ultimas(10)     → últimas trazas (dicts)
+    trazador.resumen()       → p50/p95 por fase + tasa de reuso
+
+DECISIONES DE DISEÑO:
+  1. Opt-in: sin trazador no se registra ningún TraceConfig y aiohttp no
+     emite señales (coste cero).
+  2. Muestreo en on_request_start: las peticiones no muestreadas marcan su
+     contexto y el resto de callbacks retornan en la primera línea.
+  3. Ring buffer (deque con maxlen): memoria acotada, las trazas más viejas
+     se descartan solas. Se puede dejar activo en producción.
+  4. La traza se publica en el buffer al recibir los headers (on_request_end)
+     y se completa con la fase `cuerpo` cuando se lee el body. Si el caller
+     nunca lee el cuerpo, `cuerpo` queda en None.
+"""
+
+import random
+import statistics
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+import aiohttp
+
+
+@dataclass
+class TrazaPeticion:
+    """Tiempos (en segundos) de una petición muestreada."""
+    metodo: str
+    url: str
+    inicio: float
+    cola: float = 0.0
+    dns: float = 0.0
+    conexion: float = 0.0
+    envio: Optional[float] = None
+    ttfb: Optional[float] = None
+    cuerpo: Optional[float] = None
+    total: Optional[float] = None
+    reutilizada: bool = False
+    status: Optional[int] = None
+    error: Optional[str] = None
+
+
+FASES = ("cola", "dns", "conexion", "envio", "ttfb", "cuerpo", "total")
+
+
+class TrazadorFases:
+    """
+    Construye un aiohttp.TraceConfig y guarda las trazas en un ring buffer.
+    """
+
+    def __init__(self, capacidad: int = 1000, tasa_muestreo: float = 1.0):
+        if not 0.0 <= tasa_muestreo <= 1.0:
+            raise ValueError("tasa_muestreo debe estar entre 0 y 1")
+        self._trazas: deque = deque(maxlen=capacidad)
+        self.tasa_muestreo = tasa_muestreo
+        self.peticiones_vistas = 0
+        self.peticiones_muestreadas = 0
+        self._reloj = time.perf_counter
+        self.trace_config = self._construir_trace_config()
+
+    # ── Señales de aiohttp ────────────────────────────────────
+
+    def _construir_trace_config(self) -> aiohttp.TraceConfig:
+        tc = aiohttp.TraceConfig()
+        tc.on_request_start.append(self._on_request_start)
+        tc.on_connection_queued_start.append(self._on_queued_start)
+        tc.on_connection_queued_end.append(self._on_queued_end)
+        tc.on_dns_resolvehost_start.append(self._on_dns_start)
+        tc.on_dns_resolvehost_end.append(self._on_dns_end)
+        tc.on_connection_create_start.append(self._on_create_start)
+        tc.on_connection_create_end.append(self._on_create_end)
+        tc.on_connection_reuseconn.append(self._on_reuseconn)
+        tc.on_request_headers_sent.append(self._on_headers_sent)
+        tc.on_request_end.append(self._on_request_end)
+        tc.on_response_chunk_received.append(self._on_chunk_received)
+        tc.on_request_exception.append(self._on_request_exception)
+        return tc
+
+    async def _on_request_start(self, session, ctx, params):
+        self.peticiones_vistas += 1
+        if self.tasa_muestreo < 1.0 and random.random() >= self.tasa_muestreo:
+            ctx.traza = None
+            return
+        self.peticiones_muestreadas += 1
+        ahora = self._reloj()
+        ctx.traza = TrazaPeticion(metodo=params.method, url=str(params.url), inicio=ahora)
+        ctx.marca = ahora
+
+    async def _on_queued_start(self, session, ctx, params):
+        if ctx.traza is not None:
+            ctx.marca_cola = self._reloj()
+
+    async def _on_queued_end(self, session, ctx, params):
+        if ctx.traza is not None:
+            ctx.traza.cola += self._reloj() - ctx.marca_cola
+
+    async def _on_dns_start(self, session, ctx, params):
+        if ctx.traza is not None:
+            ctx.marca_dns = self._reloj()
+
+    async def _on_dns_end(self, session, ctx, params):
+        if ctx.traza is not None:
+            ctx.traza.dns += self._reloj() - ctx.marca_dns
+
+    async def _on_create_start(self, session, ctx, params):
+        if ctx.traza is not None:
+            ctx.marca_conexion = self._reloj()
+
+    async def _on_create_end(self, session, ctx, params):
+        if ctx.traza is not None:
+            # create_start..create_end incluye DNS: lo descontamos
+            ctx.traza.conexion += self._reloj() - ctx.marca_conexion - ctx.traza.dns
+
+    async def _on_reuseconn(self, session, ctx, params):
+        if ctx.traza is not None:
+            ctx.traza.reutilizada = True
+
+    async def _on_headers_sent(self, session, ctx, params):
+        if ctx.traza is not None:
+            ahora = self._reloj()
+            ctx.traza.envio = ahora - ctx.traza.inicio
+            ctx.marca = ahora
+
+    async def _on_request_end(self, session, ctx, params):
+        traza = ctx.traza
+        if traza is None:
+            return
+        ahora = self._reloj()
+        traza.ttfb = ahora - ctx.marca
+        traza.total = ahora - traza.inicio
+        traza.status = params.response.status
+        ctx.marca = ahora
+        self._trazas.append(traza)
+
+    async def _on_chunk_received(self, session, ctx, params):
+        traza = ctx.traza
+        if traza is None or traza.ttfb is None:
+            return
+        ahora = self._reloj()
+        traza.cuerpo = ahora - ctx.marca
+        traza.total = ahora - traza.inicio
+
+    async def _on_request_exception(self, session, ctx, params):
+        traza = ctx.traza
+        if traza is None:
+            return
+        traza.error = type(params.exception).__name__
+        traza.total = self._reloj() - traza.inicio
+        self._trazas.append(traza)
+
+    # ── Consulta en runtime ───────────────────────────────────
+
+    def ultimas(self, n: Optional[int] = None) -> list:
+        """Retorna las últimas `n` trazas (todas si n es None) como dicts."""
+        trazas = list(self._trazas)
+        if n is not None:
+            trazas = trazas[-n:]
+        return [asdict(t) for t in trazas]
+
+    def resumen(self) -> dict:
+        """p50/p95/max por fase (ms) y tasa de reuso de conexiones."""
+        trazas = list(self._trazas)
+        resultado = {
+            "trazas": len(trazas),
+            "peticiones_vistas": self.peticiones_vistas,
+            "peticiones_muestreadas": self.peticiones_muestreadas,
+            "tasa_reutilizacion": (
+                sum(1 for t in trazas if t.reutilizada) / len(trazas) * 100 if trazas else 0.0
+            ),
+            "fases_ms": {},
+        }
+        for fase in FASES:
+            valores = sorted(
+                getattr(t, fase) * 1000 for t in trazas if getattr(t, fase) is not None
+            )
+            if not valores:
+                continue
+            resultado["fases_ms"][fase] = {
+                "p50": statistics.median(valores),
+                "p95": valores[min(len(valores) - 1, int(len(valores) * 0.95))],
+                "max": valores[-1],
+            }
+        return resultado
+
+    def limpiar(self) -> None:
+        self._trazas.clear()
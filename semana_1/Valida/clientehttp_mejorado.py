@@ -1,7 +1,13 @@
 import requests
 import json
+import os
+import sys
 from functools import wraps
 
+# Motor concurrente compartido (semana 2): una requests.Session por hilo
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'semana_2', 'Aplica', 'RetoIA_3')))
+from motor_concurrente import ClienteConcurrente
+
 
 BASE_URL = "http://127.0.0.1:4010"
 
@@ -47,16 +53,19 @@ class BearerAuth(requests.auth.AuthBase):
         return r
 
 
-class APIservices:
-    def __init__(self, base_url, token=""):
+class APIservices(ClienteConcurrente):
+    def __init__(self, base_url, token="", pool_size=10):
         self.base_url = base_url
-        self.session = requests.Session()
         #SEGUNDA MEJORA (CRITICA), no esta inicializado el token
         self.token = token
-        self.session.auth = BearerAuth(lambda: self.token)
+        # self.session es la sesión del hilo actual (requests.Session no es thread-safe)
+        super().__init__(pool_size=pool_size)
+
+    def _configurar_sesion(self, sesion):
+        sesion.auth = BearerAuth(lambda: self.token)
 
-        # Configuramos la sesión UNA SOLA VEZ
-        self.session.headers.update({
+        # Configuramos cada sesión UNA SOLA VEZ
+        sesion.headers.update({
             "x-Client-Version": "1.0.0",
             "Accept": "application/json",
             "Content-Type": "application/json"
@@ -33,6 +33,13 @@ class ServerError(EcoMarketError):
     """Error del servidor (5xx) - puede reintentarse"""
     pass
 
+def _http(sesion=None):
+    """
+    Retorna la sesión recibida (keep-alive, ver motor_concurrente.py) o el
+    módulo requests para conservar el comportamiento original sin sesión.
+    """
+    return sesion if sesion is not None else requests
+
 def _verificar_respuesta(response):
     """Verifica código de estado y Content-Type antes de procesar."""
     # Capa 1: Manejo de errores específicos
@@ -54,7 +61,7 @@ def _verificar_respuesta(response):
     
     return response
 
-def listar_productos(categoria=None, orden=None):
+def listar_productos(categoria=None, orden=None, sesion=None):
     """GET /productos con filtros opcionales."""
     params = {}
     if categoria:
@@ -64,21 +71,21 @@ def listar_productos(categoria=None, orden=None):
     
     url = url_builder.build_url("productos", query_params=params if params else None)
     
-    response = requests.get(url, timeout=TIMEOUT)
+    response = _http(sesion).get(url, timeout=TIMEOUT)
     _verificar_respuesta(response)
     
     return validar_lista_productos(response.json())
 
-def obtener_producto(producto_id):
+def obtener_producto(producto_id, sesion=None):
     """GET /productos/{id}"""
     url = url_builder.build_url("productos/{}", path_params=[producto_id])
     
-    response = requests.get(url, timeout=TIMEOUT)
+    response = _http(sesion).get(url, timeout=TIMEOUT)
     _verificar_respuesta(response)
     
     return validar_producto(response.json())
 
-def crear_producto(datos: dict) -> dict:
+def crear_producto(datos: dict, sesion=None) -> dict:
     """
     POST /productos
     Envía datos JSON para crear un nuevo producto. Espera un código 201 Created.
@@ -90,7 +97,7 @@ def crear_producto(datos: dict) -> dict:
     url = url_builder.build_url("productos")
     headers = {"Content-Type": "application/json"}
     
-    response = requests.post(url, json=datos, headers=headers, timeout=TIMEOUT)
+    response = _http(sesion).post(url, json=datos, headers=headers, timeout=TIMEOUT)
     _verificar_respuesta(response)
     
     if response.status_code != 201:
@@ -98,7 +105,7 @@ def crear_producto(datos: dict) -> dict:
         
     return validar_producto(response.json())
 
-def actualizar_producto_total(producto_id: int, datos: dict) -> dict:
+def actualizar_producto_total(producto_id: int, datos: dict, sesion=None) -> dict:
     """
     PUT /productos/{id}
     Reemplaza el recurso completo. Es fundamental enviar todos los campos del producto.
@@ -110,12 +117,12 @@ def actualizar_producto_total(producto_id: int, datos: dict) -> dict:
     url = url_builder.build_url("productos/{}", path_params=[producto_id])
     headers = {"Content-Type": "application/json"}
     
-    response = requests.put(url, json=datos, headers=headers, timeout=TIMEOUT)
+    response = _http(sesion).put(url, json=datos, headers=headers, timeout=TIMEOUT)
     _verificar_respuesta(response)
     
     return response.json()
 
-def actualizar_producto_parcial(producto_id: int, campos: dict) -> dict:
+def actualizar_producto_parcial(producto_id: int, campos: dict, sesion=None) -> dict:
     """
     PATCH /productos/{id}
     Modifica únicamente los campos proporcionados sin afectar el resto del recurso.
@@ -127,12 +134,12 @@ def actualizar_producto_parcial(producto_id: int, campos: dict) -> dict:
     url = url_builder.build_url("productos/{}", path_params=[producto_id])
     headers = {"Content-Type": "application/json"}
     
-    response = requests.patch(url, json=campos, headers=headers, timeout=TIMEOUT)
+    response = _http(sesion).patch(url, json=campos, headers=headers, timeout=TIMEOUT)
     _verificar_respuesta(response)
     
     return response.json()
 
-def eliminar_producto(producto_id: int) -> bool:
+def eliminar_producto(producto_id: int, sesion=None) -> bool:
     """
     DELETE /productos/{id}
     Elimina el producto especificado. Espera un código 204 No Content.
@@ -142,7 +149,7 @@ def eliminar_producto(producto_id: int) -> bool:
     """
     url = url_builder.build_url("productos/{}", path_params=[producto_id])
     
-    response = requests.delete(url, timeout=TIMEOUT)
+    response = _http(sesion).delete(url, timeout=TIMEOUT)
     _verificar_respuesta(response)
     
     # El éxito en DELETE usualmente devuelve 204
@@ -0,0 +1,182 @@
+"""
+Motor concurrente para los clientes síncronos de EcoMarket
+==========================================================
+Capa de sesiones con pool (keep-alive) + ThreadPoolExecutor para los
+clientes basados en `requests` que todavía usan algunos batch jobs.
+
+- crear_sesion(): requests.Session con HTTPAdapter dimensionado al pool.
+- SesionPorHilo: una Session por hilo (requests.Session no garantiza ser
+  thread-safe: cookies y adapters se mutan). Como el ThreadPoolExecutor
+  reutiliza sus hilos, cada hilo conserva sus conexiones keep-alive.
+- map_concurrente(): como executor.map pero conserva el orden, acepta
+  return_exceptions y no deja hilos colgando.
+- MotorConcurrente: executor + SesionPorHilo; fn recibe la sesión del hilo.
+- ClienteConcurrente: base para los clientes con `self.session`
+  (APIservices de semana 1, EcoMarketClient de semana 2): `session` es la
+  sesión del hilo actual y map_concurrente() usa un executor persistente.
+
+Uso con cliente_ecomarket:
+    with MotorConcurrente(max_workers=8) as motor:
+        productos = motor.map(lambda sesion, pid: obtener_producto(pid, sesion=sesion), ids)
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+POOL_SIZE = 10
+MAX_WORKERS = 8
+
+
+def crear_sesion(pool_size: int = POOL_SIZE, headers: dict = None) -> requests.Session:
+    """Session con un pool de `pool_size` conexiones keep-alive por host."""
+    sesion = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    sesion.mount("http://", adapter)
+    sesion.mount("https://", adapter)
+    if headers:
+        sesion.headers.update(headers)
+    return sesion
+
+
+class SesionPorHilo:
+    """Entrega una requests.Session distinta a cada hilo, creada bajo demanda."""
+
+    def __init__(self, fabrica=crear_sesion):
+        self._fabrica = fabrica
+        self._local = threading.local()
+        self._sesiones = []
+        self._lock = threading.Lock()
+
+    def actual(self) -> requests.Session:
+        sesion = getattr(self._local, "sesion", None)
+        if sesion is None:
+            sesion = self._local.sesion = self._fabrica()
+            with self._lock:
+                self._sesiones.append(sesion)
+        return sesion
+
+    @property
+    def sesiones_creadas(self) -> int:
+        return len(self._sesiones)
+
+    def cerrar(self):
+        with self._lock:
+            sesiones, self._sesiones = self._sesiones, []
+        for sesion in sesiones:
+            sesion.close()
+        self._local = threading.local()
+
+
+def map_concurrente(fn, items, max_workers: int = MAX_WORKERS, return_exceptions: bool = False,
+                    executor: ThreadPoolExecutor = None) -> list:
+    """
+    Aplica fn a cada item en paralelo y retorna los resultados EN ORDEN.
+
+    Con return_exceptions=True las excepciones se devuelven en su posición
+    (como asyncio.gather); si no, se relanza la primera en orden.
+    """
+    propio = executor is None
+    if propio:
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futuros = [executor.submit(fn, item) for item in items]
+        resultados = []
+        for futuro in futuros:
+            try:
+                resultados.append(futuro.result())
+            except Exception as e:
+                if not return_exceptions:
+                    for pendiente in futuros:
+                        pendiente.cancel()
+                    raise
+                resultados.append(e)
+        return resultados
+    finally:
+        if propio:
+            executor.shutdown(wait=True)
+
+
+class MotorConcurrente:
+    """
+    ThreadPoolExecutor + una sesión keep-alive por hilo trabajador.
+
+    fn se invoca como fn(sesion, item).
+    """
+
+    def __init__(self, max_workers: int = MAX_WORKERS, pool_size: int = None, headers: dict = None):
+        self.max_workers = max_workers
+        pool = pool_size or max_workers
+        self.sesiones = SesionPorHilo(lambda: crear_sesion(pool, headers))
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ecomarket")
+
+    def map(self, fn, items, return_exceptions: bool = False) -> list:
+        return map_concurrente(
+            lambda item: fn(self.sesiones.actual(), item),
+            items,
+            return_exceptions=return_exceptions,
+            executor=self._executor,
+        )
+
+    def cerrar(self):
+        self._executor.shutdown(wait=True)
+        self.sesiones.cerrar()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.cerrar()
+
+
+class ClienteConcurrente:
+    """
+    Base para clientes síncronos que usan `self.session`.
+
+    Cada hilo obtiene su propia Session (configurada por _configurar_sesion)
+    y map_concurrente(metodo, argumentos) reparte las llamadas en un executor
+    que vive con el cliente: sus hilos conservan las conexiones keep-alive
+    entre llamadas. Cerrar con cerrar().
+    """
+
+    def __init__(self, pool_size: int = POOL_SIZE, max_workers: int = MAX_WORKERS):
+        self._pool_size = pool_size
+        self._max_workers = max_workers
+        self._sesiones = SesionPorHilo(self._nueva_sesion)
+        self._executor = None
+
+    def _nueva_sesion(self) -> requests.Session:
+        sesion = crear_sesion(self._pool_size)
+        self._configurar_sesion(sesion)
+        return sesion
+
+    def _configurar_sesion(self, sesion: requests.Session) -> None:
+        """Auth y headers comunes; lo redefine cada cliente."""
+
+    @property
+    def session(self) -> requests.Session:
+        return self._sesiones.actual()
+
+    def map_concurrente(self, metodo, argumentos, return_exceptions: bool = False) -> list:
+        """
+        metodo(*args) por cada args (o metodo(arg)) en paralelo, resultados EN ORDEN.
+
+        Ejemplo: cliente.map_concurrente(cliente.obtener_producto, [1, 2, 3])
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="ecomarket")
+        argumentos = [a if isinstance(a, tuple) else (a,) for a in argumentos]
+        return map_concurrente(
+            lambda args: metodo(*args),
+            argumentos,
+            return_exceptions=return_exceptions,
+            executor=self._executor,
+        )
+
+    def cerrar(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self._sesiones.cerrar()
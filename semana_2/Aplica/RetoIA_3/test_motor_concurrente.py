@@ -0,0 +1,134 @@
+"""
+Test suite for motor_concurrente.py
+Runs against a local http.server (no Prism needed)
+
+Run with: pytest test_motor_concurrente.py -v
+"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from cliente_ecomarket import obtener_producto, ServerError
+from motor_concurrente import ClienteConcurrente, MotorConcurrente, map_concurrente
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    conexiones = 0
+    autorizaciones = []
+    lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        with _Handler.lock:
+            _Handler.conexiones += 1
+
+    def do_GET(self):
+        producto_id = int(self.path.rstrip("/").split("/")[-1])
+        status = 500 if producto_id == 99 else 200
+        cuerpo = json.dumps({
+            "id": producto_id, "nombre": f"Producto {producto_id}",
+            "precio": 10.0, "categoria": "miel", "disponible": True
+        }).encode()
+        _Handler.autorizaciones.append(self.headers.get("Authorization"))
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def servidor(monkeypatch):
+    import cliente_ecomarket
+    from url_builder import URLBuilder
+
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    hilo = threading.Thread(target=srv.serve_forever, daemon=True)
+    hilo.start()
+    _Handler.conexiones = 0
+    base = f"http://127.0.0.1:{srv.server_address[1]}"
+    monkeypatch.setattr(cliente_ecomarket, "url_builder", URLBuilder(base))
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+class TestMapConcurrente:
+    def test_conserva_orden(self):
+        assert map_concurrente(lambda x: x * 2, [3, 1, 2], max_workers=3) == [6, 2, 4]
+
+    def test_return_exceptions(self):
+        def fn(x):
+            if x == 2:
+                raise ValueError("dos")
+            return x
+
+        resultados = map_concurrente(fn, [1, 2, 3], return_exceptions=True)
+        assert resultados[0] == 1 and resultados[2] == 3
+        assert isinstance(resultados[1], ValueError)
+        with pytest.raises(ValueError):
+            map_concurrente(fn, [1, 2, 3])
+
+
+class TestMotorConcurrente:
+    def test_reutiliza_conexiones_por_hilo(self, servidor):
+        ids = list(range(1, 41))
+        with MotorConcurrente(max_workers=4) as motor:
+            productos = motor.map(lambda sesion, pid: obtener_producto(pid, sesion=sesion), ids)
+            assert motor.sesiones.sesiones_creadas <= 4
+
+        assert [p["id"] for p in productos] == ids
+        # 40 peticiones sobre como mucho 4 conexiones keep-alive
+        assert _Handler.conexiones <= 4
+
+    def test_errores_del_cliente_se_propagan(self, servidor):
+        with MotorConcurrente(max_workers=2) as motor:
+            resultados = motor.map(
+                lambda sesion, pid: obtener_producto(pid, sesion=sesion),
+                [1, 99],
+                return_exceptions=True,
+            )
+        assert resultados[0]["id"] == 1
+        assert isinstance(resultados[1], ServerError)
+
+
+class _ClientePrueba(ClienteConcurrente):
+    def __init__(self, base_url, token):
+        self.base_url = base_url
+        self.token = token
+        super().__init__(pool_size=2, max_workers=3)
+
+    def _configurar_sesion(self, sesion):
+        sesion.headers["Authorization"] = f"Bearer {self.token}"
+
+    def obtener(self, producto_id):
+        respuesta = self.session.get(f"{self.base_url}/productos/{producto_id}", timeout=5)
+        return threading.get_ident(), id(self.session), respuesta.json()["id"]
+
+
+class TestClienteConcurrente:
+    def test_una_sesion_por_hilo_reutilizada_entre_llamadas(self, servidor):
+        _Handler.autorizaciones = []
+        cliente = _ClientePrueba(f"http://127.0.0.1:{servidor.server_address[1]}", "tk")
+        try:
+            primera = cliente.map_concurrente(cliente.obtener, range(1, 31))
+            segunda = cliente.map_concurrente(cliente.obtener, [(i,) for i in range(31, 61)])
+        finally:
+            cliente.cerrar()
+
+        resultados = primera + segunda
+        assert [pid for _, _, pid in resultados] == list(range(1, 61))
+        # Cada hilo usa siempre su sesión y nunca la de otro hilo
+        sesion_por_hilo = {}
+        for hilo, sesion, _ in resultados:
+            assert sesion_por_hilo.setdefault(hilo, sesion) == sesion
+        assert len(set(sesion_por_hilo.values())) == len(sesion_por_hilo) <= 3
+        assert _Handler.conexiones <= 3  # el executor persiste: sin conexiones nuevas en la 2a llamada
+        assert set(_Handler.autorizaciones) == {"Bearer tk"}
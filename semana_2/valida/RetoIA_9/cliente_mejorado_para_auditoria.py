@@ -9,9 +9,15 @@ Este cliente implementa TODOS los endpoints definidos en openapiM2.yaml:
 Autor: Generado para auditoría de contrato
 """
 
+import os
+import sys
 import requests
 from typing import Optional, List, Dict, Any
 
+# Motor concurrente compartido (Aplica/RetoIA_3): una requests.Session por hilo
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'Aplica', 'RetoIA_3')))
+from motor_concurrente import ClienteConcurrente
+
 # Configuración centralizada
 BASE_URL = "http://127.0.0.1:4010"
 TIMEOUT = 10  # segundos
@@ -47,22 +53,25 @@ class ServerError(EcoMarketError):
     pass
 
 
-class EcoMarketClient:
+class EcoMarketClient(ClienteConcurrente):
     """
     Cliente HTTP completo para la API de EcoMarket.
     Implementa todos los endpoints definidos en el contrato OpenAPI.
     """
     
-    def __init__(self, base_url: str = BASE_URL, token: str = ""):
+    def __init__(self, base_url: str = BASE_URL, token: str = "", pool_size: int = 10):
         self.base_url = base_url.rstrip('/')
         self.token = token
-        self.session = requests.Session()
-        self.session.headers.update({
+        # self.session es la sesión del hilo actual (requests.Session no es thread-safe)
+        super().__init__(pool_size=pool_size)
+
+    def _configurar_sesion(self, sesion: requests.Session) -> None:
+        sesion.headers.update({
             "Accept": "application/json",
             "Content-Type": "application/json"
         })
-        if token:
-            self.session.headers["Authorization"] = f"Bearer {token}"
+        if self.token:
+            sesion.headers["Authorization"] = f"Bearer {self.token}"
     
     def _verificar_respuesta(self, response: requests.Response) -> requests.Response:
         """Verifica código de estado y Content-Type antes de procesar."""
@@ -443,8 +452,8 @@ class EcoMarketClient:
         return response.json()
     
     def cerrar(self):
-        """Cierra la sesión HTTP."""
-        self.session.close()
+        """Cierra las sesiones HTTP (una por hilo) y el pool de hilos."""
+        super().cerrar()
 
 
 # --- EJECUCIÓN DE DEMOSTRACIÓN ---
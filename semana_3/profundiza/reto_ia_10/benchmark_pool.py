@@ -10,6 +10,7 @@ Escenarios de prueba:
 2. Pool de 10 conexiones  
 3. Pool de 20 conexiones
 4. Pool ilimitado (sin límite)
+5. Pool frío vs precalentado, y tras un periodo ocioso con/sin keep-alive
 
 Métrica principal: throughput, latencia, uso de conexiones TCP
 """
@@ -33,6 +34,12 @@ SERVER_DELAY = 0.1  # 100ms
 # URL de prueba (usaremos httpbin con delay)
 TEST_URL = f"https://httpbin.org/delay/{SERVER_DELAY}"
 
+# Escenario de pre-calentamiento: pool pequeño, idle timeout corto para que
+# las conexiones ociosas caduquen durante la espera
+POOL_PRECALENTAMIENTO = 10
+KEEPALIVE_TIMEOUT_CORTO = 3.0
+TIEMPO_OCIOSO = 5.0
+
 
 # ============================================================================
 # FUNCIONES DE BENCHMARK
@@ -254,6 +261,67 @@ async def ejecutar_benchmark_completo():
     return resultados
 
 
+# ============================================================================
+# PRE-CALENTAMIENTO Y KEEP-ALIVE
+# ============================================================================
+
+async def _oleada(session: SmartSession) -> Dict[str, Any]:
+    """Una ráfaga de POOL_PRECALENTAMIENTO peticiones + conexiones abiertas por ella."""
+    creadas_antes = session.metrics.conexiones_creadas
+    resultados = await ejecutar_peticiones(session, POOL_PRECALENTAMIENTO)
+    resultados["conexiones_nuevas"] = session.metrics.conexiones_creadas - creadas_antes
+    return resultados
+
+
+async def benchmark_precalentamiento() -> List[Dict[str, Any]]:
+    """
+    Compara la primera ráfaga de peticiones con el pool frío vs precalentado,
+    y una ráfaga tras TIEMPO_OCIOSO segundos sin tráfico con y sin el
+    mantenedor keep-alive (keepalive_timeout < TIEMPO_OCIOSO).
+    """
+    print(f"\n{'='*60}")
+    print("🔥 BENCHMARK: Pool frío vs precalentado + keep-alive")
+    print(f"{'='*60}")
+
+    escenarios = []
+
+    async def escenario(label: str, precalentar: bool, ocioso: float, keepalive: bool):
+        async with SmartSession(
+            pool_size=POOL_PRECALENTAMIENTO,
+            hosts=[TEST_URL],
+            keepalive_timeout=KEEPALIVE_TIMEOUT_CORTO,
+        ) as session:
+            if precalentar:
+                await session.precalentar()
+            if keepalive:
+                session.iniciar_keepalive()
+            if ocioso:
+                print(f"   ({label}) esperando {ocioso:.0f}s sin tráfico...")
+                await asyncio.sleep(ocioso)
+            r = await _oleada(session)
+            r["label"] = label
+            r["pool_status"] = session.get_pool_status()
+            escenarios.append(r)
+            print(f"   {label:36} p50={r['latencia_p50']:.1f}ms  conexiones nuevas={r['conexiones_nuevas']}")
+
+    await escenario("Frío (sin precalentar)", False, 0, False)
+    await escenario("Precalentado", True, 0, False)
+    await escenario("Precalentado + ocioso", True, TIEMPO_OCIOSO, False)
+    await escenario("Precalentado + ocioso + keep-alive", True, TIEMPO_OCIOSO, True)
+
+    print(f"\n{'Escenario':36} {'p50 (ms)':>10} {'max (ms)':>10} {'Conex. nuevas':>14}")
+    print("-" * 74)
+    for r in escenarios:
+        print(f"{r['label']:36} {r['latencia_p50']:>10.1f} {r['latencia_max']:>10.1f} {r['conexiones_nuevas']:>14}")
+
+    frio, caliente = escenarios[0], escenarios[1]
+    print(f"\n💡 Precalentar ahorra ~{frio['latencia_p50'] - caliente['latencia_p50']:.0f}ms "
+          f"por petición en la primera ráfaga (handshake TCP+TLS).")
+    print(f"   Sin keep-alive, tras {TIEMPO_OCIOSO:.0f}s ociosos (> keepalive_timeout="
+          f"{KEEPALIVE_TIMEOUT_CORTO:.1f}s) el pool vuelve a estar frío.")
+    return escenarios
+
+
 # ============================================================================
 # GRÁFICA ASCII DE COMPARACIÓN
 # ============================================================================
@@ -287,7 +355,10 @@ if __name__ == "__main__":
     
     # Generar gráfica
     generar_grafica_ascii(resultados)
-    
+
+    # Pre-calentamiento y keep-alive
+    asyncio.run(benchmark_precalentamiento())
+
     print("\n" + "="*80)
     print("✅ Benchmark completado. Ver resultados arriba.")
     print("📄 Documentación detallada en: configuracion_optima.md")
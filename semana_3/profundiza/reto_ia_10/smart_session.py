@@ -8,6 +8,10 @@ Este módulo implementa una sesión HTTP inteligente que:
 3. Registra métricas de uso (conexiones creadas/reutilizadas/cerradas)
 4. Proporciona health checks periódicos
 5. Es drop-in replacement para aiohttp.ClientSession
+6. Pre-calienta el pool (precalentar) y mantiene vivas las conexiones
+   ociosas con un mantenedor keep-alive en segundo plano
+7. Separa la latencia de peticiones "frías" (abrieron conexión TCP) de
+   las "calientes" (reutilizaron una del pool)
 
 Autor: Async Programming Exercise - Semana 3
 Propósito educativo: Aprender sobre connection pooling y TCP keep-alive
@@ -15,10 +19,14 @@ Propósito educativo: Aprender sobre connection pooling y TCP keep-alive
 
 import aiohttp
 import asyncio
-from typing import Optional, Dict, Any
+import statistics
+import time
+from collections import deque
+from typing import Optional, Dict, Any, List
 from dataclasses import dataclass, field
 from datetime import datetime
 import logging
+from yarl import URL
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
@@ -34,6 +42,11 @@ class PoolMetrics:
     conexiones_activas: int = 0
     conexiones_disponibles: int = 0
     tiempo_inicio: datetime = field(default_factory=datetime.now)
+    # Latencias (ms) de las últimas peticiones de la aplicación, separadas por
+    # si tuvieron que abrir conexión (fría) o reutilizaron una del pool (caliente)
+    latencias_frias: deque = field(default_factory=lambda: deque(maxlen=1000))
+    latencias_calientes: deque = field(default_factory=lambda: deque(maxlen=1000))
+    pings_keepalive: int = 0
     
     def __str__(self) -> str:
         uptime = (datetime.now() - self.tiempo_inicio).total_seconds()
@@ -43,9 +56,17 @@ class PoolMetrics:
             f"Reutilizadas: {self.conexiones_reutilizadas} | "
             f"Cerradas: {self.conexiones_cerradas}\n"
             f"   Activas: {self.conexiones_activas} | "
-            f"Disponibles: {self.conexiones_disponibles}"
+            f"Disponibles: {self.conexiones_disponibles}\n"
+            f"   Latencia p50 fría: {self.latencia_p50(self.latencias_frias):.1f}ms "
+            f"({len(self.latencias_frias)}) | "
+            f"caliente: {self.latencia_p50(self.latencias_calientes):.1f}ms "
+            f"({len(self.latencias_calientes)})"
         )
     
+    @staticmethod
+    def latencia_p50(latencias) -> float:
+        return statistics.median(latencias) if latencias else 0.0
+    
     def tasa_reutilizacion(self) -> float:
         """Calcula el porcentaje de conexiones reutilizadas."""
         total = self.conexiones_creadas + self.conexiones_reutilizadas
@@ -71,6 +92,11 @@ class SmartSession:
                 
         # Ver métricas
         session.print_metrics()
+    
+    Pre-calentamiento y keep-alive:
+        session = SmartSession(pool_size=10, hosts=["https://api.example.com"])
+        await session.precalentar()          # abre 10 conexiones por host
+        session.iniciar_keepalive()          # las refresca antes del idle timeout
     """
     
     def __init__(
@@ -78,6 +104,9 @@ class SmartSession:
         pool_size: int = 10,
         timeout: Optional[aiohttp.ClientTimeout] = None,
         enable_monitoring: bool = True,
+        hosts: Optional[List[str]] = None,
+        keepalive_timeout: float = 15.0,
+        ruta_ping: str = "/",
         **kwargs
     ):
         """
@@ -86,9 +115,19 @@ class SmartSession:
                       Default: 10 (balance entre throughput y recursos)
             timeout: Timeout para las peticiones. Default: 10s total
             enable_monitoring: Si True, registra métricas detalladas
+            hosts: Orígenes (esquema://host[:puerto]) que precalentar() y el
+                   mantenedor keep-alive deben mantener con conexiones abiertas
+            keepalive_timeout: Segundos que aiohttp conserva una conexión ociosa
+                   en el pool. Debe ser MENOR que el idle timeout del servidor
+                   o de los middleboxes (NAT, balanceadores)
+            ruta_ping: Path usado por precalentar() y el keep-alive (HEAD)
             **kwargs: Argumentos adicionales para ClientSession
         """
         self.pool_size = pool_size
+        self.hosts = [str(URL(h).origin()) for h in (hosts or [])]
+        self.keepalive_timeout = keepalive_timeout
+        self.ruta_ping = ruta_ping
+        self._tarea_keepalive: Optional[asyncio.Task] = None
         self.enable_monitoring = enable_monitoring
         self.metrics = PoolMetrics() if enable_monitoring else None
         
@@ -98,12 +137,20 @@ class SmartSession:
             limit_per_host=pool_size,  # Límite por host (importante para un solo API)
             ttl_dns_cache=300,         # Cache DNS por 5 minutos
             enable_cleanup_closed=True, # Limpiar conexiones cerradas automáticamente
+            keepalive_timeout=keepalive_timeout,
         )
         
         # Configurar timeout razonable si no se especifica
         if timeout is None:
             timeout = aiohttp.ClientTimeout(total=10)
         
+        # Contadores reales de creadas/reutilizadas vía TraceConfig
+        # (en lugar de inspeccionar atributos privados del connector)
+        if self.enable_monitoring:
+            trace_configs = list(kwargs.pop("trace_configs", None) or [])
+            trace_configs.append(self._crear_trace_config())
+            kwargs["trace_configs"] = trace_configs
+        
         # Crear la sesión HTTP
         self._session = aiohttp.ClientSession(
             connector=self.connector,
@@ -123,8 +170,11 @@ class SmartSession:
     
     async def close(self):
         """Cierra la sesión y el connector, liberando todos los recursos."""
+        await self.detener_keepalive()
         if self.metrics:
-            self.metrics.conexiones_cerradas = self.connector._conns._count if hasattr(self.connector, '_conns') else 0
+            # Conexiones ociosas en el pool que se cierran ahora (API privada de aiohttp)
+            conns = getattr(self.connector, '_conns', {})
+            self.metrics.conexiones_cerradas = sum(len(c) for c in conns.values())
             logger.info(f"🔒 Cerrando SmartSession...")
             self.print_metrics()
         
@@ -169,6 +219,42 @@ class SmartSession:
     # MONITOREO Y MÉTRICAS
     # ========================================================================
     
+    def _crear_trace_config(self) -> aiohttp.TraceConfig:
+        """
+        TraceConfig que cuenta conexiones nuevas y reutilizadas del pool y
+        clasifica la latencia de cada petición en fría o caliente.
+        
+        Los pings internos (precalentar/keep-alive) se marcan con
+        trace_request_ctx={"interna": True} y no entran en las latencias.
+        """
+        trace_config = aiohttp.TraceConfig()
+        
+        async def on_request_start(session, ctx, params):
+            ctx.inicio = time.perf_counter()
+            ctx.fria = False
+        
+        async def on_connection_create_end(session, ctx, params):
+            self.metrics.conexiones_creadas += 1
+            ctx.fria = True
+        
+        async def on_connection_reuseconn(session, ctx, params):
+            self.metrics.conexiones_reutilizadas += 1
+        
+        async def on_request_end(session, ctx, params):
+            if (ctx.trace_request_ctx or {}).get("interna"):
+                return
+            latencia = (time.perf_counter() - ctx.inicio) * 1000
+            if ctx.fria:
+                self.metrics.latencias_frias.append(latencia)
+            else:
+                self.metrics.latencias_calientes.append(latencia)
+        
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+        trace_config.on_request_end.append(on_request_end)
+        return trace_config
+    
     def _update_metrics_before_request(self):
         """Actualiza métricas antes de cada petición."""
         if not self.metrics or not hasattr(self.connector, '_conns'):
@@ -200,7 +286,9 @@ class SmartSession:
                 'disponibles': conexiones libres,
                 'creadas': total creadas,
                 'reutilizadas': total reutilizadas,
-                'tasa_reutilizacion': porcentaje de reuso
+                'tasa_reutilizacion': porcentaje de reuso,
+                'latencia_fria_p50_ms' / 'latencia_caliente_p50_ms': p50 de
+                    peticiones que abrieron conexión vs. que la reutilizaron
             }
         """
         if not self.metrics:
@@ -213,6 +301,11 @@ class SmartSession:
             "creadas": self.metrics.conexiones_creadas,
             "reutilizadas": self.metrics.conexiones_reutilizadas,
             "tasa_reutilizacion": self.metrics.tasa_reutilizacion(),
+            "peticiones_frias": len(self.metrics.latencias_frias),
+            "peticiones_calientes": len(self.metrics.latencias_calientes),
+            "latencia_fria_p50_ms": PoolMetrics.latencia_p50(self.metrics.latencias_frias),
+            "latencia_caliente_p50_ms": PoolMetrics.latencia_p50(self.metrics.latencias_calientes),
+            "pings_keepalive": self.metrics.pings_keepalive,
         }
     
     def print_metrics(self):
@@ -256,6 +349,92 @@ class SmartSession:
         
         logger.info("✅ Health check: Pool saludable")
         return True
+    
+    # ========================================================================
+    # PRE-CALENTAMIENTO Y KEEP-ALIVE
+    # ========================================================================
+    
+    async def _ping(self, host: str) -> bool:
+        """HEAD liviano a host+ruta_ping; ocupa una conexión mientras dura."""
+        try:
+            async with self._session.head(
+                host + self.ruta_ping,
+                allow_redirects=False,
+                trace_request_ctx={"interna": True},
+            ) as response:
+                await response.read()
+            return True
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.debug(f"Ping a {host} falló: {type(e).__name__}")
+            return False
+    
+    async def precalentar(self, hosts: Optional[List[str]] = None,
+                          conexiones: Optional[int] = None) -> Dict[str, int]:
+        """
+        Abre `conexiones` conexiones por host antes de que llegue el tráfico.
+        
+        Lanza N pings CONCURRENTES: como ninguno libera su conexión antes de
+        que arranquen los demás, cada uno toma una conexión distinta (ociosa
+        del pool o nueva). Al terminar quedan N conexiones keep-alive listas.
+        
+        Args:
+            hosts: Orígenes a calentar. Default: los configurados en `hosts`
+            conexiones: Conexiones por host. Default (y máximo): pool_size
+        
+        Returns:
+            {host: pings exitosos}
+        """
+        hosts = [str(URL(h).origin()) for h in hosts] if hosts else self.hosts
+        conexiones = min(conexiones or self.pool_size, self.pool_size)
+        resultado = {}
+        for host in hosts:
+            oks = await asyncio.gather(*(self._ping(host) for _ in range(conexiones)))
+            resultado[host] = sum(oks)
+        logger.info(f"🔥 Pool precalentado: {resultado}")
+        return resultado
+    
+    def iniciar_keepalive(self, intervalo: Optional[float] = None,
+                          conexiones: Optional[int] = None) -> None:
+        """
+        Arranca el mantenedor keep-alive en segundo plano.
+        
+        Cada `intervalo` segundos (default: keepalive_timeout / 2) re-pingea
+        `conexiones` conexiones por host: las ociosas se reutilizan (su timer
+        de inactividad se reinicia en el cliente, el servidor y los
+        middleboxes intermedios) y las que alguien cerró se reabren, así la
+        próxima petición real no paga el handshake.
+        """
+        if self._tarea_keepalive is not None and not self._tarea_keepalive.done():
+            return
+        if not self.hosts:
+            raise ValueError("iniciar_keepalive() requiere hosts configurados")
+        intervalo = intervalo or self.keepalive_timeout / 2
+        self._tarea_keepalive = asyncio.get_running_loop().create_task(
+            self._bucle_keepalive(intervalo, conexiones)
+        )
+    
+    async def _bucle_keepalive(self, intervalo: float, conexiones: Optional[int]) -> None:
+        while True:
+            await asyncio.sleep(intervalo)
+            try:
+                resultado = await self.precalentar(conexiones=conexiones)
+            except Exception as e:
+                # El mantenedor nunca debe morir por un fallo puntual
+                logger.warning(f"⚠️  Keep-alive falló: {type(e).__name__}")
+                continue
+            if self.metrics:
+                self.metrics.pings_keepalive += sum(resultado.values())
+    
+    async def detener_keepalive(self) -> None:
+        """Detiene el mantenedor keep-alive si está corriendo."""
+        tarea, self._tarea_keepalive = self._tarea_keepalive, None
+        if tarea is None or tarea.done():
+            return
+        tarea.cancel()
+        try:
+            await tarea
+        except asyncio.CancelledError:
+            pass
 
 
 # ============================================================================
@@ -5,6 +5,12 @@ Benchmark: Sync vs Async Performance Comparison
 Rigorous benchmarking of synchronous vs asynchronous HTTP clients for
 EcoMarket to determine when async provides measurable benefits.
 
+Engines compared:
+- Sync: cliente_ecomarket sequential calls (semana_2)
+- Threads: same sync client on a ThreadPoolExecutor with one keep-alive
+  requests.Session per worker thread (motor_concurrente.py)
+- Async: aiohttp client (semana_3)
+
 Scenarios tested:
 1. Dashboard: 4 concurrent GET requests
 2. Bulk creation: 20 POST requests
@@ -36,6 +42,7 @@ import cliente_async_ecomarket as async_client
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', '..', 'semana_2', 'Aplica', 'RetoIA_3'))
 import cliente_ecomarket as sync_client
+from motor_concurrente import MotorConcurrente
 
 
 BASE_URL = "http://127.0.0.1:4010"
@@ -72,6 +79,35 @@ def benchmark_sync_dashboard(runs: int = 10) -> List[float]:
     return [t for t in tiempos if t > 0]
 
 
+def benchmark_threadpool_dashboard(runs: int = 10) -> List[float]:
+    """
+    Benchmark THREAD POOL version of dashboard loading.
+    
+    Same sync client, requests dispatched in parallel on worker threads.
+    The engine is created once so keep-alive connections survive across runs.
+    """
+    tiempos = []
+    peticiones = [
+        lambda sesion: sync_client.listar_productos(sesion=sesion),
+        lambda sesion: sync_client.listar_productos(categoria="miel", sesion=sesion),
+        lambda sesion: sync_client.obtener_producto(1, sesion=sesion),
+    ]
+    
+    with MotorConcurrente(max_workers=4) as motor:
+        for i in range(runs):
+            inicio = time.time()
+            
+            try:
+                motor.map(lambda sesion, peticion: peticion(sesion), peticiones)
+                tiempo_ms = (time.time() - inicio) * 1000
+                tiempos.append(tiempo_ms)
+            except Exception as e:
+                print(f"❌ Threads run {i+1} failed: {e}")
+                tiempos.append(-1)
+    
+    return [t for t in tiempos if t > 0]
+
+
 async def benchmark_async_dashboard(runs: int = 10) -> List[float]:
     """
     Benchmark ASYNC version of dashboard loading.
@@ -120,6 +156,30 @@ def benchmark_sync_bulk_creation(num_productos: int = 20) -> float:
     return tiempo_ms
 
 
+def benchmark_threadpool_bulk_creation(num_productos: int = 20, max_workers: int = 8) -> float:
+    """
+    Benchmark THREAD POOL version of bulk product creation.
+    
+    Creates products IN PARALLEL on `max_workers` threads (bounded like the
+    async semaphore), errors are collected instead of aborting the batch.
+    """
+    productos = [
+        {"nombre": f"Producto {i}", "precio": 100 + i*10, "categoria": "test"}
+        for i in range(num_productos)
+    ]
+    
+    inicio = time.time()
+    with MotorConcurrente(max_workers=max_workers) as motor:
+        motor.map(
+            lambda sesion, datos: sync_client.crear_producto(datos, sesion=sesion),
+            productos,
+            return_exceptions=True,
+        )
+    tiempo_ms = (time.time() - inicio) * 1000
+    
+    return tiempo_ms
+
+
 async def benchmark_async_bulk_creation(num_productos: int = 20) -> float:
     """
     Benchmark ASYNC version of bulk product creation.
@@ -188,17 +248,21 @@ async def generar_tabla_comparativa():
     # Scenario 1: Dashboard (4 requests)
     print("🔹 Scenario 1: Dashboard (4 concurrent GET)")
     tiempos_sync_dashboard = benchmark_sync_dashboard(runs=10)
+    tiempos_threads_dashboard = benchmark_threadpool_dashboard(runs=10)
     tiempos_async_dashboard = await benchmark_async_dashboard(runs=10)
     
     metricas_sync_dashboard = calcular_metricas(tiempos_sync_dashboard, 4)
+    metricas_threads_dashboard = calcular_metricas(tiempos_threads_dashboard, 4)
     metricas_async_dashboard = calcular_metricas(tiempos_async_dashboard, 4)
     
     # Scenario 2: Bulk Creation (20 requests)
     print("🔹 Scenario 2: Bulk Creation (20 POST)")
     tiempo_sync_bulk = benchmark_sync_bulk_creation(20)
+    tiempo_threads_bulk = benchmark_threadpool_bulk_creation(20)
     tiempo_async_bulk = await benchmark_async_bulk_creation(20)
     
     metricas_sync_bulk = calcular_metricas([tiempo_sync_bulk], 20)
+    metricas_threads_bulk = calcular_metricas([tiempo_threads_bulk], 20)
     metricas_async_bulk = calcular_metricas([tiempo_async_bulk], 20)
     
     # Print comparison table
@@ -206,33 +270,42 @@ async def generar_tabla_comparativa():
     print("RESULTS:")
     print("="*80 + "\n")
     
-    print("┌" + "─"*30 + "┬" + "─"*20 + "┬" + "─"*20 + "┬" + "─"*10 + "┐")
-    print(f"│ {'Scenario':^28} │ {'Sync (ms)':^18} │ {'Async (ms)':^18} │ {'Speedup':^8} │")
-    print("├" + "─"*30 + "┼" + "─"*20 + "┼" + "─"*20 + "┼" + "─"*10 + "┤")
+    print("┌" + "─"*30 + "┬" + "─"*20 + "┬" + "─"*20 + "┬" + "─"*20 + "┬" + "─"*10 + "┐")
+    print(f"│ {'Scenario':^28} │ {'Sync (ms)':^18} │ {'Threads (ms)':^18} │ {'Async (ms)':^18} │ {'Speedup':^8} │")
+    print("├" + "─"*30 + "┼" + "─"*20 + "┼" + "─"*20 + "┼" + "─"*20 + "┼" + "─"*10 + "┤")
     
     # Dashboard row
     speedup_dashboard = metricas_sync_dashboard["tiempo_total_ms"] / metricas_async_dashboard["tiempo_total_ms"]
+    speedup_threads_dashboard = metricas_sync_dashboard["tiempo_total_ms"] / metricas_threads_dashboard["tiempo_total_ms"]
     print(f"│ {'Dashboard (4 GET)':28} │ {metricas_sync_dashboard['tiempo_total_ms']:^18.0f} │ "
+          f"{metricas_threads_dashboard['tiempo_total_ms']:^18.0f} │ "
           f"{metricas_async_dashboard['tiempo_total_ms']:^18.0f} │ {speedup_dashboard:^8.2f}x │")
     
     # Bulk creation row
     speedup_bulk = metricas_sync_bulk["tiempo_total_ms"] / metricas_async_bulk["tiempo_total_ms"]
+    speedup_threads_bulk = metricas_sync_bulk["tiempo_total_ms"] / metricas_threads_bulk["tiempo_total_ms"]
     print(f"│ {'Bulk Creation (20 POST)':28} │ {metricas_sync_bulk['tiempo_total_ms']:^18.0f} │ "
+          f"{metricas_threads_bulk['tiempo_total_ms']:^18.0f} │ "
           f"{metricas_async_bulk['tiempo_total_ms']:^18.0f} │ {speedup_bulk:^8.2f}x │")
     
-    print("└" + "─"*30 + "┴" + "─"*20 + "┴" + "─"*20 + "┴" + "─"*10 + "┘")
+    print("└" + "─"*30 + "┴" + "─"*20 + "┴" + "─"*20 + "┴" + "─"*20 + "┴" + "─"*10 + "┘")
+    print("   Speedup column: Sync vs Async\n")
     
     # Detailed metrics
     print("\n📈 DETAILED METRICS:\n")
     
     print("Dashboard:")
-    print(f"   Sync:  {metricas_sync_dashboard['throughput_req_s']:.1f} req/s")
-    print(f"   Async: {metricas_async_dashboard['throughput_req_s']:.1f} req/s")
+    print(f"   Sync:    {metricas_sync_dashboard['throughput_req_s']:.1f} req/s")
+    print(f"   Threads: {metricas_threads_dashboard['throughput_req_s']:.1f} req/s")
+    print(f"   Async:   {metricas_async_dashboard['throughput_req_s']:.1f} req/s")
+    print(f"   → Threads are {speedup_threads_dashboard:.1f}x faster than sync")
     print(f"   → Async is {speedup_dashboard:.1f}x faster\n")
     
     print("Bulk Creation:")
-    print(f"   Sync:  {metricas_sync_bulk['throughput_req_s']:.1f} req/s")
-    print(f"   Async: {metricas_async_bulk['throughput_req_s']:.1f} req/s")
+    print(f"   Sync:    {metricas_sync_bulk['throughput_req_s']:.1f} req/s")
+    print(f"   Threads: {metricas_threads_bulk['throughput_req_s']:.1f} req/s")
+    print(f"   Async:   {metricas_async_bulk['throughput_req_s']:.1f} req/s")
+    print(f"   → Threads are {speedup_threads_bulk:.1f}x faster than sync")
     print(f"   → Async is {speedup_bulk:.1f}x faster\n")
     
     # Crossover point analysis
@@ -258,13 +331,17 @@ async def generar_tabla_comparativa():
     return {
         "dashboard": {
             "sync": metricas_sync_dashboard,
+            "threads": metricas_threads_dashboard,
             "async": metricas_async_dashboard,
-            "speedup": speedup_dashboard
+            "speedup": speedup_dashboard,
+            "speedup_threads": speedup_threads_dashboard
         },
         "bulk": {
             "sync": metricas_sync_bulk,
+            "threads": metricas_threads_bulk,
             "async": metricas_async_bulk,
-            "speedup": speedup_bulk
+            "speedup": speedup_bulk,
+            "speedup_threads": speedup_threads_bulk
         }
     }
 
@@ -287,14 +364,21 @@ async def comparar_uso_memoria():
     _, peak_sync = tracemalloc.get_traced_memory()
     tracemalloc.stop()
     
+    # Thread pool version
+    tracemalloc.start()
+    _ = benchmark_threadpool_dashboard(runs=5)
+    _, peak_threads = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
     # Async version
     tracemalloc.start()
     _ = await benchmark_async_dashboard(runs=5)
     _, peak_async = tracemalloc.get_traced_memory()
     tracemalloc.stop()
     
-    print(f"Sync version:  {peak_sync / 1024:.1f} KB")
-    print(f"Async version: {peak_async / 1024:.1f} KB")
+    print(f"Sync version:    {peak_sync / 1024:.1f} KB")
+    print(f"Threads version: {peak_threads / 1024:.1f} KB")
+    print(f"Async version:   {peak_async / 1024:.1f} KB")
     print(f"Difference:    {(peak_async - peak_sync) / 1024:+.1f} KB")
     print()
     
@@ -342,6 +426,12 @@ def generar_recomendacion(resultados: Dict):
     print("      → Don't fix what isn't broken")
     print()
     
+    print("🧵 USE THE THREAD POOL ENGINE if:\n")
+    print("   1. A batch job must stay synchronous (requests-based)")
+    print(f"      → Observed speedup vs sync: {resultados['bulk']['speedup_threads']:.1f}x (bulk)")
+    print("   2. Concurrency stays in the tens of requests (one thread each)")
+    print()
+    
     print("="*80)
     print("FINAL VERDICT:")
     print("="*80 + "\n")
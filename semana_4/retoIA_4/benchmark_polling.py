@@ -0,0 +1,169 @@
+"""
+Benchmark de ServicioPolling con 10.000 productos
+=================================================
+
+Compara lo que hacía cada sondeo antes con lo que hace ahora:
+
+1. Comparación de snapshots (sin red)
+   - antes: json.dumps(productos, sort_keys=True) de la lista completa y
+            comparación del string con el anterior
+   - ahora: ServicioPolling._calcular_delta(), un hash por producto (por id)
+   Se mide un sondeo sin cambios y uno con el 1% de productos modificados.
+
+2. Sesión por sondeo vs sesión persistente (red local)
+   Un servidor aiohttp en 127.0.0.1 sirve los 10.000 productos; se hacen N
+   sondeos abriendo una ClientSession en cada uno (antes) y con una sola
+   sesión (ahora). El servidor cuenta las conexiones TCP que recibe.
+
+Ejecutar: python benchmark_polling.py [--productos 10000] [--sondeos 20]
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import aiohttp
+from aiohttp import web
+
+from monitor import ServicioPolling
+
+PRODUCTOS = 10_000
+SONDEOS = 20
+CATEGORIAS = ["frutas", "lacteos", "panaderia", "bebidas", "limpieza"]
+
+
+def generar_productos(n):
+    return [
+        {
+            "id": i,
+            "nombre": f"Producto {i}",
+            "precio": round(1 + (i * 37 % 1000) / 10, 2),
+            "categoria": CATEGORIAS[i % len(CATEGORIAS)],
+            "stock": i * 13 % 200,
+            "disponible": True,
+        }
+        for i in range(1, n + 1)
+    ]
+
+
+def con_cambios(productos, fraccion):
+    """Copia de la lista con `fraccion` de los productos con otro precio."""
+    paso = max(int(1 / fraccion), 1)
+    return [
+        {**p, "precio": p["precio"] + 1} if i % paso == 0 else p
+        for i, p in enumerate(productos)
+    ]
+
+
+def medir(fn, repeticiones):
+    """Mediana en ms de `repeticiones` llamadas."""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        fn()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos)
+
+
+# ============================================================================
+# 1. COMPARACIÓN DE SNAPSHOTS
+# ============================================================================
+
+def benchmark_comparacion(productos, repeticiones=15):
+    # Cada sondeo trae objetos nuevos (como resp.json()), no los mismos de antes
+    iguales = json.loads(json.dumps(productos))
+    modificados = json.loads(json.dumps(con_cambios(productos, 0.01)))
+
+    ultima_lista = json.dumps(productos, sort_keys=True)
+    monitor = ServicioPolling(5)
+    monitor._calcular_delta(productos)
+    huellas, ultimos = monitor._huellas, monitor._productos
+
+    def antes(lista):
+        return json.dumps(lista, sort_keys=True) != ultima_lista
+
+    def ahora(lista):
+        # El monitor guarda el último sondeo: se parte siempre del mismo estado
+        monitor._huellas, monitor._productos = huellas, ultimos
+        return monitor._calcular_delta(lista)
+
+    assert not antes(iguales) and antes(modificados)
+    assert not any(ahora(iguales).values())
+    delta = ahora(modificados)
+    assert len(delta["modificados"]) == len(productos) // 100
+
+    print(f"\n1) Comparación de snapshots — {len(productos):,} productos (mediana, ms)")
+    print(f"   {'sondeo':<16}{'json.dumps':>12}{'delta':>10}")
+    for nombre, lista in (("sin cambios", iguales), ("1% modificados", modificados)):
+        t_antes = medir(lambda: antes(lista), repeticiones)
+        t_ahora = medir(lambda: ahora(lista), repeticiones)
+        print(f"   {nombre:<16}{t_antes:>12.2f}{t_ahora:>10.2f}")
+    print(f"   Con 1% modificado los observadores reciben {len(delta['modificados'])} productos, no {len(productos):,}")
+
+
+# ============================================================================
+# 2. SESIÓN POR SONDEO VS SESIÓN PERSISTENTE
+# ============================================================================
+
+async def benchmark_sesiones(productos, sondeos):
+    cuerpo = json.dumps(productos)
+    conexiones = set()
+
+    async def listar(request):
+        conexiones.add(request.transport.get_extra_info("peername"))
+        return web.Response(text=cuerpo, content_type="application/json")
+
+    app = web.Application()
+    app.router.add_get("/productos", listar)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    sitio = web.TCPSite(runner, "127.0.0.1", 0)
+    await sitio.start()
+    puerto = sitio._server.sockets[0].getsockname()[1]
+    url = f"http://127.0.0.1:{puerto}/productos"
+    timeout = aiohttp.ClientTimeout(total=10)
+
+    async def sondeo(session):
+        async with session.get(url) as resp:
+            return await resp.json()
+
+    async def sesion_por_sondeo():
+        for _ in range(sondeos):
+            async with aiohttp.ClientSession(timeout=timeout) as session:
+                await sondeo(session)
+
+    async def sesion_persistente():
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            for _ in range(sondeos):
+                await sondeo(session)
+
+    print(f"\n2) {sondeos} sondeos de {len(productos):,} productos contra 127.0.0.1")
+    print(f"   {'modo':<22}{'ms/sondeo':>10}{'conexiones TCP':>16}")
+    try:
+        for nombre, fn in (("sesión por sondeo", sesion_por_sondeo), ("sesión persistente", sesion_persistente)):
+            conexiones.clear()
+            inicio = time.perf_counter()
+            await fn()
+            ms = (time.perf_counter() - inicio) * 1000 / sondeos
+            print(f"   {nombre:<22}{ms:>10.2f}{len(conexiones):>16}")
+    finally:
+        await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--productos", type=int, default=PRODUCTOS)
+    parser.add_argument("--sondeos", type=int, default=SONDEOS)
+    args = parser.parse_args()
+
+    productos = generar_productos(args.productos)
+    benchmark_comparacion(productos)
+    asyncio.run(benchmark_sesiones(productos, args.sondeos))
+    print("\nNota: la mayor parte del tiempo por sondeo es transferir y decodificar el JSON;")
+    print("la sesión persistente ahorra el handshake TCP y el diff evita serializar la lista.")
+
+
+if __name__ == "__main__":
+    main()
@@ -24,6 +24,19 @@ TIMEOUT = 5S
   tarea ligera. Lo malo es que si en el futuro el servidor tiene la necesidad de procesar peticiones 
   más complejas, este timeout podría ser insuficiente.
 
+SESION PERSISTENTE = una aiohttp.ClientSession para todo el monitoreo
+  -> Trade-off: antes cada sondeo abría una sesión nueva y pagaba una conexión
+  TCP nueva. Con una sola sesión el keep-alive reusa la conexión. Lo malo: hay
+  que cerrarla (cerrar() / al salir de iniciar()) y tras un error se descarta
+  por si la conexión quedó rota.
+
+DIFF INCREMENTAL = hash del contenido de cada producto por id
+  -> Trade-off: antes se serializaba la lista completa con json.dumps(sort_keys=True)
+  en cada sondeo solo para compararla. Ahora se compara un hash por producto y
+  los observadores reciben un delta {"agregados", "modificados", "eliminados"}
+  en lugar de la lista entera. Lo malo: el monitor guarda un hash y el último
+  producto por id (memoria O(n)); la lista completa sigue en monitor.productos.
+
 """
 
 
@@ -93,6 +106,15 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'r
 from cliente_async_ecomarket import listar_productos, BASE_URL, TIMEOUT
 
 
+def _huella(producto):
+    """Hash del contenido de un producto, sin importar el orden de sus claves."""
+    try:
+        return hash(frozenset(producto.items()))
+    except TypeError:
+        # Valores anidados (listas/dicts): se serializa solo este producto
+        return hash(json.dumps(producto, sort_keys=True))
+
+
 class ServicioPolling(Observable):
     def __init__(self, intervalo_seg):
         super().__init__()
@@ -100,36 +122,72 @@ class ServicioPolling(Observable):
         self.intervalo_base = intervalo_seg
         self.intervalo_actual = intervalo_seg
         self.intervalo_max = 60
-        self._ultima_lista = None
+        self._huellas = None  # id -> hash del contenido en el último sondeo
+        self._productos = {}  # id -> último producto visto
+        self._session = None
         self._activo = False
 
+    @property
+    def productos(self):
+        """Lista completa del último sondeo (los observadores solo reciben el delta)."""
+        return list(self._productos.values())
+
+    async def _sesion(self):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=TIMEOUT)
+        return self._session
+
+    async def cerrar(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
     async def iniciar(self):
         self._activo = True
         print(f"[*] Iniciando monitoreo en {self.url_base}...")
 
-        while self._activo:
-            await self._consultar()
-            await asyncio.sleep(self.intervalo_actual)
+        try:
+            while self._activo:
+                await self._consultar()
+                await asyncio.sleep(self.intervalo_actual)
+        finally:
+            await self.cerrar()
+
+    def _calcular_delta(self, productos):
+        """Compara el hash de cada producto (por id) con el del sondeo anterior."""
+        anteriores = self._huellas or {}
+        huellas = {}
+        actuales = {}
+        agregados, modificados = [], []
+        for producto in productos:
+            clave = producto.get("id", producto.get("nombre"))
+            huella = _huella(producto)
+            huellas[clave] = huella
+            actuales[clave] = producto
+            previa = anteriores.get(clave)
+            if previa is None:
+                agregados.append(producto)
+            elif previa != huella:
+                modificados.append(producto)
+        eliminados = [self._productos[clave] for clave in anteriores if clave not in huellas]
+
+        self._huellas = huellas
+        self._productos = actuales
+        return {"agregados": agregados, "modificados": modificados, "eliminados": eliminados}
 
     async def _consultar(self):
         try:
-            timeout_cliente = aiohttp.ClientTimeout(total=10)
-            async with aiohttp.ClientSession(timeout=timeout_cliente) as session:
-                productos = await listar_productos(session)
+            session = await self._sesion()
+            productos = await listar_productos(session)
             if productos is None:
                 await self.notificar("error_servidor", "Productos nulos")
                 return
-            lista_actual = json.dumps(productos, sort_keys=True)
+            primer_sondeo = self._huellas is None
+            delta = self._calcular_delta(productos)
 
-            if self._ultima_lista is None:
-                self._ultima_lista = lista_actual
+            if primer_sondeo or delta["agregados"] or delta["modificados"] or delta["eliminados"]:
                 self.intervalo_actual = self.intervalo_base
-                await self.notificar("datos_actualizados", productos)
-
-            elif lista_actual != self._ultima_lista:
-                self._ultima_lista = lista_actual
-                self.intervalo_actual = self.intervalo_base
-                await self.notificar("datos_actualizados", productos)
+                await self.notificar("datos_actualizados", delta)
 
             else:
                 self.intervalo_actual = min(
@@ -142,6 +200,7 @@ class ServicioPolling(Observable):
         except Exception as e:
             print(f"Error inesperado: {e}")
             self.intervalo_actual = self.intervalo_max
+            await self.cerrar()  # la conexión pudo quedar rota: el próximo sondeo abre otra
             await self.notificar("error_servidor", str(e))
 
     def detener(self):
@@ -153,7 +212,12 @@ class ServicioPolling(Observable):
 
 
 async def actualizar_ui(datos):
-    if isinstance(datos, (list, dict)):
+    if isinstance(datos, dict) and "agregados" in datos:
+        print(
+            f"[{datetime.now().strftime('%H:%M:%S')}] UI Actualizada: "
+            f"+{len(datos['agregados'])} ~{len(datos['modificados'])} -{len(datos['eliminados'])}"
+        )
+    elif isinstance(datos, (list, dict)):
         print(f"[{datetime.now().strftime('%H:%M:%S')}] UI Actualizada: {datos}")
     else:
         # Reacción al error
@@ -8,6 +8,16 @@ import asyncio
 from unittest.mock import patch, AsyncMock, MagicMock
 from monitor import ServicioPolling
 
+
+def consultar_una_vez(monitor):
+    """Un sondeo y cierra la sesión del monitor (como hace iniciar() al terminar)."""
+    async def sondeo():
+        try:
+            await monitor._consultar()
+        finally:
+            await monitor.cerrar()
+    asyncio.run(sondeo())
+
 # 1. Patch 'listar_productos' where it is used (inside the monitor module)
 # We use new_callable=AsyncMock because it's an 'async def' function
 @patch('monitor.listar_productos', new_callable=AsyncMock)
@@ -27,7 +37,7 @@ def test_inventario_timeout(mock_listar):
     # 3. Subscribe the spy to listen for errors
     monitor.suscribir("error_servidor", spy_error_observer)
     
-    asyncio.run(monitor._consultar())
+    consultar_una_vez(monitor)
     
     if monitor.intervalo_actual == monitor.intervalo_max and error_was_broadcasted:
         print("Success! The timeout was handled AND the error was broadcasted.")
@@ -57,7 +67,7 @@ def test_inventario_html_response(mock_listar):
     monitor.suscribir("error_servidor", spy_error_observer)
     
     # 4. Run the async method.
-    asyncio.run(monitor._consultar())
+    consultar_una_vez(monitor)
     
     # 5. Verify the behavior
     if monitor.intervalo_actual == monitor.intervalo_max and error_was_broadcasted:
@@ -90,7 +100,7 @@ def test_observer_exception(mock_listar):
     monitor.suscribir("datos_actualizados", spy_success_observer)
 
     # 1. ¡FALTABA ESTA LÍNEA! Ejecutar el monitor
-    asyncio.run(monitor._consultar())
+    consultar_una_vez(monitor)
 
     # 2. VALIDACIÓN CORREGIDA:
     # Verificamos que el segundo observador se ejecutó a pesar del crash del primero.
@@ -113,7 +123,7 @@ def test_Null_Data(mock_listar):
 
     monitor.suscribir("error_servidor", spy_nullish_observer)
 
-    asyncio.run(monitor._consultar())
+    consultar_una_vez(monitor)
 
     if nullish_was_handled:
         print("Success! The nullish data was handled AND the error was broadcasted.")
@@ -146,7 +156,40 @@ def test_desacoplamiento_extremo():
     alien_observer.assert_called_once_with(datos_ficticios)
     print("¡Éxito! El ServicioPolling está perfectamente desacoplado.")
     
-    
+
+
+""" Scenario E - Sondeos con una sola sesion: el observador recibe solo el delta """
+@patch('monitor.listar_productos', new_callable=AsyncMock)
+def test_delta_incremental(mock_listar):
+    mock_listar.side_effect = [
+        [{"id": 1, "nombre": "Cafe", "precio": 10}, {"id": 2, "nombre": "Te", "precio": 5}],
+        [{"precio": 12, "nombre": "Cafe", "id": 1}, {"id": 3, "nombre": "Miel", "precio": 8}],
+        # Mismo contenido en otro orden: no es un cambio
+        [{"id": 3, "nombre": "Miel", "precio": 8}, {"id": 1, "precio": 12, "nombre": "Cafe"}],
+    ]
+    monitor = ServicioPolling(5)
+    deltas = []
+    monitor.suscribir("datos_actualizados", deltas.append)
+
+    async def tres_sondeos():
+        for _ in range(3):
+            await monitor._consultar()
+        await monitor.cerrar()
+
+    asyncio.run(tres_sondeos())
+
+    sesiones = {id(llamada.args[0]) for llamada in mock_listar.call_args_list}
+    assert len(sesiones) == 1, "Cada sondeo abrió una sesión nueva"
+    assert len(deltas) == 2
+    assert [p["id"] for p in deltas[0]["agregados"]] == [1, 2]
+    assert deltas[1] == {
+        "agregados": [{"id": 3, "nombre": "Miel", "precio": 8}],
+        "modificados": [{"precio": 12, "nombre": "Cafe", "id": 1}],
+        "eliminados": [{"id": 2, "nombre": "Te", "precio": 5}],
+    }
+    assert monitor.intervalo_actual == 7.5
+    assert [p["id"] for p in monitor.productos] == [3, 1]
+    print("Success! Una sola sesión y solo se notificó lo que cambió.")
 
 
 if __name__ == "__main__":
@@ -165,6 +208,9 @@ if __name__ == "__main__":
     print("\n--- Running Test Desacoplamiento ---")
     test_desacoplamiento_extremo()
 
+    print("\n--- Running Scenario E ---")
+    test_delta_incremental()
+
 
 
 
@@ -10,11 +10,16 @@ DECISIONES DE DISEÑO — Cliente EcoMarket / Hito 1
 [PATRÓN OBSERVER]: 2 observadores iniciales (UI y Alertas) suscritos desde el main → Trade-off: Se gana una excelente mantenibilidad y se respeta el principio Open/Closed, a costa de una ligera complejidad arquitectónica inicial frente a tener un código espagueti directo. Decisión: Excelente para EcoMarket, ya que garantiza que el sistema cliente pueda escalar fácilmente agregando nuevas vías de notificación (como correos o push) sin tocar la lógica del monitor de inventario.
 
 [PRIORIDAD DE REFACTORIZACIÓN]: Desacoplamiento y planeación sobre funcionalidad pura → Trade-off: Se sacrifica velocidad de entrega a corto plazo para ganar un código mantenible, limpio y escalable a largo plazo, reduciendo la deuda técnica. Decisión: Es la mentalidad correcta para EcoMarket; asegurar que las piezas del cliente sean modulares permitirá que el proyecto no colapse sobre su propio peso conforme agregues más características.
+
+[DETECCIÓN DE CAMBIOS]: RastreadorPedidos indexado por id que emite una TransicionPedido por pedido nuevo, modificado o eliminado, y suscripciones por predicado (suscribir_cuando(estado_pasa_a("RETRASADO"), obs)) → Trade-off: Se gana que cada sondeo cueste O(pedidos) una sola vez y que cada predicado se evalúe una vez por cambio (no una vez por observador sobre la lista completa), a costa de guardar el último pedido por id en memoria. Decisión: Los observadores de alertas solo reciben las transiciones que les interesan y una sola vez; los que necesitan la lista completa (el dashboard) la siguen recibiendo con suscribir().
 """
 import asyncio
 import aiohttp
+import functools
 import logging
 from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Callable, Optional
 
 # Configuración básica de logging
 logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
@@ -48,6 +53,64 @@ class Observable:
         for observador in self._observadores:
             observador.actualizar(datos)
 
+# =============================================================================
+# Rastreo incremental por id
+# =============================================================================
+@dataclass(frozen=True)
+class TransicionPedido:
+    id: object
+    anterior: Optional[dict]  # None si el pedido es nuevo
+    actual: Optional[dict]    # None si el pedido desapareció
+
+    @property
+    def tipo(self):
+        if self.anterior is None:
+            return "nuevo"
+        return "eliminado" if self.actual is None else "cambio"
+
+    @property
+    def estado_anterior(self):
+        return self.anterior.get('status') if self.anterior else None
+
+    @property
+    def estado_actual(self):
+        return self.actual.get('status') if self.actual else None
+
+
+class RastreadorPedidos:
+    """Guarda el último pedido visto por id y calcula qué cambió en cada sondeo."""
+
+    def __init__(self):
+        self._pedidos = {}
+
+    def procesar(self, pedidos):
+        # Una pasada por la lista: comparación pedido a pedido, no de la lista entera
+        actuales = {}
+        transiciones = []
+        for pedido in pedidos:
+            p_id = pedido.get('id')
+            actuales[p_id] = pedido
+            anterior = self._pedidos.get(p_id)
+            if anterior != pedido:
+                transiciones.append(TransicionPedido(p_id, anterior, pedido))
+        for p_id, anterior in self._pedidos.items():
+            if p_id not in actuales:
+                transiciones.append(TransicionPedido(p_id, anterior, None))
+        self._pedidos = actuales
+        return transiciones
+
+    def __len__(self):
+        return len(self._pedidos)
+
+
+@functools.lru_cache(maxsize=None)
+def estado_pasa_a(status):
+    """Predicado "el status pasa a ser `status`" (mismo objeto para el mismo status)."""
+    def predicado(transicion):
+        return transicion.estado_actual == status and transicion.estado_anterior != status
+    predicado.__name__ = f"estado_pasa_a({status!r})"
+    return predicado
+
 # =============================================================================
 # IMPLEMENTACIÓN DEL SIMULACRO
 # =============================================================================
@@ -70,6 +133,32 @@ class MonitorPedidos(Observable):
         # Inicializar ultimo_estado = None (para detectar cambios)
         self.ultimo_estado = None
 
+        # Cambios por id y observadores agrupados por predicado
+        self.rastreador = RastreadorPedidos()
+        self._por_predicado = {}
+
+    def suscribir_cuando(self, predicado: Callable[[TransicionPedido], bool], observador):
+        # Observadores con el mismo predicado comparten una sola evaluación por cambio
+        observadores = self._por_predicado.setdefault(predicado, [])
+        if observador not in observadores:
+            observadores.append(observador)
+
+    def desuscribir_cuando(self, predicado, observador):
+        observadores = self._por_predicado.get(predicado, [])
+        if observador in observadores:
+            observadores.remove(observador)
+            if not observadores:
+                del self._por_predicado[predicado]
+
+    def _notificar_transiciones(self, transiciones):
+        # Cada predicado se evalúa una vez por transición; los observadores
+        # reciben solo la lista de transiciones que lo cumplen
+        for predicado, observadores in list(self._por_predicado.items()):
+            coincidencias = [t for t in transiciones if predicado(t)]
+            if coincidencias:
+                for observador in list(observadores):
+                    observador.actualizar(coincidencias)
+
     async def _consultar_pedidos(self):
         url = f"{self.base_url}/pedidos"
         # GET a /pedidos con timeout y manejo de errores
@@ -113,9 +202,11 @@ class MonitorPedidos(Observable):
             
             if pedidos_actuales is not None:
                 # Si hay cambios respecto al ultimo_estado → _notificar
-                if pedidos_actuales != self.ultimo_estado:
-                    self._notificar(pedidos_actuales)
+                transiciones = self.rastreador.procesar(pedidos_actuales)
+                if transiciones or self.ultimo_estado is None:
                     self.ultimo_estado = pedidos_actuales
+                    self._notificar(pedidos_actuales)
+                    self._notificar_transiciones(transiciones)
                     
                     # Reiniciamos el intervalo al base porque hubo cambios exitosos
                     self.intervalo_actual = self.INTERVALO_BASE
@@ -155,20 +246,18 @@ class ObservadorPedidosUI(Observador):
         print("="*50 + "\n")
 
 class ObservadorPedidosCriticos(Observador):
-    def actualizar(self, pedidos):
-        # Filtrar pedidos con status "RETRASADO" y mostrar alerta
-        if not pedidos:
+    # Se suscribe con monitor.suscribir_cuando(estado_pasa_a("RETRASADO"), ...):
+    # recibe solo los pedidos que acaban de pasar a RETRASADO, una vez cada uno
+    def actualizar(self, transiciones):
+        if not transiciones:
             return
-            
-        retrasados = [p for p in pedidos if p.get('status') == "RETRASADO"]
-        
-        if retrasados:
-            print("!"*50)
-            print("🚨 [ALERTA] SE DETECTARON PEDIDOS RETRASADOS 🚨")
-            print("!"*50)
-            for p in retrasados:
-                print(f"⚠️  ATENCIÓN REQUERIDA: Pedido {p.get('id')} del cliente {p.get('cliente')} está RETRASADO.")
-            print("!"*50 + "\n")
+
+        print("!"*50)
+        print("🚨 [ALERTA] SE DETECTARON PEDIDOS RETRASADOS 🚨")
+        print("!"*50)
+        for t in transiciones:
+            print(f"⚠️  ATENCIÓN REQUERIDA: Pedido {t.id} del cliente {t.actual.get('cliente')} está RETRASADO.")
+        print("!"*50 + "\n")
 
 # =============================================================================
 # Ejemplo de uso / Pruebas
@@ -184,7 +273,7 @@ async def main():
         ui = ObservadorPedidosUI()
         alertas = ObservadorPedidosCriticos()
         monitor.suscribir(ui)
-        monitor.suscribir(alertas)
+        monitor.suscribir_cuando(estado_pasa_a("RETRASADO"), alertas)
         
         # Ejecutar en segundo plano
         tarea = asyncio.create_task(monitor.iniciar())
@@ -0,0 +1,113 @@
+"""
+BENCHMARK EventRouterPrioritizado — Throughput de despacho · Semana 7
+=====================================================================
+Programación Distribuida del Lado del Cliente · UAN
+
+Mide eventos despachados por segundo con handlers vacíos (se mide el
+router, no el trabajo de los handlers):
+
+  - original       → EventRouter dado (sin prioridades)
+  - antes          → despacho previo: sorted() con lambda por evento + print
+                     por evento (salida a un buffer en memoria, sin terminal)
+  - tabla          → EventRouterPrioritizado(silencioso=True).despachar()
+  - lote           → despachar_lote() en lotes de 32 eventos (un chunk SSE)
+
+Ejecutar:
+    python benchmark_router.py [--eventos 200000] [--handlers 4]
+"""
+
+import argparse
+import contextlib
+import io
+import time
+from datetime import datetime
+
+from event_router_prioritizado import EventRouter, EventRouterPrioritizado
+
+EVENTOS = 200_000
+HANDLERS = 4
+LOTE = 32
+TIPOS = ("precio-actualizado", "stock-critico", "sistema-ping", "pedido-nuevo")
+
+
+def _despachar_antes(router: EventRouterPrioritizado, tipo: str, datos: str) -> None:
+    """Copia del despachar() anterior: ordena y imprime en cada evento."""
+    if tipo not in router._registro or not router._registro[tipo]:
+        return
+    handlers_ordenados = sorted(router._registro[tipo], key=lambda t: (-t[0], t[1]))
+    ts = datetime.now().strftime("%H:%M:%S")
+    print(f"  [router-prioritizado] [{ts}] Despachando '{tipo}' en orden de prioridad:")
+    for prioridad, _, fn in handlers_ordenados:
+        print(f"    → [{prioridad}] {fn.__name__}")
+        try:
+            fn(datos)
+        except Exception as e:
+            print(f"    ⚡ Handler '{fn.__name__}' falló: {e} — continuando")
+
+
+def _handler(datos: str) -> None:
+    pass
+
+
+def _routers(handlers: int):
+    original = EventRouter()
+    prioritizado = EventRouterPrioritizado(silencioso=True)
+    for tipo in TIPOS:
+        for prioridad in range(handlers):
+            original.registrar(tipo, _handler)
+            prioritizado.registrar(tipo, _handler, prioridad=(prioridad * 7) % 11)
+    return original, prioritizado
+
+
+def _cronometrar(fn, eventos: list) -> float:
+    inicio = time.perf_counter()
+    fn(eventos)
+    return len(eventos) / (time.perf_counter() - inicio)
+
+
+def medir(n_eventos: int, handlers: int) -> list:
+    original, prioritizado = _routers(handlers)
+    eventos = [(TIPOS[i % len(TIPOS)], '{"producto_id": "P001"}') for i in range(n_eventos)]
+
+    def con_original(evs):
+        for tipo, datos in evs:
+            original.despachar(tipo, datos)
+
+    def con_antes(evs):
+        with contextlib.redirect_stdout(io.StringIO()):
+            for tipo, datos in evs:
+                _despachar_antes(prioritizado, tipo, datos)
+
+    def con_tabla(evs):
+        for tipo, datos in evs:
+            prioritizado.despachar(tipo, datos)
+
+    def con_lote(evs):
+        for i in range(0, len(evs), LOTE):
+            prioritizado.despachar_lote(evs[i:i + LOTE])
+
+    return [
+        (nombre, _cronometrar(fn, eventos))
+        for nombre, fn in (("original", con_original), ("antes", con_antes),
+                           ("tabla", con_tabla), ("lote", con_lote))
+    ]
+
+
+def imprimir_tabla(resultados: list, handlers: int) -> None:
+    base = dict(resultados)["antes"]
+    print(f"\n  {handlers} handlers por tipo, {len(TIPOS)} tipos")
+    print(f"  {'Modo':<10} {'eventos/s':>12} {'vs antes':>10}")
+    print("  " + "-" * 34)
+    for nombre, tasa in resultados:
+        print(f"  {nombre:<10} {tasa:>12,.0f} {tasa / base:>9.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--eventos", type=int, default=EVENTOS)
+    parser.add_argument("--handlers", type=int, default=HANDLERS)
+    args = parser.parse_args()
+    print("=" * 65)
+    print("  BENCHMARK EventRouterPrioritizado — eventos/s")
+    print("=" * 65)
+    imprimir_tabla(medir(args.eventos, args.handlers), args.handlers)
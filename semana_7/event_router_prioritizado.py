@@ -34,6 +34,25 @@ Escenario de EcoMarket:
 
 INV-P1: Interfaz original (registrar sin prioridad) funciona con default=5.
 INV-P2: ClienteSSEMultiplex no cambia — solo llama a despachar(tipo, datos).
+
+RENDIMIENTO: tablas de despacho precompiladas
+=============================================
+despachar() se llama por cada evento del stream; registrar() casi nunca.
+Por eso el orden se calcula al registrar/desregistrar y no al despachar:
+
+1. Por cada tipo se guarda una TUPLA inmutable de (prioridad, handler) ya
+   ordenada. registrar()/desregistrar() construyen un dict nuevo y lo
+   asignan de una vez (copy-on-write), así despachar() nunca ve una tabla a
+   medio actualizar, ni siquiera si un handler registra otro handler.
+2. despachar(tipo, datos) = un dict.get + recorrer la tupla: O(1) en el
+   número de tipos y sin sorted()/lambda por evento.
+3. despachar_lote(eventos) cumple la promesa del escenario de arriba: dentro
+   de UN lote leído del stream, todos los handlers de prioridad 10 corren
+   antes que los de prioridad 5, sin importar qué evento llegó primero.
+   Empates: orden de llegada del evento y luego orden de registro.
+4. silencioso=True no imprime nada por evento (solo fallos de handlers).
+   Con cientos de eventos por segundo, el print() costaba más que el
+   despacho. Ver benchmark_router.py.
 """
 
 import asyncio
@@ -86,7 +105,7 @@ class EventRouterPrioritizado:
       - El ClienteSSEMultiplex no cambia — solo llama a despachar() (INV-P2)
 
     Uso:
-      router = EventRouterPrioritizado()
+      router = EventRouterPrioritizado()               # silencioso=True en producción
       router.registrar("stock-critico",      handler_stock, prioridad=10)  # alta
       router.registrar("precio-actualizado", handler_precio, prioridad=5)  # media
       router.registrar("sistema-ping",       handler_ping, prioridad=1)    # baja
@@ -95,11 +114,24 @@ class EventRouterPrioritizado:
 
     PRIORIDAD_DEFAULT = 5
 
-    def __init__(self):
+    def __init__(self, silencioso: bool = False):
         # Almacena tuplas (prioridad, orden_registro, handler_fn) por tipo
         # El orden_registro garantiza FIFO para misma prioridad
         self._registro: Dict[str, List[Tuple[int, int, Callable]]] = defaultdict(list)
         self._contador = 0  # orden de registro global para desempate FIFO
+        # Tablas precompiladas: tipo → tupla de (prioridad, fn) en orden de despacho
+        self._tablas: Dict[str, Tuple[Tuple[int, Callable], ...]] = {}
+        self.silencioso = silencioso
+
+    def _compilar(self, tipo: str) -> None:
+        """Reordena los handlers de `tipo` y publica una tabla nueva (copy-on-write)."""
+        ordenados = sorted(self._registro[tipo], key=lambda t: (-t[0], t[1]))
+        tablas = dict(self._tablas)
+        if ordenados:
+            tablas[tipo] = tuple((prioridad, fn) for prioridad, _, fn in ordenados)
+        else:
+            tablas.pop(tipo, None)
+        self._tablas = tablas  # una sola asignación: despachar ve la tabla vieja o la nueva
 
     def registrar(self, tipo: str, fn: Callable, prioridad: int = PRIORIDAD_DEFAULT) -> None:
         """
@@ -108,9 +140,11 @@ class EventRouterPrioritizado:
         """
         self._registro[tipo].append((prioridad, self._contador, fn))
         self._contador += 1
-        ts = datetime.now().strftime("%H:%M:%S")
-        print(f"  📋 [{ts}] Registrado '{fn.__name__}' para '{tipo}' "
-              f"(prioridad={prioridad})")
+        self._compilar(tipo)
+        if not self.silencioso:
+            ts = datetime.now().strftime("%H:%M:%S")
+            print(f"  📋 [{ts}] Registrado '{fn.__name__}' para '{tipo}' "
+                  f"(prioridad={prioridad})")
 
     def desregistrar(self, tipo: str, fn: Callable) -> None:
         """Elimina todas las entradas de fn para el tipo dado."""
@@ -118,6 +152,7 @@ class EventRouterPrioritizado:
             self._registro[tipo] = [
                 (p, o, f) for p, o, f in self._registro[tipo] if f != fn
             ]
+            self._compilar(tipo)
 
     def despachar(self, tipo: str, datos: str) -> None:
         """
@@ -125,31 +160,71 @@ class EventRouterPrioritizado:
         Handlers con igual prioridad se ejecutan en orden de registro (FIFO).
         INV-P2: el cliente solo llama a despachar(tipo, datos) — sin cambios.
         """
-        if tipo not in self._registro or not self._registro[tipo]:
-            ts = datetime.now().strftime("%H:%M:%S")
-            print(f"  [router] [{ts}] Tipo desconocido '{tipo}' — ignorado")
+        tabla = self._tablas.get(tipo)  # ya ordenada al registrar
+        if tabla is None:
+            if not self.silencioso:
+                ts = datetime.now().strftime("%H:%M:%S")
+                print(f"  [router] [{ts}] Tipo desconocido '{tipo}' — ignorado")
             return
 
-        # Ordenar: primero por prioridad DESCENDENTE, luego por orden ASCENDENTE (FIFO)
-        handlers_ordenados = sorted(
-            self._registro[tipo],
-            key=lambda t: (-t[0], t[1])   # -prioridad: mayor primero; orden: FIFO
-        )
+        if self.silencioso:
+            for _, fn in tabla:
+                try:
+                    fn(datos)
+                except Exception as e:
+                    self._reportar_fallo(fn, e)
+            return
 
         ts = datetime.now().strftime("%H:%M:%S")
         print(f"  [router-prioritizado] [{ts}] Despachando '{tipo}' en orden de prioridad:")
 
-        for prioridad, _, fn in handlers_ordenados:
+        for prioridad, fn in tabla:
             print(f"    → [{prioridad}] {fn.__name__}")
             try:
                 fn(datos)
             except Exception as e:
-                ts = datetime.now().strftime("%H:%M:%S")
-                print(f"    ⚡ [{ts}] Handler '{fn.__name__}' falló: {e} — continuando")
+                self._reportar_fallo(fn, e)
+
+    def despachar_lote(self, eventos: List[Tuple[str, str]]) -> None:
+        """
+        Despacha un lote de eventos (p. ej. los leídos de un mismo chunk del
+        stream) con prioridad ENTRE eventos: todos los handlers de mayor
+        prioridad del lote corren antes que los de menor prioridad.
+        Empates: orden de llegada del evento, luego orden de registro (FIFO).
+        """
+        tablas = self._tablas  # misma versión de tablas para todo el lote
+        por_prioridad: Dict[int, List[Tuple[Callable, str]]] = {}
+        for tipo, datos in eventos:
+            tabla = tablas.get(tipo)
+            if tabla is None:
+                if not self.silencioso:
+                    ts = datetime.now().strftime("%H:%M:%S")
+                    print(f"  [router] [{ts}] Tipo desconocido '{tipo}' — ignorado")
+                continue
+            for prioridad, fn in tabla:
+                cubeta = por_prioridad.get(prioridad)
+                if cubeta is None:
+                    cubeta = por_prioridad[prioridad] = []
+                cubeta.append((fn, datos))
+
+        # Pocas prioridades distintas: ordenar las claves es O(k log k), no O(n log n)
+        for prioridad in sorted(por_prioridad, reverse=True):
+            for fn, datos in por_prioridad[prioridad]:
+                if not self.silencioso:
+                    print(f"    → [{prioridad}] {fn.__name__}")
+                try:
+                    fn(datos)
+                except Exception as e:
+                    self._reportar_fallo(fn, e)
+
+    @staticmethod
+    def _reportar_fallo(fn: Callable, e: Exception) -> None:
+        ts = datetime.now().strftime("%H:%M:%S")
+        print(f"    ⚡ [{ts}] Handler '{getattr(fn, '__name__', fn)}' falló: {e} — continuando")
 
     def listar_handlers(self, tipo: str) -> None:
         """Muestra los handlers registrados para un tipo, en orden de despacho."""
-        if tipo not in self._registro:
+        if tipo not in self._tablas:
             print(f"  No hay handlers para '{tipo}'")
             return
         handlers_ordenados = sorted(
@@ -328,6 +403,22 @@ async def demo_prioridades():
     print(f"   - handler_precio_auditoria (prio=3): ejecutado después de UI ✅")
     print("=" * 65)
 
+    # Fase 2: los mismos 15 eventos leídos en UN chunk del stream.
+    # despachar_lote() aplica la prioridad ENTRE eventos del lote.
+    print("\n🚀 Fase 2: los 15 eventos llegan en el mismo chunk → despachar_lote()")
+    print("-" * 65)
+    _despachos_log.clear()
+    router.silencioso = True
+    router.despachar_lote(eventos)
+
+    print("\n📋 LOG DE DESPACHO DEL LOTE (primeros 4):")
+    for i, entrada in enumerate(_despachos_log[:4], 1):
+        print(f"  {i:2}. {entrada}")
+    primero = _despachos_log[0]
+    marca = "✅" if "handler_stock_URGENTE" in primero else "❌"
+    print(f"\n   stock-critico (evento #10) se atendió primero en el lote {marca}")
+    print("=" * 65)
+
 
 if __name__ == "__main__":
     print("=" * 65)
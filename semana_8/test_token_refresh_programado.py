@@ -0,0 +1,76 @@
+"""
+test_token_refresh_programado.py — Refresh proactivo con call_at (Semana 8)
+==========================================================================
+
+Ejecutar: python -m pytest test_token_refresh_programado.py -q
+"""
+
+import asyncio
+import base64
+import json
+import time
+
+import pytest
+
+from token_manager import EXPIRY_MARGIN_SEC, TokenManager
+
+pytestmark = pytest.mark.asyncio
+
+
+def _jwt_con_exp(exp: int) -> str:
+    def b64(obj):
+        return base64.urlsafe_b64encode(json.dumps(obj).encode()).decode().rstrip("=")
+    return f"{b64({'alg': 'HS256', 'typ': 'JWT'})}.{b64({'sub': 'op1', 'exp': exp})}.firma"
+
+
+class _TokenManagerContado(TokenManager):
+    """refresh_access_token sin red: cuenta llamadas y guarda un token con `ttl` segundos."""
+
+    def __init__(self, ttl: int):
+        super().__init__()
+        self.refresh_calls = 0
+        self._ttl = ttl
+
+    async def refresh_access_token(self) -> bool:
+        self.refresh_calls += 1
+        self.store_tokens(_jwt_con_exp(int(time.time()) + self._ttl))
+        return True
+
+
+async def test_refresh_cuando_el_token_entra_en_el_margen():
+    tm = _TokenManagerContado(ttl=900)
+    tm.start_proactive_refresh()
+    tm.store_tokens(_jwt_con_exp(int(time.time()) + EXPIRY_MARGIN_SEC + 2), "refresh")
+    assert not tm.is_expiring_soon()
+
+    limite = time.monotonic() + 3.5
+    while tm.refresh_calls == 0 and time.monotonic() < limite:
+        await asyncio.sleep(0.05)
+
+    assert tm.refresh_calls == 1
+    assert not tm.is_expiring_soon()
+    assert tm._proactive_timer is not None  # reprogramado para el token nuevo
+    tm.logout()
+
+
+async def test_token_ya_dentro_del_margen_se_refresca_sin_bucle():
+    # El servidor emite tokens que ya nacen dentro del margen
+    tm = _TokenManagerContado(ttl=EXPIRY_MARGIN_SEC // 2)
+    tm.start_proactive_refresh()
+    tm.store_tokens(_jwt_con_exp(int(time.time()) + 60), "refresh")
+    assert tm.is_expiring_soon()
+
+    await asyncio.sleep(0.2)
+    assert tm.refresh_calls == 1  # de inmediato, y no otra vez enseguida
+    assert tm._proactive_timer is not None
+    tm.logout()
+
+
+async def test_logout_cancela_el_refresh_programado():
+    tm = _TokenManagerContado(ttl=900)
+    tm.start_proactive_refresh()
+    tm.store_tokens(_jwt_con_exp(int(time.time()) + 30), "refresh")
+    tm.logout()
+    await asyncio.sleep(0.1)
+    assert tm.refresh_calls == 0
+    assert tm._proactive_timer is None
@@ -26,6 +26,9 @@ INVARIANTES GLOBALES:
   INV-TM4: refresh_access_token() → solo UNA petición real al servidor
             aunque sean N corrutinas concurrentes llamando al mismo tiempo.
   INV-TM5: logout() limpia TODO el estado: token, flag, cola de espera, timer.
+  INV-TM7: el payload del access_token se decodifica UNA vez por token
+            (cache en _exp_actual); el refresh proactivo es un único
+            loop.call_at en exp - margen, no un bucle de polling.
   INV-TM6: decode_payload() lanza ValueError controlado ante token malformado
             (no IndexError/KeyError sin capturar que derribe el cliente).
 
@@ -95,6 +98,7 @@ REFRESH_ENDPOINT  = f"{AUTH_BASE_URL}/api/auth/refresh"
 RECURSO_ENDPOINT  = f"{AUTH_BASE_URL}/api/ecomarket/precios"
 
 EXPIRY_MARGIN_SEC = 300   # Renovar si faltan < 5 minutos
+PROACTIVE_MIN_INTERVAL_SEC = 30   # Mínimo entre dos refresh proactivos seguidos
 
 
 # ════════════════════════════════════════════════════════════════════
@@ -118,8 +122,14 @@ class TokenManager:
         self._access_token: Optional[str] = None
         self._refresh_token: Optional[str] = None
         self._refresh_lock = asyncio.Lock()   # Singleton guard — INV-TM4
-        self._proactive_task: Optional[asyncio.Task] = None   # Timer proactivo
+        self._proactive_task: Optional[asyncio.Task] = None   # Refresh proactivo en curso
+        self._proactive_timer: Optional[asyncio.TimerHandle] = None   # call_at en exp - margen
+        self._proactive_enabled = False
+        self._ultimo_proactivo: Optional[float] = None   # time.time() del último refresh proactivo
         self._refresh_endpoint = REFRESH_ENDPOINT
+        # Cache decode-once: 'exp' del token del que se decodificó
+        self._claims_token: Optional[str] = None
+        self._exp_cacheado: Optional[int] = None
 
     # ── Método 1: decode_payload ─────────────────────────────────────
 
@@ -199,17 +209,11 @@ class TokenManager:
         if self._access_token is None:
             return True   # Sin token → necesita refresh/login
 
-        try:
-            payload = self.decode_payload(self._access_token)
-        except ValueError:
-            # Token malformado → tratar como expirado
-            return True
-
-        # INV-TM3: sin 'exp' → tratar como expirado inmediatamente
-        if 'exp' not in payload:
+        # INV-TM3: sin 'exp' (o token malformado) → tratar como expirado
+        exp_unix = self._exp_actual()
+        if exp_unix is None:
             return True
 
-        exp_unix = payload['exp']
         # INV-TM2: time.time() devuelve segundos (float); exp es segundos Unix
         # ¡NUNCA comparar con time.time() * 1000 ni con Date.now() sin dividir!
         ahora_unix = int(time.time())
@@ -217,6 +221,26 @@ class TokenManager:
 
         return tiempo_restante < margin_seconds
 
+    def _exp_actual(self) -> Optional[int]:
+        """
+        Retorna el 'exp' del access_token actual, decodificándolo UNA sola vez.
+
+        DECISIÓN DE DISEÑO:
+          is_expiring_soon() se consulta antes de cada petición; repetir
+          split + Base64 + json.loads cada vez es trabajo desperdiciado. Se
+          cachea el 'exp' junto con el token del que salió: si alguien
+          reemplaza _access_token directamente (como validar_6_casos), la
+          comparación por identidad lo detecta y se decodifica de nuevo.
+        """
+        token = self._access_token
+        if token is not self._claims_token:
+            self._claims_token = token
+            try:
+                self._exp_cacheado = self.decode_payload(token).get('exp')
+            except ValueError:
+                self._exp_cacheado = None   # malformado → expirado
+        return self._exp_cacheado
+
     # ── Método 3: store_tokens ────────────────────────────────────────
 
     def store_tokens(self, access_token: str, refresh_token: Optional[str] = None) -> None:
@@ -239,6 +263,8 @@ class TokenManager:
         self._access_token = access_token
         if refresh_token is not None:
             self._refresh_token = refresh_token
+        self._exp_actual()   # claims decodificados una sola vez, aquí
+        self._programar_refresh_proactivo()
 
         ts = time.strftime('%H:%M:%S')
         print(f"  🔐 [{ts}] Tokens almacenados en memoria")
@@ -288,6 +314,11 @@ class TokenManager:
         self._refresh_token = None
 
         # Cancelar el timer de refresh proactivo (INV-TM5)
+        self._proactive_enabled = False
+        self._ultimo_proactivo = None
+        if self._proactive_timer is not None:
+            self._proactive_timer.cancel()
+            self._proactive_timer = None
         if self._proactive_task and not self._proactive_task.done():
             self._proactive_task.cancel()
             self._proactive_task = None
@@ -351,6 +382,8 @@ class TokenManager:
                         return False
 
                     self._access_token = nuevo_token
+                    self._exp_actual()
+                    self._programar_refresh_proactivo()
                     ts = time.strftime('%H:%M:%S')
                     print(f"  ✅ [{ts}] Access token renovado exitosamente")
                     return True
@@ -375,25 +408,56 @@ class TokenManager:
 
     # ── Método extra: start_proactive_refresh ────────────────────────
 
-    async def _proactive_refresh_loop(self) -> None:
+    def _programar_refresh_proactivo(self) -> None:
         """
-        Tarea de fondo que verifica periódicamente si el token está por expirar
-        y dispara un refresh proactivo si es necesario.
+        Programa UN refresh con loop.call_at en el instante en que
+        is_expiring_soon() pasa a True (exp - EXPIRY_MARGIN_SEC + 1).
+
+        DECISIÓN DE DISEÑO:
+          Antes un bucle despertaba cada 60 s para preguntar is_expiring_soon():
+          60 despertares por hora para un solo refresh útil, y hasta 60 s de
+          retraso sobre el margen. Con el 'exp' ya cacheado se sabe el instante
+          exacto; cada store_tokens()/refresh reprograma el timer. Un token que
+          ya está dentro del margen se refresca de inmediato, pero nunca antes
+          de PROACTIVE_MIN_INTERVAL_SEC desde el refresh proactivo anterior
+          (un servidor que emite tokens de vida corta no provoca un bucle).
         """
-        while True:
-            await asyncio.sleep(60)   # Verificar cada 60 segundos
-            if self._access_token and self.is_expiring_soon():
-                ts = time.strftime('%H:%M:%S')
-                print(f"  🔔 [{ts}] Refresh proactivo: token expira en < 5 min")
-                await self.refresh_access_token()
+        if self._proactive_timer is not None:
+            self._proactive_timer.cancel()
+            self._proactive_timer = None
+        if not self._proactive_enabled or self._access_token is None:
+            return
+        exp_unix = self._exp_actual()
+        if exp_unix is None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return   # sin event loop (llamada desde código síncrono)
+        # is_expiring_soon() compara segundos enteros con '<': pasa a True en exp - margen + 1
+        instante = exp_unix - EXPIRY_MARGIN_SEC + 1
+        if self._ultimo_proactivo is not None:
+            instante = max(instante, self._ultimo_proactivo + PROACTIVE_MIN_INTERVAL_SEC)
+        retraso = max(instante - time.time(), 0.0)
+        self._proactive_timer = loop.call_at(loop.time() + retraso, self._on_proactive_timer)
+
+    def _on_proactive_timer(self) -> None:
+        self._proactive_timer = None
+        if self._access_token is None:
+            return
+        # Sin volver a preguntar is_expiring_soon(): loop.time() (monotónico) y
+        # time.time() derivan unos ms y el timer ya se programó para este instante
+        self._ultimo_proactivo = time.time()
+        ts = time.strftime('%H:%M:%S')
+        print(f"  🔔 [{ts}] Refresh proactivo: token expira en < 5 min")
+        if self._proactive_task is None or self._proactive_task.done():
+            self._proactive_task = asyncio.ensure_future(self.refresh_access_token())
 
     def start_proactive_refresh(self) -> None:
-        """Inicia el timer de refresh proactivo como tarea de fondo."""
-        if self._proactive_task is None or self._proactive_task.done():
-            self._proactive_task = asyncio.ensure_future(
-                self._proactive_refresh_loop()
-            )
-            print("  ⏰ Timer de refresh proactivo iniciado")
+        """Activa el refresh proactivo: un timer en exp - margen (no polling)."""
+        self._proactive_enabled = True
+        self._programar_refresh_proactivo()
+        print("  ⏰ Timer de refresh proactivo iniciado")
 
 
 # ════════════════════════════════════════════════════════════════════